@@ -1,36 +1,143 @@
 import logging
 from datetime import datetime, timezone
+from typing import Dict, Any
 from fastapi import APIRouter, HTTPException, Depends
+from pydantic import ValidationError
 
 from app.models.domain import (
-    ActionActiveTask, ActionVote, ActionUnvote, ActionReveal, ActionReset, 
+    ActionActiveTask, ActionVote, ActionUnvote, ActionReveal, ActionReset,
     ActionComplete, ActionDelete, ActionKick, ActionTimer, ActionReorder,
-    TaskStatus, Vote, ActionBase
+    ActionBatch, TaskStatus, Vote, ActionBase
 )
 from app.core.security import get_current_user
-from app.db.database import get_db
-from app.services.socket import broadcast_room_state, check_all_voted, get_room_state, sio
+from app.db.repositories import Repositories, get_repositories
+from app.services.idempotency import IdempotentRoute
+from app.services.statistics import compute_vote_statistics
+from app.services import counters, live_metrics
+from app.services.authz import get_membership, get_room_deck, invalidate_membership
+from app.services.socket import broadcast_room_state, broadcast_reveal, check_all_voted, reveal_cards, sio
 
 logger = logging.getLogger(__name__)
-router = APIRouter(tags=["Actions"])
+router = APIRouter(tags=["Actions"], route_class=IdempotentRoute)
+
+# Each admin action is split into an "apply" step (DB writes only) and the HTTP
+# endpoint (auth + apply + broadcast), so the batch endpoint can reuse the same
+# logic while checking admin rights and broadcasting only once.
+
+async def _apply_active_task(repos: Repositories, action: ActionActiveTask) -> Dict[str, Any]:
+    await repos.tasks.replace_status(action.room_id, TaskStatus.ACTIVE, TaskStatus.PENDING)
+    await repos.tasks.update(action.task_id, {
+        "status": TaskStatus.ACTIVE,
+        "final_score": None,
+        "votes_summary": [],
+        "statistics": None,
+        "completed_at": None
+    })
+    await repos.rooms.update(action.room_id, {"active_task_id": action.task_id, "cards_revealed": False})
+    await counters.record_votes_removed(repos.db, {"task_id": action.task_id})
+    await repos.votes.delete_task(action.task_id)
+    return {}
+
+async def _apply_reveal(repos: Repositories, action: ActionReveal) -> Dict[str, Any]:
+    await reveal_cards(repos, action.room_id)
+    return {}
+
+async def _apply_reset(repos: Repositories, action: ActionReset) -> Dict[str, Any]:
+    if action.task_id:
+        await counters.record_votes_removed(repos.db, {"task_id": action.task_id})
+        await repos.votes.delete_task(action.task_id)
+        await repos.tasks.update(action.task_id, {"statistics": None})
+    await repos.rooms.update(action.room_id, {"cards_revealed": False})
+    return {}
+
+async def _apply_complete(repos: Repositories, action: ActionComplete) -> Dict[str, Any]:
+    votes = await repos.votes.list_task(action.task_id)
+    names = {}
+    if votes:
+        voters = await repos.memberships.list_by_ids(action.room_id, [v["user_id"] for v in votes])
+        names = {u["id"]: u["name"] for u in voters}
+    votes_summary = [{"name": names.get(v["user_id"], "Unknown"), "value": v["value"]} for v in votes]
+    # Recomputed from the final votes: a vote changed after the reveal makes the
+    # statistics stored by reveal_cards stale.
+    room = await repos.rooms.get(action.room_id, ["deck_values"])
+    statistics = compute_vote_statistics([v["value"] for v in votes], (room or {}).get("deck_values") or [])
+
+    await repos.tasks.update(action.task_id, {
+        "status": TaskStatus.COMPLETED,
+        "final_score": str(action.final_score),
+        "votes_summary": votes_summary,
+        "statistics": statistics,
+        "completed_at": datetime.now(timezone.utc).isoformat()
+    })
+    await repos.rooms.update(action.room_id, {"active_task_id": None, "cards_revealed": False})
+    return {}
+
+async def _apply_delete_task(repos: Repositories, action: ActionDelete) -> Dict[str, Any]:
+    room = await repos.rooms.get(action.room_id)
+    if room and room.get("active_task_id") == action.task_id:
+        await repos.rooms.update(action.room_id, {"active_task_id": None, "cards_revealed": False})
+    if await repos.tasks.delete(action.task_id): await counters.bump(repos.db, counters.room_key(action.room_id), tasks_count=-1)
+    await counters.record_votes_removed(repos.db, {"task_id": action.task_id})
+    await repos.votes.delete_task(action.task_id)
+    return {}
+
+async def _apply_cancel_task(repos: Repositories, action: ActionDelete) -> Dict[str, Any]:
+    room = await repos.rooms.get(action.room_id)
+    if room and room.get("active_task_id") == action.task_id:
+        await repos.rooms.update(action.room_id, {"active_task_id": None, "cards_revealed": False})
+
+    await repos.tasks.update(action.task_id, {"status": TaskStatus.CANCELLED})
+    return {}
+
+async def _apply_kick(repos: Repositories, action: ActionKick) -> Dict[str, Any]:
+    if await repos.memberships.delete(action.target_user_id, action.room_id):
+        await counters.bump(repos.db, counters.room_key(action.room_id), members_count=-1)
+    invalidate_membership(action.target_user_id, action.room_id)
+    await counters.record_votes_removed(repos.db, {"user_id": action.target_user_id, "room_id": action.room_id})
+    await repos.votes.delete_user_in_room(action.target_user_id, action.room_id)
+    await sio.emit('kicked', {"target_user_id": action.target_user_id}, room=action.room_id)
+    return {}
+
+async def _apply_start_timer(repos: Repositories, action: ActionTimer) -> Dict[str, Any]:
+    timer_end = (datetime.now(timezone.utc).timestamp() + action.duration_seconds)
+    timer_end_iso = datetime.fromtimestamp(timer_end, tz=timezone.utc).isoformat()
+
+    await repos.rooms.update(action.room_id, {"timer_end": timer_end_iso})
+    return {"timer_end": timer_end_iso}
+
+async def _apply_stop_timer(repos: Repositories, action: ActionBase) -> Dict[str, Any]:
+    await repos.rooms.update(action.room_id, {"timer_end": None})
+    return {}
+
+async def _apply_reorder_tasks(repos: Repositories, action: ActionReorder) -> Dict[str, Any]:
+    for index, task_id in enumerate(action.task_ids):
+        await repos.tasks.update(task_id, {"position": index}, room_id=action.room_id)
+    return {}
+
+# Batchable admin actions, keyed by the path of their standalone endpoint.
+BATCH_ACTIONS = {
+    "active-task": (ActionActiveTask, _apply_active_task),
+    "reveal": (ActionReveal, _apply_reveal),
+    "reset": (ActionReset, _apply_reset),
+    "complete": (ActionComplete, _apply_complete),
+    "delete-task": (ActionDelete, _apply_delete_task),
+    "cancel-task": (ActionDelete, _apply_cancel_task),
+    "kick": (ActionKick, _apply_kick),
+    "start-timer": (ActionTimer, _apply_start_timer),
+    "stop-timer": (ActionBase, _apply_stop_timer),
+    "reorder-tasks": (ActionReorder, _apply_reorder_tasks),
+}
+
+# Actions after which the cards are (or may be) hidden again.
+CONCEALING_ACTIONS = {"active-task", "reset", "complete", "delete-task", "cancel-task"}
 
 @router.post("/active-task")
 async def set_active_task_http(action: ActionActiveTask, current_user_id: str = Depends(get_current_user)):
-    db = get_db()
-    user = await db.users.find_one({"id": current_user_id, "room_id": action.room_id})
+    repos = get_repositories()
+    user = await get_membership(current_user_id, action.room_id)
     if not user or not user.get("is_admin"): raise HTTPException(403, "Admin only")
-    
-    await db.tasks.update_many({"room_id": action.room_id, "status": TaskStatus.ACTIVE}, {"$set": {"status": TaskStatus.PENDING}})
-    await db.tasks.update_one(
-        {"id": action.task_id}, 
-        {"$set": {
-            "status": TaskStatus.ACTIVE,
-            "final_score": None,
-            "votes_summary": []
-        }}
-    )
-    await db.rooms.update_one({"id": action.room_id}, {"$set": {"active_task_id": action.task_id, "cards_revealed": False}})
-    await db.votes.delete_many({"task_id": action.task_id})
+
+    await _apply_active_task(repos, action)
     await broadcast_room_state(action.room_id)
     return {"status": "success"}
 
@@ -38,25 +145,24 @@ async def set_active_task_http(action: ActionActiveTask, current_user_id: str =
 async def cast_vote_http(action: ActionVote, current_user_id: str = Depends(get_current_user)):
     if action.user_id != current_user_id:
         raise HTTPException(403, "User ID mismatch")
-    db = get_db()
-    user = await db.users.find_one({"id": action.user_id, "room_id": action.room_id})
+    repos = get_repositories()
+    user = await get_membership(action.user_id, action.room_id)
     if not user or user.get("is_spectator"): raise HTTPException(403, "Cannot vote")
-    
-    room = await db.rooms.find_one({"id": action.room_id})
-    if not room: raise HTTPException(404, "Room not found")
-    
-    deck_values = room.get("deck_values", [])
+
+    deck_values = await get_room_deck(action.room_id)
+    if deck_values is None: raise HTTPException(404, "Room not found")
+
     if str(action.value) not in deck_values:
-        raise HTTPException(400, f"Invalid vote value. Must be one of: {deck_values}")
-    
-    await db.votes.delete_one({"task_id": action.task_id, "user_id": action.user_id})
+        raise HTTPException(400, f"Invalid vote value. Must be one of: {list(deck_values)}")
+
     vote = Vote(task_id=action.task_id, user_id=action.user_id, value=str(action.value))
-    await db.votes.insert_one(vote.model_dump())
-    
+    if not await repos.votes.replace(vote.model_dump()):
+        await counters.bump(repos.db, counters.user_key(action.user_id), votes_cast=1)
+    live_metrics.record_vote(action.room_id)
+
     if await check_all_voted(action.room_id, action.task_id):
-        await db.rooms.update_one({"id": action.room_id}, {"$set": {"cards_revealed": True}})
-        state = await get_room_state(action.room_id, include_votes=True)
-        await sio.emit('reveal_votes', state, room=action.room_id)
+        await reveal_cards(repos, action.room_id)
+        await broadcast_reveal(action.room_id)
     else:
         await broadcast_room_state(action.room_id)
     return {"status": "success"}
@@ -65,134 +171,138 @@ async def cast_vote_http(action: ActionVote, current_user_id: str = Depends(get_
 async def retract_vote_http(action: ActionUnvote, current_user_id: str = Depends(get_current_user)):
     if action.user_id != current_user_id:
         raise HTTPException(403, "User ID mismatch")
-    db = get_db()
-    user = await db.users.find_one({"id": action.user_id, "room_id": action.room_id})
+    repos = get_repositories()
+    user = await get_membership(action.user_id, action.room_id)
     if not user or user.get("is_spectator"): raise HTTPException(403, "Cannot vote")
-    
-    await db.votes.delete_one({"task_id": action.task_id, "user_id": action.user_id})
+
+    if await repos.votes.delete(action.task_id, action.user_id):
+        await counters.bump(repos.db, counters.user_key(action.user_id), votes_cast=-1)
     await broadcast_room_state(action.room_id)
     return {"status": "success"}
 
 @router.post("/reveal")
 async def reveal_cards_http(action: ActionReveal, current_user_id: str = Depends(get_current_user)):
-    db = get_db()
-    user = await db.users.find_one({"id": current_user_id, "room_id": action.room_id})
+    repos = get_repositories()
+    user = await get_membership(current_user_id, action.room_id)
     if not user or not user.get("is_admin"): raise HTTPException(403, "Admin only")
-    await db.rooms.update_one({"id": action.room_id}, {"$set": {"cards_revealed": True}})
-    state = await get_room_state(action.room_id, include_votes=True)
-    await sio.emit('reveal_votes', state, room=action.room_id)
+    await _apply_reveal(repos, action)
+    await broadcast_reveal(action.room_id)
     return {"status": "success"}
 
 @router.post("/reset")
 async def reset_votes_http(action: ActionReset, current_user_id: str = Depends(get_current_user)):
-    db = get_db()
-    user = await db.users.find_one({"id": current_user_id, "room_id": action.room_id})
+    repos = get_repositories()
+    user = await get_membership(current_user_id, action.room_id)
     if not user or not user.get("is_admin"): raise HTTPException(403, "Admin only")
-    if action.task_id: await db.votes.delete_many({"task_id": action.task_id})
-    await db.rooms.update_one({"id": action.room_id}, {"$set": {"cards_revealed": False}})
+    await _apply_reset(repos, action)
     await broadcast_room_state(action.room_id)
     return {"status": "success"}
 
 @router.post("/complete")
 async def complete_task_http(action: ActionComplete, current_user_id: str = Depends(get_current_user)):
-    db = get_db()
-    user = await db.users.find_one({"id": current_user_id, "room_id": action.room_id})
+    repos = get_repositories()
+    user = await get_membership(current_user_id, action.room_id)
     if not user or not user.get("is_admin"): raise HTTPException(403, "Admin only")
-    
-    votes = await db.votes.find({"task_id": action.task_id}).to_list(100)
-    votes_summary = []
-    for v in votes:
-        v_user = await db.users.find_one({"id": v["user_id"], "room_id": action.room_id})
-        votes_summary.append({
-            "name": v_user["name"] if v_user else "Unknown",
-            "value": v["value"]
-        })
-    
-    await db.tasks.update_one(
-        {"id": action.task_id}, 
-        {"$set": {
-            "status": TaskStatus.COMPLETED, 
-            "final_score": str(action.final_score),
-            "votes_summary": votes_summary
-        }}
-    )
-    await db.rooms.update_one({"id": action.room_id}, {"$set": {"active_task_id": None, "cards_revealed": False}})
+
+    await _apply_complete(repos, action)
     await broadcast_room_state(action.room_id)
     return {"status": "success"}
 
 @router.post("/delete-task")
 async def delete_task_http(action: ActionDelete, current_user_id: str = Depends(get_current_user)):
-    db = get_db()
-    user = await db.users.find_one({"id": current_user_id, "room_id": action.room_id})
+    repos = get_repositories()
+    user = await get_membership(current_user_id, action.room_id)
     if not user or not user.get("is_admin"): raise HTTPException(403, "Admin only")
-    room = await db.rooms.find_one({"id": action.room_id})
-    if room and room.get("active_task_id") == action.task_id:
-        await db.rooms.update_one({"id": action.room_id}, {"$set": {"active_task_id": None, "cards_revealed": False}})
-    await db.tasks.delete_one({"id": action.task_id})
-    await db.votes.delete_many({"task_id": action.task_id})
+    await _apply_delete_task(repos, action)
     await broadcast_room_state(action.room_id)
     return {"status": "success"}
 
 @router.post("/cancel-task")
-async def cancel_task_http(action: ActionDelete, current_user_id: str = Depends(get_current_user)): 
-    db = get_db()
-    user = await db.users.find_one({"id": current_user_id, "room_id": action.room_id})
+async def cancel_task_http(action: ActionDelete, current_user_id: str = Depends(get_current_user)):
+    repos = get_repositories()
+    user = await get_membership(current_user_id, action.room_id)
     if not user or not user.get("is_admin"): raise HTTPException(403, "Admin only")
-    
-    room = await db.rooms.find_one({"id": action.room_id})
-    if room and room.get("active_task_id") == action.task_id:
-        await db.rooms.update_one({"id": action.room_id}, {"$set": {"active_task_id": None, "cards_revealed": False}})
-    
-    await db.tasks.update_one({"id": action.task_id}, {"$set": {"status": TaskStatus.CANCELLED}})
+
+    await _apply_cancel_task(repos, action)
     await broadcast_room_state(action.room_id)
     return {"status": "success"}
 
 @router.post("/kick")
 async def kick_user_http(action: ActionKick, current_user_id: str = Depends(get_current_user)):
-    db = get_db()
-    user = await db.users.find_one({"id": current_user_id, "room_id": action.room_id})
+    repos = get_repositories()
+    user = await get_membership(current_user_id, action.room_id)
     if not user or not user.get("is_admin"): raise HTTPException(403, "Admin only")
-    
-    await db.users.delete_one({"id": action.target_user_id, "room_id": action.room_id})
-    await db.votes.delete_many({"user_id": action.target_user_id, "room_id": action.room_id})
-    await sio.emit('kicked', {"target_user_id": action.target_user_id}, room=action.room_id)
+
+    await _apply_kick(repos, action)
     await broadcast_room_state(action.room_id)
     return {"status": "success"}
 
 @router.post("/start-timer")
 async def start_timer_http(action: ActionTimer, current_user_id: str = Depends(get_current_user)):
-    db = get_db()
-    user = await db.users.find_one({"id": current_user_id, "room_id": action.room_id})
+    repos = get_repositories()
+    user = await get_membership(current_user_id, action.room_id)
     if not user or not user.get("is_admin"): raise HTTPException(403, "Admin only")
-    
-    timer_end = (datetime.now(timezone.utc).timestamp() + action.duration_seconds)
-    timer_end_iso = datetime.fromtimestamp(timer_end, tz=timezone.utc).isoformat()
-    
-    await db.rooms.update_one({"id": action.room_id}, {"$set": {"timer_end": timer_end_iso}})
+
+    result = await _apply_start_timer(repos, action)
     await broadcast_room_state(action.room_id)
-    return {"status": "success", "timer_end": timer_end_iso}
+    return {"status": "success", **result}
 
 @router.post("/stop-timer")
 async def stop_timer_http(action: ActionBase, current_user_id: str = Depends(get_current_user)):
-    db = get_db()
-    user = await db.users.find_one({"id": current_user_id, "room_id": action.room_id})
+    repos = get_repositories()
+    user = await get_membership(current_user_id, action.room_id)
     if not user or not user.get("is_admin"): raise HTTPException(403, "Admin only")
-    
-    await db.rooms.update_one({"id": action.room_id}, {"$set": {"timer_end": None}})
+
+    await _apply_stop_timer(repos, action)
     await broadcast_room_state(action.room_id)
     return {"status": "success"}
 
 @router.post("/reorder-tasks")
 async def reorder_tasks_http(action: ActionReorder, current_user_id: str = Depends(get_current_user)):
-    db = get_db()
-    user = await db.users.find_one({"id": current_user_id, "room_id": action.room_id})
+    repos = get_repositories()
+    user = await get_membership(current_user_id, action.room_id)
     if not user or not user.get("is_admin"): raise HTTPException(403, "Admin only")
-    
-    for index, task_id in enumerate(action.task_ids):
-        await db.tasks.update_one(
-            {"id": task_id, "room_id": action.room_id},
-            {"$set": {"position": index}}
-        )
-    
+
+    await _apply_reorder_tasks(repos, action)
     await broadcast_room_state(action.room_id)
     return {"status": "success"}
+
+@router.post("/actions/batch")
+async def batch_actions_http(batch: ActionBatch, current_user_id: str = Depends(get_current_user)):
+    repos = get_repositories()
+    user = await get_membership(current_user_id, batch.room_id)
+    if not user or not user.get("is_admin"): raise HTTPException(403, "Admin only")
+
+    results = []
+    revealed = False
+    failed = False
+    for index, item in enumerate(batch.actions):
+        if failed and batch.stop_on_error:
+            results.append({"index": index, "action": item.action, "status": "skipped"})
+            continue
+        try:
+            if item.action not in BATCH_ACTIONS:
+                raise HTTPException(400, f"Unknown action: {item.action}")
+            model, apply = BATCH_ACTIONS[item.action]
+            action = model(**{**item.params, "room_id": batch.room_id, "user_id": batch.user_id})
+            outcome = await apply(repos, action)
+            results.append({"index": index, "action": item.action, "status": "success", **outcome})
+            revealed = item.action == "reveal" or (revealed and item.action not in CONCEALING_ACTIONS)
+        except HTTPException as e:
+            failed = True
+            results.append({"index": index, "action": item.action, "status": "error", "status_code": e.status_code, "detail": e.detail})
+        except ValidationError as e:
+            failed = True
+            results.append({"index": index, "action": item.action, "status": "error", "status_code": 422, "detail": e.errors(include_url=False, include_context=False)})
+        except Exception as e:
+            failed = True
+            logger.error(f"❌ Erro no batch da sala {batch.room_id} ({item.action}): {e}")
+            results.append({"index": index, "action": item.action, "status": "error", "status_code": 500, "detail": "Internal error"})
+
+    # A single update for the whole batch: reveal_votes if the batch ended on a reveal.
+    if revealed:
+        await broadcast_reveal(batch.room_id)
+    else:
+        await broadcast_room_state(batch.room_id)
+
+    return {"status": "error" if failed else "success", "results": results}
@@ -1,74 +1,95 @@
+import re
 import logging
-from typing import Dict, Any
-from fastapi import APIRouter, HTTPException
+from typing import Callable, Dict, Any, List, Literal, Optional, Tuple
+from pymongo import InsertOne, DeleteOne, DeleteMany
+from fastapi import APIRouter, Depends, HTTPException, Query
 
+from app.core.config import settings
+from app.core.security import require_admin
 from app.models.domain import BatchDeleteRequest, BatchDeleteRoomsRequest
-from app.db.database import get_db
-from app.services.socket import sio, broadcast_room_state
+from app.db.database import db_instance, get_db, query_metrics, read_preference, QUERY_CLASSES
+from app.db import migrations
+from app.db.repositories import LegacyLayoutError, membership_key, require_normalized_layout, vote_key
+from app.db.pagination import decode_cursor, keyset_match, keyset_sort, page_result
+from app.services.authz import invalidate_user, cache_stats
+from app.services import analytics, counters, retention, user_directory
+from app.services.cascade import delete_rooms, delete_users, fan_out
+from app.services.jobs import Job, runner
+from app.services.socket import broadcast_room_state
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/admin", tags=["Admin"])
 
-@router.get("/users")
-async def get_admin_users():
-    db = get_db()
-    if db is None: return []
-    
-    pipeline = [
-        {"$group": {
-            "_id": "$id",
-            "name": {"$first": "$name"},
-            "picture": {"$first": "$picture"},
-            "rooms": {"$addToSet": "$room_id"},
-            "is_online": {"$max": "$is_online"}
-        }}
+USER_SORT_KEYS = {
+    "type": ["_type", "_name", "id"],
+    "name": ["_name", "id"],
+    "email": ["_email", "id"]
+}
+
+def _stats_lookup(kind: str) -> List[Dict[str, Any]]:
+    # Counters are read from the materialized `stats` collection (see services/counters.py).
+    return [
+        {"$addFields": {"_stats_id": {"$concat": [f"{kind}:", "$id"]}}},
+        {"$lookup": {"from": "stats", "localField": "_stats_id", "foreignField": "_id", "as": "_stats"}},
+        {"$addFields": {"_stats": {"$ifNull": [{"$first": "$_stats"}, {}]}}}
     ]
-    users_cursor = db.users.aggregate(pipeline)
-    room_users = await users_cursor.to_list(None)
-    
-    all_users = {}
-    
-    google_users = await db.global_users.find().to_list(None)
-    for u in google_users:
-        uid = u["id"]
-        all_users[uid] = {
-            "id": uid,
-            "name": u.get("name", "Unknown"),
-            "email": u.get("email", ""),
-            "picture": u.get("picture"),
-            "type": "Google",
-            "rooms_participated": 0,
-            "is_online": False
-        }
-        
-    for ru in room_users:
-        uid = ru["_id"]
-        if uid in all_users:
-            all_users[uid]["rooms_participated"] = len(ru.get("rooms", []))
-            all_users[uid]["is_online"] = bool(ru.get("is_online", False))
-            if ru.get("name") and all_users[uid]["name"] == "Unknown":
-                all_users[uid]["name"] = ru["name"]
-            if ru.get("picture") and not all_users[uid]["picture"]:
-                all_users[uid]["picture"] = ru["picture"]
-        else:
-            all_users[uid] = {
-                "id": uid,
-                "name": ru.get("name", "Guest"),
-                "email": "",
-                "picture": ru.get("picture"),
-                "type": "Guest",
-                "rooms_participated": len(ru.get("rooms", [])),
-                "is_online": bool(ru.get("is_online", False))
-            }
-            
-    result = []
-    for uid, user_data in all_users.items():
-        user_data["rooms_owned"] = await db.rooms.count_documents({"owner_id": uid})
-        user_data["votes_cast"] = await db.votes.count_documents({"user_id": uid})
-        result.append(user_data)
-        
-    result.sort(key=lambda x: (x["type"] != "Google", x["name"].lower()))
-    return result
+
+def _stat(field: str) -> Dict[str, Any]:
+    return {"$ifNull": [f"$_stats.{field}", 0]}
+
+def admin_users_match(q: Optional[str]) -> Dict[str, Any]:
+    if not q: return {}
+    prefix = {"$regex": f"^{re.escape(q.lower())}"}
+    return {"$or": [{"_name": prefix}, {"_email": prefix}]}
+
+def admin_users_pipeline(q: Optional[str], sort: str, direction: int, limit: int, after: Optional[List[Any]]) -> List[Dict[str, Any]]:
+    # Pages over the materialized directory rows (services/user_directory.py) on their sort
+    # indexes; rooms, presence and the stats counters are looked up for that page only.
+    fields = USER_SORT_KEYS[sort]
+    match = admin_users_match(q)
+    if after is not None:
+        match = {"$and": [match, keyset_match(fields, after, direction)]} if match else keyset_match(fields, after, direction)
+    pipeline: List[Dict[str, Any]] = [{"$match": match}] if match else []
+    pipeline += [
+        {"$sort": keyset_sort(fields, direction)},
+        {"$limit": limit + 1},
+        {"$lookup": {"from": "memberships", "localField": "id", "foreignField": "user_id", "as": "_rooms"}},
+        *_stats_lookup("user"),
+        {"$addFields": {
+            "rooms_participated": {"$size": {"$setUnion": ["$_rooms.room_id", []]}},
+            "is_online": {"$anyElementTrue": [{"$map": {"input": "$_rooms", "in": {"$eq": ["$$this.is_online", True]}}}]},
+            "rooms_owned": _stat("rooms_owned"),
+            "votes_cast": _stat("votes_cast")
+        }},
+        {"$project": {"_id": 0, "_rooms": 0, "_stats": 0, "_stats_id": 0}}
+    ]
+    return pipeline
+
+@router.get("/users")
+async def get_admin_users(
+    q: Optional[str] = None,
+    sort: Literal["type", "name", "email"] = "type",
+    order: Literal["asc", "desc"] = "asc",
+    limit: int = Query(50, ge=1, le=500),
+    cursor: Optional[str] = None,
+    total: Literal["exact", "estimated", "none"] = "exact"
+):
+    db = get_db("admin")
+    if db is None: return {"items": [], "next_cursor": None, "total": 0}
+
+    fields = USER_SORT_KEYS[sort]
+    after = decode_cursor(cursor, len(fields))
+    direction = 1 if order == "asc" else -1
+
+    users = await db.admin_users.aggregate(admin_users_pipeline(q, sort, direction, limit, after)).to_list(limit + 1)
+
+    # As for rooms: "estimated" reads collection metadata and ignores the search.
+    count = None
+    if total == "estimated":
+        count = await db.admin_users.estimated_document_count()
+    elif total == "exact":
+        count = await db.admin_users.count_documents(admin_users_match(q))
+    return page_result(users, limit, fields, count)
 
 @router.get("/users/{user_id}/check")
 async def check_user_relations(user_id: str):
@@ -78,7 +99,7 @@ async def check_user_relations(user_id: str):
         
     owned_rooms_count = await db.rooms.count_documents({"owner_id": user_id})
     votes_count = await db.votes.count_documents({"user_id": user_id})
-    memberships_count = await db.users.count_documents({"id": user_id})
+    memberships_count = await db.memberships.count_documents({"user_id": user_id})
     
     return {
         "owned_rooms": owned_rooms_count,
@@ -87,46 +108,56 @@ async def check_user_relations(user_id: str):
         "has_relations": (owned_rooms_count > 0 or votes_count > 0 or memberships_count > 0)
     }
 
-@router.delete("/users/{user_id}")
+@router.delete("/users/{user_id}", status_code=202)
 async def delete_user(user_id: str, confirm: bool = False):
     db = get_db()
     if db is None: raise HTTPException(500, "Database connection not available")
         
-    owned_rooms = await db.rooms.find({"owner_id": user_id}).to_list(None)
-    votes_count = await db.votes.count_documents({"user_id": user_id})
-    memberships = await db.users.find({"id": user_id}).to_list(None)
-    
-    has_relations = (len(owned_rooms) > 0 or votes_count > 0 or len(memberships) > 0)
-    
-    if has_relations and not confirm:
+    relations = await check_user_relations(user_id)
+    if relations["has_relations"] and not confirm:
         raise HTTPException(
             status_code=400, 
             detail="User has active rooms, votes, or room memberships. Confirmation required."
         )
         
-    affected_rooms = set()
-    for mem in memberships: affected_rooms.add(mem["room_id"])
-        
-    room_ids_to_delete = [r["id"] for r in owned_rooms]
-    for r_id in room_ids_to_delete:
-        tasks = await db.tasks.find({"room_id": r_id}).to_list(None)
-        task_ids = [t["id"] for t in tasks]
-        if task_ids:
-            await db.votes.delete_many({"task_id": {"$in": task_ids}})
-        await db.tasks.delete_many({"room_id": r_id})
-        await db.users.delete_many({"room_id": r_id})
-        await db.rooms.delete_one({"id": r_id})
-        await sio.emit('room_deleted', {"room_id": r_id}, room=r_id)
-        
-    await db.votes.delete_many({"user_id": user_id})
-    await db.users.delete_many({"id": user_id})
-    await db.global_users.delete_one({"id": user_id})
-    
-    for r_id in affected_rooms:
-        if r_id not in room_ids_to_delete:
-            await broadcast_room_state(r_id)
-            
-    return {"status": "success"}
+    job = await runner.submit("delete_users", {"user_ids": [user_id]}, lambda job: delete_users(db, [user_id], job))
+    return {"status": "accepted", "job_id": job["id"], "job": job}
+
+def _rekey_ops(moves: List[Dict[str, Any]], deletes: List[Any], owner_field: str, target_id: str, key: Callable[[Dict[str, Any]], str]) -> List[Any]:
+    # Keys contain the user id, so a moved document is reinserted under the target's key.
+    ops: List[Any] = []
+    for doc in moves:
+        moved = {**doc, owner_field: target_id}
+        ops += [InsertOne({**moved, "_id": key(moved)}), DeleteOne({"_id": doc["_id"]})]
+    if deletes: ops.append(DeleteMany({"_id": {"$in": deletes}}))
+    return ops
+
+def _plan_merge(groups: List[Dict[str, Any]], owner_field: str, target_id: str, source_order: Dict[str, int]) -> Tuple[List[Dict[str, Any]], List[Any]]:
+    """Splits source documents grouped by their unique key into moves and conflicting deletes.
+
+    Where the target already has a document the source ones are dropped; otherwise the
+    document of the first source (in request order) moves to the target and the rest
+    are dropped, which is what merging the sources one after the other would do."""
+    moves, deletes = [], []
+    for group in groups:
+        sources = sorted((d for d in group["docs"] if d[owner_field] != target_id), key=lambda d: source_order[d[owner_field]])
+        if not group["has_target"]:
+            moves.append(sources.pop(0))
+        deletes += [d["_id"] for d in sources]
+    return moves, deletes
+
+def _merge_groups_pipeline(owner_field: str, key_field: str, target_id: str, source_ids: List[str]) -> List[Dict[str, Any]]:
+    # One pass over the source and target documents, grouped by the field that must stay
+    # unique per user: (task_id, user_id) for votes, (user_id, room_id) for memberships.
+    return [
+        {"$match": {owner_field: {"$in": source_ids + [target_id]}}},
+        {"$group": {
+            "_id": f"${key_field}",
+            "docs": {"$push": "$$ROOT"},
+            "has_target": {"$max": {"$eq": [f"${owner_field}", target_id]}}
+        }},
+        {"$match": {f"docs.{owner_field}": {"$in": source_ids}}}
+    ]
 
 @router.post("/users/merge")
 async def merge_users(data: Dict[str, Any]):
@@ -135,89 +166,170 @@ async def merge_users(data: Dict[str, Any]):
         
     target_id = data.get("target_id")
     source_ids = data.get("source_ids", [])
+    dry_run = bool(data.get("dry_run", False))
     
     if not target_id or not source_ids:
         raise HTTPException(400, "target_id and source_ids are required")
-        
-    for src_id in source_ids:
-        if src_id == target_id: continue
-            
-        await db.rooms.update_many({"owner_id": src_id}, {"$set": {"owner_id": target_id}})
-        
-        src_votes = await db.votes.find({"user_id": src_id}).to_list(None)
-        for vote in src_votes:
-            exists = await db.votes.find_one({"task_id": vote["task_id"], "user_id": target_id})
-            if exists:
-                await db.votes.delete_one({"_id": vote["_id"]})
-            else:
-                await db.votes.update_one({"_id": vote["_id"]}, {"$set": {"user_id": target_id}})
-                
-        src_memberships = await db.users.find({"id": src_id}).to_list(None)
-        affected_rooms = set()
-        for mem in src_memberships:
-            room_id = mem["room_id"]
-            affected_rooms.add(room_id)
-            
-            exists = await db.users.find_one({"id": target_id, "room_id": room_id})
-            if exists:
-                await db.users.delete_one({"id": src_id, "room_id": room_id})
-            else:
-                await db.users.update_one(
-                    {"id": src_id, "room_id": room_id},
-                    {"$set": {"id": target_id}}
-                )
-                
-        await db.global_users.delete_one({"id": src_id})
-        
-        for r_id in affected_rooms:
-            await broadcast_room_state(r_id)
-            
-    return {"status": "success", "merged_count": len(source_ids)}
+
+    try:
+        require_normalized_layout()
+    except LegacyLayoutError as e:
+        raise HTTPException(409, str(e))
+
+    sources = list(dict.fromkeys(src_id for src_id in source_ids if src_id != target_id))
+    source_order = {src_id: i for i, src_id in enumerate(sources)}
+
+    vote_groups = await db.votes.aggregate(_merge_groups_pipeline("user_id", "task_id", target_id, sources)).to_list(None)
+    member_groups = await db.memberships.aggregate(_merge_groups_pipeline("user_id", "room_id", target_id, sources)).to_list(None)
+    vote_moves, vote_deletes = _plan_merge(vote_groups, "user_id", target_id, source_order)
+    member_moves, member_deletes = _plan_merge(member_groups, "user_id", target_id, source_order)
+    affected_rooms = [g["_id"] for g in member_groups]
+
+    report = {
+        "rooms_transferred": await db.rooms.count_documents({"owner_id": {"$in": sources}}) if dry_run else 0,
+        "votes_moved": len(vote_moves),
+        "votes_conflicting": len(vote_deletes),
+        "memberships_moved": len(member_moves),
+        "memberships_conflicting": len(member_deletes),
+        "affected_rooms": len(affected_rooms)
+    }
+    if dry_run or not sources:
+        return {"status": "success", "dry_run": dry_run, "merged_count": len(sources), **report}
+
+    moved_rooms = await db.rooms.update_many({"owner_id": {"$in": sources}}, {"$set": {"owner_id": target_id}})
+    report["rooms_transferred"] = moved_rooms.modified_count
+
+    vote_ops = _rekey_ops(vote_moves, vote_deletes, "user_id", target_id, lambda v: vote_key(v["task_id"], v["user_id"]))
+    if vote_ops: await db.votes.bulk_write(vote_ops, ordered=True)
+
+    member_ops = _rekey_ops(member_moves, member_deletes, "user_id", target_id, lambda m: membership_key(m["user_id"], m["room_id"]))
+    if member_ops: await db.memberships.bulk_write(member_ops, ordered=True)
+
+    # The target keeps its own profile, or takes the first source's.
+    for src_id in sources:
+        profile = await db.profiles.find_one({"_id": src_id})
+        if profile:
+            await db.profiles.update_one({"_id": target_id}, {"$setOnInsert": {k: v for k, v in profile.items() if k != "_id"}}, upsert=True)
+            break
+    await db.profiles.delete_many({"_id": {"$in": sources}})
+    await db.global_users.delete_many({"id": {"$in": sources}})
+    for u_id in sources + [target_id]: invalidate_user(u_id)
+    await user_directory.refresh(db, sources + [target_id])
+
+    dropped_ids = set(member_deletes)
+    conflicts_per_room: Dict[str, int] = {}
+    for group in member_groups:
+        dropped = sum(1 for d in group["docs"] if d["_id"] in dropped_ids)
+        if dropped: conflicts_per_room[group["_id"]] = -dropped
+    await counters.drop(db, [counters.user_key(src_id) for src_id in sources])
+    await counters.bump_many(db, {
+        counters.user_key(target_id): {"rooms_owned": report["rooms_transferred"], "votes_cast": len(vote_moves)},
+        **{counters.room_key(r_id): {"members_count": n} for r_id, n in conflicts_per_room.items()}
+    })
+
+    # One broadcast per affected room, however many sources were members of it.
+    await fan_out(affected_rooms, broadcast_room_state)
+    return {"status": "success", "dry_run": False, "merged_count": len(sources), **report}
+
+ROOM_SORT_KEYS = ["created_at", "id"]
+
+def admin_rooms_pipeline(match: Dict[str, Any], active: Optional[bool], direction: int, limit: int, after: Optional[List[Any]]) -> List[Dict[str, Any]]:
+    # Task and member totals come from the stats counters; online members are counted
+    # live. Lookups run after $limit unless the activity filter needs them to pick the page.
+    if after is not None:
+        match = {"$and": [match, keyset_match(ROOM_SORT_KEYS, after, direction)]} if match else keyset_match(ROOM_SORT_KEYS, after, direction)
+    counts = [
+        *_stats_lookup("room"),
+        {"$lookup": {
+            "from": "memberships",
+            "localField": "id",
+            "foreignField": "room_id",
+            "pipeline": [{"$match": {"is_online": True}}, {"$count": "n"}],
+            "as": "online"
+        }},
+        {"$addFields": {
+            "tasks_count": _stat("tasks_count"),
+            "active_users_count": {"$ifNull": [{"$first": "$online.n"}, 0]},
+            "total_users_count": _stat("members_count")
+        }}
+    ]
+    pipeline: List[Dict[str, Any]] = [{"$match": match}, {"$sort": keyset_sort(ROOM_SORT_KEYS, direction)}]
+    if active is None:
+        pipeline += [{"$limit": limit + 1}] + counts
+    else:
+        active_match = {"active_users_count": {"$gt": 0}} if active else {"active_users_count": 0}
+        pipeline += counts + [{"$match": active_match}, {"$limit": limit + 1}]
+    pipeline.append({"$project": {
+        "_id": 0,
+        "id": 1,
+        "name": 1,
+        "owner_id": 1,
+        "created_at": 1,
+        "deck_type": 1,
+        "tasks_count": 1,
+        "active_users_count": 1,
+        "total_users_count": 1
+    }})
+    return pipeline
 
 @router.get("/rooms")
-async def get_admin_rooms():
-    db = get_db()
-    if db is None: return []
-    
-    rooms = await db.rooms.find().sort("created_at", -1).to_list(None)
-    result = []
-    for r in rooms:
-        r_id = r["id"]
-        tasks_count = await db.tasks.count_documents({"room_id": r_id})
-        users_count = await db.users.count_documents({"room_id": r_id, "is_online": True})
-        total_users = await db.users.count_documents({"room_id": r_id})
-        
-        result.append({
-            "id": r_id,
-            "name": r.get("name"),
-            "owner_id": r.get("owner_id"),
-            "created_at": r.get("created_at"),
-            "deck_type": r.get("deck_type"),
-            "tasks_count": tasks_count,
-            "active_users_count": users_count,
-            "total_users_count": total_users
-        })
-    return result
-
-@router.delete("/rooms/{room_id}")
+async def get_admin_rooms(
+    owner_id: Optional[str] = None,
+    deck_type: Optional[str] = None,
+    active: Optional[bool] = None,
+    order: Literal["asc", "desc"] = "desc",
+    limit: int = Query(50, ge=1, le=500),
+    cursor: Optional[str] = None,
+    total: Literal["exact", "estimated", "none"] = "exact"
+):
+    db = get_db("admin")
+    if db is None: return {"items": [], "next_cursor": None}
+
+    after = decode_cursor(cursor, len(ROOM_SORT_KEYS))
+    direction = 1 if order == "asc" else -1
+    match: Dict[str, Any] = {}
+    if owner_id: match["owner_id"] = owner_id
+    if deck_type: match["deck_type"] = deck_type
+
+    rooms = await db.rooms.aggregate(admin_rooms_pipeline(match, active, direction, limit, after)).to_list(limit + 1)
+
+    # "estimated" reads collection metadata and ignores filters; "none" skips counting.
+    count = None
+    if total == "estimated":
+        count = await db.rooms.estimated_document_count()
+    elif total == "exact":
+        if active is None:
+            count = await db.rooms.count_documents(match)
+        else:
+            counted = await db.rooms.aggregate([
+                {"$match": match},
+                {"$lookup": {
+                    "from": "memberships",
+                    "localField": "id",
+                    "foreignField": "room_id",
+                    "pipeline": [{"$match": {"is_online": True}}, {"$limit": 1}],
+                    "as": "online"
+                }},
+                {"$match": {"online": {"$ne": []} if active else []}},
+                {"$count": "count"}
+            ]).to_list(1)
+            count = counted[0]["count"] if counted else 0
+    return page_result(rooms, limit, ROOM_SORT_KEYS, count)
+
+async def _delete_rooms_job(db, room_ids: List[str], job: Job) -> Dict[str, Any]:
+    await job.report(phase="rooms", rooms_total=len(room_ids))
+    return {"deleted": await delete_rooms(db, room_ids, job)}
+
+@router.delete("/rooms/{room_id}", status_code=202)
 async def delete_room_admin(room_id: str):
     db = get_db()
     if db is None: raise HTTPException(500, "Database connection not available")
         
-    room_id = room_id.upper()
-    
-    tasks = await db.tasks.find({"room_id": room_id}).to_list(None)
-    task_ids = [t["id"] for t in tasks]
-    if task_ids:
-        await db.votes.delete_many({"task_id": {"$in": task_ids}})
-    await db.tasks.delete_many({"room_id": room_id})
-    await db.users.delete_many({"room_id": room_id})
-    await db.rooms.delete_one({"id": room_id})
-    
-    await sio.emit('room_deleted', {"room_id": room_id}, room=room_id)
-    return {"status": "success"}
+    room_ids = [room_id.upper()]
+    job = await runner.submit("delete_rooms", {"room_ids": room_ids}, lambda job: _delete_rooms_job(db, room_ids, job))
+    return {"status": "accepted", "job_id": job["id"], "job": job}
 
-@router.post("/users/batch-delete")
+@router.post("/users/batch-delete", status_code=202)
 async def batch_delete_users(data: BatchDeleteRequest):
     db = get_db()
     if db is None: raise HTTPException(500, "Database connection not available")
@@ -229,7 +341,7 @@ async def batch_delete_users(data: BatchDeleteRequest):
         
     owned_rooms_count = await db.rooms.count_documents({"owner_id": {"$in": user_ids}})
     votes_count = await db.votes.count_documents({"user_id": {"$in": user_ids}})
-    memberships_count = await db.users.count_documents({"id": {"$in": user_ids}})
+    memberships_count = await db.memberships.count_documents({"user_id": {"$in": user_ids}})
     
     has_relations = (owned_rooms_count > 0 or votes_count > 0 or memberships_count > 0)
     if has_relations and not confirm:
@@ -238,35 +350,10 @@ async def batch_delete_users(data: BatchDeleteRequest):
             detail="One or more selected users have active rooms, votes, or room memberships. Confirmation required."
         )
         
-    user_memberships = await db.users.find({"id": {"$in": user_ids}}).to_list(None)
-    affected_rooms = {m["room_id"] for m in user_memberships}
-    
-    owned_rooms = await db.rooms.find({"owner_id": {"$in": user_ids}}).to_list(None)
-    room_ids_to_delete = [r["id"] for r in owned_rooms]
-    
-    if room_ids_to_delete:
-        tasks = await db.tasks.find({"room_id": {"$in": room_ids_to_delete}}).to_list(None)
-        task_ids = [t["id"] for t in tasks]
-        if task_ids:
-            await db.votes.delete_many({"task_id": {"$in": task_ids}})
-        await db.tasks.delete_many({"room_id": {"$in": room_ids_to_delete}})
-        await db.users.delete_many({"room_id": {"$in": room_ids_to_delete}})
-        await db.rooms.delete_many({"id": {"$in": room_ids_to_delete}})
-        
-        for r_id in room_ids_to_delete:
-            await sio.emit('room_deleted', {"room_id": r_id}, room=r_id)
-            
-    await db.votes.delete_many({"user_id": {"$in": user_ids}})
-    await db.users.delete_many({"id": {"$in": user_ids}})
-    await db.global_users.delete_many({"id": {"$in": user_ids}})
-    
-    for r_id in affected_rooms:
-        if r_id not in room_ids_to_delete:
-            await broadcast_room_state(r_id)
-            
-    return {"status": "success", "deleted_count": len(user_ids)}
+    job = await runner.submit("delete_users", {"user_ids": user_ids}, lambda job: delete_users(db, user_ids, job))
+    return {"status": "accepted", "job_id": job["id"], "job": job, "deleted_count": len(user_ids)}
 
-@router.post("/rooms/batch-delete")
+@router.post("/rooms/batch-delete", status_code=202)
 async def batch_delete_rooms(data: BatchDeleteRoomsRequest):
     db = get_db()
     if db is None: raise HTTPException(500, "Database connection not available")
@@ -274,16 +361,78 @@ async def batch_delete_rooms(data: BatchDeleteRoomsRequest):
     room_ids = [r.upper() for r in data.ids]
     if not room_ids: return {"status": "success", "deleted_count": 0}
         
-    tasks = await db.tasks.find({"room_id": {"$in": room_ids}}).to_list(None)
-    task_ids = [t["id"] for t in tasks]
-    if task_ids:
-        await db.votes.delete_many({"task_id": {"$in": task_ids}})
-        
-    await db.tasks.delete_many({"room_id": {"$in": room_ids}})
-    await db.users.delete_many({"room_id": {"$in": room_ids}})
-    await db.rooms.delete_many({"id": {"$in": room_ids}})
-    
-    for r_id in room_ids:
-        await sio.emit('room_deleted', {"room_id": r_id}, room=r_id)
-        
-    return {"status": "success", "deleted_count": len(room_ids)}
+    job = await runner.submit("delete_rooms", {"room_ids": room_ids}, lambda job: _delete_rooms_job(db, room_ids, job))
+    return {"status": "accepted", "job_id": job["id"], "job": job, "deleted_count": len(room_ids)}
+
+@router.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    job = await runner.get(job_id)
+    if not job: raise HTTPException(404, "Job not found")
+    return job
+
+@router.post("/jobs/{job_id}/cancel", dependencies=[Depends(require_admin)])
+async def cancel_job(job_id: str):
+    job = await runner.get(job_id)
+    if not job: raise HTTPException(404, "Job not found")
+    if not await runner.cancel(job_id):
+        raise HTTPException(409, f"Job is {job['status']} or not running on this node and cannot be cancelled")
+    return {"status": "success", "job_id": job_id}
+
+@router.post("/stats/reconcile", dependencies=[Depends(require_admin)])
+async def reconcile_stats(dry_run: bool = False):
+    db = get_db()
+    if db is None: raise HTTPException(500, "Database connection not available")
+    return await counters.reconcile(db, apply=not dry_run)
+
+@router.get("/retention", dependencies=[Depends(require_admin)])
+async def get_retention():
+    return {"policies": retention.policies(), "last_run": retention.last_run or None}
+
+@router.post("/retention/sweep", status_code=202, dependencies=[Depends(require_admin)])
+async def run_retention_sweep(dry_run: bool = True):
+    db = get_db()
+    if db is None: raise HTTPException(500, "Database connection not available")
+    if not dry_run and not settings.RETENTION_ENABLED:
+        raise HTTPException(409, "Retention is disabled; set RETENTION_ENABLED=true to delete data")
+    job = await retention.submit_sweep(db, dry_run=dry_run)
+    return {"status": "accepted", "job_id": job["id"], "job": job}
+
+@router.get("/migrations", dependencies=[Depends(require_admin)])
+async def get_migrations():
+    db = get_db()
+    if db is None: raise HTTPException(500, "Database connection not available")
+    return {"migrations": await migrations.status(db)}
+
+@router.post("/migrations/run", status_code=202, dependencies=[Depends(require_admin)])
+async def run_migrations():
+    db = get_db()
+    if db is None: raise HTTPException(500, "Database connection not available")
+    job = await migrations.submit_migrate(db)
+    return {"status": "accepted", "job_id": job["id"], "job": job}
+
+@router.get("/analytics", dependencies=[Depends(require_admin)])
+async def get_analytics():
+    db = get_db("analytics")
+    if db is None: raise HTTPException(500, "Database connection not available")
+    report = await analytics.get_report(db)
+    if not report: raise HTTPException(404, "Report not computed yet")
+    return report
+
+@router.post("/analytics/refresh", status_code=202, dependencies=[Depends(require_admin)])
+async def refresh_analytics():
+    db = get_db("analytics")
+    if db is None: raise HTTPException(500, "Database connection not available")
+    job = await analytics.submit_report(db)
+    return {"status": "accepted", "job_id": job["id"], "job": job}
+
+@router.get("/cache", dependencies=[Depends(require_admin)])
+async def get_cache_stats():
+    return cache_stats()
+
+@router.get("/reads", dependencies=[Depends(require_admin)])
+async def get_read_routing():
+    """Read preference of each query class and the servers its reads actually ran on."""
+    return {
+        "routes": {name: read_preference(name).document for name in QUERY_CLASSES},
+        "servers": query_metrics.snapshot(db_instance.client)
+    }
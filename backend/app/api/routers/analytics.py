@@ -0,0 +1,28 @@
+import logging
+from fastapi import APIRouter, Request, HTTPException, Depends
+
+from app.core.security import get_current_user, limiter
+from app.db.database import get_db
+from app.services import analytics
+
+logger = logging.getLogger(__name__)
+router = APIRouter(prefix="/analytics", tags=["Analytics"])
+
+# Reports are precomputed by a background job (services/analytics.py); reading one is a
+# single lookup. The report for a user covers the rooms they own.
+
+@router.get("/me")
+async def get_my_report(current_user_id: str = Depends(get_current_user)):
+    db = get_db("analytics")
+    if db is None: raise HTTPException(500, "Database connection not available")
+    report = await analytics.get_report(db, owner_id=current_user_id)
+    if not report: raise HTTPException(404, "Report not computed yet")
+    return report
+
+@router.post("/me/refresh", status_code=202)
+@limiter.limit("2/minute")
+async def refresh_my_report(request: Request, current_user_id: str = Depends(get_current_user)):
+    db = get_db("analytics")
+    if db is None: raise HTTPException(500, "Database connection not available")
+    job = await analytics.submit_report(db, owner_id=current_user_id)
+    return {"status": "accepted", "job_id": job["id"], "job": job}
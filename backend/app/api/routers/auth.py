@@ -1,73 +1,60 @@
 import os
 import uuid
 import logging
+from typing import Dict
 from fastapi import APIRouter, Request, HTTPException, Response
 from google.oauth2 import id_token
 from google.auth.transport import requests as google_requests
 
 from app.models.domain import AuthGoogle, GuestAuth
 from app.core.config import settings
-from app.core.security import create_access_token, limiter
-from app.db.database import get_db
+from app.core.security import create_access_token, set_auth_cookie, limiter
+from app.db.repositories import get_repositories
+from app.services import user_directory
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/auth", tags=["Auth"])
 
-@router.post("/google")
-@limiter.limit("5/minute")
-async def auth_google(request: Request, input: AuthGoogle, response: Response):
+async def upsert_google_user(credential: str) -> Dict[str, str]:
     try:
-        idinfo = id_token.verify_oauth2_token(input.credential, google_requests.Request(), settings.GOOGLE_CLIENT_ID)
-        userid = idinfo['sub']
-        email = idinfo.get('email', '')
-        name = idinfo.get('name', '')
-        picture = idinfo.get('picture', '')
-
-        db = get_db()
-        if db is not None:
-             await db.global_users.update_one(
-                 {"id": userid},
-                 {"$set": {"email": email, "name": name, "picture": picture}},
-                 upsert=True
-             )
-        
-        token = create_access_token(data={"sub": userid})
-        
-        response.set_cookie(
-            key="access_token",
-            value=token,
-            httponly=True,
-            max_age=settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60,
-            samesite="none",
-            secure=True
-        )
-        
-        return {
-            "id": userid,
-            "email": email,
-            "name": name,
-            "picture": picture,
-            "access_token": token,
-            "token_type": "bearer"
-        }
+        idinfo = id_token.verify_oauth2_token(credential, google_requests.Request(), settings.GOOGLE_CLIENT_ID)
     except ValueError as e:
         logger.error(f"Google auth error: {e}")
         raise HTTPException(status_code=401, detail="Invalid token")
 
+    userid = idinfo['sub']
+    email = idinfo.get('email', '')
+    name = idinfo.get('name', '')
+    picture = idinfo.get('picture', '')
+
+    repos = get_repositories()
+    if repos is not None:
+        await repos.global_users.upsert(userid, {"email": email, "name": name, "picture": picture})
+        user_directory.refresh_later(repos.db, [userid])
+    return {"id": userid, "email": email, "name": name, "picture": picture}
+
+def new_guest_id() -> str:
+    return f"guest-{str(uuid.uuid4())[:12]}"
+
+@router.post("/google")
+@limiter.limit("5/minute")
+async def auth_google(request: Request, input: AuthGoogle, response: Response):
+    identity = await upsert_google_user(input.credential)
+    token = create_access_token(data={"sub": identity["id"]})
+    set_auth_cookie(response, token)
+
+    return {
+        **identity,
+        "access_token": token,
+        "token_type": "bearer"
+    }
+
 @router.post("/guest")
 @limiter.limit("100/minute")
 async def auth_guest(request: Request, input: GuestAuth, response: Response):
-    guest_id = f"guest-{str(uuid.uuid4())[:12]}"
+    guest_id = new_guest_id()
     token = create_access_token(data={"sub": guest_id, "is_guest": True})
-    
-    response.set_cookie(
-        key="access_token",
-        value=token,
-        httponly=True,
-        max_age=settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60,
-        samesite="none",
-        secure=True
-    )
+    set_auth_cookie(response, token)
     
     return {
         "id": guest_id,
@@ -0,0 +1,64 @@
+import logging
+from datetime import datetime, timezone
+from typing import Literal
+from fastapi import APIRouter, HTTPException, Depends, Request
+from fastapi.responses import StreamingResponse
+
+from app.models.domain import TaskStatus
+from app.core.security import get_current_user, limiter
+from app.db.database import get_db
+from app.db.repositories import MongoRooms
+from app.services.archive import get_membership_or_rehydrate
+from app.services.export import iter_room_history, iter_owner_history, stream_export
+
+logger = logging.getLogger(__name__)
+router = APIRouter(prefix="/export", tags=["Export"])
+
+MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+def _streaming_response(rows, fmt: str, name: str) -> StreamingResponse:
+    stamp = datetime.now(timezone.utc).strftime("%Y%m%d%H%M%S")
+    return StreamingResponse(
+        stream_export(rows, fmt),
+        media_type=MEDIA_TYPES[fmt],
+        headers={"Content-Disposition": f'attachment; filename="{name}-{stamp}.{fmt}"'}
+    )
+
+@router.get("/rooms/{room_id}/history")
+@limiter.limit("10/minute")
+async def export_room_history(
+    request: Request,
+    room_id: str,
+    format: Literal["ndjson", "csv"] = "ndjson",
+    status: TaskStatus = TaskStatus.COMPLETED,
+    current_user_id: str = Depends(get_current_user)
+):
+    room_id = room_id.upper()
+    db = get_db("export")
+    if db is None: raise HTTPException(500, "Database connection not available")
+
+    if not await get_membership_or_rehydrate(db, current_user_id, room_id):
+        raise HTTPException(status_code=403, detail="You are not a member of this room")
+    room = await MongoRooms(db).get(room_id, ["id", "name"])
+    if not room: raise HTTPException(404, "Room not found")
+
+    logger.info(f"📤 Export: Histórico da sala {room_id} ({format})")
+    rows = iter_room_history(db, [room_id], {room_id: room.get("name")}, status.value)
+    return _streaming_response(rows, format, f"room-{room_id}")
+
+@router.get("/owners/{owner_id}/history")
+@limiter.limit("5/minute")
+async def export_owner_history(
+    request: Request,
+    owner_id: str,
+    format: Literal["ndjson", "csv"] = "ndjson",
+    status: TaskStatus = TaskStatus.COMPLETED,
+    current_user_id: str = Depends(get_current_user)
+):
+    if owner_id != current_user_id:
+        raise HTTPException(403, "Access denied")
+    db = get_db("export")
+    if db is None: raise HTTPException(500, "Database connection not available")
+
+    logger.info(f"📤 Export: Histórico do dono {owner_id} ({format})")
+    return _streaming_response(iter_owner_history(db, owner_id, status.value), format, "history")
@@ -1,13 +1,16 @@
 import uuid
 import logging
+from typing import Dict, Any, Tuple
 from datetime import datetime, timezone
 from fastapi import APIRouter, Request, HTTPException, Depends
 from jose import JWTError, jwt
 
-from app.models.domain import Room, RoomCreate, UserJoin, get_deck_values, FIBONACCI_VALUES
+from app.models.domain import Room, RoomCreate, UserJoin, get_deck_values
 from app.core.security import get_current_user, limiter, settings
-from app.db.database import get_db
-from app.services.socket import get_room_state
+from app.db.repositories import Repositories, get_repositories
+from app.services.authz import get_membership, invalidate_membership
+from app.services import archive, counters, user_directory
+from app.services.socket import read_room_state
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/rooms", tags=["Rooms"])
@@ -26,30 +29,25 @@ async def create_room(request: Request, input: RoomCreate, current_user_id: str
         deck_values=values
     )
     
-    db = get_db()
-    if db is not None:
-        await db.rooms.insert_one(room.model_dump())
+    repos = get_repositories()
+    if repos is not None:
+        await repos.rooms.insert(room.model_dump())
+        await counters.bump(repos.db, counters.user_key(current_user_id), rooms_owned=1)
     return room
 
-@router.post("/{room_id}/join")
-@limiter.limit("20/minute")
-async def join_room_http(request: Request, room_id: str, input: UserJoin):
-    room_id = room_id.upper()
-    db = get_db()
-    
-    room = await db.rooms.find_one({"id": room_id}, {"_id": 0})
+async def join_room_member(repos: Repositories, room_id: str, input: UserJoin) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    room = await repos.rooms.get(room_id)
+    # Cold storage is a MongoDB collection; the in-memory engine never archives rooms.
+    if not room and repos.db is not None: room = await archive.rehydrate_room(repos.db, room_id)
     if not room: raise HTTPException(404, "Room not found")
     
-    if "deck_type" not in room: room["deck_type"] = "FIBONACCI"
-    if "deck_values" not in room: room["deck_values"] = [str(v) for v in FIBONACCI_VALUES]
-    
     is_owner = input.user_id and room.get("owner_id") == input.user_id
     
     is_admin = False
     if is_owner:
         is_admin = True
     else:
-        existing_count = await db.users.count_documents({"room_id": room_id, "id": {"$ne": input.user_id} if input.user_id else {}})
+        existing_count = await repos.memberships.count_room(room_id, exclude_user=input.user_id)
         is_admin = (existing_count == 0)
         
     user_id = input.user_id or str(uuid.uuid4())
@@ -64,21 +62,29 @@ async def join_room_http(request: Request, room_id: str, input: UserJoin):
         "joined_at": datetime.now(timezone.utc).isoformat()
     }
     
-    await db.users.update_one(
-        {"id": user_id, "room_id": room_id},
-        {"$set": user_data},
-        upsert=True
-    )
-    
-    final_user_doc = await db.users.find_one({"id": user_id, "room_id": room_id}, {"_id": 0})
-    return {"user": final_user_doc, "room": room}
+    created = await repos.memberships.upsert(user_id, room_id, user_data, unset=["offline_since"])
+    if created:
+        await counters.bump(repos.db, counters.room_key(room_id), members_count=1)
+    invalidate_membership(user_id, room_id)
+    user_directory.refresh_later(repos.db, [user_id])
+    # The upsert $sets every stored field, so the membership doc is user_data itself.
+    return dict(user_data), room
+
+@router.post("/{room_id}/join")
+@limiter.limit("20/minute")
+async def join_room_http(request: Request, room_id: str, input: UserJoin):
+    room_id = room_id.upper()
+    repos = get_repositories()
+    if repos is None: raise HTTPException(500, "Database connection not available")
+    user, room = await join_room_member(repos, room_id, input)
+    return {"user": user, "room": room}
 
 @router.get("/{room_id}/state")
 @limiter.limit("60/minute")
 async def get_state_http(room_id: str, request: Request, current_user_id: str = Depends(get_current_user)):
     room_id = room_id.upper()
-    db = get_db()
-    user = await db.users.find_one({"id": current_user_id, "room_id": room_id})
+    repos = get_repositories()
+    user = await archive.get_membership_or_rehydrate(repos.db if repos else None, current_user_id, room_id)
     if not user:
         raise HTTPException(status_code=403, detail="You are not a member of this room")
-    return await get_room_state(room_id, requesting_user_id=current_user_id)
+    return await read_room_state(room_id, requesting_user_id=current_user_id)
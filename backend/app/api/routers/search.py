@@ -0,0 +1,25 @@
+import logging
+from typing import Optional
+from fastapi import APIRouter, Request, HTTPException, Depends, Query
+
+from app.core.security import get_current_user, limiter
+from app.db.database import get_db
+from app.db.pagination import decode_cursor
+from app.services import search
+
+logger = logging.getLogger(__name__)
+router = APIRouter(prefix="/search", tags=["Search"])
+
+@router.get("/tasks")
+@limiter.limit("30/minute")
+async def search_tasks(
+    request: Request,
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    current_user_id: str = Depends(get_current_user)
+):
+    db = get_db()
+    if db is None: raise HTTPException(500, "Database connection not available")
+    after = decode_cursor(cursor, len(search.SORT_FIELDS))
+    return await search.search_tasks(db, current_user_id, q, limit, after)
@@ -0,0 +1,58 @@
+import logging
+from fastapi import APIRouter, Request, HTTPException, Response
+
+from app.models.domain import SessionBootstrap, UserJoin
+from app.core.security import create_access_token, get_request_user_id, set_auth_cookie, limiter
+from app.db.repositories import get_repositories
+from app.services.socket import broadcast_room_state, read_room_state
+from app.api.routers.auth import upsert_google_user, new_guest_id
+from app.api.routers.rooms import join_room_member
+
+logger = logging.getLogger(__name__)
+router = APIRouter(prefix="/session", tags=["Session"])
+
+@router.post("/bootstrap")
+@limiter.limit("20/minute")
+async def bootstrap_session(request: Request, input: SessionBootstrap, response: Response):
+    # Auth + join + initial state in one round trip. Clients pass the returned
+    # state_version to the socket join_room event to skip a redundant rebuild.
+    repos = get_repositories()
+    if repos is None: raise HTTPException(500, "Database connection not available")
+    room_id = input.room_id.upper()
+
+    identity = {"name": input.name, "picture": input.picture}
+    if input.credential:
+        google = await upsert_google_user(input.credential)
+        user_id = google["id"]
+        identity = {**google, "name": input.name or google["name"], "picture": input.picture or google["picture"]}
+        token = create_access_token(data={"sub": user_id})
+    else:
+        user_id = get_request_user_id(request)
+        is_guest = not user_id or user_id.startswith("guest-")
+        user_id = user_id or new_guest_id()
+        token = create_access_token(data={"sub": user_id, "is_guest": True} if is_guest else {"sub": user_id})
+        identity["is_guest"] = is_guest
+    set_auth_cookie(response, token)
+
+    membership, room = await join_room_member(repos, room_id, UserJoin(
+        room_id=room_id,
+        name=identity["name"],
+        user_id=user_id,
+        picture=identity["picture"],
+        is_spectator=input.is_spectator
+    ))
+
+    # Other members learn about the newcomer here, not on the socket join.
+    await broadcast_room_state(room_id)
+    state = await read_room_state(room_id, requesting_user_id=user_id)
+    logger.info(f"🚀 Bootstrap: Usuário {user_id} na sala {room_id}")
+
+    return {
+        "access_token": token,
+        "token_type": "bearer",
+        "user": {"id": user_id, **identity},
+        "membership": membership,
+        "room": room,
+        "state": state,
+        "state_version": state.get("version")
+    }
@@ -1,10 +1,17 @@
+import uuid
 import logging
+from typing import Optional
 from fastapi import APIRouter, HTTPException, Depends, Request
 
 from app.models.domain import Task, TaskCreate
 from app.core.security import get_current_user, limiter
 from app.db.database import get_db
-from app.services.socket import broadcast_room_state
+from app.db.repositories import get_repositories
+from app.services.authz import get_membership
+from app.services.archive import get_membership_or_rehydrate
+from app.services import counters, search
+from app.services.socket import broadcast_room_state, sio
+from app.services.task_import import IMPORT_FORMATS, ImportFormatError, detect_format, import_tasks
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/tasks", tags=["Tasks"])
@@ -12,18 +19,20 @@ router = APIRouter(prefix="/tasks", tags=["Tasks"])
 @router.post("", response_model=Task)
 async def create_task(input: TaskCreate, current_user_id: str = Depends(get_current_user)):
     input.room_id = input.room_id.upper()
-    db = get_db()
-    if db is None: raise HTTPException(500, "DB Error")
+    repos = get_repositories()
+    if repos is None: raise HTTPException(500, "DB Error")
     
-    user = await db.users.find_one({"id": current_user_id, "room_id": input.room_id})
+    user = await get_membership(current_user_id, input.room_id)
     if not user or not user.get("is_admin"):
         raise HTTPException(403, "Only admins can add tasks")
 
-    last_task = await db.tasks.find_one({"room_id": input.room_id}, sort=[("position", -1)])
-    next_position = (last_task.get("position", 0) + 1) if last_task else 0
+    last_position = await repos.tasks.last_position(input.room_id)
+    next_position = (last_position + 1) if last_position is not None else 0
     
     task = Task(room_id=input.room_id, title=input.title, description=input.description or "", position=next_position)
-    await db.tasks.insert_one(task.model_dump())
+    await repos.tasks.insert(task.model_dump())
+    await counters.bump(repos.db, counters.room_key(input.room_id), tasks_count=1)
+    search.invalidate_room(input.room_id)
     await broadcast_room_state(input.room_id)
     return task
 
@@ -31,11 +40,47 @@ async def create_task(input: TaskCreate, current_user_id: str = Depends(get_curr
 @limiter.limit("60/minute")
 async def get_tasks(request: Request, room_id: str, current_user_id: str = Depends(get_current_user)):
     room_id = room_id.upper()
-    db = get_db()
-    if db is None: return []
+    repos = get_repositories()
+    if repos is None: return []
     
-    user = await db.users.find_one({"id": current_user_id, "room_id": room_id})
+    user = await get_membership_or_rehydrate(repos.db, current_user_id, room_id)
     if not user:
         raise HTTPException(status_code=403, detail="You are not a member of this room")
         
-    return await db.tasks.find({"room_id": room_id}, {"_id": 0}).sort("position", 1).to_list(100)
+    return await repos.tasks.list_room(room_id)
+
+@router.post("/rooms/{room_id}/import")
+@limiter.limit("10/minute")
+async def import_tasks_http(request: Request, room_id: str, format: Optional[str] = None, current_user_id: str = Depends(get_current_user)):
+    room_id = room_id.upper()
+    db = get_db()
+    if db is None: raise HTTPException(500, "DB Error")
+
+    user = await get_membership(current_user_id, room_id)
+    if not user or not user.get("is_admin"):
+        raise HTTPException(403, "Only admins can add tasks")
+
+    fmt = (format or detect_format(request.headers.get("content-type"))).lower()
+    if fmt not in IMPORT_FORMATS:
+        raise HTTPException(400, f"Unsupported format. Use one of: {list(IMPORT_FORMATS)}")
+
+    import_id = uuid.uuid4().hex[:12]
+    async def report_progress(summary):
+        logger.info(f"📥 Import {import_id} (sala {room_id}): {summary['processed']} tarefas processadas")
+        await sio.emit('tasks_import_progress', {
+            "import_id": import_id,
+            "room_id": room_id,
+            "processed": summary["processed"],
+            "created": summary["created"],
+            "updated": summary["updated"]
+        }, room=room_id)
+
+    try:
+        summary = await import_tasks(db, room_id, request.stream(), fmt, on_progress=report_progress)
+    except ImportFormatError as e:
+        raise HTTPException(400, str(e))
+
+    await counters.bump(db, counters.room_key(room_id), tasks_count=summary["created"])
+    search.invalidate_room(room_id)
+    await broadcast_room_state(room_id)
+    return {"status": "success", "import_id": import_id, **summary}
@@ -0,0 +1,121 @@
+import logging
+from typing import List
+from fastapi import APIRouter, Request, HTTPException, Depends
+from pymongo.errors import BulkWriteError
+
+from app.models.domain import Room, RoomTemplate, RoomTemplateCreate, RoomProvision, Task, get_deck_values
+from app.core.security import get_current_user, limiter
+from app.db.database import get_db
+from app.db.repositories import keyed
+from app.services import counters
+
+logger = logging.getLogger(__name__)
+router = APIRouter(prefix="/templates", tags=["Templates"])
+
+TASK_INSERT_CHUNK = 1000
+ROOM_INSERT_ATTEMPTS = 5
+
+async def _get_owned_template(db, template_id: str, current_user_id: str) -> RoomTemplate:
+    doc = await db.room_templates.find_one({"id": template_id}, {"_id": 0})
+    if not doc: raise HTTPException(404, "Template not found")
+    if doc.get("owner_id") != current_user_id: raise HTTPException(403, "Access denied")
+    return RoomTemplate(**doc)
+
+async def _insert_rooms(db, rooms: List[Room]):
+    """Inserts the rooms, giving the ones whose 8-character id is already taken a new id
+    and retrying them. If that fails, the rooms inserted so far are removed (never the
+    ones whose id belongs to an existing room) before the error is raised."""
+    pending = rooms
+    for _ in range(ROOM_INSERT_ATTEMPTS):
+        try:
+            await db.rooms.insert_many([keyed("rooms", room.model_dump()) for room in pending], ordered=False)
+            return
+        except BulkWriteError as e:
+            errors = e.details.get("writeErrors", [])
+            pending = [pending[err["index"]] for err in errors]
+            if not errors or any(err.get("code") != 11000 for err in errors):
+                await _remove_inserted(db, rooms, pending)
+                raise
+            for room in pending: room.id = Room.model_fields["id"].default_factory()
+    await _remove_inserted(db, rooms, pending)
+    raise HTTPException(503, "Could not allocate room ids, try again")
+
+async def _remove_inserted(db, rooms: List[Room], failed: List[Room]):
+    failed_ids = {id(room) for room in failed}
+    inserted = [room.id for room in rooms if id(room) not in failed_ids]
+    if inserted: await db.rooms.delete_many({"_id": {"$in": inserted}})
+
+@router.post("", response_model=RoomTemplate)
+@limiter.limit("10/minute")
+async def create_template(request: Request, input: RoomTemplateCreate, current_user_id: str = Depends(get_current_user)):
+    db = get_db()
+    if db is None: raise HTTPException(500, "Database connection not available")
+
+    template = RoomTemplate(
+        name=input.name,
+        owner_id=current_user_id,
+        deck_type=input.deck_type,
+        custom_deck=input.custom_deck,
+        deck_values=get_deck_values(input.deck_type, input.custom_deck),
+        tasks=input.tasks
+    )
+    await db.room_templates.insert_one(template.model_dump())
+    return template
+
+@router.get("")
+async def list_templates(current_user_id: str = Depends(get_current_user)):
+    db = get_db()
+    if db is None: return []
+    return await db.room_templates.find({"owner_id": current_user_id}, {"_id": 0}).sort("created_at", -1).to_list(100)
+
+@router.get("/{template_id}", response_model=RoomTemplate)
+async def get_template(template_id: str, current_user_id: str = Depends(get_current_user)):
+    db = get_db()
+    if db is None: raise HTTPException(500, "Database connection not available")
+    return await _get_owned_template(db, template_id, current_user_id)
+
+@router.delete("/{template_id}")
+async def delete_template(template_id: str, current_user_id: str = Depends(get_current_user)):
+    db = get_db()
+    if db is None: raise HTTPException(500, "Database connection not available")
+    await _get_owned_template(db, template_id, current_user_id)
+    await db.room_templates.delete_one({"id": template_id})
+    return {"status": "success"}
+
+@router.post("/{template_id}/provision")
+@limiter.limit("5/minute")
+async def provision_rooms(request: Request, template_id: str, input: RoomProvision, current_user_id: str = Depends(get_current_user)):
+    db = get_db()
+    if db is None: raise HTTPException(500, "Database connection not available")
+    template = await _get_owned_template(db, template_id, current_user_id)
+
+    # Rooms and tasks are built in memory and written with one insert_many per
+    # collection (tasks in chunks), instead of one round trip per room/task.
+    names: List[str] = input.names or [f"{input.name_prefix or template.name} {i + 1}" for i in range(input.count)]
+
+    rooms = [
+        Room(name=name, owner_id=current_user_id, deck_type=template.deck_type, deck_values=template.deck_values)
+        for name in names
+    ]
+    # Tasks are built once the room ids are final (colliding ids are regenerated).
+    await _insert_rooms(db, rooms)
+    tasks = [
+        keyed("tasks", Task(room_id=room.id, position=position, **task.model_dump()).model_dump())
+        for room in rooms
+        for position, task in enumerate(template.tasks)
+    ]
+    for i in range(0, len(tasks), TASK_INSERT_CHUNK):
+        await db.tasks.insert_many(tasks[i:i + TASK_INSERT_CHUNK], ordered=False)
+
+    deltas = {counters.room_key(room.id): {"tasks_count": len(template.tasks)} for room in rooms}
+    deltas[counters.user_key(current_user_id)] = {"rooms_owned": len(rooms)}
+    await counters.bump_many(db, deltas)
+
+    logger.info(f"🏗️ Provisionamento: {len(rooms)} salas a partir do template {template_id} ({len(tasks)} tarefas)")
+    return {
+        "status": "success",
+        "template_id": template_id,
+        "room_ids": [room.id for room in rooms],
+        "rooms": [{"id": room.id, "name": room.name} for room in rooms],
+        "tasks_per_room": len(template.tasks)
+    }
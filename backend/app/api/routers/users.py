@@ -1,7 +1,8 @@
 import logging
 from fastapi import APIRouter, HTTPException, Depends
 from app.core.security import get_current_user
-from app.db.database import get_db
+from app.db.repositories import get_repositories
+from app.services import archive
 
 logger = logging.getLogger(__name__)
 router = APIRouter(tags=["Users"])
@@ -10,31 +11,32 @@ router = APIRouter(tags=["Users"])
 async def get_user_rooms(user_id: str, current_user_id: str = Depends(get_current_user)):
     if user_id != current_user_id:
         raise HTTPException(403, "Access denied")
-    db = get_db()
-    if db is None: return []
-    return await db.rooms.find({"owner_id": user_id}, {"_id": 0}).sort("created_at", -1).to_list(100)
+    repos = get_repositories("room_lists")
+    if repos is None: return []
+    rooms = await repos.rooms.list_by_owner(user_id)
+    if repos.db is not None: rooms += await archive.list_owned(repos.db, user_id)
+    return rooms
 
 @router.get("/recent-rooms/{user_id}")
 async def get_recent_rooms(user_id: str, current_user_id: str = Depends(get_current_user)):
     if user_id != current_user_id:
         raise HTTPException(403, "Access denied")
-    db = get_db()
-    if db is None: return []
+    repos = get_repositories("room_lists")
+    if repos is None: return []
     
-    memberships = await db.users.find({"id": user_id}).to_list(100)
-    if not memberships: return []
+    memberships = await repos.memberships.list_user(user_id)
+    # Archived rooms keep their member list outside `users`, so they are merged in separately.
+    archived = await archive.list_joined(repos.db, user_id) if repos.db is not None else []
+    if not memberships and not archived: return []
         
     joined_at_map = {}
     for mem in memberships:
         joined_at_map[mem["room_id"]] = mem.get("joined_at", "1970-01-01T00:00:00Z")
         
     room_ids = list(joined_at_map.keys())
+    for r in archived:
+        joined_at_map[r["id"]] = r.pop("joined_at") or "1970-01-01T00:00:00Z"
     
-    rooms_cursor = db.rooms.find({
-        "id": {"$in": room_ids},
-        "owner_id": {"$ne": user_id}
-    }, {"_id": 0})
-    
-    rooms = await rooms_cursor.to_list(100)
+    rooms = await repos.rooms.list_by_ids(room_ids, exclude_owner=user_id) + archived
     rooms.sort(key=lambda r: joined_at_map.get(r["id"], ""), reverse=True)
     return rooms
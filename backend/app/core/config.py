@@ -8,11 +8,97 @@ load_dotenv(ROOT_DIR / '.env')
 class Settings:
     MONGO_URL: str = os.environ.get('MONGO_URL', '')
     DB_NAME: str = os.environ.get('DB_NAME', 'pyplanpoker')
+    # Storage engine of the realtime core ("mongo", or "memory": process-local, single node,
+    # nothing persisted; aggregation-based features such as admin, analytics and export need mongo)
+    STORAGE_ENGINE: str = os.environ.get("STORAGE_ENGINE", "mongo")
+    # Schema migrations at startup ("blocking": serve only after they are applied,
+    # "background": run them as a job, "off": run them with `python -m app.db.migrations`)
+    MIGRATIONS_ON_STARTUP: str = os.environ.get("MIGRATIONS_ON_STARTUP", "blocking")
+    MIGRATION_BATCH_SIZE: int = int(os.environ.get("MIGRATION_BATCH_SIZE", "500"))
+    MIGRATION_BATCH_DELAY_SECONDS: float = float(os.environ.get("MIGRATION_BATCH_DELAY_SECONDS", "0"))
+    MIGRATION_LEASE_SECONDS: float = float(os.environ.get("MIGRATION_LEASE_SECONDS", "60"))
+    MIGRATION_POLL_SECONDS: float = float(os.environ.get("MIGRATION_POLL_SECONDS", "1"))
+    MIGRATION_STATUS_REFRESH_SECONDS: float = float(os.environ.get("MIGRATION_STATUS_REFRESH_SECONDS", "5"))
+    # Read routing (app/db/database.py): the listed query classes may read from secondaries
+    # ("primary" keeps every read on the primary); MongoDB requires a staleness bound >= 90s
+    TOLERANT_READ_CLASSES: list[str] = [c.strip() for c in os.environ.get("TOLERANT_READ_CLASSES", "admin,export,room_lists,analytics").split(",") if c.strip()]
+    TOLERANT_READ_PREFERENCE: str = os.environ.get("TOLERANT_READ_PREFERENCE", "secondaryPreferred")
+    READ_MAX_STALENESS_SECONDS: int = int(os.environ.get("READ_MAX_STALENESS_SECONDS", "90"))
+    ENSURE_INDEXES_ON_STARTUP: bool = os.environ.get("ENSURE_INDEXES_ON_STARTUP", "true").lower() == "true"
     JWT_SECRET: str = os.environ.get("JWT_SECRET", "super-secret-key-change-it-in-prod")
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 60 * 24 * 7 # 1 week
     GOOGLE_CLIENT_ID: str = os.environ.get('GOOGLE_CLIENT_ID', '')
+
+    # Authorization cache (membership role flags and room decks)
+    AUTHZ_CACHE_TTL_SECONDS: float = float(os.environ.get("AUTHZ_CACHE_TTL_SECONDS", "30"))
+    AUTHZ_CACHE_MAXSIZE: int = int(os.environ.get("AUTHZ_CACHE_MAXSIZE", "10000"))
+
+    # Idempotency-Key store for action endpoints ("memory" or "mongo")
+    IDEMPOTENCY_BACKEND: str = os.environ.get("IDEMPOTENCY_BACKEND", "memory")
+    IDEMPOTENCY_TTL_SECONDS: int = int(os.environ.get("IDEMPOTENCY_TTL_SECONDS", "3600"))
+    IDEMPOTENCY_MAXSIZE: int = int(os.environ.get("IDEMPOTENCY_MAXSIZE", "10000"))
+
+    # Bulk task import
+    IMPORT_CHUNK_SIZE: int = int(os.environ.get("IMPORT_CHUNK_SIZE", "500"))
+    IMPORT_MAX_ROWS: int = int(os.environ.get("IMPORT_MAX_ROWS", "10000"))
+
+    # Streaming history export
+    EXPORT_BATCH_SIZE: int = int(os.environ.get("EXPORT_BATCH_SIZE", "500"))
+
+    # Background jobs (cascading admin deletions)
+    JOBS_MAX_CONCURRENCY: int = int(os.environ.get("JOBS_MAX_CONCURRENCY", "2"))
+    DELETE_BATCH_SIZE: int = int(os.environ.get("DELETE_BATCH_SIZE", "500"))
+    BROADCAST_CONCURRENCY: int = int(os.environ.get("BROADCAST_CONCURRENCY", "20"))
+    JOBS_STALE_SECONDS: int = int(os.environ.get("JOBS_STALE_SECONDS", "300"))
+
+    # Retention sweeper (a retention of 0 disables the policy, an interval of 0 the sweeper).
+    # Until RETENTION_ENABLED is set the sweeper only runs dry and the TTL index is not created.
+    RETENTION_ENABLED: bool = os.environ.get("RETENTION_ENABLED", "false").lower() == "true"
+    RETENTION_SWEEP_INTERVAL_SECONDS: float = float(os.environ.get("RETENTION_SWEEP_INTERVAL_SECONDS", "3600"))
+    RETENTION_IDLE_ROOM_DAYS: float = float(os.environ.get("RETENTION_IDLE_ROOM_DAYS", "180"))
+    ARCHIVE_AFTER_DAYS: float = float(os.environ.get("ARCHIVE_AFTER_DAYS", "30"))
+    RETENTION_OFFLINE_MEMBERSHIP_DAYS: float = float(os.environ.get("RETENTION_OFFLINE_MEMBERSHIP_DAYS", "30"))
+    RETENTION_CLOSED_TASK_VOTES_DAYS: float = float(os.environ.get("RETENTION_CLOSED_TASK_VOTES_DAYS", "7"))
+    RETENTION_ORPHAN_VOTES: bool = os.environ.get("RETENTION_ORPHAN_VOTES", "true").lower() == "true"
+    SWEEP_BATCH_SIZE: int = int(os.environ.get("SWEEP_BATCH_SIZE", "200"))
+    SWEEP_BATCH_DELAY_SECONDS: float = float(os.environ.get("SWEEP_BATCH_DELAY_SECONDS", "0.1"))
+
+    # Admin counters reconciliation (0 disables the background loop)
+    STATS_RECONCILE_INTERVAL_SECONDS: float = float(os.environ.get("STATS_RECONCILE_INTERVAL_SECONDS", "21600"))
     
+    # Estimation analytics reports (0 workers computes inline, 0 interval disables the refresh loop)
+    ANALYTICS_BATCH_SIZE: int = int(os.environ.get("ANALYTICS_BATCH_SIZE", "2000"))
+    ANALYTICS_WORKERS: int = int(os.environ.get("ANALYTICS_WORKERS", "0"))
+    ANALYTICS_REFRESH_INTERVAL_SECONDS: float = float(os.environ.get("ANALYTICS_REFRESH_INTERVAL_SECONDS", "86400"))
+
+    # Task search ("mongo" text index, or the in-memory inverted index)
+    SEARCH_BACKEND: str = os.environ.get("SEARCH_BACKEND", "mongo")
+    SEARCH_INDEX_TTL_SECONDS: float = float(os.environ.get("SEARCH_INDEX_TTL_SECONDS", "60"))
+    SEARCH_TEXT_RETRY_SECONDS: float = float(os.environ.get("SEARCH_TEXT_RETRY_SECONDS", "300"))
+    SEARCH_INDEX_MAX_ROOMS: int = int(os.environ.get("SEARCH_INDEX_MAX_ROOMS", "5000"))
+
+    # Change-feed broadcasting ("auto": Mongo change streams, or table hooks with the memory
+    # engine; "off": only the explicit broadcasts of the node that made the write)
+    CHANGE_FEED: str = os.environ.get("CHANGE_FEED", "auto")
+    CHANGE_FEED_DEBOUNCE_SECONDS: float = float(os.environ.get("CHANGE_FEED_DEBOUNCE_SECONDS", "0.05"))
+    CHANGE_FEED_RETRY_SECONDS: float = float(os.environ.get("CHANGE_FEED_RETRY_SECONDS", "5"))
+    CHANGE_FEED_PRE_IMAGES: bool = os.environ.get("CHANGE_FEED_PRE_IMAGES", "false").lower() == "true"
+    CHANGE_FEED_CACHE_TTL_SECONDS: float = float(os.environ.get("CHANGE_FEED_CACHE_TTL_SECONDS", "3600"))
+    CHANGE_FEED_CACHE_MAXSIZE: int = int(os.environ.get("CHANGE_FEED_CACHE_MAXSIZE", "100000"))
+
+    # Room state read projection (room_views). Projector nodes rebuild the views of rooms
+    # changed outside the write paths; one projector node per deployment is enough.
+    ROOM_VIEWS: bool = os.environ.get("ROOM_VIEWS", "true").lower() == "true"
+    ROOM_VIEWS_PROJECTOR: bool = os.environ.get("ROOM_VIEWS_PROJECTOR", "true").lower() == "true"
+
+    # Live admin metrics (/admin socket.io namespace). ADMIN_USER_IDS is a comma-separated
+    # allowlist, also required by the operational /api/admin routes (jobs, retention,
+    # migrations, stats, analytics); when empty they refuse everyone.
+    ADMIN_USER_IDS: list[str] = [u.strip() for u in os.environ.get("ADMIN_USER_IDS", "").split(",") if u.strip()]
+    ADMIN_METRICS_INTERVAL_SECONDS: float = float(os.environ.get("ADMIN_METRICS_INTERVAL_SECONDS", "1"))
+    ADMIN_METRICS_TOP_ROOMS: int = int(os.environ.get("ADMIN_METRICS_TOP_ROOMS", "10"))
+
     # CORS
     raw_origins: str = os.environ.get("CORS_ORIGINS", os.environ.get("ALLOWED_ORIGINS", "*"))
     clean_origins: str = raw_origins.strip('"').strip("'")
@@ -1,5 +1,6 @@
 from datetime import datetime, timezone
-from fastapi import HTTPException, Depends, Request
+from typing import Optional
+from fastapi import HTTPException, Depends, Request, Response
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from jose import JWTError, jwt
 from slowapi import Limiter
@@ -17,6 +18,27 @@ def create_access_token(data: dict):
     encoded_jwt = jwt.encode(to_encode, settings.JWT_SECRET, algorithm=settings.ALGORITHM)
     return encoded_jwt
 
+def set_auth_cookie(response: Response, token: str):
+    response.set_cookie(
+        key="access_token",
+        value=token,
+        httponly=True,
+        max_age=settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60,
+        samesite="none",
+        secure=True
+    )
+
+def get_request_user_id(request: Request) -> Optional[str]:
+    token = request.cookies.get("access_token")
+    if not token:
+        scheme, _, credentials = request.headers.get("Authorization", "").partition(" ")
+        if scheme.lower() == "bearer": token = credentials
+    if not token: return None
+    try:
+        return jwt.decode(token, settings.JWT_SECRET, algorithms=[settings.ALGORITHM]).get("sub")
+    except JWTError:
+        return None
+
 async def get_current_user(request: Request, credentials: HTTPAuthorizationCredentials = Depends(security)):
     token = request.cookies.get("access_token")
     if not token and credentials:
@@ -33,3 +55,9 @@ async def get_current_user(request: Request, credentials: HTTPAuthorizationCrede
         return user_id
     except JWTError:
         raise HTTPException(status_code=401, detail="Could not validate credentials")
+
+async def require_admin(user_id: str = Depends(get_current_user)):
+    # Same allowlist as the /admin socket.io namespace: when empty nobody is an admin.
+    if user_id not in settings.ADMIN_USER_IDS:
+        raise HTTPException(status_code=403, detail="Admin access required")
+    return user_id
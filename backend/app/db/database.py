@@ -1,23 +1,148 @@
+import inspect
 import logging
-from typing import Optional, Any
-from motor.motor_asyncio import AsyncIOMotorClient
+import threading
+from contextvars import ContextVar
+from typing import Optional, Any, Dict, Tuple
+from motor.motor_asyncio import (
+    AsyncIOMotorClient, AsyncIOMotorCollection, AsyncIOMotorCommandCursor, AsyncIOMotorCursor,
+    AsyncIOMotorDatabase, AsyncIOMotorLatentCommandCursor
+)
+from pymongo import monitoring
+from pymongo.read_preferences import Nearest, PrimaryPreferred, ReadPreference, Secondary, SecondaryPreferred
 from app.core.config import settings
 
 logger = logging.getLogger(__name__)
 
+# Read routing per query class. Realtime reads (room state, votes, authorization) always
+# go to the primary; the classes in TOLERANT_READ_CLASSES read through a handle with
+# TOLERANT_READ_PREFERENCE and a READ_MAX_STALENESS_SECONDS bound, so listings, exports
+# and reports are served by secondaries when the deployment has them (on a standalone
+# server, or a replica set without secondaries, they fall back to the primary). Writes go
+# to the primary whatever the handle. Each non-realtime handle carries its class, and the
+# driver's command events record which server ran the reads of each class
+# (GET /api/admin/reads).
+
+REALTIME = "realtime"
+QUERY_CLASSES = (REALTIME, "admin", "export", "room_lists", "analytics")
+READ_MODES = {"primaryPreferred": PrimaryPreferred, "secondary": Secondary, "secondaryPreferred": SecondaryPreferred, "nearest": Nearest}
+READ_COMMANDS = {"find", "getMore", "aggregate", "count", "distinct"}
+
+query_class: ContextVar[str] = ContextVar("query_class", default=REALTIME)
+HANDLE_TYPES = (AsyncIOMotorDatabase, AsyncIOMotorCollection, AsyncIOMotorCursor, AsyncIOMotorCommandCursor, AsyncIOMotorLatentCommandCursor)
+
+def read_preference(name: str):
+    if name not in settings.TOLERANT_READ_CLASSES or settings.TOLERANT_READ_PREFERENCE not in READ_MODES:
+        return ReadPreference.PRIMARY
+    return READ_MODES[settings.TOLERANT_READ_PREFERENCE](max_staleness=settings.READ_MAX_STALENESS_SECONDS)
+
+class QueryMetrics(monitoring.CommandListener):
+    """Read commands per query class and server. Motor runs each operation with the
+    context it was started in, so the class set by a TaggedHandle is visible here."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counts: Dict[Tuple[str, str], Dict[str, float]] = {}
+
+    def _record(self, event, failed: bool):
+        if event.command_name not in READ_COMMANDS: return
+        host, port = event.connection_id
+        with self.lock:
+            entry = self.counts.setdefault((query_class.get(), f"{host}:{port}"), {"commands": 0, "errors": 0, "total_ms": 0.0})
+            entry["commands"] += 1
+            entry["errors"] += int(failed)
+            entry["total_ms"] += event.duration_micros / 1000
+
+    def started(self, event): pass
+    def succeeded(self, event): self._record(event, False)
+    def failed(self, event): self._record(event, True)
+
+    def snapshot(self, client=None) -> Dict[str, Dict[str, Dict[str, Any]]]:
+        primary = client.primary if client is not None else None
+        secondaries = client.secondaries if client is not None else set()
+        result: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        with self.lock:
+            items = [(key, dict(entry)) for key, entry in self.counts.items()]
+        for (name, server), entry in items:
+            host, port = server.rsplit(":", 1)
+            address = (host, int(port))
+            role = "primary" if address == primary else "secondary" if address in secondaries else "unknown"
+            result.setdefault(name, {})[server] = {
+                "role": role,
+                "commands": entry["commands"],
+                "errors": entry["errors"],
+                "avg_ms": round(entry["total_ms"] / entry["commands"], 2)
+            }
+        return result
+
+    def clear(self):
+        with self.lock: self.counts.clear()
+
+query_metrics = QueryMetrics()
+
+class TaggedHandle:
+    """A Motor database, collection or cursor whose operations run with query_class set
+    to `name`. The tag covers only the calls made through this handle (and the
+    collections and cursors it returns), not the rest of the calling task."""
+
+    def __init__(self, target, name: str):
+        self._target = target
+        self._name = name
+
+    def _wrap(self, value):
+        return TaggedHandle(value, self._name) if isinstance(value, HANDLE_TYPES) else value
+
+    async def _tagged(self, awaitable):
+        token = query_class.set(self._name)
+        try: return self._wrap(await awaitable)
+        finally: query_class.reset(token)
+
+    def __getattr__(self, attr):
+        value = getattr(self._target, attr)
+        if not inspect.ismethod(value): return self._wrap(value)
+
+        def call(*args, **kwargs):
+            # Motor schedules most operations when called, copying the context; native
+            # coroutines run later, so the tag is also held while they are awaited.
+            token = query_class.set(self._name)
+            try: result = value(*args, **kwargs)
+            finally: query_class.reset(token)
+            return self._tagged(result) if inspect.iscoroutine(result) else self._wrap(result)
+        return call
+
+    def __getitem__(self, name: str):
+        return self._wrap(self._target[name])
+
+    def __aiter__(self):
+        return self
+
+    def __anext__(self):
+        return self._tagged(self._target.__anext__())
+
 class Database:
     client: Optional[AsyncIOMotorClient] = None
     db: Any = None
+    readers: Dict[str, Any] = {}
 
     async def connect(self):
         if settings.MONGO_URL:
             try:
-                self.client = AsyncIOMotorClient(settings.MONGO_URL)
+                self.client = AsyncIOMotorClient(settings.MONGO_URL, event_listeners=[query_metrics])
                 self.db = self.client[settings.DB_NAME]
+                self.readers = {}
                 logger.info(f"✅ MongoDB Conectado: {settings.DB_NAME}")
             except Exception as e:
                 logger.error(f"❌ Erro MongoDB: {e}")
 
+    def reader(self, name: str):
+        """The database handle for the reads of query class `name`."""
+        # Without a client (db injected directly) there is nothing to route or count.
+        if self.client is None or self.db is None or name == REALTIME: return self.db
+        if name not in self.readers:
+            pref = read_preference(name)
+            db = self.db if pref == ReadPreference.PRIMARY else self.client.get_database(settings.DB_NAME, read_preference=pref)
+            self.readers[name] = TaggedHandle(db, name)
+        return self.readers[name]
+
     async def disconnect(self):
         if self.client:
             self.client.close()
@@ -25,5 +150,6 @@ class Database:
 
 db_instance = Database()
 
-def get_db():
-    return db_instance.db
+def get_db(name: str = REALTIME):
+    """The database handle for query class `name`; reads through it are counted under that class."""
+    return db_instance.reader(name)
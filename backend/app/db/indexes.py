@@ -0,0 +1,219 @@
+import argparse
+import asyncio
+import logging
+import sys
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Tuple
+
+from pymongo import ASCENDING, DESCENDING
+from pymongo.errors import OperationFailure
+
+logger = logging.getLogger(__name__)
+
+# Indexes are declared here and ensured at startup (create_index is a no-op when the
+# index already exists). `python -m app.db.indexes --check` additionally runs explain()
+# on the query shapes the routers and services issue and fails on any collection scan.
+# TTL and text indexes whose options come from settings are owned by their services
+# (retention, search, idempotency) and ensured through them.
+
+IndexSpec = Tuple[str, List[Tuple[str, int]], Dict[str, Any]]
+
+# Rooms, tasks, votes and memberships are looked up by `_id` (see app/db/repositories.py),
+# which needs no declaration; a user has at most one vote per task and one membership
+# per room because both are keyed by the pair.
+INDEXES: List[IndexSpec] = [
+    ("rooms", [("owner_id", ASCENDING), ("created_at", DESCENDING)], {}),
+    ("rooms", [("created_at", ASCENDING), ("id", ASCENDING)], {}),
+    ("memberships", [("room_id", ASCENDING), ("is_online", ASCENDING)], {}),
+    ("memberships", [("user_id", ASCENDING)], {}),
+    ("tasks", [("room_id", ASCENDING), ("position", ASCENDING)], {}),
+    ("tasks", [("room_id", ASCENDING), ("external_id", ASCENDING)], {}),
+    ("tasks", [("status", ASCENDING), ("completed_at", ASCENDING)], {}),
+    ("votes", [("task_id", ASCENDING)], {}),
+    ("votes", [("user_id", ASCENDING)], {}),
+    ("global_users", [("id", ASCENDING)], {"unique": True}),
+    # Sort keys of the admin users listing (services/user_directory.py); also serve the prefix search.
+    ("admin_users", [("_type", ASCENDING), ("_name", ASCENDING), ("id", ASCENDING)], {}),
+    ("admin_users", [("_name", ASCENDING), ("id", ASCENDING)], {}),
+    ("admin_users", [("_email", ASCENDING), ("id", ASCENDING)], {}),
+    ("room_templates", [("id", ASCENDING)], {"unique": True}),
+    ("room_templates", [("owner_id", ASCENDING), ("created_at", DESCENDING)], {}),
+    ("archived_rooms", [("id", ASCENDING)], {"unique": True}),
+    ("archived_rooms", [("owner_id", ASCENDING), ("created_at", DESCENDING)], {}),
+    ("archived_rooms", [("members.id", ASCENDING)], {}),
+    ("archived_rooms", [("archived_at", ASCENDING)], {}),
+    ("jobs", [("id", ASCENDING)], {"unique": True}),
+    ("analytics_reports", [("scope", ASCENDING)], {"unique": True}),
+]
+
+async def ensure_indexes(db) -> Dict[str, Any]:
+    """Creates every declared index. A failing index (e.g. duplicates blocking a unique
+    constraint) is logged and reported without stopping the others or the app."""
+    from app.services.idempotency import ensure_ttl_index
+    from app.services.retention import ensure_ttl_indexes
+    from app.services.search import ensure_text_index
+
+    created, failed = [], []
+    for collection, keys, options in INDEXES:
+        try:
+            created.append(await db[collection].create_index(keys, **options))
+        except OperationFailure as e:
+            failed.append({"collection": collection, "keys": keys, "error": str(e)})
+            logger.error(f"❌ Índice {collection} {keys} não criado: {e}")
+    for name, ensure in (("offline_since_ttl", ensure_ttl_indexes), ("tasks_text", ensure_text_index), ("idempotency_ttl", ensure_ttl_index)):
+        try:
+            await ensure(db)
+        except OperationFailure as e:
+            failed.append({"index": name, "error": str(e)})
+            logger.error(f"❌ Índice {name} não criado: {e}")
+    logger.info(f"🗂️ Índices garantidos: {len(created)} ok, {len(failed)} com erro")
+    return {"created": created, "failed": failed}
+
+# --- Query-plan regression check ---
+
+QueryShape = Dict[str, Any]
+
+def query_shapes() -> List[QueryShape]:
+    """Representative instances of the queries issued at runtime, built with the same
+    pipeline helpers as the code that runs them. `scan: True` marks the few queries
+    that read a whole collection on purpose (admin aggregates, reconciliation)."""
+    from app.api.routers.admin import admin_rooms_pipeline, admin_users_match, admin_users_pipeline, _merge_groups_pipeline
+    from app.services.analytics import tasks_pipeline
+    from app.services.counters import rooms_removed_pipeline
+    from app.services.search import hits_pipeline
+    from app.services.user_directory import rows_pipeline
+    from app.services.retention import idle_rooms_pipeline, closed_tasks_pipeline
+    from app.models.domain import TaskStatus
+
+    now = datetime.now(timezone.utc).isoformat()
+    return [
+        {"name": "room by id", "collection": "rooms", "filter": {"_id": "ROOM"}},
+        {"name": "rooms by ids", "collection": "rooms", "filter": {"_id": {"$in": ["ROOM"]}, "owner_id": {"$ne": "u"}}},
+        {"name": "rooms by owner", "collection": "rooms", "filter": {"owner_id": "u"}, "sort": {"created_at": -1}},
+        {"name": "rooms of owners", "collection": "rooms", "filter": {"owner_id": {"$in": ["u", "v"]}}},
+        {"name": "admin rooms page", "collection": "rooms", "pipeline": admin_rooms_pipeline({}, None, -1, 50, None)},
+        {"name": "admin rooms by owner", "collection": "rooms", "pipeline": admin_rooms_pipeline({"owner_id": "u"}, None, -1, 50, None)},
+        {"name": "owners of removed rooms", "collection": "rooms", "pipeline": rooms_removed_pipeline(["ROOM"])},
+        {"name": "idle rooms", "collection": "rooms", "pipeline": idle_rooms_pipeline(now)},
+        {"name": "membership", "collection": "memberships", "filter": {"_id": "ROOM:u"}},
+        {"name": "online members", "collection": "memberships", "filter": {"room_id": "ROOM", "is_online": {"$ne": False}}},
+        {"name": "voters", "collection": "memberships", "filter": {"room_id": "ROOM", "is_spectator": False, "is_online": {"$ne": False}}},
+        {"name": "memberships of user", "collection": "memberships", "filter": {"user_id": "u"}},
+        {"name": "other members", "collection": "memberships", "filter": {"room_id": "ROOM", "user_id": {"$ne": "u"}}},
+        {"name": "expired offline members", "collection": "memberships", "filter": {"offline_since": {"$lt": datetime.now(timezone.utc)}}},
+        {"name": "membership merge", "collection": "memberships", "pipeline": _merge_groups_pipeline("user_id", "room_id", "u", ["v"])},
+        {"name": "legacy offline backfill", "collection": "memberships", "filter": {"is_online": False, "offline_since": {"$exists": False}}, "scan": True},
+        {"name": "member profiles", "collection": "profiles", "filter": {"_id": {"$in": ["u", "v"]}}},
+        {"name": "task by id", "collection": "tasks", "filter": {"_id": "t"}},
+        {"name": "room tasks", "collection": "tasks", "filter": {"room_id": "ROOM"}, "sort": {"position": 1}},
+        {"name": "last task position", "collection": "tasks", "filter": {"room_id": "ROOM"}, "sort": {"position": -1}},
+        {"name": "active task of room", "collection": "tasks", "filter": {"room_id": "ROOM", "status": TaskStatus.ACTIVE.value}},
+        {"name": "import dedup", "collection": "tasks", "filter": {"room_id": "ROOM", "external_id": {"$in": ["a"]}}},
+        {"name": "room history", "collection": "tasks", "filter": {"room_id": {"$in": ["ROOM"]}, "status": TaskStatus.COMPLETED.value}},
+        {"name": "closed tasks", "collection": "tasks", "pipeline": closed_tasks_pipeline(now)},
+        {"name": "analytics batch", "collection": "tasks", "pipeline": tasks_pipeline({"status": TaskStatus.COMPLETED.value}, None, 100)},
+        {"name": "task search", "collection": "tasks", "filter": {"$text": {"$search": "login"}, "room_id": {"$in": ["ROOM"]}}},
+        {"name": "search hits", "collection": "tasks", "pipeline": hits_pipeline(["t"])},
+        {"name": "task votes", "collection": "votes", "filter": {"task_id": "t"}},
+        {"name": "user vote", "collection": "votes", "filter": {"_id": "t:u"}},
+        {"name": "votes of tasks", "collection": "votes", "filter": {"task_id": {"$in": ["t"]}}},
+        {"name": "votes of user", "collection": "votes", "filter": {"user_id": "u"}},
+        {"name": "vote merge", "collection": "votes", "pipeline": _merge_groups_pipeline("user_id", "task_id", "u", ["v"])},
+        {"name": "global user", "collection": "global_users", "filter": {"id": "u"}},
+        {"name": "user directory rows", "collection": "global_users", "pipeline": rows_pipeline(["u"])},
+        {"name": "admin users page", "collection": "admin_users", "pipeline": admin_users_pipeline(None, "type", 1, 50, None)},
+        {"name": "admin users by name", "collection": "admin_users", "pipeline": admin_users_pipeline(None, "name", -1, 50, ["ana", "u"])},
+        {"name": "admin users by email", "collection": "admin_users", "pipeline": admin_users_pipeline(None, "email", 1, 50, None)},
+        {"name": "admin users search", "collection": "admin_users", "filter": admin_users_match("an")},
+        {"name": "template by id", "collection": "room_templates", "filter": {"id": "x"}},
+        {"name": "templates of owner", "collection": "room_templates", "filter": {"owner_id": "u"}, "sort": {"created_at": -1}},
+        {"name": "room view", "collection": "room_views", "filter": {"_id": "ROOM"}},
+        {"name": "archived room", "collection": "archived_rooms", "filter": {"id": "ROOM"}},
+        {"name": "archived rooms of owner", "collection": "archived_rooms", "filter": {"owner_id": "u"}, "sort": {"created_at": -1}},
+        {"name": "archived rooms of member", "collection": "archived_rooms", "filter": {"members.id": "u", "owner_id": {"$ne": "u"}}},
+        {"name": "expired archives", "collection": "archived_rooms", "filter": {"archived_at": {"$lt": now}}},
+        {"name": "job", "collection": "jobs", "filter": {"id": "j"}},
+        {"name": "analytics report", "collection": "analytics_reports", "filter": {"scope": "global"}},
+        {"name": "stats reconciliation", "collection": "stats", "filter": {}, "scan": True},
+    ]
+
+async def collection_stats(db, names: List[str]) -> Dict[str, Dict[str, int]]:
+    """Document count, data size and index footprint per collection (missing ones skipped).
+    Compared before and after a layout change, it shows the index and working-set cost."""
+    stats = {}
+    for name in names:
+        try:
+            shards = await db[name].aggregate([{"$collStats": {"storageStats": {}}}]).to_list(None)
+        except OperationFailure:
+            continue  # collection does not exist
+        totals = {"count": 0, "data_size": 0, "indexes": 0, "index_size": 0}
+        for shard in shards:
+            storage = shard.get("storageStats", {})
+            totals["count"] += storage.get("count", 0)
+            totals["data_size"] += storage.get("size", 0)
+            totals["indexes"] = max(totals["indexes"], storage.get("nindexes", 0))
+            totals["index_size"] += storage.get("totalIndexSize", 0)
+        totals["avg_doc_size"] = totals["data_size"] // totals["count"] if totals["count"] else 0
+        stats[name] = totals
+    return stats
+
+def find_stages(plan: Any, stage: str) -> bool:
+    """True if any node of an explain() document (classic or SBE, find or aggregate) is `stage`."""
+    if isinstance(plan, dict):
+        if plan.get("stage") == stage: return True
+        return any(find_stages(v, stage) for v in plan.values())
+    if isinstance(plan, list):
+        return any(find_stages(v, stage) for v in plan)
+    return False
+
+async def explain(db, shape: QueryShape) -> Dict[str, Any]:
+    if "pipeline" in shape:
+        command = {"aggregate": shape["collection"], "pipeline": shape["pipeline"], "cursor": {}}
+    else:
+        command = {"find": shape["collection"], "filter": shape["filter"]}
+        if shape.get("sort"): command["sort"] = shape["sort"]
+    return await db.command("explain", command, verbosity="queryPlanner")
+
+async def check_query_plans(db) -> List[Dict[str, Any]]:
+    results = []
+    for shape in query_shapes():
+        result = {"name": shape["name"], "collection": shape["collection"], "scan_allowed": bool(shape.get("scan"))}
+        try:
+            result["collscan"] = find_stages(await explain(db, shape), "COLLSCAN")
+        except OperationFailure as e:
+            result.update(collscan=None, error=str(e))
+        result["ok"] = "error" not in result and (result["scan_allowed"] or not result["collscan"])
+        results.append(result)
+    return results
+
+async def _main(check: bool, show_stats: bool) -> int:
+    from app.db.database import db_instance
+
+    await db_instance.connect()
+    db = db_instance.db
+    if db is None:
+        print("MONGO_URL is not configured")
+        return 2
+    try:
+        report = await ensure_indexes(db)
+        exit_code = 1 if report["failed"] else 0
+        if check:
+            for result in await check_query_plans(db):
+                status = "ok" if result["ok"] else "FAIL"
+                detail = result.get("error") or ("COLLSCAN (allowed)" if result["collscan"] else "index")
+                print(f"{status:4} {result['collection']:18} {result['name']:28} {detail}")
+                if not result["ok"]: exit_code = 1
+        if show_stats:
+            names = sorted({collection for collection, _, _ in INDEXES} | {"profiles"})
+            for name, st in (await collection_stats(db, names)).items():
+                print(f"{name:18} {st['count']:>10} docs {st['avg_doc_size']:>6} B/doc {st['data_size']:>12} B data {st['indexes']:>3} indexes {st['index_size']:>12} B")
+        return exit_code
+    finally:
+        await db_instance.disconnect()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ensure MongoDB indexes and optionally check query plans.")
+    parser.add_argument("--check", action="store_true", help="explain() every known query shape and fail on collection scans")
+    parser.add_argument("--stats", action="store_true", help="print document, data and index sizes per collection")
+    args = parser.parse_args()
+    sys.exit(asyncio.run(_main(args.check, args.stats)))
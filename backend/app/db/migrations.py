@@ -0,0 +1,345 @@
+import argparse
+import asyncio
+import logging
+import sys
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Set
+
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+
+from app.core.config import settings
+from app.db import repositories
+from app.db.indexes import collection_stats
+from app.models.domain import FIBONACCI_VALUES
+
+logger = logging.getLogger(__name__)
+
+# Versioned schema migrations. Each migration has an integer version and is recorded in
+# `schema_migrations` (_id = version) with its status and progress; pending migrations
+# run in version order at startup (MIGRATIONS_ON_STARTUP), from the admin API or from
+# `python -m app.db.migrations`. Nodes starting together coordinate through a lease on
+# the migration record, so each migration runs once. Backfills update documents in _id
+# batches with a filter that stops matching once a document is migrated, which makes
+# them idempotent and safe to resume after a crash.
+#
+# Documents restored from cold storage (services/archive.py) predate some migrations;
+# they pass through `upgrade()` before being written back.
+#
+# `applied` is this node's view of the applied versions (loaded at startup, refreshed
+# until every migration is applied); the repositories read both storage layouts until
+# NORMALIZED_LAYOUT is in it.
+
+OWNER = uuid.uuid4().hex[:8]
+NORMALIZED_LAYOUT = 4
+
+applied: Set[int] = set()
+
+MigrationRun = Callable[["MigrationContext"], Awaitable[None]]
+DocUpgrade = Callable[[Dict[str, Any]], None]
+
+class Migration:
+    def __init__(self, version: int, name: str, run: MigrationRun, upgrades: Optional[Dict[str, DocUpgrade]] = None):
+        self.version = version
+        self.name = name
+        self.run = run
+        self.upgrades = upgrades or {}
+
+class MigrationContext:
+    def __init__(self, db, migration: Migration, job=None):
+        self.db = db
+        self.migration = migration
+        self.job = job
+        self.progress: Dict[str, Any] = {}
+
+    async def report(self, **progress: Any):
+        """Saves progress and renews the lease on the migration."""
+        self.progress.update(progress)
+        lease = datetime.now(timezone.utc) + timedelta(seconds=settings.MIGRATION_LEASE_SECONDS)
+        await self.db.schema_migrations.update_one(
+            {"_id": self.migration.version, "owner": OWNER},
+            {"$set": {"progress": self.progress, "locked_until": lease}}
+        )
+        if self.job is not None:
+            await self.job.report(migration=self.migration.name, **{self.migration.name: self.progress})
+            await self.job.checkpoint()
+
+    async def backfill(self, collection: str, query: Dict[str, Any], update: Dict[str, Any]) -> Dict[str, int]:
+        """Applies `update` to the documents matching `query`, MIGRATION_BATCH_SIZE at a time.
+        `update` must make the document stop matching `query`."""
+        batch_size = settings.MIGRATION_BATCH_SIZE
+        totals = {"matched": 0, "modified": 0, "batches": 0}
+        last_id = None
+        while True:
+            page = dict(query)
+            if last_id is not None: page["_id"] = {"$gt": last_id}
+            docs = await self.db[collection].find(page, {"_id": 1}).sort("_id", 1).limit(batch_size).to_list(batch_size)
+            if not docs: break
+            ids = [d["_id"] for d in docs]
+            result = await self.db[collection].update_many({**query, "_id": {"$in": ids}}, update)
+            totals["matched"] += result.matched_count
+            totals["modified"] += result.modified_count
+            totals["batches"] += 1
+            await self.report(**{collection: totals})
+            if len(docs) < batch_size: break
+            last_id = ids[-1]
+            if settings.MIGRATION_BATCH_DELAY_SECONDS > 0: await asyncio.sleep(settings.MIGRATION_BATCH_DELAY_SECONDS)
+        await self.report(**{collection: totals})
+        return totals
+
+    async def rekey(self, collection: str, key: Callable[[Dict[str, Any]], Any]) -> Dict[str, int]:
+        """Moves the documents with ObjectId keys to `key(doc)`, MIGRATION_BATCH_SIZE at a time.
+        Each copy is inserted before its original is deleted, and a write that reached the
+        original in between (the repositories write both while the layout is legacy) is
+        carried over to the copy."""
+        batch_size = settings.MIGRATION_BATCH_SIZE
+        coll = self.db[collection]
+        totals = {"rekeyed": 0, "batches": 0}
+        while True:
+            docs = await coll.find({"_id": {"$type": "objectId"}}).sort("_id", 1).limit(batch_size).to_list(batch_size)
+            if not docs: break
+            copies = [{**doc, "_id": key(doc)} for doc in docs]
+            await _insert_new(coll, copies)
+            for doc, copy in zip(docs, copies):
+                latest = await coll.find_one_and_delete({"_id": doc["_id"]})
+                if latest is not None and latest != doc:
+                    await coll.replace_one({"_id": copy["_id"]}, {**latest, "_id": copy["_id"]})
+            totals["rekeyed"] += len(docs)
+            totals["batches"] += 1
+            await self.report(**{collection: totals})
+            if settings.MIGRATION_BATCH_DELAY_SECONDS > 0: await asyncio.sleep(settings.MIGRATION_BATCH_DELAY_SECONDS)
+        await self.report(**{collection: totals})
+        return totals
+
+async def _insert_new(collection, docs: List[Dict[str, Any]]):
+    """Inserts `docs`, skipping those whose key already exists."""
+    try:
+        await collection.insert_many(docs, ordered=False)
+    except BulkWriteError as e:
+        if any(err.get("code") != 11000 for err in e.details.get("writeErrors", [])): raise
+
+async def write_members(db, members: List[Dict[str, Any]]):
+    """Writes members in the API shape ({"id", "room_id", "name", ...flags}) as memberships
+    and profiles. Existing memberships are kept and the first profile of a user wins."""
+    memberships, profiles = [], []
+    for member in members:
+        membership, profile = repositories.split_member(member)
+        memberships.append(membership)
+        if profile: profiles.append(UpdateOne({"_id": member["id"]}, {"$setOnInsert": profile}, upsert=True))
+    if memberships: await _insert_new(db.memberships, memberships)
+    if profiles: await db.profiles.bulk_write(profiles, ordered=True)
+
+MIGRATIONS: List[Migration] = []
+
+def field_default(version: int, name: str, collection: str, field: str, value: Any) -> Migration:
+    """Backfills `field` with `value` on the documents of `collection` that lack it."""
+    async def run(ctx: MigrationContext):
+        await ctx.backfill(collection, {field: {"$exists": False}}, {"$set": {field: value}})
+
+    def upgrade(doc: Dict[str, Any]):
+        doc.setdefault(field, value)
+
+    migration = Migration(version, name, run, {collection: upgrade})
+    MIGRATIONS.append(migration)
+    return migration
+
+# Rooms created before deck types and the discussion timer.
+field_default(1, "rooms_deck_type", "rooms", "deck_type", "FIBONACCI")
+field_default(2, "rooms_deck_values", "rooms", "deck_values", [str(v) for v in FIBONACCI_VALUES])
+field_default(3, "rooms_timer_end", "rooms", "timer_end", None)
+
+# Rooms, tasks and votes keyed by `_id`; memberships split into lean `memberships`
+# documents and one `profiles` document per user (see app/db/repositories.py).
+LAYOUT_COLLECTIONS = ["rooms", "tasks", "votes", "users", "memberships", "profiles"]
+# Unique on the legacy keys: they would reject the rekeyed copies.
+LEGACY_UNIQUE = [("rooms", "id_1", [("id", 1)]), ("tasks", "id_1", [("id", 1)]), ("votes", "task_id_1_user_id_1", None)]
+LEGACY_INDEXES = [("rooms", "id_1"), ("tasks", "id_1"), ("votes", "task_id_1_user_id_1")]
+
+async def _normalize_layout(ctx: MigrationContext):
+    db = ctx.db
+    await ctx.report(before=await collection_stats(db, LAYOUT_COLLECTIONS))
+    for collection, name, relaxed in LEGACY_UNIQUE:
+        info = (await db[collection].index_information()).get(name)
+        if not info or not info.get("unique"): continue
+        await db[collection].drop_index(name)
+        # The legacy layout still looks documents up by id until every node has switched.
+        if relaxed: await db[collection].create_index(relaxed, name=name)
+
+    await ctx.rekey("rooms", lambda doc: doc["id"])
+    await ctx.rekey("tasks", lambda doc: doc["id"])
+    await ctx.rekey("votes", lambda doc: repositories.vote_key(doc["task_id"], doc["user_id"]))
+
+    # Newest first: the profile of the latest membership wins, and a profile already
+    # written by the app is never overwritten.
+    batch_size = settings.MIGRATION_BATCH_SIZE
+    totals = {"moved": 0, "batches": 0}
+    while True:
+        docs = await db.users.find({}).sort("_id", -1).limit(batch_size).to_list(batch_size)
+        if not docs: break
+        await write_members(db, docs)
+        await db.users.delete_many({"_id": {"$in": [d["_id"] for d in docs]}})
+        totals["moved"] += len(docs)
+        totals["batches"] += 1
+        await ctx.report(users=totals)
+
+async def _drop_legacy_indexes(ctx: MigrationContext):
+    db = ctx.db
+    dropped = []
+    for collection, name in LEGACY_INDEXES:
+        if name in await db[collection].index_information(): dropped.append((collection, name))
+    if dropped:
+        # Nodes that have not seen migration 4 applied yet still query by these indexes.
+        await asyncio.sleep(3 * settings.MIGRATION_STATUS_REFRESH_SECONDS)
+        for collection, name in dropped: await db[collection].drop_index(name)
+    if await db.users.estimated_document_count() == 0: await db.users.drop()
+    await ctx.report(dropped=[f"{c}.{n}" for c, n in dropped], after=await collection_stats(db, LAYOUT_COLLECTIONS))
+
+async def _build_user_directory(ctx: MigrationContext):
+    from app.services import user_directory
+
+    await ctx.report(admin_users=await user_directory.rebuild(ctx.db))
+
+async def _rekey_imported_tasks(ctx: MigrationContext):
+    await ctx.rekey("tasks", lambda doc: doc["id"])
+
+MIGRATIONS.append(Migration(NORMALIZED_LAYOUT, "normalized_layout", _normalize_layout))
+MIGRATIONS.append(Migration(5, "drop_legacy_indexes", _drop_legacy_indexes))
+# The admin users listing pages over materialized rows (see services/user_directory.py).
+MIGRATIONS.append(Migration(6, "admin_user_directory", _build_user_directory))
+# Tasks created by the bulk import's upserts before they were keyed like the others
+# ended up under an ObjectId `_id` on already normalized databases.
+MIGRATIONS.append(Migration(7, "rekey_imported_tasks", _rekey_imported_tasks))
+
+def upgrade(collection: str, docs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    for migration in MIGRATIONS:
+        apply = migration.upgrades.get(collection)
+        if apply is None: continue
+        for doc in docs: apply(doc)
+    return docs
+
+async def status(db) -> List[Dict[str, Any]]:
+    records = {r["_id"]: r for r in await db.schema_migrations.find({}).to_list(None)}
+    result = []
+    for m in sorted(MIGRATIONS, key=lambda m: m.version):
+        record = records.get(m.version, {})
+        result.append({
+            "version": m.version,
+            "name": m.name,
+            "status": record.get("status", "pending"),
+            "progress": record.get("progress", {}),
+            "started_at": record.get("started_at"),
+            "applied_at": record.get("applied_at"),
+            "error": record.get("error")
+        })
+    return result
+
+def _mark_applied(versions: Iterable[int]):
+    applied.update(versions)
+    repositories.legacy_layout = NORMALIZED_LAYOUT not in applied
+
+async def load_applied(db) -> Set[int]:
+    records = await db.schema_migrations.find({"status": "applied"}, {"_id": 1}).to_list(None)
+    applied.clear()
+    _mark_applied(r["_id"] for r in records)
+    return applied
+
+async def refresh_periodically(get_db, interval_seconds: float):
+    """Follows migrations run by other nodes (or the CLI) until every one is applied."""
+    while any(m.version not in applied for m in MIGRATIONS):
+        await asyncio.sleep(interval_seconds)
+        db = get_db()
+        if db is None: continue
+        try:
+            await load_applied(db)
+        except Exception as e:
+            logger.warning(f"⚠️ Falha ao consultar migrações aplicadas: {e}")
+
+async def _claim(db, migration: Migration) -> Optional[str]:
+    """Returns "claimed", "applied", or None when another node holds the lease."""
+    now = datetime.now(timezone.utc)
+    try:
+        await db.schema_migrations.find_one_and_update(
+            {"_id": migration.version, "status": {"$ne": "applied"}, "$or": [
+                {"locked_until": {"$exists": False}},
+                {"locked_until": {"$lt": now}}
+            ]},
+            {
+                "$set": {
+                    "name": migration.name, "status": "running", "owner": OWNER, "error": None,
+                    "started_at": now, "locked_until": now + timedelta(seconds=settings.MIGRATION_LEASE_SECONDS)
+                },
+                "$setOnInsert": {"progress": {}}
+            },
+            upsert=True
+        )
+        return "claimed"
+    except DuplicateKeyError:
+        # The record exists but did not match: applied already, or leased by another node.
+        record = await db.schema_migrations.find_one({"_id": migration.version})
+        return "applied" if record and record.get("status") == "applied" else None
+
+async def migrate(db, job=None) -> Dict[str, Any]:
+    """Runs the pending migrations in version order. Waits for migrations that another node
+    is running, so a node never serves before the schema it expects is in place."""
+    done, skipped = [], []
+    for migration in sorted(MIGRATIONS, key=lambda m: m.version):
+        while True:
+            claim = await _claim(db, migration)
+            if claim is not None: break
+            await asyncio.sleep(settings.MIGRATION_POLL_SECONDS)
+        if claim == "applied":
+            skipped.append(migration.version)
+            _mark_applied([migration.version])
+            continue
+
+        ctx = MigrationContext(db, migration, job)
+        logger.info(f"🧬 Migração {migration.version} ({migration.name}) iniciada")
+        try:
+            await migration.run(ctx)
+        except Exception as e:
+            await db.schema_migrations.update_one(
+                {"_id": migration.version, "owner": OWNER},
+                {"$set": {"status": "failed", "error": str(e), "locked_until": datetime.now(timezone.utc)}}
+            )
+            logger.error(f"❌ Migração {migration.version} ({migration.name}) falhou: {e}")
+            raise
+        await db.schema_migrations.update_one(
+            {"_id": migration.version, "owner": OWNER},
+            {"$set": {"status": "applied", "applied_at": datetime.now(timezone.utc), "progress": ctx.progress}, "$unset": {"locked_until": ""}}
+        )
+        done.append(migration.version)
+        _mark_applied([migration.version])
+        logger.info(f"✅ Migração {migration.version} ({migration.name}) aplicada: {ctx.progress}")
+    return {"applied": done, "already_applied": skipped}
+
+async def submit_migrate(db) -> Dict[str, Any]:
+    from app.services.jobs import runner
+
+    return await runner.submit("schema_migrations", {}, lambda job: migrate(db, job))
+
+async def _main(show_status: bool) -> int:
+    from app.db.database import db_instance
+
+    await db_instance.connect()
+    db = db_instance.db
+    if db is None:
+        print("MONGO_URL is not configured")
+        return 2
+    try:
+        if not show_status:
+            result = await migrate(db)
+            print(f"applied: {result['applied'] or 'none'}")
+        for m in await status(db):
+            print(f"{m['version']:>4} {m['name']:28} {m['status']:8} {m['progress']}")
+        return 0
+    except Exception as e:
+        print(f"migration failed: {e}")
+        return 1
+    finally:
+        await db_instance.disconnect()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Apply pending schema migrations.")
+    parser.add_argument("--status", action="store_true", help="only list migrations and their status")
+    sys.exit(asyncio.run(_main(parser.parse_args().status)))
@@ -0,0 +1,52 @@
+import base64
+import json
+from typing import Any, Dict, List, Optional, Sequence
+from fastapi import HTTPException
+
+# Keyset ("seek") pagination: the client gets an opaque cursor holding the sort key
+# values of the last item it received, and the next page starts strictly after it.
+# Unlike skip/offset, later pages cost the same as the first one.
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    raw = json.dumps(list(values), separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: Optional[str], size: int) -> Optional[List[Any]]:
+    if not cursor: return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(raw)
+    except ValueError:
+        raise HTTPException(400, "Invalid cursor")
+    if not isinstance(values, list) or len(values) != size:
+        raise HTTPException(400, "Invalid cursor")
+    return values
+
+def keyset_match(fields: Sequence[str], values: Sequence[Any], direction: int) -> Dict[str, Any]:
+    """$match stage selecting documents that sort after `values` on `fields`.
+
+    The last field must be unique (usually the id) so that ties never repeat or
+    skip items between pages."""
+    op = "$gt" if direction > 0 else "$lt"
+    clauses = []
+    for i, field in enumerate(fields):
+        clause = {f: values[j] for j, f in enumerate(fields[:i])}
+        clause[field] = {op: values[i]}
+        clauses.append(clause)
+    return {"$or": clauses}
+
+def keyset_sort(fields: Sequence[str], direction: int) -> Dict[str, int]:
+    return {field: direction for field in fields}
+
+def page_result(items: List[Dict[str, Any]], limit: int, fields: Sequence[str], total: Optional[int] = None) -> Dict[str, Any]:
+    # Callers fetch limit + 1 items; the extra one only tells whether a next page exists.
+    # Computed sort keys are prefixed with "_" and stripped once the cursor is built.
+    has_more = len(items) > limit
+    items = items[:limit]
+    next_cursor = None
+    if has_more and items:
+        next_cursor = encode_cursor([items[-1].get(f) for f in fields])
+    items = [{k: v for k, v in item.items() if not k.startswith("_")} for item in items]
+    result: Dict[str, Any] = {"items": items, "next_cursor": next_cursor}
+    if total is not None: result["total"] = total
+    return result
@@ -0,0 +1,509 @@
+import copy
+from collections import defaultdict
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from pymongo.errors import DuplicateKeyError
+
+from app.core.config import settings
+from app.db.database import REALTIME, get_db
+
+# Repository layer for the realtime core (rooms, memberships, tasks, votes, global
+# users). STORAGE_ENGINE selects the implementation:
+#   - "mongo": thin wrappers issuing the same Motor calls the routers used to make;
+#   - "memory": process-local tables with secondary indexes, for benchmarks, tests and
+#     single-node deployments without MongoDB.
+# Both return plain dicts without `_id` (members as {"id", "room_id", "name", ...flags})
+# and are checked by test_backend_repositories.py.
+# Features built on aggregations (admin listings, analytics, export, archive, counters)
+# stay Mongo-only and read `Repositories.db`, which is None under the memory engine.
+
+# Documents are keyed by `_id`: rooms and tasks by their id (also kept as a plain `id`
+# field, the shape the API, the admin pipelines and the archives use), votes by task and
+# user, and memberships by room and user. Memberships are lean (role flags, presence,
+# joined_at); the profile (name, picture) is stored once per user in `profiles`.
+#
+# Databases written before this layout have ObjectId keys and memberships with inline
+# profiles in `users`. Until migration 4 (app/db/migrations.py) has rekeyed them,
+# `legacy_layout` is True and the Mongo repositories read both layouts: rooms, tasks and
+# votes are looked up by their fields (a document being rekeyed briefly exists twice, so
+# writes go to both copies and lists are deduplicated), and memberships still in `users`
+# are moved to `memberships` on their first write.
+legacy_layout = False
+
+PROFILE_FIELDS = ("name", "picture")
+
+class LegacyLayoutError(RuntimeError):
+    pass
+
+def require_normalized_layout():
+    """Raised by batch operations that only know the normalized layout (cascades,
+    archiving, merges), which would otherwise miss documents still in the legacy one."""
+    if legacy_layout: raise LegacyLayoutError("Storage layout migration pending: run the schema migrations first")
+
+def vote_key(task_id: str, user_id: str) -> str:
+    return f"{task_id}:{user_id}"
+
+def membership_key(user_id: str, room_id: str) -> str:
+    return f"{room_id}:{user_id}"
+
+def keyed(collection: str, doc: Dict[str, Any]) -> Dict[str, Any]:
+    """`doc` with the `_id` it has in the normalized layout (rooms, tasks and votes)."""
+    key = vote_key(doc["task_id"], doc["user_id"]) if collection == "votes" else doc["id"]
+    return {**doc, "_id": key}
+
+def split_member(member: Dict[str, Any]) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """Splits a member as the API sees it ({"id", "room_id", "name", ...flags}) into its
+    `memberships` document and its `profiles` fields."""
+    membership = {k: v for k, v in member.items() if k not in PROFILE_FIELDS and k not in ("_id", "id")}
+    membership.update(_id=membership_key(member["id"], member["room_id"]), user_id=member["id"])
+    return membership, {f: member[f] for f in PROFILE_FIELDS if f in member}
+
+def join_member(membership: Dict[str, Any], profile: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    member = {"id": membership["user_id"], **{k: v for k, v in membership.items() if k not in ("_id", "user_id")}}
+    if profile: member.update((f, profile[f]) for f in PROFILE_FIELDS if f in profile)
+    return member
+
+def _projection(fields: Optional[Sequence[str]]) -> Dict[str, int]:
+    return {"_id": 0, **{f: 1 for f in fields}} if fields else {"_id": 0}
+
+def _key_filter(key: str) -> Dict[str, Any]:
+    return {"id": key} if legacy_layout else {"_id": key}
+
+def _unique(docs: List[Dict[str, Any]], field: str) -> List[Dict[str, Any]]:
+    if not legacy_layout: return docs
+    seen: set = set()
+    return [d for d in docs if not (d[field] in seen or seen.add(d[field]))]
+
+async def _update(collection, query: Dict[str, Any], update: Dict[str, Any]):
+    if legacy_layout: await collection.update_many(query, update)
+    else: await collection.update_one(query, update)
+
+async def _delete(collection, query: Dict[str, Any]) -> int:
+    if legacy_layout: return min(1, (await collection.delete_many(query)).deleted_count)
+    return (await collection.delete_one(query)).deleted_count
+
+# --- MongoDB ---
+
+class MongoRooms:
+    def __init__(self, db):
+        self.db = db
+
+    async def get(self, room_id: str, fields: Optional[Sequence[str]] = None) -> Optional[Dict[str, Any]]:
+        return await self.db.rooms.find_one(_key_filter(room_id), _projection(fields))
+
+    async def insert(self, room: Dict[str, Any]):
+        await self.db.rooms.insert_one(keyed("rooms", room))
+
+    async def update(self, room_id: str, fields: Dict[str, Any]):
+        await _update(self.db.rooms, _key_filter(room_id), {"$set": fields})
+
+    async def reveal(self, room_id: str) -> bool:
+        """Turns the cards face up; True only for the call that flipped them."""
+        query = {**_key_filter(room_id), "cards_revealed": {"$ne": True}}
+        write = self.db.rooms.update_many if legacy_layout else self.db.rooms.update_one
+        return (await write(query, {"$set": {"cards_revealed": True}})).modified_count > 0
+
+    async def delete(self, room_id: str) -> int:
+        return await _delete(self.db.rooms, _key_filter(room_id))
+
+    async def list_by_owner(self, owner_id: str, limit: int = 100) -> List[Dict[str, Any]]:
+        return _unique(await self.db.rooms.find({"owner_id": owner_id}, {"_id": 0}).sort("created_at", -1).to_list(limit), "id")
+
+    async def list_by_ids(self, room_ids: List[str], exclude_owner: Optional[str] = None, limit: int = 100) -> List[Dict[str, Any]]:
+        query: Dict[str, Any] = {"id" if legacy_layout else "_id": {"$in": room_ids}}
+        if exclude_owner: query["owner_id"] = {"$ne": exclude_owner}
+        return _unique(await self.db.rooms.find(query, {"_id": 0}).to_list(limit), "id")
+
+class MongoMemberships:
+    """Room memberships (`memberships`) joined with the members' `profiles` where names
+    are needed. `get` and `list_user` return the membership alone (flags, joined_at)."""
+
+    def __init__(self, db):
+        self.db = db
+
+    async def _profiles(self, user_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        if not user_ids: return {}
+        return {p["_id"]: p for p in await self.db.profiles.find({"_id": {"$in": user_ids}}).to_list(None)}
+
+    async def _set_profile(self, user_id: str, profile: Dict[str, Any], overwrite: bool = True):
+        if not profile: return
+        update = {"$set": profile} if overwrite else {"$setOnInsert": profile}
+        await self.db.profiles.update_one({"_id": user_id}, update, upsert=True)
+
+    async def _promote(self, user_id: str, room_id: str) -> bool:
+        """Legacy layout: moves the member's `users` document, if any, to `memberships`."""
+        legacy = await self.db.users.find_one({"id": user_id, "room_id": room_id})
+        if legacy is None: return False
+        membership, profile = split_member(legacy)
+        try:
+            await self.db.memberships.insert_one(membership)
+        except DuplicateKeyError:
+            pass  # moved concurrently (by the migration or another write)
+        await self._set_profile(user_id, profile, overwrite=False)
+        await self.db.users.delete_one({"_id": legacy["_id"]})
+        return True
+
+    async def _legacy(self, query: Dict[str, Any], known: Iterable[Tuple[str, str]], limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Legacy layout: members of `query` still in `users`, minus the (user, room) pairs already read."""
+        if not legacy_layout: return []
+        known = set(known)
+        docs = await self.db.users.find(query, {"_id": 0}).to_list(limit)
+        return [d for d in docs if (d["id"], d["room_id"]) not in known]
+
+    async def get(self, user_id: str, room_id: str) -> Optional[Dict[str, Any]]:
+        membership = await self.db.memberships.find_one({"_id": membership_key(user_id, room_id)})
+        if membership is not None: return join_member(membership)
+        if legacy_layout: return await self.db.users.find_one({"id": user_id, "room_id": room_id}, {"_id": 0})
+        return None
+
+    async def upsert(self, user_id: str, room_id: str, fields: Dict[str, Any], unset: Sequence[str] = ()) -> bool:
+        """Sets `fields` on the membership (and profile fields on the user's profile),
+        creating it if needed. Returns True if it was created."""
+        moved = legacy_layout and await self._promote(user_id, room_id)
+        membership, profile = split_member({**fields, "id": user_id, "room_id": room_id})
+        await self._set_profile(user_id, profile)
+        update: Dict[str, Any] = {"$set": {k: v for k, v in membership.items() if k != "_id"}}
+        if unset: update["$unset"] = {f: "" for f in unset}
+        result = await self.db.memberships.update_one({"_id": membership["_id"]}, update, upsert=True)
+        return result.upserted_id is not None and not moved
+
+    async def update(self, user_id: str, room_id: str, fields: Dict[str, Any], unset: Sequence[str] = ()):
+        if legacy_layout: await self._promote(user_id, room_id)
+        membership, profile = split_member({**fields, "id": user_id, "room_id": room_id})
+        await self._set_profile(user_id, profile)
+        update: Dict[str, Any] = {"$set": {k: v for k, v in membership.items() if k not in ("_id", "user_id", "room_id")}}
+        if unset: update["$unset"] = {f: "" for f in unset}
+        await self.db.memberships.update_one({"_id": membership["_id"]}, update)
+
+    async def delete(self, user_id: str, room_id: str) -> int:
+        deleted = (await self.db.memberships.delete_one({"_id": membership_key(user_id, room_id)})).deleted_count
+        if legacy_layout: deleted += (await self.db.users.delete_many({"id": user_id, "room_id": room_id})).deleted_count
+        return min(1, deleted)
+
+    async def list_room(self, room_id: str, online_only: bool = False, voters_only: bool = False, limit: int = 100) -> List[Dict[str, Any]]:
+        query: Dict[str, Any] = {"room_id": room_id}
+        if voters_only: query["is_spectator"] = False
+        if online_only: query["is_online"] = {"$ne": False}
+        memberships = await self.db.memberships.find(query).to_list(limit)
+        profiles = await self._profiles([m["user_id"] for m in memberships])
+        members = [join_member(m, profiles.get(m["user_id"])) for m in memberships]
+        return members + await self._legacy(query, ((m["id"], room_id) for m in members), limit)
+
+    async def list_by_ids(self, room_id: str, user_ids: List[str]) -> List[Dict[str, Any]]:
+        # Names only: the callers pass the voters of a task, who are members of its room.
+        profiles = await self.db.profiles.find({"_id": {"$in": user_ids}}, {"name": 1}).to_list(None)
+        names = [{"id": p["_id"], "name": p.get("name")} for p in profiles]
+        missing = set(user_ids) - {n["id"] for n in names}
+        if legacy_layout and missing:
+            names += await self.db.users.find({"id": {"$in": list(missing)}, "room_id": room_id}, {"_id": 0, "id": 1, "name": 1}).to_list(None)
+        return names
+
+    async def list_user(self, user_id: str, limit: int = 100) -> List[Dict[str, Any]]:
+        members = [join_member(m) for m in await self.db.memberships.find({"user_id": user_id}).to_list(limit)]
+        return members + await self._legacy({"id": user_id}, ((user_id, m["room_id"]) for m in members), limit)
+
+    async def count_room(self, room_id: str, exclude_user: Optional[str] = None) -> int:
+        query: Dict[str, Any] = {"room_id": room_id}
+        if exclude_user: query["user_id"] = {"$ne": exclude_user}
+        count = await self.db.memberships.count_documents(query)
+        if legacy_layout:
+            count += await self.db.users.count_documents({"room_id": room_id, **({"id": {"$ne": exclude_user}} if exclude_user else {})})
+        return count
+
+class MongoTasks:
+    def __init__(self, db):
+        self.db = db
+
+    async def get(self, task_id: str) -> Optional[Dict[str, Any]]:
+        return await self.db.tasks.find_one(_key_filter(task_id), {"_id": 0})
+
+    async def insert(self, task: Dict[str, Any]):
+        await self.db.tasks.insert_one(keyed("tasks", task))
+
+    async def list_room(self, room_id: str, limit: int = 100) -> List[Dict[str, Any]]:
+        return _unique(await self.db.tasks.find({"room_id": room_id}, {"_id": 0}).sort("position", 1).to_list(limit), "id")
+
+    async def last_position(self, room_id: str) -> Optional[int]:
+        last = await self.db.tasks.find_one({"room_id": room_id}, sort=[("position", -1)])
+        return last.get("position", 0) if last else None
+
+    async def update(self, task_id: str, fields: Dict[str, Any], room_id: Optional[str] = None, inc: Optional[Dict[str, int]] = None):
+        query = {**_key_filter(task_id), "room_id": room_id} if room_id else _key_filter(task_id)
+        update: Dict[str, Any] = {"$set": fields} if fields else {}
+        if inc: update["$inc"] = inc
+        await _update(self.db.tasks, query, update)
+
+    async def replace_status(self, room_id: str, old: str, new: str):
+        await self.db.tasks.update_many({"room_id": room_id, "status": old}, {"$set": {"status": new}})
+
+    async def delete(self, task_id: str) -> int:
+        return await _delete(self.db.tasks, _key_filter(task_id))
+
+class MongoVotes:
+    def __init__(self, db):
+        self.db = db
+
+    async def list_task(self, task_id: str, limit: int = 100) -> List[Dict[str, Any]]:
+        return _unique(await self.db.votes.find({"task_id": task_id}, {"_id": 0}).to_list(limit), "user_id")
+
+    async def replace(self, vote: Dict[str, Any]) -> bool:
+        """Stores the user's vote for the task. Returns True if it replaced a previous vote."""
+        doc = keyed("votes", vote)
+        if not legacy_layout:
+            return (await self.db.votes.replace_one({"_id": doc["_id"]}, doc, upsert=True)).matched_count > 0
+        replaced = await self.db.votes.delete_many({"task_id": vote["task_id"], "user_id": vote["user_id"]})
+        try:
+            await self.db.votes.insert_one(doc)
+        except DuplicateKeyError:
+            await self.db.votes.replace_one({"_id": doc["_id"]}, doc)  # rekeyed concurrently by the migration
+        return bool(replaced.deleted_count)
+
+    async def delete(self, task_id: str, user_id: str) -> int:
+        if legacy_layout: return await _delete(self.db.votes, {"task_id": task_id, "user_id": user_id})
+        return (await self.db.votes.delete_one({"_id": vote_key(task_id, user_id)})).deleted_count
+
+    async def delete_task(self, task_id: str) -> int:
+        return (await self.db.votes.delete_many({"task_id": task_id})).deleted_count
+
+    async def delete_user_in_room(self, user_id: str, room_id: str) -> int:
+        return (await self.db.votes.delete_many({"user_id": user_id, "room_id": room_id})).deleted_count
+
+class MongoGlobalUsers:
+    def __init__(self, db):
+        self.db = db
+
+    async def get(self, user_id: str) -> Optional[Dict[str, Any]]:
+        return await self.db.global_users.find_one({"id": user_id}, {"_id": 0})
+
+    async def upsert(self, user_id: str, fields: Dict[str, Any]):
+        await self.db.global_users.update_one({"id": user_id}, {"$set": fields}, upsert=True)
+
+    async def delete(self, user_id: str) -> int:
+        return (await self.db.global_users.delete_one({"id": user_id})).deleted_count
+
+# --- In-memory ---
+
+class MemoryTable:
+    """Rows keyed by a primary key tuple, with hash indexes on field tuples. Rows are
+    copied in and out, so callers can never mutate stored state by accident. Listeners
+    are called with the stored document after every write (the removed one on delete);
+    they back the in-process change feed (services/change_feed.py)."""
+
+    def __init__(self, key: Tuple[str, ...], indexes: Iterable[Tuple[str, ...]] = ()):
+        self.key = key
+        self.rows: Dict[Tuple[Any, ...], Dict[str, Any]] = {}
+        self.indexes: Dict[Tuple[str, ...], Dict[Tuple[Any, ...], set]] = {fields: defaultdict(set) for fields in indexes}
+        self.listeners: List[Callable[[Dict[str, Any]], None]] = []
+
+    def _values(self, doc: Dict[str, Any], fields: Tuple[str, ...]) -> Tuple[Any, ...]:
+        return tuple(doc.get(f) for f in fields)
+
+    def _unindex(self, pk: Tuple[Any, ...]):
+        doc = self.rows.get(pk)
+        if doc is None: return
+        for fields, index in self.indexes.items():
+            bucket = index.get(self._values(doc, fields))
+            if bucket is None: continue
+            bucket.discard(pk)
+            if not bucket: del index[self._values(doc, fields)]
+
+    def get(self, *pk: Any) -> Optional[Dict[str, Any]]:
+        doc = self.rows.get(pk)
+        return copy.deepcopy(doc) if doc is not None else None
+
+    def put(self, doc: Dict[str, Any]) -> bool:
+        pk = self._values(doc, self.key)
+        created = pk not in self.rows
+        self._unindex(pk)
+        self.rows[pk] = copy.deepcopy(doc)
+        for fields, index in self.indexes.items():
+            index[self._values(doc, fields)].add(pk)
+        for listener in self.listeners: listener(self.rows[pk])
+        return created
+
+    def delete(self, *pk: Any) -> bool:
+        if pk not in self.rows: return False
+        self._unindex(pk)
+        doc = self.rows.pop(pk)
+        for listener in self.listeners: listener(doc)
+        return True
+
+    def lookup(self, fields: Tuple[str, ...], *values: Any) -> List[Dict[str, Any]]:
+        return [copy.deepcopy(self.rows[pk]) for pk in self.indexes[fields].get(values, ())]
+
+class MemoryRooms:
+    def __init__(self):
+        self.table = MemoryTable(("id",), [("owner_id",)])
+
+    async def get(self, room_id: str, fields: Optional[Sequence[str]] = None) -> Optional[Dict[str, Any]]:
+        room = self.table.get(room_id)
+        if room is None or not fields: return room
+        return {f: room[f] for f in fields if f in room}
+
+    async def insert(self, room: Dict[str, Any]):
+        self.table.put(room)
+
+    async def update(self, room_id: str, fields: Dict[str, Any]):
+        room = self.table.get(room_id)
+        if room is not None: self.table.put({**room, **fields})
+
+    async def reveal(self, room_id: str) -> bool:
+        room = self.table.get(room_id)
+        if room is None or room.get("cards_revealed"): return False
+        self.table.put({**room, "cards_revealed": True})
+        return True
+
+    async def delete(self, room_id: str) -> int:
+        return int(self.table.delete(room_id))
+
+    async def list_by_owner(self, owner_id: str, limit: int = 100) -> List[Dict[str, Any]]:
+        rooms = self.table.lookup(("owner_id",), owner_id)
+        return sorted(rooms, key=lambda r: r.get("created_at") or "", reverse=True)[:limit]
+
+    async def list_by_ids(self, room_ids: List[str], exclude_owner: Optional[str] = None, limit: int = 100) -> List[Dict[str, Any]]:
+        rooms = [r for r in (self.table.get(room_id) for room_id in room_ids) if r is not None]
+        return [r for r in rooms if not exclude_owner or r.get("owner_id") != exclude_owner][:limit]
+
+def _apply(doc: Dict[str, Any], fields: Dict[str, Any], unset: Sequence[str] = (), inc: Optional[Dict[str, int]] = None) -> Dict[str, Any]:
+    doc = {**doc, **fields}
+    for f in unset: doc.pop(f, None)
+    for f, n in (inc or {}).items(): doc[f] = doc.get(f, 0) + n
+    return doc
+
+class MemoryMemberships:
+    def __init__(self):
+        self.table = MemoryTable(("_id",), [("room_id",), ("user_id",)])
+        self.profiles = MemoryTable(("_id",))
+
+    def _join(self, membership: Dict[str, Any]) -> Dict[str, Any]:
+        return join_member(membership, self.profiles.get(membership["user_id"]))
+
+    def _write(self, user_id: str, room_id: str, fields: Dict[str, Any], unset: Sequence[str], create: bool) -> bool:
+        membership, profile = split_member({**fields, "id": user_id, "room_id": room_id})
+        current = self.table.get(membership["_id"])
+        if current is None and not create: return False
+        if profile: self.profiles.put({**(self.profiles.get(user_id) or {"_id": user_id}), **profile})
+        return self.table.put(_apply(current or {}, membership, unset))
+
+    async def get(self, user_id: str, room_id: str) -> Optional[Dict[str, Any]]:
+        membership = self.table.get(membership_key(user_id, room_id))
+        return join_member(membership) if membership is not None else None
+
+    async def upsert(self, user_id: str, room_id: str, fields: Dict[str, Any], unset: Sequence[str] = ()) -> bool:
+        return self._write(user_id, room_id, fields, unset, create=True)
+
+    async def update(self, user_id: str, room_id: str, fields: Dict[str, Any], unset: Sequence[str] = ()):
+        self._write(user_id, room_id, fields, unset, create=False)
+
+    async def delete(self, user_id: str, room_id: str) -> int:
+        return int(self.table.delete(membership_key(user_id, room_id)))
+
+    async def list_room(self, room_id: str, online_only: bool = False, voters_only: bool = False, limit: int = 100) -> List[Dict[str, Any]]:
+        members = self.table.lookup(("room_id",), room_id)
+        if voters_only: members = [m for m in members if m.get("is_spectator") is False]
+        if online_only: members = [m for m in members if m.get("is_online") is not False]
+        return [self._join(m) for m in members[:limit]]
+
+    async def list_by_ids(self, room_id: str, user_ids: List[str]) -> List[Dict[str, Any]]:
+        profiles = (self.profiles.get(user_id) for user_id in user_ids)
+        return [{"id": p["_id"], "name": p.get("name")} for p in profiles if p is not None]
+
+    async def list_user(self, user_id: str, limit: int = 100) -> List[Dict[str, Any]]:
+        return [join_member(m) for m in self.table.lookup(("user_id",), user_id)[:limit]]
+
+    async def count_room(self, room_id: str, exclude_user: Optional[str] = None) -> int:
+        return sum(1 for m in self.table.lookup(("room_id",), room_id) if m["user_id"] != exclude_user)
+
+class MemoryTasks:
+    def __init__(self):
+        self.table = MemoryTable(("id",), [("room_id",)])
+
+    async def get(self, task_id: str) -> Optional[Dict[str, Any]]:
+        return self.table.get(task_id)
+
+    async def insert(self, task: Dict[str, Any]):
+        self.table.put(task)
+
+    async def list_room(self, room_id: str, limit: int = 100) -> List[Dict[str, Any]]:
+        return sorted(self.table.lookup(("room_id",), room_id), key=lambda t: t.get("position", 0))[:limit]
+
+    async def last_position(self, room_id: str) -> Optional[int]:
+        tasks = self.table.lookup(("room_id",), room_id)
+        return max(t.get("position", 0) for t in tasks) if tasks else None
+
+    async def update(self, task_id: str, fields: Dict[str, Any], room_id: Optional[str] = None, inc: Optional[Dict[str, int]] = None):
+        task = self.table.get(task_id)
+        if task is None or (room_id and task.get("room_id") != room_id): return
+        self.table.put(_apply(task, fields, inc=inc))
+
+    async def replace_status(self, room_id: str, old: str, new: str):
+        for task in self.table.lookup(("room_id",), room_id):
+            if task.get("status") == old: self.table.put({**task, "status": new})
+
+    async def delete(self, task_id: str) -> int:
+        return int(self.table.delete(task_id))
+
+class MemoryVotes:
+    def __init__(self):
+        self.table = MemoryTable(("task_id", "user_id"), [("task_id",), ("user_id",)])
+
+    async def list_task(self, task_id: str, limit: int = 100) -> List[Dict[str, Any]]:
+        return self.table.lookup(("task_id",), task_id)[:limit]
+
+    async def replace(self, vote: Dict[str, Any]) -> bool:
+        return not self.table.put(vote)
+
+    async def delete(self, task_id: str, user_id: str) -> int:
+        return int(self.table.delete(task_id, user_id))
+
+    async def delete_task(self, task_id: str) -> int:
+        votes = self.table.lookup(("task_id",), task_id)
+        for v in votes: self.table.delete(v["task_id"], v["user_id"])
+        return len(votes)
+
+    async def delete_user_in_room(self, user_id: str, room_id: str) -> int:
+        votes = [v for v in self.table.lookup(("user_id",), user_id) if v.get("room_id") == room_id]
+        for v in votes: self.table.delete(v["task_id"], v["user_id"])
+        return len(votes)
+
+class MemoryGlobalUsers:
+    def __init__(self):
+        self.table = MemoryTable(("id",))
+
+    async def get(self, user_id: str) -> Optional[Dict[str, Any]]:
+        return self.table.get(user_id)
+
+    async def upsert(self, user_id: str, fields: Dict[str, Any]):
+        self.table.put({**(self.table.get(user_id) or {"id": user_id}), **fields})
+
+    async def delete(self, user_id: str) -> int:
+        return int(self.table.delete(user_id))
+
+# --- Engine selection ---
+
+class Repositories:
+    def __init__(self, rooms, memberships, tasks, votes, global_users, db=None):
+        self.rooms = rooms
+        self.memberships = memberships
+        self.tasks = tasks
+        self.votes = votes
+        self.global_users = global_users
+        self.db = db
+
+def mongo_repositories(db) -> Repositories:
+    return Repositories(MongoRooms(db), MongoMemberships(db), MongoTasks(db), MongoVotes(db), MongoGlobalUsers(db), db=db)
+
+def memory_repositories() -> Repositories:
+    return Repositories(MemoryRooms(), MemoryMemberships(), MemoryTasks(), MemoryVotes(), MemoryGlobalUsers())
+
+_memory: Optional[Repositories] = None
+
+def get_repositories(query_class: str = REALTIME) -> Optional[Repositories]:
+    """The configured storage, or None when MongoDB is selected but not connected.
+    `query_class` routes the reads (see app/db/database.py)."""
+    global _memory
+    if settings.STORAGE_ENGINE == "memory":
+        if _memory is None: _memory = memory_repositories()
+        return _memory
+    db = get_db(query_class)
+    return mongo_repositories(db) if db is not None else None
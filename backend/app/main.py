@@ -1,4 +1,5 @@
 import os
+import asyncio
 import logging
 from datetime import datetime, timezone
 import socketio
@@ -10,9 +11,15 @@ from slowapi import _rate_limit_exceeded_handler
 
 from app.core.config import settings
 from app.core.security import limiter
-from app.db.database import db_instance
-from app.services.socket import sio
-from app.api.routers import auth, rooms, tasks, actions, admin, users
+from app.db.database import db_instance, get_db
+from app.db.indexes import ensure_indexes
+from app.db import migrations
+from app.services.socket import sio, push_admin_metrics
+from app.services.counters import reconcile_periodically
+from app.services.retention import sweep_periodically
+from app.services.analytics import refresh_periodically
+from app.services.change_feed import create_broadcaster
+from app.api.routers import auth, rooms, tasks, actions, admin, users, session, export, templates, analytics, search
 from app.models.domain import FIBONACCI_VALUES
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -51,12 +58,46 @@ async def add_security_headers(request: Request, call_next):
     response.headers["Content-Security-Policy"] = csp
     return response
 
+background_tasks = set()
+
 @fastapi_app.on_event("startup")
 async def startup_event():
     await db_instance.connect()
+    if db_instance.db is not None and settings.ENSURE_INDEXES_ON_STARTUP:
+        try:
+            await ensure_indexes(db_instance.db)
+        except Exception as e:
+            logger.error(f"❌ Erro ao garantir índices: {e}")
+    if db_instance.db is not None:
+        # The repositories read the legacy layout until migration 4 is applied (by this
+        # node or another one), see app/db/migrations.py.
+        try:
+            await migrations.load_applied(db_instance.db)
+        except Exception as e:
+            logger.error(f"❌ Erro ao consultar migrações aplicadas: {e}")
+        background_tasks.add(asyncio.create_task(migrations.refresh_periodically(get_db, settings.MIGRATION_STATUS_REFRESH_SECONDS)))
+    if db_instance.db is not None and settings.MIGRATIONS_ON_STARTUP == "blocking":
+        try:
+            await migrations.migrate(db_instance.db)
+        except Exception as e:
+            logger.error(f"❌ Erro ao aplicar migrações: {e}")
+    elif db_instance.db is not None and settings.MIGRATIONS_ON_STARTUP == "background":
+        await migrations.submit_migrate(db_instance.db)
+    if settings.STATS_RECONCILE_INTERVAL_SECONDS > 0:
+        background_tasks.add(asyncio.create_task(reconcile_periodically(get_db, settings.STATS_RECONCILE_INTERVAL_SECONDS)))
+    if settings.RETENTION_SWEEP_INTERVAL_SECONDS > 0:
+        background_tasks.add(asyncio.create_task(sweep_periodically(get_db, settings.RETENTION_SWEEP_INTERVAL_SECONDS)))
+    if settings.ANALYTICS_REFRESH_INTERVAL_SECONDS > 0:
+        background_tasks.add(asyncio.create_task(refresh_periodically(lambda: get_db("analytics"), settings.ANALYTICS_REFRESH_INTERVAL_SECONDS)))
+    broadcaster = create_broadcaster()
+    if broadcaster is not None:
+        background_tasks.add(asyncio.create_task(broadcaster.run()))
+    if settings.ADMIN_METRICS_INTERVAL_SECONDS > 0:
+        background_tasks.add(asyncio.create_task(push_admin_metrics(settings.ADMIN_METRICS_INTERVAL_SECONDS)))
 
 @fastapi_app.on_event("shutdown")
 async def shutdown_event():
+    for task in background_tasks: task.cancel()
     await db_instance.disconnect()
 
 # Include routers
@@ -66,6 +107,11 @@ fastapi_app.include_router(tasks.router, prefix="/api")
 fastapi_app.include_router(actions.router, prefix="/api")
 fastapi_app.include_router(admin.router, prefix="/api")
 fastapi_app.include_router(users.router, prefix="/api")
+fastapi_app.include_router(session.router, prefix="/api")
+fastapi_app.include_router(export.router, prefix="/api")
+fastapi_app.include_router(templates.router, prefix="/api")
+fastapi_app.include_router(analytics.router, prefix="/api")
+fastapi_app.include_router(search.router, prefix="/api")
 
 @fastapi_app.get("/api/fibonacci")
 async def get_fibonacci():
@@ -36,6 +36,13 @@ class AuthGoogle(BaseModel):
 class GuestAuth(BaseModel): 
     name: str
 
+class SessionBootstrap(BaseModel):
+    room_id: str
+    name: str
+    picture: Optional[str] = None
+    is_spectator: bool = False
+    credential: Optional[str] = None
+
 class ActionBase(BaseModel):
     room_id: str
     user_id: str
@@ -54,6 +61,14 @@ class ActionKick(ActionBase): target_user_id: str
 class ActionTimer(ActionBase): duration_seconds: int
 class ActionReorder(ActionBase): task_ids: List[str]
 
+class BatchActionItem(BaseModel):
+    action: str
+    params: Dict[str, Any] = {}
+
+class ActionBatch(ActionBase):
+    actions: List[BatchActionItem]
+    stop_on_error: bool = False
+
 class BatchDeleteRequest(BaseModel):
     ids: List[str]
     confirm: bool = False
@@ -73,6 +88,33 @@ class Room(BaseModel):
     deck_values: List[str] = [str(v) for v in FIBONACCI_VALUES]
     timer_end: Optional[str] = None
 
+class TemplateTask(BaseModel):
+    title: str
+    description: str = ""
+    external_id: Optional[str] = None
+
+class RoomTemplateCreate(BaseModel):
+    name: str
+    deck_type: str = "FIBONACCI"
+    custom_deck: Optional[str] = None
+    tasks: List[TemplateTask] = []
+
+class RoomTemplate(BaseModel):
+    model_config = ConfigDict(extra="ignore")
+    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    name: str
+    owner_id: str
+    deck_type: str = "FIBONACCI"
+    custom_deck: Optional[str] = None
+    deck_values: List[str] = [str(v) for v in FIBONACCI_VALUES]
+    tasks: List[TemplateTask] = []
+    created_at: str = Field(default_factory=lambda: datetime.now(timezone.utc).isoformat())
+
+class RoomProvision(BaseModel):
+    count: int = Field(1, ge=1, le=100)
+    name_prefix: Optional[str] = None
+    names: Optional[List[str]] = Field(None, min_length=1, max_length=100)
+
 class User(BaseModel):
     model_config = ConfigDict(extra="ignore")
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
@@ -94,7 +136,12 @@ class Task(BaseModel):
     status: TaskStatus = TaskStatus.PENDING
     final_score: Optional[str] = None
     votes_summary: List[Dict[str, Any]] = []
+    statistics: Optional[Dict[str, Any]] = None
     position: int = 0
+    rounds: int = 0
+    external_id: Optional[str] = None
+    created_at: str = Field(default_factory=lambda: datetime.now(timezone.utc).isoformat())
+    completed_at: Optional[str] = None
 
 class Vote(BaseModel):
     model_config = ConfigDict(extra="ignore")
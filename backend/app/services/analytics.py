@@ -0,0 +1,292 @@
+import asyncio
+import logging
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.core.config import settings
+from app.models.domain import TaskStatus, FIBONACCI_VALUES
+from app.services.archive import iter_archived_payloads
+from app.services.jobs import Job, runner
+from app.services.statistics import deck_scale
+
+logger = logging.getLogger(__name__)
+
+# Estimation analytics, computed by a background job and stored as precomputed reports
+# in `analytics_reports` (one per scope: "global" or "owner:<user_id>"), so reading a
+# report is a single find_one. Completed tasks are streamed in ANALYTICS_BATCH_SIZE
+# batches, each batch is turned into columnar NumPy arrays and reduced with vectorized
+# operations to a mergeable partial aggregate; with ANALYTICS_WORKERS > 0 the
+# reductions run in a process pool while the next batch is being read. Archived rooms
+# are decoded from their cold copies after the live tasks.
+
+_pool: Optional[ProcessPoolExecutor] = None
+
+def _get_pool() -> Optional[ProcessPoolExecutor]:
+    global _pool
+    if settings.ANALYTICS_WORKERS <= 0: return None
+    if _pool is None: _pool = ProcessPoolExecutor(max_workers=settings.ANALYTICS_WORKERS)
+    return _pool
+
+def scope_key(owner_id: Optional[str] = None) -> str:
+    return f"owner:{owner_id}" if owner_id else "global"
+
+def tasks_pipeline(match: Dict[str, Any], last_id: Any, batch_size: int) -> List[Dict[str, Any]]:
+    stages: List[Dict[str, Any]] = [{"$match": match}]
+    if last_id is not None: stages.append({"$match": {"_id": {"$gt": last_id}}})
+    return stages + [
+        {"$sort": {"_id": 1}},
+        {"$limit": batch_size},
+        # The room lookup runs after the limit, so it costs one indexed probe per task in the batch.
+        {"$lookup": {
+            "from": "rooms",
+            "localField": "room_id",
+            "foreignField": "_id",
+            "pipeline": [{"$project": {"_id": 0, "deck_type": 1, "deck_values": 1}}],
+            "as": "room"
+        }},
+        {"$project": {
+            "_id": 1,
+            "final_score": 1,
+            "rounds": 1,
+            "votes": "$votes_summary.value",
+            "room": {"$first": "$room"}
+        }}
+    ]
+
+async def iter_task_batches(db, match: Dict[str, Any]):
+    batch_size = settings.ANALYTICS_BATCH_SIZE
+    last_id = None
+    while True:
+        docs = await db.tasks.aggregate(tasks_pipeline(match, last_id, batch_size)).to_list(batch_size)
+        if not docs: return
+        last_id = docs[-1]["_id"]
+        yield docs
+        if len(docs) < batch_size: return
+
+async def iter_archived_batches(db, owner_id: Optional[str] = None):
+    """Completed tasks of the archived rooms in the shape of tasks_pipeline, so cold rooms
+    count in the reports without being rehydrated."""
+    batch_size = settings.ANALYTICS_BATCH_SIZE
+    batch: List[Dict[str, Any]] = []
+    async for payload in iter_archived_payloads(db, {"owner_id": owner_id} if owner_id else {}):
+        room = {k: payload["room"].get(k) for k in ("deck_type", "deck_values")}
+        for task in payload["tasks"]:
+            if task.get("status") != TaskStatus.COMPLETED: continue
+            batch.append({
+                "_id": task.get("id"),
+                "final_score": task.get("final_score"),
+                "rounds": task.get("rounds"),
+                "votes": [v.get("value") for v in task.get("votes_summary") or []],
+                "room": room
+            })
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+    if batch: yield batch
+
+async def _report_batches(db, match: Dict[str, Any], owner_id: Optional[str]):
+    async for docs in iter_task_batches(db, match): yield docs
+    async for docs in iter_archived_batches(db, owner_id): yield docs
+
+def to_columns(docs: Sequence[Dict[str, Any]]) -> Dict[str, Any]:
+    """Flattens a batch of tasks into columnar arrays (one row per task, one per vote).
+
+    Decks are grouped by deck_type; cards are mapped to their point on the room's deck
+    scale (see services/statistics.py), so spreads are comparable within a deck type."""
+    decks: List[str] = []
+    deck_index: Dict[str, int] = {}
+    cards: List[str] = []
+    card_index: Dict[str, int] = {}
+    scales: Dict[Tuple[str, ...], Dict[str, float]] = {}
+
+    def code(label: str, labels: List[str], index: Dict[str, int]) -> int:
+        if label not in index:
+            index[label] = len(labels)
+            labels.append(label)
+        return index[label]
+
+    n_votes = sum(len(d.get("votes") or []) for d in docs)
+    t_deck = np.empty(len(docs), dtype=np.int32)
+    t_rounds = np.empty(len(docs), dtype=np.int32)
+    t_final_pos = np.full(len(docs), np.nan)
+    t_final_card = np.full(len(docs), -1, dtype=np.int32)
+    v_task = np.empty(n_votes, dtype=np.int32)
+    v_card = np.empty(n_votes, dtype=np.int32)
+    v_pos = np.full(n_votes, np.nan)
+
+    row = 0
+    for i, doc in enumerate(docs):
+        room = doc.get("room") or {}
+        deck_values = tuple(str(v) for v in room.get("deck_values") or FIBONACCI_VALUES)
+        scale = scales.get(deck_values)
+        if scale is None: scale = scales[deck_values] = deck_scale(deck_values)[1]
+
+        t_deck[i] = code(room.get("deck_type") or "FIBONACCI", decks, deck_index)
+        t_rounds[i] = max(int(doc.get("rounds") or 1), 1)
+        final = doc.get("final_score")
+        if final is not None:
+            final = str(final)
+            t_final_card[i] = code(final, cards, card_index)
+            t_final_pos[i] = scale.get(final, np.nan)
+
+        for value in doc.get("votes") or []:
+            value = str(value)
+            v_task[row] = i
+            v_card[row] = code(value, cards, card_index)
+            v_pos[row] = scale.get(value, np.nan)
+            row += 1
+
+    return {
+        "decks": decks, "cards": cards,
+        "t_deck": t_deck, "t_rounds": t_rounds, "t_final_pos": t_final_pos, "t_final_card": t_final_card,
+        "v_task": v_task, "v_card": v_card, "v_pos": v_pos
+    }
+
+def aggregate_columns(columns: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+    """Reduces one batch to per-deck sums and counts. Runs in the process pool when enabled."""
+    decks, cards = columns["decks"], columns["cards"]
+    t_deck, t_rounds = columns["t_deck"], columns["t_rounds"]
+    t_final_pos, t_final_card = columns["t_final_pos"], columns["t_final_card"]
+    v_task, v_card, v_pos = columns["v_task"], columns["v_card"], columns["v_pos"]
+    n_decks, n_tasks = len(decks), t_deck.size
+    v_deck = t_deck[v_task]
+
+    # Consensus: every estimable vote of the task lands on the same point of the scale.
+    estimable = ~np.isnan(v_pos)
+    lo = np.full(n_tasks, np.inf)
+    hi = np.full(n_tasks, -np.inf)
+    np.minimum.at(lo, v_task[estimable], v_pos[estimable])
+    np.maximum.at(hi, v_task[estimable], v_pos[estimable])
+    consensus = np.isfinite(lo) & (lo == hi)
+
+    # Spread: distance between each vote and the task's final score, in scale steps.
+    deviation = np.abs(v_pos - t_final_pos[v_task])
+    measured = ~np.isnan(deviation)
+    hits = v_card == t_final_card[v_task]
+
+    tasks = np.bincount(t_deck, minlength=n_decks)
+    consensus_n = np.bincount(t_deck, weights=consensus, minlength=n_decks)
+    rounds_sum = np.bincount(t_deck, weights=t_rounds, minlength=n_decks)
+    votes = np.bincount(v_deck, minlength=n_decks)
+    deviation_sum = np.bincount(v_deck[measured], weights=deviation[measured], minlength=n_decks)
+    deviation_n = np.bincount(v_deck[measured], minlength=n_decks)
+    hits_n = np.bincount(v_deck, weights=hits, minlength=n_decks)
+    # (deck, card) and (deck, rounds) histograms via a single unique() over combined codes.
+    n_cards = max(len(cards), 1)
+    round_base = int(t_rounds.max(initial=1)) + 1
+    pairs, pair_counts = np.unique(v_deck.astype(np.int64) * n_cards + v_card, return_counts=True)
+    round_pairs, round_counts = np.unique(t_deck.astype(np.int64) * round_base + t_rounds, return_counts=True)
+
+    partial: Dict[str, Dict[str, Any]] = {
+        deck: {
+            "tasks": int(tasks[d]),
+            "consensus": int(consensus_n[d]),
+            "rounds_sum": int(rounds_sum[d]),
+            "votes": int(votes[d]),
+            "deviation_sum": float(deviation_sum[d]),
+            "deviation_n": int(deviation_n[d]),
+            "hits": int(hits_n[d]),
+            "cards": Counter(),
+            "rounds": Counter()
+        } for d, deck in enumerate(decks)
+    }
+    for pair, count in zip(pairs.tolist(), pair_counts.tolist()):
+        d, c = divmod(pair, n_cards)
+        partial[decks[d]]["cards"][cards[c]] += count
+    for pair, count in zip(round_pairs.tolist(), round_counts.tolist()):
+        d, r = divmod(pair, round_base)
+        partial[decks[d]]["rounds"][r] += count
+    return partial
+
+def merge(total: Dict[str, Dict[str, Any]], partial: Dict[str, Dict[str, Any]]):
+    for deck, sums in partial.items():
+        acc = total.setdefault(deck, {k: (Counter() if isinstance(v, Counter) else 0) for k, v in sums.items()})
+        for key, value in sums.items():
+            if isinstance(value, Counter): acc[key].update(value)
+            else: acc[key] += value
+
+def _ratio(a: float, b: float) -> Optional[float]:
+    return round(a / b, 4) if b else None
+
+def finalize(total: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+    decks = {}
+    for deck, s in sorted(total.items()):
+        decks[deck] = {
+            "tasks": s["tasks"],
+            "votes": s["votes"],
+            "distribution": [{"card": card, "count": n} for card, n in s["cards"].most_common()],
+            "consensus_rate": _ratio(s["consensus"], s["tasks"]),
+            "rounds": {
+                "mean": _ratio(s["rounds_sum"], s["tasks"]),
+                "distribution": [{"rounds": r, "tasks": n} for r, n in sorted(s["rounds"].items())]
+            },
+            "vote_spread": {
+                "mean_abs_deviation": _ratio(s["deviation_sum"], s["deviation_n"]),
+                "exact_match_rate": _ratio(s["hits"], s["votes"])
+            }
+        }
+    tasks = sum(s["tasks"] for s in total.values())
+    return {
+        "tasks": tasks,
+        "votes": sum(s["votes"] for s in total.values()),
+        "consensus_rate": _ratio(sum(s["consensus"] for s in total.values()), tasks),
+        "rounds_mean": _ratio(sum(s["rounds_sum"] for s in total.values()), tasks),
+        "decks": decks
+    }
+
+async def build_report(db, job: Job, owner_id: Optional[str] = None) -> Dict[str, Any]:
+    started = time.perf_counter()
+    match: Dict[str, Any] = {"status": TaskStatus.COMPLETED}
+    if owner_id:
+        match["room_id"] = {"$in": await db.rooms.distinct("id", {"owner_id": owner_id})}
+
+    pool = _get_pool()
+    loop = asyncio.get_running_loop()
+    total: Dict[str, Dict[str, Any]] = {}
+    pending: List[asyncio.Future] = []
+    scanned = 0
+    async for docs in _report_batches(db, match, owner_id):
+        columns = to_columns(docs)
+        if pool is None:
+            merge(total, aggregate_columns(columns))
+        else:
+            pending.append(loop.run_in_executor(pool, aggregate_columns, columns))
+            if len(pending) >= settings.ANALYTICS_WORKERS * 2:
+                merge(total, await pending.pop(0))
+        scanned += len(docs)
+        await job.report(tasks_scanned=scanned)
+        await job.checkpoint()
+    for future in pending: merge(total, await future)
+
+    scope = scope_key(owner_id)
+    report = {
+        "scope": scope,
+        "generated_at": datetime.now(timezone.utc).isoformat(),
+        "duration_ms": round((time.perf_counter() - started) * 1000, 1),
+        "job_id": job.id,
+        **finalize(total)
+    }
+    await db.analytics_reports.replace_one({"scope": scope}, dict(report), upsert=True)
+    logger.info(f"📊 Relatório de estimativas {scope}: {scanned} tarefas em {report['duration_ms']} ms")
+    return {"scope": scope, "tasks": report["tasks"], "duration_ms": report["duration_ms"]}
+
+async def submit_report(db, owner_id: Optional[str] = None) -> Dict[str, Any]:
+    return await runner.submit("analytics_report", {"scope": scope_key(owner_id)}, lambda job: build_report(db, job, owner_id))
+
+async def get_report(db, owner_id: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    return await db.analytics_reports.find_one({"scope": scope_key(owner_id)}, {"_id": 0})
+
+async def refresh_periodically(get_db, interval_seconds: float):
+    while True:
+        await asyncio.sleep(interval_seconds)
+        db = get_db()
+        if db is None: continue
+        try:
+            await submit_report(db)
+        except Exception as e:
+            logger.error(f"❌ Erro ao agendar relatório de estimativas: {e}")
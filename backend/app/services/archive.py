@@ -0,0 +1,183 @@
+import asyncio
+import logging
+import zlib
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from typing import Any, AsyncIterator, Dict, List, Optional
+from bson import Binary, json_util
+
+from app.db import migrations
+from app.db.repositories import join_member, keyed, require_normalized_layout
+from app.services import counters, room_views, user_directory
+from app.services.authz import get_membership, invalidate_room
+
+try:
+    import zstandard
+except ImportError:  # optional dependency, zlib is always available
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+# Cold storage for inactive rooms: the room, its tasks, votes and members (memberships
+# joined with their profiles) are packed into a single compressed document in
+# `archived_rooms` and removed from the hot collections. The archive keeps a few plain fields (owner, name, members) so the room
+# lists can show it without decompressing; opening the room rehydrates it.
+
+CODEC = "zstd" if zstandard is not None else "zlib"
+REHYDRATE_CLAIM_SECONDS = 60
+
+_locks: Dict[str, asyncio.Lock] = {}
+
+def compress(data: bytes) -> bytes:
+    if CODEC == "zstd": return zstandard.ZstdCompressor(level=10).compress(data)
+    return zlib.compress(data, 9)
+
+def decompress(data: bytes, codec: str) -> bytes:
+    if codec == "zstd":
+        if zstandard is None: raise RuntimeError("zstandard is required to open this archive")
+        return zstandard.ZstdDecompressor().decompress(data)
+    return zlib.decompress(data)
+
+def _strip_ids(docs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    return [{k: v for k, v in d.items() if k != "_id"} for d in docs]
+
+def _counter_deltas(payload: Dict[str, Any], sign: int) -> Dict[str, Dict[str, int]]:
+    room = payload["room"]
+    deltas: Dict[str, Dict[str, int]] = {
+        counters.room_key(room["id"]): {"tasks_count": sign * len(payload["tasks"]), "members_count": sign * len(payload["users"])}
+    }
+    if room.get("owner_id"):
+        deltas[counters.user_key(room["owner_id"])] = {"rooms_owned": sign}
+    for user_id, n in Counter(v["user_id"] for v in payload["votes"]).items():
+        deltas.setdefault(counters.user_key(user_id), {})["votes_cast"] = sign * n
+    return deltas
+
+async def _room_members(db, room_id: str) -> List[Dict[str, Any]]:
+    memberships = await db.memberships.find({"room_id": room_id}).to_list(None)
+    user_ids = [m["user_id"] for m in memberships]
+    profiles = {p["_id"]: p for p in await db.profiles.find({"_id": {"$in": user_ids}}).to_list(None)} if user_ids else {}
+    return [join_member(m, profiles.get(m["user_id"])) for m in memberships]
+
+async def archive_room(db, room_id: str) -> Optional[Dict[str, int]]:
+    require_normalized_layout()
+    room = await db.rooms.find_one({"_id": room_id})
+    if not room: return None
+    tasks = await db.tasks.find({"room_id": room_id}).to_list(None)
+    task_ids = [t["id"] for t in tasks]
+    votes = await db.votes.find({"task_id": {"$in": task_ids}}).to_list(None) if task_ids else []
+    # Archives keep members in the API shape; profiles stay hot (they are shared by rooms).
+    users = await _room_members(db, room_id)
+
+    payload = {"room": _strip_ids([room])[0], "tasks": _strip_ids(tasks), "votes": _strip_ids(votes), "users": _strip_ids(users)}
+    raw = json_util.dumps(payload).encode()
+    packed = compress(raw)
+    await db.archived_rooms.replace_one({"id": room_id}, {
+        "id": room_id,
+        "name": room.get("name"),
+        "owner_id": room.get("owner_id"),
+        "created_at": room.get("created_at"),
+        "deck_type": room.get("deck_type"),
+        "members": [{"id": u["id"], "joined_at": u.get("joined_at")} for u in users],
+        "archived_at": datetime.now(timezone.utc).isoformat(),
+        "codec": CODEC,
+        "payload": Binary(packed),
+        "raw_size": len(raw),
+        "counts": {"tasks": len(tasks), "votes": len(votes), "users": len(users)}
+    }, upsert=True)
+
+    # The archive is written before anything is removed, so a failure below leaves the
+    # room hot (and archivable again) rather than lost.
+    if task_ids: await db.votes.delete_many({"task_id": {"$in": task_ids}})
+    await db.tasks.delete_many({"room_id": room_id})
+    await db.memberships.delete_many({"room_id": room_id})
+    await db.rooms.delete_one({"_id": room_id})
+    await room_views.drop(db, room_id)
+    invalidate_room(room_id)
+    await counters.bump_many(db, _counter_deltas(payload, -1))
+
+    logger.info(f"🧊 Sala {room_id} arquivada: {len(raw)} → {len(packed)} bytes ({CODEC})")
+    return {"tasks": len(tasks), "votes": len(votes), "users": len(users), "raw_size": len(raw), "stored_size": len(packed)}
+
+async def _rehydrate(db, room_id: str) -> Optional[Dict[str, Any]]:
+    room = await db.rooms.find_one({"_id": room_id}, {"_id": 0})
+    if room: return room  # rehydrated by a concurrent request
+
+    # Claiming the archive keeps two nodes from restoring it at the same time; a claim
+    # left behind by a crashed node expires after REHYDRATE_CLAIM_SECONDS.
+    now = datetime.now(timezone.utc)
+    archived = await db.archived_rooms.find_one_and_update(
+        {"id": room_id, "$or": [
+            {"rehydrating_at": {"$exists": False}},
+            {"rehydrating_at": {"$lt": now - timedelta(seconds=REHYDRATE_CLAIM_SECONDS)}}
+        ]},
+        {"$set": {"rehydrating_at": now}}
+    )
+    if not archived: return None
+
+    payload = json_util.loads(decompress(archived["payload"], archived["codec"]))
+    # Archives keep the schema of the day they were written.
+    migrations.upgrade("rooms", [payload["room"]])
+    for collection in ("tasks", "votes", "users"): migrations.upgrade(collection, payload[collection])
+    if payload["tasks"]: await db.tasks.insert_many([keyed("tasks", t) for t in payload["tasks"]], ordered=False)
+    if payload["votes"]: await db.votes.insert_many([keyed("votes", v) for v in payload["votes"]], ordered=False)
+    await migrations.write_members(db, payload["users"])
+    await user_directory.refresh(db, [u["id"] for u in payload["users"]])
+    await db.rooms.insert_one(keyed("rooms", payload["room"]))
+    await db.archived_rooms.delete_one({"id": room_id})
+    await counters.bump_many(db, _counter_deltas(payload, 1))
+
+    logger.info(f"🔥 Sala {room_id} reidratada do arquivo")
+    return payload["room"]
+
+async def iter_archived_payloads(db, query: Dict[str, Any]) -> AsyncIterator[Dict[str, Any]]:
+    """Decoded payloads of the archives matching `query`, one at a time and without
+    rehydrating them, for the readers that report on history (export, analytics)."""
+    async for archived in db.archived_rooms.find(query, {"_id": 0, "payload": 1, "codec": 1}):
+        payload = json_util.loads(decompress(archived["payload"], archived["codec"]))
+        migrations.upgrade("rooms", [payload["room"]])
+        migrations.upgrade("tasks", payload["tasks"])
+        yield payload
+
+async def rehydrate_room(db, room_id: str) -> Optional[Dict[str, Any]]:
+    """Moves an archived room back into the hot collections and returns the room document."""
+    lock = _locks.setdefault(room_id, asyncio.Lock())
+    try:
+        async with lock:
+            return await _rehydrate(db, room_id)
+    finally:
+        if not lock.locked(): _locks.pop(room_id, None)
+
+async def get_membership_or_rehydrate(db, user_id: str, room_id: str) -> Optional[Dict[str, Any]]:
+    membership = await get_membership(user_id, room_id)
+    if membership is None and db is not None and await rehydrate_room(db, room_id):
+        membership = await get_membership(user_id, room_id)
+    return membership
+
+def _summary(archived: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "id": archived["id"],
+        "name": archived.get("name"),
+        "owner_id": archived.get("owner_id"),
+        "created_at": archived.get("created_at"),
+        "deck_type": archived.get("deck_type"),
+        "archived": True
+    }
+
+async def list_owned(db, user_id: str, limit: int = 100) -> List[Dict[str, Any]]:
+    docs = await db.archived_rooms.find(
+        {"owner_id": user_id},
+        {"_id": 0, "payload": 0, "members": 0}
+    ).sort("created_at", -1).to_list(limit)
+    return [_summary(d) for d in docs]
+
+async def list_joined(db, user_id: str, limit: int = 100) -> List[Dict[str, Any]]:
+    """Archived rooms the user was a member of (not owner), with the user's joined_at."""
+    docs = await db.archived_rooms.find(
+        {"members.id": user_id, "owner_id": {"$ne": user_id}},
+        {"_id": 0, "payload": 0}
+    ).to_list(limit)
+    result = []
+    for d in docs:
+        joined_at = next((m.get("joined_at") for m in d.get("members", []) if m["id"] == user_id), None)
+        result.append({**_summary(d), "joined_at": joined_at})
+    return result
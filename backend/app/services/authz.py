@@ -0,0 +1,60 @@
+import logging
+from typing import Optional, Dict, Any, Tuple
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.db.repositories import get_repositories
+
+logger = logging.getLogger(__name__)
+
+# (user_id, room_id) -> role flags, and room_id -> deck values. Entries are
+# dropped explicitly by join/kick/merge/delete paths; the TTL is only a safety
+# net for writes made outside this process.
+membership_cache = TTLCache(settings.AUTHZ_CACHE_TTL_SECONDS, settings.AUTHZ_CACHE_MAXSIZE)
+deck_cache = TTLCache(settings.AUTHZ_CACHE_TTL_SECONDS, settings.AUTHZ_CACHE_MAXSIZE)
+
+async def get_membership(user_id: str, room_id: str) -> Optional[Dict[str, Any]]:
+    key = (user_id, room_id.upper())
+    flags = membership_cache.get(key)
+    if flags is not None: return flags
+
+    repos = get_repositories()
+    if repos is None: return None
+    user = await repos.memberships.get(user_id, key[1])
+    if not user: return None
+
+    flags = {
+        "id": user_id,
+        "room_id": key[1],
+        "is_admin": bool(user.get("is_admin")),
+        "is_spectator": bool(user.get("is_spectator"))
+    }
+    membership_cache.set(key, flags)
+    return flags
+
+async def get_room_deck(room_id: str) -> Optional[Tuple[str, ...]]:
+    room_id = room_id.upper()
+    deck = deck_cache.get(room_id)
+    if deck is not None: return deck
+
+    repos = get_repositories()
+    if repos is None: return None
+    room = await repos.rooms.get(room_id, ["deck_values"])
+    if not room: return None
+
+    deck = tuple(room["deck_values"])
+    deck_cache.set(room_id, deck)
+    return deck
+
+def invalidate_membership(user_id: str, room_id: str):
+    membership_cache.pop((user_id, room_id.upper()))
+
+def invalidate_user(user_id: str):
+    membership_cache.discard_where(lambda k: k[0] == user_id)
+
+def invalidate_room(room_id: str):
+    room_id = room_id.upper()
+    membership_cache.discard_where(lambda k: k[1] == room_id)
+    deck_cache.pop(room_id)
+
+def cache_stats() -> Dict[str, Any]:
+    return {"membership": membership_cache.stats(), "deck": deck_cache.stats()}
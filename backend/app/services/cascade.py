@@ -0,0 +1,106 @@
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional
+
+from app.core.config import settings
+from app.db.repositories import require_normalized_layout
+from app.services import counters, room_views, search, user_directory
+from app.services.authz import invalidate_room, invalidate_user
+from app.services.jobs import Job
+from app.services.socket import sio, broadcast_room_state
+
+logger = logging.getLogger(__name__)
+
+# Cascading deletions run as background jobs: every collection is emptied in chunks of
+# DELETE_BATCH_SIZE documents with a checkpoint between chunks, so a heavy user never
+# holds the event loop (or a request) for the whole cascade and a cancel takes effect
+# at the next chunk.
+
+async def delete_in_batches(
+    collection, query: Dict[str, Any], job: Job,
+    before_delete: Optional[Callable[[List[Dict[str, Any]]], Awaitable[None]]] = None,
+    fields: Iterable[str] = ()
+) -> int:
+    """Deletes the documents matching `query` one chunk at a time.
+
+    `before_delete` receives each chunk (with `fields` projected) before it is deleted."""
+    projection = {"_id": 1, **{f: 1 for f in fields}}
+    deleted = 0
+    while True:
+        docs = await collection.find(query, projection).limit(settings.DELETE_BATCH_SIZE).to_list(settings.DELETE_BATCH_SIZE)
+        if not docs: return deleted
+        if before_delete: await before_delete(docs)
+        result = await collection.delete_many({"_id": {"$in": [d["_id"] for d in docs]}})
+        deleted += result.deleted_count
+        await job.checkpoint()
+
+async def fan_out(room_ids: Iterable[str], send: Callable[[str], Awaitable[None]]):
+    """Runs `send` for every room with at most BROADCAST_CONCURRENCY in flight."""
+    semaphore = asyncio.Semaphore(settings.BROADCAST_CONCURRENCY)
+
+    async def bounded(room_id: str):
+        async with semaphore:
+            try:
+                await send(room_id)
+            except Exception as e:
+                logger.warning(f"⚠️ Falha ao notificar sala {room_id}: {e}")
+
+    await asyncio.gather(*(bounded(r_id) for r_id in room_ids))
+
+async def delete_rooms(db, room_ids: List[str], job: Job) -> Dict[str, int]:
+    require_normalized_layout()
+    totals = {"rooms": 0, "tasks": 0, "votes": 0, "memberships": 0, "archived_rooms": 0}
+
+    async def drop_votes(tasks: List[Dict[str, Any]]):
+        task_ids = [t["_id"] for t in tasks]
+        await counters.record_votes_removed(db, {"task_id": {"$in": task_ids}})
+        result = await db.votes.delete_many({"task_id": {"$in": task_ids}})
+        totals["votes"] += result.deleted_count
+
+    for index, room_id in enumerate(room_ids):
+        totals["tasks"] += await delete_in_batches(db.tasks, {"room_id": room_id}, job, before_delete=drop_votes)
+        totals["memberships"] += await delete_in_batches(db.memberships, {"room_id": room_id}, job)
+        await counters.record_rooms_removed(db, [room_id])
+        result = await db.rooms.delete_one({"_id": room_id})
+        totals["rooms"] += result.deleted_count
+        # The cold copy goes too, or opening the room would rehydrate it. Its counters
+        # were already subtracted when it was archived.
+        totals["archived_rooms"] += (await db.archived_rooms.delete_one({"id": room_id})).deleted_count
+        await room_views.drop(db, room_id)
+        invalidate_room(room_id)
+        search.invalidate_room(room_id)
+        await sio.emit('room_deleted', {"room_id": room_id}, room=room_id)
+        await job.report(deleted=dict(totals), rooms_remaining=len(room_ids) - index - 1)
+
+    return totals
+
+async def delete_users(db, user_ids: List[str], job: Job) -> Dict[str, Any]:
+    require_normalized_layout()
+    owned_room_ids = await db.rooms.distinct("_id", {"owner_id": {"$in": user_ids}})
+    owned_room_ids += [r for r in await db.archived_rooms.distinct("id", {"owner_id": {"$in": user_ids}}) if r not in owned_room_ids]
+    affected_rooms = set(await db.memberships.distinct("room_id", {"user_id": {"$in": user_ids}})) - set(owned_room_ids)
+    await job.report(phase="rooms", rooms_total=len(owned_room_ids))
+
+    totals = await delete_rooms(db, owned_room_ids, job)
+
+    await job.report(phase="votes")
+    totals["votes"] += await delete_in_batches(db.votes, {"user_id": {"$in": user_ids}}, job)
+
+    await job.report(phase="memberships")
+    member_groups = await db.memberships.aggregate([
+        {"$match": {"user_id": {"$in": user_ids}}},
+        {"$group": {"_id": "$room_id", "n": {"$sum": 1}}}
+    ]).to_list(None)
+    await counters.bump_many(db, {counters.room_key(g["_id"]): {"members_count": -g["n"]} for g in member_groups})
+    totals["memberships"] += await delete_in_batches(db.memberships, {"user_id": {"$in": user_ids}}, job)
+    totals["profiles"] = (await db.profiles.delete_many({"_id": {"$in": user_ids}})).deleted_count
+
+    result = await db.global_users.delete_many({"id": {"$in": user_ids}})
+    totals["users"] = result.deleted_count
+    for u_id in user_ids: invalidate_user(u_id)
+    await counters.drop(db, [counters.user_key(u_id) for u_id in user_ids])
+    await user_directory.refresh(db, user_ids)
+
+    await job.report(phase="broadcast", deleted=dict(totals))
+    await fan_out(affected_rooms, broadcast_room_state)
+    return {"deleted": totals, "affected_rooms": len(affected_rooms)}
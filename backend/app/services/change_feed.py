@@ -0,0 +1,167 @@
+import asyncio
+import logging
+from typing import Any, AsyncIterator, Dict, Optional, Set, Tuple
+
+from pymongo.errors import OperationFailure, PyMongoError
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.db.repositories import Repositories, get_repositories
+from app.services import socket, room_views
+
+logger = logging.getLogger(__name__)
+
+# Storage changes -> per-room "dirty" notifications. A feed yields (collection, document)
+# pairs for every write to the realtime collections, whoever made it (this node, another
+# node, an admin endpoint or a script like check_db.py). The broadcaster maps them to
+# rooms, coalesces bursts and rebuilds the state of the dirty rooms that have sockets on
+# this node; rooms whose state did not change since the last push are skipped, so the
+# explicit broadcasts of the write paths are not sent twice. With the room_views projection
+# (services/room_views.py), projector nodes rebuild the views of changed rooms and every
+# node pushes a view when it changes, so remote nodes never rebuild state themselves.
+#   - MongoChangeFeed: a database change stream (requires a replica set);
+#   - MemoryChangeFeed: hooks on the in-memory storage engine, also used by tests.
+
+# `users` holds the memberships of the legacy layout (see app/db/migrations.py).
+WATCHED = ("rooms", "users", "memberships", "tasks", "votes", "room_views")
+# $changeStream on a standalone server / a server without change stream support.
+UNSUPPORTED_CODES = {40573, 40324}
+
+Change = Tuple[str, Dict[str, Any]]
+
+class ChangeFeedUnavailable(Exception):
+    pass
+
+class MemoryChangeFeed:
+    def __init__(self, repos: Optional[Repositories] = None):
+        self.queue: "asyncio.Queue[Change]" = asyncio.Queue()
+        if repos is not None:
+            for collection, repo in (("rooms", repos.rooms), ("memberships", repos.memberships), ("tasks", repos.tasks), ("votes", repos.votes)):
+                repo.table.listeners.append(lambda doc, c=collection: self.publish(c, doc))
+
+    def publish(self, collection: str, doc: Dict[str, Any]):
+        self.queue.put_nowait((collection, {k: doc.get(k) for k in ("_id", "id", "room_id", "task_id")}))
+
+    async def changes(self) -> AsyncIterator[Change]:
+        while True:
+            yield await self.queue.get()
+
+class MongoChangeFeed:
+    def __init__(self, db):
+        self.db = db
+        self.resume_token = None
+
+    async def changes(self) -> AsyncIterator[Change]:
+        pipeline = [
+            {"$match": {"ns.coll": {"$in": list(WATCHED)}, "operationType": {"$in": ["insert", "update", "replace", "delete"]}}},
+            # Only the room id of a view is needed; readers fetch the state with find_one.
+            {"$project": {f"{doc}.{field}": 0 for doc in ("fullDocument", "fullDocumentBeforeChange") for field in ("state", "hidden_votes")}}
+        ]
+        options: Dict[str, Any] = {"full_document": "updateLookup"}
+        # Pre-images (MongoDB 6+, changeStreamPreAndPostImages enabled on the collections)
+        # resolve deletes of documents this node has not seen change before.
+        if settings.CHANGE_FEED_PRE_IMAGES: options["full_document_before_change"] = "whenAvailable"
+        while True:
+            try:
+                async with self.db.watch(pipeline, resume_after=self.resume_token, **options) as stream:
+                    logger.info("🛰️ Change stream aberto")
+                    async for change in stream:
+                        self.resume_token = stream.resume_token
+                        doc = change.get("fullDocument") or change.get("fullDocumentBeforeChange") or change["documentKey"]
+                        yield change["ns"]["coll"], doc
+            except OperationFailure as e:
+                if e.code in UNSUPPORTED_CODES: raise ChangeFeedUnavailable(str(e))
+                logger.warning(f"⚠️ Change stream interrompido: {e}")
+                if e.code == 286: self.resume_token = None  # ChangeStreamHistoryLost
+                await asyncio.sleep(settings.CHANGE_FEED_RETRY_SECONDS)
+            except PyMongoError as e:
+                logger.warning(f"⚠️ Change stream interrompido: {e}")
+                await asyncio.sleep(settings.CHANGE_FEED_RETRY_SECONDS)
+
+class RoomResolver:
+    """Maps changed documents to room ids. Votes only carry task_id, so they are resolved
+    through the task. Deletes only carry the key: membership and vote keys start with the
+    room and task ids, other deletes are resolved from earlier changes."""
+
+    def __init__(self, repos: Repositories):
+        self.repos = repos
+        self.task_rooms = TTLCache(settings.CHANGE_FEED_CACHE_TTL_SECONDS, settings.CHANGE_FEED_CACHE_MAXSIZE)
+        self.doc_rooms = TTLCache(settings.CHANGE_FEED_CACHE_TTL_SECONDS, settings.CHANGE_FEED_CACHE_MAXSIZE)
+
+    async def room_of(self, collection: str, doc: Dict[str, Any]) -> Optional[str]:
+        room_id = None
+        # ObjectId keys belong to documents written before the layout migration.
+        key = doc.get("_id") if isinstance(doc.get("_id"), str) else None
+        if collection == "room_views":
+            room_id = key
+        elif collection == "rooms":
+            room_id = doc.get("id") or key
+        elif collection in ("users", "memberships", "tasks"):
+            room_id = doc.get("room_id")
+            if room_id is None and collection == "memberships" and key: room_id = key.split(":", 1)[0]
+            task_id = doc.get("id") or key
+            if collection == "tasks" and room_id and task_id: self.task_rooms.set(task_id, room_id)
+        elif collection == "votes":
+            task_id = doc.get("task_id") or (key.split(":", 1)[0] if key else None)
+            if task_id: room_id = self.task_rooms.get(task_id)
+            if task_id and room_id is None:
+                task = await self.repos.tasks.get(task_id)
+                room_id = task.get("room_id") if task else None
+                if room_id: self.task_rooms.set(task_id, room_id)
+
+        key = (collection, doc.get("_id"))
+        if room_id and key[1] is not None: self.doc_rooms.set(key, room_id)
+        elif key[1] is not None: room_id = self.doc_rooms.get(key)
+        return room_id.upper() if room_id else None
+
+class Broadcaster:
+    def __init__(self, feed, resolver: RoomResolver):
+        self.feed = feed
+        self.resolver = resolver
+        self.dirty: Set[str] = set()
+        self.views_changed: Set[str] = set()
+        self.wakeup = asyncio.Event()
+
+    async def flush(self) -> Set[str]:
+        """Projects the rooms whose data changed (on projector nodes) and pushes the changed
+        rooms with local sockets. Returns the rooms actually broadcast."""
+        dirty, self.dirty = self.dirty, set()
+        views_changed, self.views_changed = self.views_changed, set()
+        project = settings.ROOM_VIEWS_PROJECTOR and room_views.enabled(self.resolver.repos.db)
+        local = socket.local_rooms()
+        sent = set()
+        for room_id in dirty | views_changed:
+            try:
+                if project and room_id in dirty: await socket.project_room(room_id)
+                if room_id in local and await socket.broadcast_if_changed(room_id): sent.add(room_id)
+            except Exception as e:
+                logger.error(f"❌ Erro ao transmitir alteração da sala {room_id}: {e}")
+        return sent
+
+    async def _flush_loop(self):
+        while True:
+            await self.wakeup.wait()
+            # Coalesces the burst of changes of a single action (room + tasks + votes).
+            await asyncio.sleep(settings.CHANGE_FEED_DEBOUNCE_SECONDS)
+            self.wakeup.clear()
+            await self.flush()
+
+    async def run(self):
+        flusher = asyncio.create_task(self._flush_loop())
+        try:
+            async for collection, doc in self.feed.changes():
+                room_id = await self.resolver.room_of(collection, doc)
+                if room_id is None: continue
+                (self.views_changed if collection == "room_views" else self.dirty).add(room_id)
+                self.wakeup.set()
+        except ChangeFeedUnavailable as e:
+            logger.warning(f"⚠️ Change streams indisponíveis, apenas broadcasts locais: {e}")
+        finally:
+            flusher.cancel()
+
+def create_broadcaster() -> Optional[Broadcaster]:
+    if settings.CHANGE_FEED == "off": return None
+    repos = get_repositories()
+    if repos is None: return None
+    feed = MemoryChangeFeed(repos) if repos.db is None else MongoChangeFeed(repos.db)
+    return Broadcaster(feed, RoomResolver(repos))
@@ -0,0 +1,149 @@
+import asyncio
+import logging
+from collections import defaultdict
+from typing import Dict, Any, Iterable, List
+from pymongo import UpdateOne, ReplaceOne, DeleteOne
+
+logger = logging.getLogger(__name__)
+
+# Materialized admin counters, one document per user ("user:<id>": rooms_owned,
+# votes_cast) and per room ("room:<id>": tasks_count, members_count). Write paths
+# apply $inc deltas next to their own writes; reconcile() rebuilds everything from
+# the raw collections. Counter updates are best effort: a failure is logged and never
+# fails the request, and the drift it leaves is repaired by the next reconciliation.
+
+USER_FIELDS = ("rooms_owned", "votes_cast")
+ROOM_FIELDS = ("tasks_count", "members_count")
+
+def user_key(user_id: str) -> str:
+    return f"user:{user_id}"
+
+def room_key(room_id: str) -> str:
+    return f"room:{room_id}"
+
+def _update(key: str, deltas: Dict[str, int]) -> UpdateOne:
+    kind, ref_id = key.split(":", 1)
+    return UpdateOne(
+        {"_id": key},
+        {"$inc": deltas, "$setOnInsert": {"kind": kind, "ref_id": ref_id}},
+        upsert=True
+    )
+
+async def bump_many(db, deltas: Dict[str, Dict[str, int]]):
+    if db is None: return  # in-memory storage engine: counters are MongoDB-only
+    try:
+        ops = [_update(key, fields) for key, fields in deltas.items() if any(fields.values())]
+        if ops: await db.stats.bulk_write(ops, ordered=False)
+    except Exception as e:
+        logger.warning(f"⚠️ Falha ao atualizar contadores: {e}")
+
+async def bump(db, key: str, **deltas: int):
+    await bump_many(db, {key: deltas})
+
+async def drop(db, keys: Iterable[str]):
+    keys = list(keys)
+    if db is None or not keys: return
+    try:
+        await db.stats.delete_many({"_id": {"$in": keys}})
+    except Exception as e:
+        logger.warning(f"⚠️ Falha ao remover contadores: {e}")
+
+async def record_votes_removed(db, query: Dict[str, Any]):
+    """Decrements votes_cast for the voters of the votes matching `query`.
+
+    Must run before the votes are deleted."""
+    if db is None: return
+    try:
+        groups = await db.votes.aggregate([
+            {"$match": query},
+            {"$group": {"_id": "$user_id", "n": {"$sum": 1}}}
+        ]).to_list(None)
+    except Exception as e:
+        logger.warning(f"⚠️ Falha ao contar votos removidos: {e}")
+        return
+    await bump_many(db, {user_key(g["_id"]): {"votes_cast": -g["n"]} for g in groups if g.get("_id")})
+
+def rooms_removed_pipeline(room_ids: List[str]) -> List[Dict[str, Any]]:
+    return [
+        {"$match": {"_id": {"$in": room_ids}}},
+        {"$group": {"_id": "$owner_id", "n": {"$sum": 1}}}
+    ]
+
+async def record_rooms_removed(db, room_ids: List[str]):
+    """Decrements rooms_owned for the owners of `room_ids` and drops their room counters.
+
+    Must run before the rooms are deleted."""
+    if not room_ids: return
+    try:
+        groups = await db.rooms.aggregate(rooms_removed_pipeline(room_ids)).to_list(None)
+    except Exception as e:
+        logger.warning(f"⚠️ Falha ao contar salas removidas: {e}")
+        groups = []
+    await bump_many(db, {user_key(g["_id"]): {"rooms_owned": -g["n"]} for g in groups if g.get("_id")})
+    await drop(db, [room_key(r_id) for r_id in room_ids])
+
+async def _group_counts(collection, field: str) -> Dict[str, int]:
+    pipeline = [{"$group": {"_id": f"${field}", "n": {"$sum": 1}}}]
+    return {g["_id"]: g["n"] async for g in collection.aggregate(pipeline) if g["_id"] is not None}
+
+async def compute_expected(db) -> Dict[str, Dict[str, Any]]:
+    expected: Dict[str, Dict[str, Any]] = defaultdict(dict)
+    sources = [
+        ("user", "rooms_owned", await _group_counts(db.rooms, "owner_id")),
+        ("user", "votes_cast", await _group_counts(db.votes, "user_id")),
+        ("room", "tasks_count", await _group_counts(db.tasks, "room_id")),
+        ("room", "members_count", await _group_counts(db.memberships, "room_id"))
+    ]
+    for kind, field, counts in sources:
+        for ref_id, n in counts.items():
+            expected[f"{kind}:{ref_id}"][field] = n
+
+    for key, fields in expected.items():
+        kind, ref_id = key.split(":", 1)
+        for field in (USER_FIELDS if kind == "user" else ROOM_FIELDS):
+            fields.setdefault(field, 0)
+        fields.update({"kind": kind, "ref_id": ref_id})
+    return expected
+
+async def reconcile(db, apply: bool = True, max_drift_items: int = 100) -> Dict[str, Any]:
+    """Rebuilds every counter from the raw collections and reports the drift found."""
+    expected = await compute_expected(db)
+    current = {doc["_id"]: doc async for doc in db.stats.find({})}
+
+    drift: List[Dict[str, Any]] = []
+    ops = []
+    for key, fields in expected.items():
+        stored = current.get(key, {})
+        diff = {
+            f: {"stored": stored.get(f, 0), "actual": v}
+            for f, v in fields.items() if f not in ("kind", "ref_id") and stored.get(f, 0) != v
+        }
+        if diff or key not in current:
+            ops.append(ReplaceOne({"_id": key}, fields, upsert=True))
+            if diff: drift.append({"key": key, "fields": diff})
+    stale = [key for key in current if key not in expected]
+    ops += [DeleteOne({"_id": key}) for key in stale]
+    drift += [{"key": key, "stale": True} for key in stale if any(current[key].get(f) for f in USER_FIELDS + ROOM_FIELDS)]
+
+    if apply and ops:
+        await db.stats.bulk_write(ops, ordered=False)
+
+    logger.info(f"🧮 Reconciliação de contadores: {len(expected)} documentos, {len(drift)} com divergência")
+    return {
+        "applied": apply,
+        "counters": len(expected),
+        "drifted": len(drift),
+        "written": len(ops) if apply else 0,
+        "drift": drift[:max_drift_items]
+    }
+
+async def reconcile_periodically(get_db, interval_seconds: float):
+    """Background loop: reconciles at startup (filling an empty stats collection) and then every interval."""
+    while True:
+        db = get_db()
+        if db is not None:
+            try:
+                await reconcile(db)
+            except Exception as e:
+                logger.error(f"❌ Erro na reconciliação de contadores: {e}")
+        await asyncio.sleep(interval_seconds)
@@ -0,0 +1,94 @@
+import io
+import csv
+import json
+from typing import AsyncIterator, Dict, Any, List, Optional
+
+from app.core.config import settings
+from app.services.archive import iter_archived_payloads
+
+# Rows are written as they come off the cursors and flushed in ~64KB pieces, so
+# memory stays constant no matter how much history a room or owner has.
+FLUSH_BYTES = 64 * 1024
+
+EXPORT_PROJECTION = {
+    "_id": 0, "id": 1, "room_id": 1, "external_id": 1, "title": 1, "description": 1, "status": 1,
+    "final_score": 1, "votes_summary": 1, "statistics": 1, "created_at": 1, "completed_at": 1
+}
+
+CSV_COLUMNS = [
+    "room_id", "room_name", "task_id", "external_id", "title", "description", "status", "final_score",
+    "votes", "mean", "median", "consensus", "agreement", "created_at", "completed_at"
+]
+
+def export_row(task: Dict[str, Any], room_name: Optional[str]) -> Dict[str, Any]:
+    return {
+        "room_id": task.get("room_id"),
+        "room_name": room_name,
+        "task_id": task.get("id"),
+        "external_id": task.get("external_id"),
+        "title": task.get("title"),
+        "description": task.get("description", ""),
+        "status": task.get("status"),
+        "final_score": task.get("final_score"),
+        "votes_summary": task.get("votes_summary", []),
+        "statistics": task.get("statistics"),
+        "created_at": task.get("created_at"),
+        "completed_at": task.get("completed_at")
+    }
+
+def format_ndjson(row: Dict[str, Any]) -> str:
+    return json.dumps(row, ensure_ascii=False, default=str) + "\n"
+
+def format_csv(row: Dict[str, Any]) -> str:
+    stats = row.get("statistics") or {}
+    buffer = io.StringIO()
+    csv.writer(buffer).writerow([
+        row["room_id"], row["room_name"], row["task_id"], row["external_id"], row["title"], row["description"],
+        row["status"], row["final_score"],
+        "; ".join(f"{v.get('name')}={v.get('value')}" for v in row["votes_summary"]),
+        stats.get("mean"), stats.get("median"), stats.get("consensus"), stats.get("agreement"),
+        row["created_at"], row["completed_at"]
+    ])
+    return buffer.getvalue()
+
+def csv_header() -> str:
+    buffer = io.StringIO()
+    csv.writer(buffer).writerow(CSV_COLUMNS)
+    return buffer.getvalue()
+
+async def iter_room_history(db, room_ids: List[str], room_names: Dict[str, str], status: str) -> AsyncIterator[Dict[str, Any]]:
+    cursor = db.tasks.find(
+        {"room_id": {"$in": room_ids}, "status": status}, EXPORT_PROJECTION
+    ).sort([("room_id", 1), ("position", 1)]).batch_size(settings.EXPORT_BATCH_SIZE)
+    async for task in cursor:
+        yield export_row(task, room_names.get(task.get("room_id")))
+
+async def iter_owner_history(db, owner_id: str, status: str) -> AsyncIterator[Dict[str, Any]]:
+    # Rooms are consumed in batches so only one batch of room names is held at a time.
+    rooms = db.rooms.find({"owner_id": owner_id}, {"_id": 0, "id": 1, "name": 1}).sort("created_at", -1).batch_size(settings.EXPORT_BATCH_SIZE)
+    batch: Dict[str, str] = {}
+    async for room in rooms:
+        batch[room["id"]] = room.get("name")
+        if len(batch) >= settings.EXPORT_BATCH_SIZE:
+            async for row in iter_room_history(db, list(batch), batch, status): yield row
+            batch = {}
+    if batch:
+        async for row in iter_room_history(db, list(batch), batch, status): yield row
+    # Archived rooms are read from their compressed copies instead of being rehydrated.
+    async for payload in iter_archived_payloads(db, {"owner_id": owner_id}):
+        tasks = sorted((t for t in payload["tasks"] if t.get("status") == status), key=lambda t: t.get("position", 0))
+        for task in tasks: yield export_row(task, payload["room"].get("name"))
+
+async def stream_export(rows: AsyncIterator[Dict[str, Any]], fmt: str) -> AsyncIterator[str]:
+    formatter = format_csv if fmt == "csv" else format_ndjson
+    pending = [csv_header()] if fmt == "csv" else []
+    size = sum(len(p) for p in pending)
+    async for row in rows:
+        line = formatter(row)
+        pending.append(line)
+        size += len(line)
+        if size >= FLUSH_BYTES:
+            yield "".join(pending)
+            pending, size = [], 0
+    if pending:
+        yield "".join(pending)
@@ -0,0 +1,126 @@
+import asyncio
+import hashlib
+import logging
+from datetime import datetime, timezone
+from typing import Optional, Dict, Any, Callable, Coroutine
+from fastapi import Request, Response
+from fastapi.responses import JSONResponse
+from fastapi.routing import APIRoute
+from pymongo.errors import OperationFailure
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.core.security import get_request_user_id
+from app.db.database import get_db
+
+logger = logging.getLogger(__name__)
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+INDEX_OPTIONS_CONFLICT = 85
+
+class MemoryIdempotencyStore:
+    def __init__(self, ttl_seconds: int, maxsize: int):
+        self.cache = TTLCache(ttl_seconds, maxsize)
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        return self.cache.get(key)
+
+    async def set(self, key: str, record: Dict[str, Any]):
+        self.cache.set(key, record)
+
+async def ensure_ttl_index(db):
+    """TTL index expiring stored responses, ensured with the other indexes at startup."""
+    if settings.IDEMPOTENCY_BACKEND != "mongo": return
+    seconds = settings.IDEMPOTENCY_TTL_SECONDS
+    try:
+        await db.idempotency_keys.create_index("created_at", expireAfterSeconds=seconds)
+    except OperationFailure as e:
+        if e.code != INDEX_OPTIONS_CONFLICT: raise
+        # The index exists with another expiry: update it in place.
+        await db.command("collMod", "idempotency_keys", index={"name": "created_at_1", "expireAfterSeconds": seconds})
+
+class MongoIdempotencyStore:
+    """Shares stored responses between nodes; expiry is handled by a TTL index on
+    created_at (ensure_ttl_index)."""
+
+    def __init__(self, ttl_seconds: int):
+        self.ttl_seconds = ttl_seconds
+
+    async def _collection(self):
+        db = get_db()
+        return None if db is None else db.idempotency_keys
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        coll = await self._collection()
+        if coll is None: return None
+        return await coll.find_one({"_id": key}, {"_id": 0})
+
+    async def set(self, key: str, record: Dict[str, Any]):
+        coll = await self._collection()
+        if coll is None: return
+        await coll.replace_one(
+            {"_id": key},
+            {**record, "created_at": datetime.now(timezone.utc)},
+            upsert=True
+        )
+
+if settings.IDEMPOTENCY_BACKEND == "mongo":
+    store = MongoIdempotencyStore(settings.IDEMPOTENCY_TTL_SECONDS)
+else:
+    store = MemoryIdempotencyStore(settings.IDEMPOTENCY_TTL_SECONDS, settings.IDEMPOTENCY_MAXSIZE)
+
+# Requests currently being processed in this process, so a retry that arrives
+# before the original finished waits for it instead of running twice.
+_inflight: Dict[str, asyncio.Future] = {}
+
+def _replay(record: Dict[str, Any]) -> Response:
+    return Response(
+        content=record["body"],
+        status_code=record["status_code"],
+        media_type=record.get("media_type"),
+        headers={"Idempotent-Replayed": "true"}
+    )
+
+class IdempotentRoute(APIRoute):
+    """Route class honoring the Idempotency-Key header: a repeated request with the same
+    key, user and path returns the stored response without running the endpoint again."""
+
+    def get_route_handler(self) -> Callable[[Request], Coroutine[Any, Any, Response]]:
+        handler = super().get_route_handler()
+
+        async def idempotent_handler(request: Request) -> Response:
+            key = request.headers.get(IDEMPOTENCY_HEADER)
+            user_id = get_request_user_id(request) if key else None
+            if not key or not user_id or request.method != "POST":
+                return await handler(request)
+
+            body = await request.body()
+            fingerprint = hashlib.sha256(body).hexdigest()
+            store_key = f"{user_id}:{request.url.path}:{key}"
+
+            while store_key in _inflight:
+                await asyncio.shield(_inflight[store_key])
+
+            future = asyncio.get_running_loop().create_future()
+            _inflight[store_key] = future
+            try:
+                record = await store.get(store_key)
+                if record is not None:
+                    if record["fingerprint"] != fingerprint:
+                        return JSONResponse({"detail": f"{IDEMPOTENCY_HEADER} reused with a different request"}, status_code=422)
+                    return _replay(record)
+
+                response = await handler(request)
+                if response.status_code < 400 and hasattr(response, "body"):
+                    await store.set(store_key, {
+                        "fingerprint": fingerprint,
+                        "status_code": response.status_code,
+                        "media_type": response.media_type,
+                        "body": response.body.decode("utf-8")
+                    })
+                return response
+            finally:
+                del _inflight[store_key]
+                future.set_result(None)
+
+        return idempotent_handler
@@ -0,0 +1,133 @@
+import asyncio
+import logging
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from app.core.config import settings
+from app.db.database import get_db
+
+logger = logging.getLogger(__name__)
+
+# In-process background jobs for long admin operations. Each job has a record in the
+# `jobs` collection (status, progress, result) so its progress can be polled from
+# any node; the work itself runs on the node that accepted the request.
+
+class JobCancelled(Exception):
+    pass
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+class Job:
+    def __init__(self, runner: "JobRunner", record: Dict[str, Any]):
+        self.runner = runner
+        self.record = record
+        self.cancel_requested = False
+
+    @property
+    def id(self) -> str:
+        return self.record["id"]
+
+    @property
+    def params(self) -> Dict[str, Any]:
+        return self.record["params"]
+
+    async def report(self, **progress: Any):
+        self.record["progress"].update(progress)
+        await self.runner.save(self, progress=self.record["progress"])
+
+    async def checkpoint(self):
+        """Yields to the event loop between batches and stops the job if it was cancelled."""
+        await asyncio.sleep(0)
+        if self.cancel_requested: raise JobCancelled()
+
+JobHandler = Callable[[Job], Awaitable[Dict[str, Any]]]
+
+class JobRunner:
+    def __init__(self, max_concurrency: int):
+        self.max_concurrency = max_concurrency
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._jobs: Dict[str, Job] = {}
+        self._tasks: Dict[str, asyncio.Task] = {}
+
+    async def save(self, job: Job, **fields: Any):
+        fields["updated_at"] = _now()
+        job.record.update(fields)
+        db = get_db()
+        if db is None: return
+        try:
+            await db.jobs.update_one({"id": job.id}, {"$set": fields})
+        except Exception as e:
+            logger.warning(f"⚠️ Falha ao salvar job {job.id}: {e}")
+
+    async def submit(self, job_type: str, params: Dict[str, Any], handler: JobHandler) -> Dict[str, Any]:
+        record = {
+            "id": str(uuid.uuid4()),
+            "type": job_type,
+            "status": "queued",
+            "params": params,
+            "progress": {},
+            "result": None,
+            "error": None,
+            "created_at": _now(),
+            "started_at": None,
+            "finished_at": None,
+            "updated_at": _now()
+        }
+        db = get_db()
+        if db is not None:
+            await db.jobs.insert_one(dict(record))
+
+        job = Job(self, record)
+        self._jobs[job.id] = job
+        self._tasks[job.id] = asyncio.create_task(self._run(job, handler))
+        return dict(record)
+
+    async def _run(self, job: Job, handler: JobHandler):
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        try:
+            async with self._semaphore:
+                if job.cancel_requested: raise JobCancelled()
+                await self.save(job, status="running", started_at=_now())
+                result = await handler(job)
+                await self.save(job, status="completed", result=result, finished_at=_now())
+                logger.info(f"✅ Job {job.record['type']} {job.id} concluído")
+        except JobCancelled:
+            await self.save(job, status="cancelled", finished_at=_now())
+            logger.info(f"🛑 Job {job.record['type']} {job.id} cancelado")
+        except Exception as e:
+            logger.error(f"❌ Job {job.record['type']} {job.id} falhou: {e}")
+            await self.save(job, status="failed", error=str(e), finished_at=_now())
+        finally:
+            self._jobs.pop(job.id, None)
+            self._tasks.pop(job.id, None)
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        if job_id in self._jobs:
+            return dict(self._jobs[job_id].record)
+        db = get_db()
+        if db is None: return None
+        record = await db.jobs.find_one({"id": job_id}, {"_id": 0})
+        # Unfinished jobs owned by another process are reported as interrupted once they
+        # stop making progress (e.g. the node running them was restarted).
+        if record and record["status"] in ("queued", "running"):
+            updated_at = datetime.fromisoformat(record.get("updated_at") or record["created_at"])
+            if (datetime.now(timezone.utc) - updated_at).total_seconds() > settings.JOBS_STALE_SECONDS:
+                record["status"] = "interrupted"
+        return record
+
+    async def cancel(self, job_id: str) -> bool:
+        """Requests cancellation; the job stops at its next checkpoint and keeps the work already done."""
+        job = self._jobs.get(job_id)
+        if job is None: return False
+        job.cancel_requested = True
+        await self.save(job, cancel_requested=True)
+        return True
+
+    async def wait(self, job_id: str):
+        task = self._tasks.get(job_id)
+        if task is not None: await asyncio.shield(task)
+
+runner = JobRunner(settings.JOBS_MAX_CONCURRENCY)
@@ -0,0 +1,64 @@
+import heapq
+import time
+from collections import Counter, deque
+from typing import Any, Deque, Dict, List, Tuple
+
+# Process-local activity counters behind the /admin metrics namespace. Votes and state
+# broadcasts are tallied per room in one-second buckets covering the last minute;
+# recording is O(1) on the hot paths and a snapshot only walks these buckets and the
+# socket tables, so pushing metrics never touches the database. Each node reports its
+# own traffic.
+
+WINDOW_SECONDS = 60
+
+# (second, votes per room, broadcasts per room), oldest first
+_buckets: Deque[Tuple[int, Counter, Counter]] = deque(maxlen=WINDOW_SECONDS)
+
+def _current_bucket() -> Tuple[int, Counter, Counter]:
+    second = int(time.monotonic())
+    if not _buckets or _buckets[-1][0] != second:
+        _buckets.append((second, Counter(), Counter()))
+    return _buckets[-1]
+
+def record_vote(room_id: str):
+    _current_bucket()[1][room_id.upper()] += 1
+
+def record_broadcast(room_id: str):
+    _current_bucket()[2][room_id.upper()] += 1
+
+def _window_totals() -> Tuple[Counter, Counter]:
+    oldest = int(time.monotonic()) - WINDOW_SECONDS
+    votes, broadcasts = Counter(), Counter()
+    for second, v, b in _buckets:
+        if second <= oldest: continue
+        votes.update(v)
+        broadcasts.update(b)
+    return votes, broadcasts
+
+def snapshot(socket_users: Dict[str, Dict[str, str]], connected_sockets: int, top_n: int) -> Dict[str, Any]:
+    votes, broadcasts = _window_totals()
+    online: Dict[str, set] = {}
+    for info in socket_users.values():
+        online.setdefault(info["room_id"], set()).add(info["user_id"])
+
+    # Hottest rooms: most votes in the last minute, then most state updates, then most people online.
+    candidates = set(votes) | set(broadcasts) | set(online)
+    ranked = heapq.nlargest(top_n, candidates, key=lambda r: (votes[r], broadcasts[r], len(online.get(r, ()))))
+    hottest: List[Dict[str, Any]] = [{
+        "room_id": r,
+        "votes_per_minute": votes[r],
+        "updates_per_minute": broadcasts[r],
+        "online_users": len(online.get(r, ()))
+    } for r in ranked]
+
+    return {
+        "active_rooms": len(online),
+        "connected_sockets": connected_sockets,
+        "online_users": len({info["user_id"] for info in socket_users.values()}),
+        "votes_per_minute": sum(votes.values()),
+        "updates_per_minute": sum(broadcasts.values()),
+        "hottest_rooms": hottest
+    }
+
+def reset():
+    _buckets.clear()
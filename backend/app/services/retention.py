@@ -0,0 +1,228 @@
+import asyncio
+import logging
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List
+from pymongo.errors import OperationFailure
+
+from app.core.config import settings
+from app.db.repositories import require_normalized_layout
+from app.models.domain import TaskStatus
+from app.services import archive, counters
+from app.services.cascade import delete_rooms
+from app.services.jobs import Job, runner
+
+logger = logging.getLogger(__name__)
+
+# Retention policies, applied by a periodic sweeper job:
+#   - rooms idle for ARCHIVE_AFTER_DAYS are moved to compressed cold storage (services/archive.py);
+#   - offline memberships expire through a TTL index on `offline_since` (set on disconnect);
+#   - idle rooms, votes of closed tasks and orphan votes are found with keyset-paginated
+#     aggregations and deleted in SWEEP_BATCH_SIZE chunks, pausing SWEEP_BATCH_DELAY_SECONDS
+#     between chunks so the sweeper never competes with live traffic.
+# A policy whose retention is 0 is disabled. Nothing is deleted until an operator sets
+# RETENTION_ENABLED: before that the periodic sweep is a dry run. TTL deletions bypass the stats counters;
+# the periodic reconciliation in services/counters.py absorbs that drift.
+
+last_run: Dict[str, Any] = {}
+
+def policies() -> Dict[str, Any]:
+    return {
+        "enabled": settings.RETENTION_ENABLED,
+        "archive_after_days": settings.ARCHIVE_AFTER_DAYS,
+        "idle_rooms_days": settings.RETENTION_IDLE_ROOM_DAYS,
+        "offline_memberships_days": settings.RETENTION_OFFLINE_MEMBERSHIP_DAYS,
+        "closed_task_votes_days": settings.RETENTION_CLOSED_TASK_VOTES_DAYS,
+        "orphan_votes": settings.RETENTION_ORPHAN_VOTES,
+        "batch_size": settings.SWEEP_BATCH_SIZE,
+        "batch_delay_seconds": settings.SWEEP_BATCH_DELAY_SECONDS,
+        "interval_seconds": settings.RETENTION_SWEEP_INTERVAL_SECONDS
+    }
+
+def _cutoff(days: float) -> datetime:
+    return datetime.now(timezone.utc) - timedelta(days=days)
+
+async def ensure_ttl_indexes(db):
+    days = settings.RETENTION_OFFLINE_MEMBERSHIP_DAYS
+    if days <= 0 or not settings.RETENTION_ENABLED: return
+    seconds = int(days * 86400)
+    try:
+        await db.memberships.create_index("offline_since", name="offline_since_ttl", expireAfterSeconds=seconds)
+    except OperationFailure:
+        # The index exists with another expiry: update it in place.
+        await db.command("collMod", "memberships", index={"name": "offline_since_ttl", "expireAfterSeconds": seconds})
+
+async def iter_batches(collection, pipeline: List[Dict[str, Any]], fields: List[str]):
+    """Yields the documents selected by `pipeline` in _id order, SWEEP_BATCH_SIZE at a time."""
+    last_id = None
+    while True:
+        stages = list(pipeline)
+        if last_id is not None: stages.append({"$match": {"_id": {"$gt": last_id}}})
+        stages += [
+            {"$sort": {"_id": 1}},
+            {"$limit": settings.SWEEP_BATCH_SIZE},
+            {"$project": {"_id": 1, **{f: 1 for f in fields}}}
+        ]
+        docs = await collection.aggregate(stages).to_list(settings.SWEEP_BATCH_SIZE)
+        if not docs: return
+        last_id = docs[-1]["_id"]
+        yield docs
+        if len(docs) < settings.SWEEP_BATCH_SIZE: return
+
+async def pause(job: Job):
+    await job.checkpoint()
+    if settings.SWEEP_BATCH_DELAY_SECONDS > 0:
+        await asyncio.sleep(settings.SWEEP_BATCH_DELAY_SECONDS)
+
+def idle_rooms_pipeline(cutoff: str) -> List[Dict[str, Any]]:
+    # A room is idle when it is older than the cutoff, nobody is online and nobody
+    # joined or closed a task in it since the cutoff.
+    return [
+        {"$match": {"created_at": {"$lt": cutoff}}},
+        {"$lookup": {
+            "from": "memberships",
+            "localField": "id",
+            "foreignField": "room_id",
+            "pipeline": [
+                {"$match": {"$or": [{"is_online": True}, {"joined_at": {"$gte": cutoff}}]}},
+                {"$limit": 1}
+            ],
+            "as": "recent_members"
+        }},
+        {"$match": {"recent_members": []}},
+        {"$lookup": {
+            "from": "tasks",
+            "localField": "id",
+            "foreignField": "room_id",
+            "pipeline": [
+                {"$match": {"$or": [{"created_at": {"$gte": cutoff}}, {"completed_at": {"$gte": cutoff}}]}},
+                {"$limit": 1}
+            ],
+            "as": "recent_tasks"
+        }},
+        {"$match": {"recent_tasks": []}}
+    ]
+
+def closed_tasks_pipeline(cutoff: str) -> List[Dict[str, Any]]:
+    # Completed tasks keep their votes_summary, so their votes are only needed until the
+    # retention ends. A cancelled task's votes are deleted anyway if it is re-activated.
+    return [{"$match": {"$or": [
+        {"status": TaskStatus.COMPLETED, "completed_at": {"$lt": cutoff}},
+        {"status": TaskStatus.CANCELLED}
+    ]}}]
+
+def orphan_votes_pipeline() -> List[Dict[str, Any]]:
+    return [
+        {"$lookup": {"from": "tasks", "localField": "task_id", "foreignField": "_id", "pipeline": [{"$limit": 1}, {"$project": {"_id": 1}}], "as": "task"}},
+        {"$match": {"task": []}}
+    ]
+
+async def _sweep_idle_rooms(db, job: Job, dry_run: bool, metrics: Dict[str, int]):
+    cutoff = _cutoff(settings.RETENTION_IDLE_ROOM_DAYS).isoformat()
+    async for docs in iter_batches(db.rooms, idle_rooms_pipeline(cutoff), ["id"]):
+        metrics["matched"] += len(docs)
+        if not dry_run:
+            deleted = await delete_rooms(db, [d["id"] for d in docs], job)
+            metrics["deleted"] += deleted["rooms"]
+        metrics["batches"] += 1
+        await pause(job)
+
+    # Archived rooms count as idle since they were archived.
+    expired = {"archived_at": {"$lt": cutoff}}
+    if dry_run:
+        metrics["matched"] += await db.archived_rooms.count_documents(expired)
+    else:
+        result = await db.archived_rooms.delete_many(expired)
+        metrics["matched"] += result.deleted_count
+        metrics["deleted"] += result.deleted_count
+
+async def _archive_idle_rooms(db, job: Job, dry_run: bool, metrics: Dict[str, int]):
+    cutoff = _cutoff(settings.ARCHIVE_AFTER_DAYS).isoformat()
+    metrics["stored_bytes"] = metrics["raw_bytes"] = 0
+    async for docs in iter_batches(db.rooms, idle_rooms_pipeline(cutoff), ["id"]):
+        metrics["matched"] += len(docs)
+        if not dry_run:
+            for doc in docs:
+                sizes = await archive.archive_room(db, doc["id"])
+                if not sizes: continue
+                metrics["deleted"] += 1
+                metrics["raw_bytes"] += sizes["raw_size"]
+                metrics["stored_bytes"] += sizes["stored_size"]
+        metrics["batches"] += 1
+        await pause(job)
+
+async def _sweep_closed_task_votes(db, job: Job, dry_run: bool, metrics: Dict[str, int]):
+    cutoff = _cutoff(settings.RETENTION_CLOSED_TASK_VOTES_DAYS).isoformat()
+    async for tasks in iter_batches(db.tasks, closed_tasks_pipeline(cutoff), ["id"]):
+        query = {"task_id": {"$in": [t["id"] for t in tasks]}}
+        if dry_run:
+            metrics["matched"] += await db.votes.count_documents(query)
+        else:
+            await counters.record_votes_removed(db, query)
+            result = await db.votes.delete_many(query)
+            metrics["matched"] += result.deleted_count
+            metrics["deleted"] += result.deleted_count
+        metrics["batches"] += 1
+        await pause(job)
+
+async def _sweep_orphan_votes(db, job: Job, dry_run: bool, metrics: Dict[str, int]):
+    async for votes in iter_batches(db.votes, orphan_votes_pipeline(), []):
+        metrics["matched"] += len(votes)
+        if not dry_run:
+            query = {"_id": {"$in": [v["_id"] for v in votes]}}
+            await counters.record_votes_removed(db, query)
+            result = await db.votes.delete_many(query)
+            metrics["deleted"] += result.deleted_count
+        metrics["batches"] += 1
+        await pause(job)
+
+async def _sweep_offline_memberships(db, job: Job, dry_run: bool, metrics: Dict[str, int]):
+    # Deletion itself is left to the TTL index; memberships that went offline before
+    # offline_since existed get it now, so they expire one retention period from today.
+    cutoff = _cutoff(settings.RETENTION_OFFLINE_MEMBERSHIP_DAYS)
+    metrics["matched"] = await db.memberships.count_documents({"offline_since": {"$lt": cutoff}})
+    legacy = {"is_online": False, "offline_since": {"$exists": False}}
+    if dry_run:
+        metrics["backfilled"] = await db.memberships.count_documents(legacy)
+    else:
+        await ensure_ttl_indexes(db)
+        result = await db.memberships.update_many(legacy, {"$set": {"offline_since": datetime.now(timezone.utc)}})
+        metrics["backfilled"] = result.modified_count
+
+async def sweep(db, job: Job, dry_run: bool = False) -> Dict[str, Any]:
+    require_normalized_layout()
+    steps = []
+    if settings.RETENTION_OFFLINE_MEMBERSHIP_DAYS > 0: steps.append(("offline_memberships", _sweep_offline_memberships))
+    if settings.RETENTION_IDLE_ROOM_DAYS > 0: steps.append(("idle_rooms", _sweep_idle_rooms))
+    if settings.ARCHIVE_AFTER_DAYS > 0: steps.append(("archive_rooms", _archive_idle_rooms))
+    if settings.RETENTION_CLOSED_TASK_VOTES_DAYS > 0: steps.append(("closed_task_votes", _sweep_closed_task_votes))
+    if settings.RETENTION_ORPHAN_VOTES: steps.append(("orphan_votes", _sweep_orphan_votes))
+
+    report: Dict[str, Any] = {"dry_run": dry_run, "started_at": datetime.now(timezone.utc).isoformat(), "policies": {}}
+    for name, step in steps:
+        metrics = {"matched": 0, "deleted": 0, "batches": 0}
+        started = time.perf_counter()
+        await job.report(phase=name)
+        await step(db, job, dry_run, metrics)
+        metrics["duration_ms"] = round((time.perf_counter() - started) * 1000, 1)
+        report["policies"][name] = metrics
+        await job.report(**{name: metrics})
+
+    report["finished_at"] = datetime.now(timezone.utc).isoformat()
+    last_run.clear()
+    last_run.update(report)
+    logger.info(f"🧹 Varredura de retenção{' (simulação)' if dry_run else ''}: {report['policies']}")
+    return report
+
+async def submit_sweep(db, dry_run: bool = False) -> Dict[str, Any]:
+    return await runner.submit("retention_sweep", {"dry_run": dry_run}, lambda job: sweep(db, job, dry_run))
+
+async def sweep_periodically(get_db, interval_seconds: float):
+    while True:
+        await asyncio.sleep(interval_seconds)
+        db = get_db()
+        if db is None: continue
+        try:
+            await submit_sweep(db, dry_run=not settings.RETENTION_ENABLED)
+        except Exception as e:
+            logger.error(f"❌ Erro ao agendar varredura de retenção: {e}")
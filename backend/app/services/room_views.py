@@ -0,0 +1,142 @@
+import argparse
+import asyncio
+import hashlib
+import json
+import logging
+import sys
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from pymongo.errors import DuplicateKeyError
+
+from app.core.config import settings
+from app.db.repositories import MongoRooms
+
+logger = logging.getLogger(__name__)
+
+# CQRS read side for room state. `room_views` holds one document per room (_id = room id)
+# with the ready-to-send public state (votes masked until the reveal), the hidden vote
+# values (only used to show each voter their own card), a digest and a version that is
+# incremented on every change. Broadcasts write the view right after the write that
+# triggered them; writes made elsewhere are projected by the change-feed broadcaster on
+# ROOM_VIEWS_PROJECTOR nodes. Readers (GET state, bootstrap, change-feed broadcasts) do a
+# single find_one by _id. `python -m app.services.room_views --rebuild` repairs views.
+
+BuildState = Callable[[str], Awaitable[Dict[str, Any]]]
+
+def enabled(db) -> bool:
+    return settings.ROOM_VIEWS and db is not None
+
+def state_digest(state: Dict[str, Any]) -> str:
+    public = {k: v for k, v in state.items() if k not in ("version", "statistics")}
+    return hashlib.sha1(json.dumps(public, sort_keys=True, default=str).encode()).hexdigest()
+
+def public_state(state: Dict[str, Any]) -> Dict[str, Any]:
+    """Masks the votes of a state built with include_votes=True, unless cards are revealed."""
+    if not state or state["room"].get("cards_revealed"): return state
+    return {**state, "votes": [{"user_id": v["user_id"], "has_voted": True} for v in state["votes"]]}
+
+def to_document(state: Dict[str, Any], built_at: datetime) -> Dict[str, Any]:
+    public = {k: v for k, v in public_state(state).items() if k not in ("version", "statistics")}
+    hidden = {} if state["room"].get("cards_revealed") else {v["user_id"]: v["value"] for v in state["votes"]}
+    return {"state": public, "hidden_votes": hidden, "digest": state_digest(public), "built_at": built_at}
+
+def for_user(view: Dict[str, Any], requesting_user_id: Optional[str] = None) -> Dict[str, Any]:
+    state = dict(view["state"])
+    own = view.get("hidden_votes", {}).get(requesting_user_id) if requesting_user_id else None
+    if own is not None:
+        state["votes"] = [
+            {**v, "value": own} if v["user_id"] == requesting_user_id else v
+            for v in state["votes"]
+        ]
+    return state
+
+async def read(db, room_id: str) -> Optional[Dict[str, Any]]:
+    return await db.room_views.find_one({"_id": room_id})
+
+async def save(db, room_id: str, state: Dict[str, Any], started: datetime, force: bool = False) -> bool:
+    """Stores the view built from `state` (read from the collections at `started`).
+
+    Skipped when the stored view has the same digest or was built from a later read, so
+    concurrent projectors never move a view backwards. Best effort, like the counters:
+    a failure is logged and repaired by the next change or by a rebuild."""
+    doc = to_document(state, started)
+    query: Dict[str, Any] = {"_id": room_id}
+    if not force: query.update(digest={"$ne": doc["digest"]}, built_at={"$lt": started})
+    try:
+        await db.room_views.update_one(query, {"$set": doc, "$inc": {"version": 1}}, upsert=True)
+        return True
+    except DuplicateKeyError:
+        return False  # the stored view is current or newer
+    except Exception as e:
+        logger.warning(f"⚠️ Falha ao gravar projeção da sala {room_id}: {e}")
+        return False
+
+async def drop(db, room_id: str):
+    try:
+        await db.room_views.delete_one({"_id": room_id})
+    except Exception as e:
+        logger.warning(f"⚠️ Falha ao remover projeção da sala {room_id}: {e}")
+
+async def rebuild(db, build: BuildState, room_ids: Optional[List[str]] = None, batch_size: int = 500) -> Dict[str, int]:
+    """Rebuilds the views of `room_ids` (default: every room) and deletes views of rooms
+    that no longer exist."""
+    totals = {"rebuilt": 0, "orphans_removed": 0}
+
+    async def project(room_id: str):
+        started = datetime.now(timezone.utc)
+        state = await build(room_id)
+        if state:
+            await save(db, room_id, state, started, force=True)
+            totals["rebuilt"] += 1
+        else:
+            await drop(db, room_id)
+
+    if room_ids is not None:
+        for room_id in room_ids: await project(room_id.upper())
+        return totals
+
+    last_id = None
+    while True:
+        query = {"_id": {"$gt": last_id}} if last_id is not None else {}
+        rooms = await db.rooms.find(query, {"_id": 1, "id": 1}).sort("_id", 1).limit(batch_size).to_list(batch_size)
+        for room in rooms: await project(room["id"])
+        if len(rooms) < batch_size: break
+        last_id = rooms[-1]["_id"]
+
+    last_id = None
+    while True:
+        query = {"_id": {"$gt": last_id}} if last_id is not None else {}
+        views = await db.room_views.find(query, {"_id": 1}).sort("_id", 1).limit(batch_size).to_list(batch_size)
+        ids = [v["_id"] for v in views]
+        existing = {r["id"] for r in await MongoRooms(db).list_by_ids(ids, limit=len(ids))} if ids else set()
+        orphans = [i for i in ids if i not in existing]
+        if orphans:
+            totals["orphans_removed"] += (await db.room_views.delete_many({"_id": {"$in": orphans}})).deleted_count
+        if len(views) < batch_size: break
+        last_id = ids[-1]
+
+    logger.info(f"🧱 Projeções reconstruídas: {totals['rebuilt']} salas, {totals['orphans_removed']} órfãs removidas")
+    return totals
+
+async def _main(room_ids: Optional[List[str]]) -> int:
+    from app.db.database import db_instance
+    from app.services.socket import get_room_state
+
+    await db_instance.connect()
+    db = db_instance.db
+    if db is None:
+        print("MONGO_URL is not configured")
+        return 2
+    try:
+        totals = await rebuild(db, lambda room_id: get_room_state(room_id, include_votes=True), room_ids)
+        print(f"rebuilt {totals['rebuilt']} views, removed {totals['orphans_removed']} orphans")
+        return 0
+    finally:
+        await db_instance.disconnect()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild the room_views projection from the source collections.")
+    parser.add_argument("--rebuild", action="store_true", required=True, help="rebuild the projections")
+    parser.add_argument("--room", action="append", help="only rebuild this room (repeatable)")
+    sys.exit(asyncio.run(_main(parser.parse_args().room)))
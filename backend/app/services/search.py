@@ -0,0 +1,195 @@
+import logging
+import math
+import re
+import time
+import unicodedata
+from collections import OrderedDict, defaultdict
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from pymongo.errors import OperationFailure
+
+from app.core.config import settings
+from app.db.pagination import keyset_match, page_result
+
+logger = logging.getLogger(__name__)
+
+# Task search across the rooms a user belongs to. The primary backend is a Mongo text
+# index over title/description; deployments without text search (SEARCH_BACKEND=memory,
+# or a server that rejects $text) use an in-process inverted index instead. Both rank
+# hits by relevance, weigh the title above the description and page with the same
+# (score, id) keyset cursor. A rejected $text query switches to the inverted index for
+# SEARCH_TEXT_RETRY_SECONDS, after which the text index is tried again.
+
+TEXT_INDEX_NAME = "tasks_text"
+TITLE_WEIGHT = 5
+DESCRIPTION_WEIGHT = 1
+SORT_FIELDS = ["_score", "id"]
+
+_text_search_failed_at: Optional[float] = None
+
+async def ensure_text_index(db):
+    """Ensured at startup with the other indexes (app/db/indexes.py)."""
+    if settings.SEARCH_BACKEND != "mongo": return
+    # default_language "none": no stemming or stop words, rooms mix Portuguese and English.
+    await db.tasks.create_index(
+        [("title", "text"), ("description", "text")],
+        name=TEXT_INDEX_NAME,
+        weights={"title": TITLE_WEIGHT, "description": DESCRIPTION_WEIGHT},
+        default_language="none"
+    )
+
+def tokenize(text: Optional[str]) -> List[str]:
+    """Lower-cased, accent-free word tokens, mirroring the diacritic-insensitive text index."""
+    if not text: return []
+    folded = "".join(c for c in unicodedata.normalize("NFKD", text) if not unicodedata.combining(c))
+    return re.findall(r"\w+", folded.lower())
+
+class InvertedIndex:
+    """token -> {task_id: weighted term frequency}, loaded per room and refreshed after
+    SEARCH_INDEX_TTL_SECONDS; the least recently searched rooms are evicted beyond
+    SEARCH_INDEX_MAX_ROOMS."""
+
+    def __init__(self):
+        self.postings: Dict[str, Dict[str, float]] = defaultdict(dict)
+        self.task_tokens: Dict[str, List[str]] = {}
+        self.task_room: Dict[str, str] = {}
+        self.room_tasks: Dict[str, List[str]] = {}
+        self.loaded_at: "OrderedDict[str, float]" = OrderedDict()
+
+    def stale_rooms(self, room_ids: Sequence[str]) -> List[str]:
+        now = time.monotonic()
+        stale = []
+        for room_id in room_ids:
+            loaded = self.loaded_at.get(room_id)
+            if loaded is None or now - loaded > settings.SEARCH_INDEX_TTL_SECONDS:
+                stale.append(room_id)
+            else:
+                self.loaded_at.move_to_end(room_id)
+        return stale
+
+    def drop_room(self, room_id: str):
+        for task_id in self.room_tasks.pop(room_id, []):
+            for token in self.task_tokens.pop(task_id, []):
+                postings = self.postings.get(token)
+                if postings is None: continue
+                postings.pop(task_id, None)
+                if not postings: del self.postings[token]
+            self.task_room.pop(task_id, None)
+        self.loaded_at.pop(room_id, None)
+
+    def index_room(self, room_id: str, tasks: Sequence[Dict[str, Any]]):
+        self.drop_room(room_id)
+        for task in tasks:
+            weights: Dict[str, float] = defaultdict(float)
+            for token in tokenize(task.get("title")): weights[token] += TITLE_WEIGHT
+            for token in tokenize(task.get("description")): weights[token] += DESCRIPTION_WEIGHT
+            for token, weight in weights.items(): self.postings[token][task["id"]] = weight
+            self.task_tokens[task["id"]] = list(weights)
+            self.task_room[task["id"]] = room_id
+        self.room_tasks[room_id] = [t["id"] for t in tasks]
+        self.loaded_at[room_id] = time.monotonic()
+        while len(self.loaded_at) > settings.SEARCH_INDEX_MAX_ROOMS:
+            self.drop_room(next(iter(self.loaded_at)))
+
+    def search(self, room_ids: Sequence[str], terms: Sequence[str]) -> List[Tuple[float, str]]:
+        """(score, task_id) pairs sorted by score then id, both descending."""
+        rooms = set(room_ids)
+        n_tasks = max(len(self.task_room), 1)
+        scores: Dict[str, float] = defaultdict(float)
+        for term in set(terms):
+            postings = self.postings.get(term)
+            if not postings: continue
+            idf = math.log(1 + n_tasks / len(postings))
+            for task_id, weight in postings.items():
+                if self.task_room.get(task_id) in rooms: scores[task_id] += weight * idf
+        return sorted(((round(s, 6), t) for t, s in scores.items()), reverse=True)
+
+index = InvertedIndex()
+
+def invalidate_room(room_id: str):
+    """Called after tasks are created or imported so the next search reloads the room."""
+    index.drop_room(room_id.upper())
+
+async def user_room_ids(db, user_id: str) -> List[str]:
+    """Live rooms the user belongs to or owns. Archived rooms are not searched: their
+    tasks only exist in the compressed copy until opening the room rehydrates it."""
+    member_of = await db.memberships.distinct("room_id", {"user_id": user_id})
+    owned = await db.rooms.distinct("_id", {"owner_id": user_id})
+    return sorted(set(member_of) | set(owned))
+
+def _hit_projection() -> Dict[str, Any]:
+    return {
+        "_id": 0, "id": 1, "title": 1, "description": 1, "status": 1, "final_score": 1,
+        "room_id": 1, "room_name": {"$first": "$room.name"}, "_score": 1
+    }
+
+def _room_lookup() -> Dict[str, Any]:
+    return {"$lookup": {
+        "from": "rooms", "localField": "room_id", "foreignField": "_id",
+        "pipeline": [{"$project": {"_id": 0, "name": 1}}], "as": "room"
+    }}
+
+async def _search_mongo(db, room_ids: List[str], q: str, limit: int, after: Optional[List[Any]]) -> List[Dict[str, Any]]:
+    pipeline: List[Dict[str, Any]] = [
+        {"$match": {"$text": {"$search": q}, "room_id": {"$in": room_ids}}},
+        {"$addFields": {"_score": {"$meta": "textScore"}}}
+    ]
+    if after: pipeline.append({"$match": keyset_match(SORT_FIELDS, after, -1)})
+    pipeline += [
+        {"$sort": {"_score": -1, "id": -1}},
+        {"$limit": limit + 1},
+        _room_lookup(),
+        {"$project": _hit_projection()}
+    ]
+    return await db.tasks.aggregate(pipeline).to_list(limit + 1)
+
+def hits_pipeline(task_ids: List[str]) -> List[Dict[str, Any]]:
+    return [
+        {"$match": {"_id": {"$in": task_ids}}},
+        _room_lookup(),
+        {"$project": _hit_projection()}
+    ]
+
+async def _search_memory(db, room_ids: List[str], q: str, limit: int, after: Optional[List[Any]]) -> List[Dict[str, Any]]:
+    stale = index.stale_rooms(room_ids)
+    if stale:
+        tasks = await db.tasks.find(
+            {"room_id": {"$in": stale}},
+            {"_id": 0, "id": 1, "room_id": 1, "title": 1, "description": 1}
+        ).to_list(None)
+        by_room: Dict[str, List[Dict[str, Any]]] = {r: [] for r in stale}
+        for task in tasks: by_room[task["room_id"]].append(task)
+        for room_id, room_tasks in by_room.items(): index.index_room(room_id, room_tasks)
+
+    ranked = index.search(room_ids, tokenize(q))
+    if after: ranked = [(s, t) for s, t in ranked if (s, t) < (after[0], after[1])]
+    page = ranked[:limit + 1]
+    if not page: return []
+
+    # Status, final score and room name are read fresh; deleted tasks simply drop out.
+    scores = {t: s for s, t in page}
+    docs = await db.tasks.aggregate(hits_pipeline(list(scores))).to_list(None)
+    for doc in docs: doc["_score"] = scores[doc["id"]]
+    return sorted(docs, key=lambda d: (d["_score"], d["id"]), reverse=True)
+
+async def search_tasks(db, user_id: str, q: str, limit: int, after: Optional[List[Any]]) -> Dict[str, Any]:
+    global _text_search_failed_at
+    room_ids = await user_room_ids(db, user_id)
+    if not room_ids or not tokenize(q): return page_result([], limit, SORT_FIELDS)
+
+    hits = None
+    cooling_down = _text_search_failed_at is not None and time.monotonic() - _text_search_failed_at < settings.SEARCH_TEXT_RETRY_SECONDS
+    if settings.SEARCH_BACKEND == "mongo" and not cooling_down:
+        try:
+            hits = await _search_mongo(db, room_ids, q, limit, after)
+            if _text_search_failed_at is not None: logger.info("🔎 Busca textual do Mongo disponível novamente")
+            _text_search_failed_at = None
+        except OperationFailure as e:
+            # Logged once per outage; retries that fail again only restart the cooldown.
+            if _text_search_failed_at is None: logger.warning(f"⚠️ Busca textual do Mongo indisponível, usando índice em memória: {e}")
+            _text_search_failed_at = time.monotonic()
+    if hits is None:
+        hits = await _search_memory(db, room_ids, q, limit, after)
+
+    for hit in hits: hit["score"] = round(hit["_score"], 4)
+    return page_result(hits, limit, SORT_FIELDS)
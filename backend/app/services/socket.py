@@ -1,10 +1,14 @@
+import uuid
+import asyncio
 import socketio
 import logging
-from typing import Optional, Dict, Any
+from datetime import datetime, timezone
+from typing import Optional, Dict, Any, Set
 from http import cookies
 from jose import jwt, JWTError
-from app.db.database import get_db
-from app.models.domain import FIBONACCI_VALUES
+from app.db.repositories import get_repositories
+from app.services.statistics import compute_vote_statistics
+from app.services import live_metrics, room_views
 from app.core.config import settings
 
 logger = logging.getLogger(__name__)
@@ -18,25 +22,43 @@ sio = socketio.AsyncServer(
     allow_eio3=True
 )
 socket_users = {}
+connected_sids = set()
+
+# Per-room state version, bumped on every broadcast. Versions are prefixed with a
+# per-process id so a version handed out by one node never matches on another.
+NODE_ID = uuid.uuid4().hex[:8]
+room_versions: Dict[str, int] = {}
+
+# Room versions are counted per node and prefixed with NODE_ID: a version handed out by
+# another node (or before a restart) never matches, so the join skip below only fires
+# when the bootstrap and the socket land on the same node with no broadcast in between.
+def get_room_version(room_id: str) -> str:
+    return f"{NODE_ID}:{room_versions.get(room_id.upper(), 0)}"
+
+def bump_room_version(room_id: str) -> str:
+    room_id = room_id.upper()
+    room_versions[room_id] = room_versions.get(room_id, 0) + 1
+    return get_room_version(room_id)
 
 async def get_room_state(room_id: str, include_votes: bool = False, requesting_user_id: Optional[str] = None) -> Dict[str, Any]:
     room_id = room_id.upper()
-    db = get_db()
-    if db is None: return {}
+    repos = get_repositories()
+    if repos is None: return {}
+    version = get_room_version(room_id)
     
-    room = await db.rooms.find_one({"id": room_id}, {"_id": 0})
+    room = await repos.rooms.get(room_id)
     if not room: return {}
     
-    users = await db.users.find({"room_id": room_id, "is_online": {"$ne": False}}, {"_id": 0}).to_list(100)
-    tasks = await db.tasks.find({"room_id": room_id}, {"_id": 0}).sort("position", 1).to_list(100)
+    users = await repos.memberships.list_room(room_id, online_only=True)
+    tasks = await repos.tasks.list_room(room_id)
     
     active_task = None
     if room.get("active_task_id"):
-        active_task = await db.tasks.find_one({"id": room["active_task_id"]}, {"_id": 0})
+        active_task = await repos.tasks.get(room["active_task_id"])
     
     votes = []
     if active_task:
-        raw_votes = await db.votes.find({"task_id": active_task["id"]}, {"_id": 0}).to_list(100)
+        raw_votes = await repos.votes.list_task(active_task["id"])
         if room.get("cards_revealed") or include_votes:
             votes = raw_votes
         else:
@@ -49,32 +71,108 @@ async def get_room_state(room_id: str, include_votes: bool = False, requesting_u
         voted_ids = {v["user_id"] for v in raw_votes}
         for user in users: user["has_voted"] = user["id"] in voted_ids
     
-    if "deck_type" not in room: room["deck_type"] = "FIBONACCI"
-    if "deck_values" not in room: room["deck_values"] = [str(v) for v in FIBONACCI_VALUES]
-    if "timer_end" not in room: room["timer_end"] = None
-    
-    return {"room": room, "users": users, "tasks": tasks, "votes": votes, "active_task": active_task}
+    return {"room": room, "users": users, "tasks": tasks, "votes": votes, "active_task": active_task, "version": version}
+
+# Digest of the last state pushed per room (version excluded). The change-feed broadcaster
+# (services/change_feed.py) skips rooms whose current state matches it, which is the case
+# for writes this node already broadcast itself.
+state_digests: Dict[str, str] = {}
+
+def local_rooms() -> Set[str]:
+    """Rooms with at least one socket connected to this node."""
+    return {info["room_id"] for info in socket_users.values()}
+
+async def project_room(room_id: str) -> Dict[str, Any]:
+    """Builds the room state from the collections (votes unmasked) and stores it as the
+    room's room_views projection."""
+    room_id = room_id.upper()
+    repos = get_repositories()
+    if repos is None: return {}
+    started = datetime.now(timezone.utc)
+    state = await get_room_state(room_id, include_votes=True)
+    if state and room_views.enabled(repos.db): await room_views.save(repos.db, room_id, state, started)
+    return state
+
+async def read_room_state(room_id: str, requesting_user_id: Optional[str] = None) -> Dict[str, Any]:
+    """Room state as served to clients: a single find_one on the room_views projection,
+    built on the spot when the room has none yet."""
+    room_id = room_id.upper()
+    repos = get_repositories()
+    if repos is None: return {}
+    if not room_views.enabled(repos.db):
+        return await get_room_state(room_id, requesting_user_id=requesting_user_id)
+    view = await room_views.read(repos.db, room_id)
+    if view is None:
+        state = await project_room(room_id)
+        if not state: return {}
+        view = room_views.to_document(state, datetime.now(timezone.utc))
+    return {**room_views.for_user(view, requesting_user_id), "version": get_room_version(room_id)}
 
 async def broadcast_room_state(room_id: str):
-    db = get_db()
-    if db is None: return
+    if get_repositories() is None: return
     room_id = room_id.upper()
-    state = await get_room_state(room_id)
+    bump_room_version(room_id)
+    live_metrics.record_broadcast(room_id)
+    state = room_views.public_state(await project_room(room_id))
+    if state: state_digests[room_id] = room_views.state_digest(state)
     logger.info(f"📢 BROADCAST: Enviando update para sala {room_id}")
     await sio.emit('state_update', state, room=room_id)
 
+async def reveal_cards(repos, room_id: str) -> bool:
+    """Turns the room's cards face up. Only the hidden -> revealed transition closes a
+    voting round: the statistics are computed then, stored on the active task, and its
+    rounds counter (averaged by the analytics reports) is bumped. Repeated reveals are no-ops."""
+    if not await repos.rooms.reveal(room_id): return False
+    room = await repos.rooms.get(room_id, ["active_task_id", "deck_values"])
+    if not room or not room.get("active_task_id"): return True
+    votes = await repos.votes.list_task(room["active_task_id"])
+    statistics = compute_vote_statistics([v["value"] for v in votes], room.get("deck_values") or [])
+    await repos.tasks.update(room["active_task_id"], {"statistics": statistics}, inc={"rounds": 1})
+    return True
+
+async def broadcast_reveal(room_id: str):
+    repos = get_repositories()
+    if repos is None: return
+    room_id = room_id.upper()
+    bump_room_version(room_id)
+    live_metrics.record_broadcast(room_id)
+    started = datetime.now(timezone.utc)
+    state = await get_room_state(room_id, include_votes=True)
+    active_task = state.get("active_task")
+    # The statistics were stored on the task by reveal_cards; they are shipped, not recomputed.
+    if active_task: state["statistics"] = active_task.get("statistics")
+    if state:
+        state_digests[room_id] = room_views.state_digest(state)
+        if room_views.enabled(repos.db): await room_views.save(repos.db, room_id, state, started)
+    logger.info(f"🃏 REVEAL: Revelando votos da sala {room_id}")
+    await sio.emit('reveal_votes', state, room=room_id)
+
+async def broadcast_if_changed(room_id: str) -> bool:
+    """Pushes the room's current state (its projection, when enabled) unless this node
+    already sent it."""
+    room_id = room_id.upper()
+    state = await read_room_state(room_id)
+    digest = room_views.state_digest(state) if state else None
+    if digest is None or state_digests.get(room_id) == digest: return False
+    state["version"] = bump_room_version(room_id)
+    state_digests[room_id] = digest
+    live_metrics.record_broadcast(room_id)
+    logger.info(f"📢 BROADCAST: Sala {room_id} alterada fora deste nó, enviando update")
+    await sio.emit('state_update', state, room=room_id)
+    return True
+
 async def check_all_voted(room_id: str, task_id: str) -> bool:
-    db = get_db()
-    if db is None: return False
+    repos = get_repositories()
+    if repos is None: return False
     room_id = room_id.upper()
-    voters = await db.users.find({"room_id": room_id, "is_spectator": False, "is_online": {"$ne": False}}).to_list(100)
-    votes = await db.votes.find({"task_id": task_id}).to_list(100)
+    voters = await repos.memberships.list_room(room_id, online_only=True, voters_only=True)
+    votes = await repos.votes.list_task(task_id)
     if not voters: return False
     return all(user["id"] in {v["user_id"] for v in votes} for user in voters)
 
 
-@sio.event
-async def connect(sid, environ, auth=None):
+def authenticate(sid, environ, auth=None) -> str:
+    """Returns the user id of the JWT sent in the auth payload or the access_token cookie."""
     token = None
     if auth and isinstance(auth, dict) and auth.get('token'):
         token = auth['token']
@@ -103,19 +201,25 @@ async def connect(sid, environ, auth=None):
     
     try:
         payload = jwt.decode(token, settings.JWT_SECRET, algorithms=[settings.ALGORITHM])
-        user_id = payload.get("sub")
-        if not user_id:
-            raise socketio.exceptions.ConnectionRefusedError('invalid_token')
-        async with sio.session(sid) as session:
-            session['user_id'] = user_id
     except JWTError:
         logger.warning(f"Connection refused: Invalid token for sid {sid}")
         raise socketio.exceptions.ConnectionRefusedError('unauthorized')
-        
+    user_id = payload.get("sub")
+    if not user_id:
+        raise socketio.exceptions.ConnectionRefusedError('invalid_token')
+    return user_id
+
+@sio.event
+async def connect(sid, environ, auth=None):
+    user_id = authenticate(sid, environ, auth)
+    async with sio.session(sid) as session:
+        session['user_id'] = user_id
+    connected_sids.add(sid)
     return True
 
 @sio.event
 async def disconnect(sid):
+    connected_sids.discard(sid)
     user_info = socket_users.get(sid)
     if user_info:
         user_id = user_info["user_id"]
@@ -129,17 +233,17 @@ async def disconnect(sid):
                 has_other_sockets = True
                 break
                 
-        db = get_db()
-        if db is not None:
+        repos = get_repositories()
+        if repos is not None:
             if not has_other_sockets:
-                await db.users.update_one({"id": user_id, "room_id": room_id}, {"$set": {"is_online": False}})
+                # offline_since drives the TTL expiry of offline memberships (see services/retention.py).
+                await repos.memberships.update(user_id, room_id, {"is_online": False, "offline_since": datetime.now(timezone.utc)})
                 
-            room = await db.rooms.find_one({"id": room_id})
+            room = await repos.rooms.get(room_id)
             if room and room.get("active_task_id") and not room.get("cards_revealed"):
                 if await check_all_voted(room_id, room["active_task_id"]):
-                    await db.rooms.update_one({"id": room_id}, {"$set": {"cards_revealed": True}})
-                    state = await get_room_state(room_id, include_votes=True)
-                    await sio.emit('reveal_votes', state, room=room_id)
+                    await reveal_cards(repos, room_id)
+                    await broadcast_reveal(room_id)
                     return
             await broadcast_room_state(room_id)
 
@@ -157,7 +261,47 @@ async def join_room(sid, data):
     await sio.enter_room(sid, room_id)
     socket_users[sid] = {"room_id": room_id, "user_id": user_id}
     
-    db = get_db()
-    if db is not None:
-        await db.users.update_one({"id": user_id, "room_id": room_id}, {"$set": {"is_online": True}})
+    # Clients that just bootstrapped (POST /api/session/bootstrap) already hold this exact
+    # state and are already marked online, so there is nothing to write or rebuild. Only
+    # the bootstrap's state_version may be sent here: the web client joins through
+    # /rooms/{id}/join and sends none, since a reconnecting socket must be marked online.
+    if data.get("state_version") and data["state_version"] == get_room_version(room_id):
+        logger.info(f"⏭️ Socket Join: Sala {room_id} já sincronizada (versão {data['state_version']})")
+        return
+    
+    repos = get_repositories()
+    if repos is not None:
+        await repos.memberships.update(user_id, room_id, {"is_online": True}, unset=["offline_since"])
         await broadcast_room_state(room_id)
+
+# Live admin metrics: sockets on the /admin namespace receive a `metrics` snapshot on
+# connect and then every ADMIN_METRICS_INTERVAL_SECONDS, built from in-memory counters.
+ADMIN_NAMESPACE = '/admin'
+admin_sids = set()
+
+def admin_metrics() -> Dict[str, Any]:
+    metrics = live_metrics.snapshot(socket_users, len(connected_sids), settings.ADMIN_METRICS_TOP_ROOMS)
+    return {**metrics, "node_id": NODE_ID, "timestamp": datetime.now(timezone.utc).isoformat()}
+
+@sio.on('connect', namespace=ADMIN_NAMESPACE)
+async def admin_connect(sid, environ, auth=None):
+    user_id = authenticate(sid, environ, auth)
+    # Guest tokens are free to obtain, so without an allowlist nobody gets the metrics stream.
+    if user_id not in settings.ADMIN_USER_IDS:
+        logger.warning(f"Admin connection refused: user {user_id} is not an admin")
+        raise socketio.exceptions.ConnectionRefusedError('forbidden')
+    admin_sids.add(sid)
+    await sio.emit('metrics', admin_metrics(), to=sid, namespace=ADMIN_NAMESPACE)
+
+@sio.on('disconnect', namespace=ADMIN_NAMESPACE)
+async def admin_disconnect(sid):
+    admin_sids.discard(sid)
+
+async def push_admin_metrics(interval_seconds: float):
+    while True:
+        await asyncio.sleep(interval_seconds)
+        if not admin_sids: continue
+        try:
+            await sio.emit('metrics', admin_metrics(), namespace=ADMIN_NAMESPACE)
+        except Exception as e:
+            logger.error(f"❌ Erro ao enviar métricas administrativas: {e}")
@@ -0,0 +1,78 @@
+from typing import Dict, Any, Sequence, Tuple
+import numpy as np
+
+# Vote statistics computed once per reveal (on completion only when the task was never
+# revealed), persisted on the task and shipped in the reveal_votes payload, so clients
+# never recompute them.
+
+def deck_scale(deck_values: Sequence[str]) -> Tuple[str, Dict[str, float]]:
+    """Maps every estimable card of a deck to a point on its scale.
+
+    Mostly-numeric decks (Fibonacci, Sequential, numeric custom decks) use the card
+    value itself and drop non-numeric cards such as "?". Other decks (T-shirt,
+    textual custom decks) are ordinal: each card maps to its position in the deck."""
+    cards = [str(v) for v in deck_values if str(v) != "?"]
+    numeric = {}
+    for card in cards:
+        try:
+            value = float(card)
+        except ValueError:
+            continue
+        if np.isfinite(value): numeric[card] = value
+
+    if cards and len(numeric) * 2 >= len(cards):
+        return "numeric", numeric
+    return "ordinal", {card: float(index) for index, card in enumerate(cards)}
+
+def _round(value: float) -> float:
+    return round(float(value), 4)
+
+def compute_vote_statistics(values: Sequence[str], deck_values: Sequence[str]) -> Dict[str, Any]:
+    kind, scale = deck_scale(deck_values)
+    cards = list(scale.keys())
+    positions = np.fromiter(scale.values(), dtype=float, count=len(scale))
+
+    values = [str(v) for v in values]
+    estimable = [v for v in values if v in scale]
+    stats: Dict[str, Any] = {
+        "scale": kind,
+        "count": len(estimable),
+        "abstentions": len(values) - len(estimable),
+        "distribution": [],
+        "mean": None,
+        "median": None,
+        "mode": [],
+        "min": None,
+        "max": None,
+        "spread": None,
+        "std": None,
+        "agreement": None,
+        "consensus": False,
+        "nearest_card": None
+    }
+    if not estimable or not cards:
+        return stats
+
+    votes = np.fromiter((scale[v] for v in estimable), dtype=float, count=len(estimable))
+    uniq, counts = np.unique(votes, return_counts=True)
+
+    def card_at(point: float) -> str:
+        return cards[int(np.abs(positions - point).argmin())]
+
+    mean = votes.mean()
+    median = np.median(votes)
+    stats.update({
+        # A list rather than a dict: custom card labels are not safe Mongo keys.
+        "distribution": [{"card": card_at(p), "count": int(c)} for p, c in zip(uniq, counts)],
+        "mean": _round(mean),
+        "median": _round(median),
+        "mode": [card_at(p) for p in uniq[counts == counts.max()]],
+        "min": card_at(votes.min()),
+        "max": card_at(votes.max()),
+        "spread": _round(np.ptp(votes)),
+        "std": _round(votes.std()),
+        "agreement": _round(counts.max() / votes.size),
+        "consensus": bool(uniq.size == 1),
+        "nearest_card": card_at(mean)
+    })
+    return stats
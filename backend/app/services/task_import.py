@@ -0,0 +1,168 @@
+import csv
+import json
+import codecs
+import logging
+from typing import AsyncIterator, Dict, Any, List, Optional, Tuple
+from pymongo import InsertOne, UpdateOne
+
+from app.core.config import settings
+from app.db.repositories import keyed
+from app.models.domain import Task
+
+logger = logging.getLogger(__name__)
+
+IMPORT_FORMATS = ("ndjson", "csv", "json")
+
+class ImportFormatError(ValueError):
+    pass
+
+async def _iter_text(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    async for chunk in chunks:
+        text = decoder.decode(chunk)
+        if text: yield text
+    tail = decoder.decode(b"", final=True)
+    if tail: yield tail
+
+async def _iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    buffer = ""
+    async for text in _iter_text(chunks):
+        buffer += text
+        *lines, buffer = buffer.split("\n")
+        for line in lines: yield line
+    if buffer: yield buffer
+
+async def parse_ndjson(chunks: AsyncIterator[bytes]) -> AsyncIterator[Tuple[int, Any]]:
+    line_no = 0
+    async for line in _iter_lines(chunks):
+        line_no += 1
+        if not line.strip(): continue
+        try:
+            yield line_no, json.loads(line)
+        except json.JSONDecodeError as e:
+            yield line_no, ImportFormatError(f"Invalid JSON: {e.msg}")
+
+async def parse_csv(chunks: AsyncIterator[bytes]) -> AsyncIterator[Tuple[int, Any]]:
+    header: Optional[List[str]] = None
+    record, line_no = "", 0
+    async for line in _iter_lines(chunks):
+        line_no += 1
+        record += line + "\n"
+        # A quoted field may span lines; a record is complete once its quotes balance.
+        if record.count('"') % 2: continue
+        text, record = record, ""
+        if not text.strip(): continue
+        row = next(csv.reader([text]))
+        if header is None:
+            header = [h.strip().lower() for h in row]
+            if "title" not in header: raise ImportFormatError("CSV header must contain a 'title' column")
+            continue
+        yield line_no, dict(zip(header, row))
+    if record.strip():
+        yield line_no, ImportFormatError("Unterminated quoted field")
+
+async def parse_json_array(chunks: AsyncIterator[bytes]) -> AsyncIterator[Tuple[int, Any]]:
+    # Incrementally decodes the elements of a top-level JSON array, so the whole
+    # document never has to be held in memory.
+    decoder = json.JSONDecoder()
+    buffer, pos, index, started = "", 0, 0, False
+    async for text in _iter_text(chunks):
+        buffer = buffer[pos:] + text
+        pos = 0
+        while True:
+            while pos < len(buffer) and buffer[pos] in " \t\r\n,":
+                pos += 1
+            if pos >= len(buffer): break
+            if not started:
+                if buffer[pos] != "[": raise ImportFormatError("Expected a JSON array")
+                started, pos = True, pos + 1
+                continue
+            if buffer[pos] == "]": return
+            try:
+                item, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                break  # element not complete yet, wait for more data
+            index += 1
+            pos = end
+            yield index, item
+    if buffer[pos:].strip():
+        raise ImportFormatError("Truncated JSON array")
+
+PARSERS = {"ndjson": parse_ndjson, "csv": parse_csv, "json": parse_json_array}
+
+def detect_format(content_type: str) -> str:
+    content_type = (content_type or "").lower()
+    if "csv" in content_type: return "csv"
+    if "ndjson" in content_type or "jsonl" in content_type: return "ndjson"
+    return "json"
+
+def normalize_row(raw: Any) -> Dict[str, Optional[str]]:
+    if not isinstance(raw, dict): raise ImportFormatError("Each task must be an object")
+    title = str(raw.get("title") or "").strip()
+    if not title: raise ImportFormatError("Missing title")
+    external_id = raw.get("external_id", raw.get("id"))
+    external_id = str(external_id).strip() if external_id not in (None, "") else None
+    return {"title": title, "description": str(raw.get("description") or ""), "external_id": external_id}
+
+async def write_chunk(db, room_id: str, rows: List[Dict[str, Optional[str]]], next_position: int) -> Tuple[Dict[str, int], int]:
+    # Rows with an external ID are upserted on (room_id, external_id); only rows that
+    # create a task get a new position, assigned here in a single pass.
+    external_ids = [r["external_id"] for r in rows if r["external_id"]]
+    existing = set()
+    if external_ids:
+        cursor = db.tasks.find({"room_id": room_id, "external_id": {"$in": external_ids}}, {"_id": 0, "external_id": 1})
+        existing = {t["external_id"] for t in await cursor.to_list(None)}
+
+    ops = []
+    for row in rows:
+        if not row["external_id"]:
+            ops.append(InsertOne(keyed("tasks", Task(room_id=room_id, position=next_position, **row).model_dump())))
+            next_position += 1
+            continue
+        on_insert = {}
+        if row["external_id"] not in existing:
+            task = keyed("tasks", Task(room_id=room_id, position=next_position, **row).model_dump())
+            on_insert = {k: v for k, v in task.items() if k not in ("title", "description", "room_id", "external_id")}
+            existing.add(row["external_id"])
+            next_position += 1
+        update = {"$set": {"title": row["title"], "description": row["description"]}}
+        if on_insert: update["$setOnInsert"] = on_insert
+        ops.append(UpdateOne({"room_id": room_id, "external_id": row["external_id"]}, update, upsert=True))
+
+    result = await db.tasks.bulk_write(ops, ordered=True)
+    counts = {
+        "created": result.inserted_count + result.upserted_count,
+        "updated": result.matched_count
+    }
+    return counts, next_position
+
+async def import_tasks(db, room_id: str, chunks: AsyncIterator[bytes], fmt: str, on_progress=None) -> Dict[str, Any]:
+    last_task = await db.tasks.find_one({"room_id": room_id}, sort=[("position", -1)])
+    next_position = (last_task.get("position", 0) + 1) if last_task else 0
+
+    summary: Dict[str, Any] = {"processed": 0, "created": 0, "updated": 0, "errors": [], "truncated": False}
+    rows: List[Dict[str, Optional[str]]] = []
+
+    async def flush():
+        nonlocal rows, next_position
+        if not rows: return
+        counts, next_position = await write_chunk(db, room_id, rows, next_position)
+        summary["created"] += counts["created"]
+        summary["updated"] += counts["updated"]
+        rows = []
+        if on_progress: await on_progress(summary)
+
+    async for row_no, raw in PARSERS[fmt](chunks):
+        if summary["processed"] >= settings.IMPORT_MAX_ROWS:
+            summary["truncated"] = True
+            break
+        summary["processed"] += 1
+        try:
+            if isinstance(raw, Exception): raise raw
+            rows.append(normalize_row(raw))
+        except ImportFormatError as e:
+            if len(summary["errors"]) < 100: summary["errors"].append({"row": row_no, "detail": str(e)})
+            continue
+        if len(rows) >= settings.IMPORT_CHUNK_SIZE: await flush()
+    await flush()
+    return summary
@@ -0,0 +1,119 @@
+import argparse
+import asyncio
+import logging
+import sys
+from typing import Any, Dict, Iterable, List, Optional, Set
+from pymongo import DeleteOne, ReplaceOne
+
+logger = logging.getLogger(__name__)
+
+# Materialized admin user directory (`admin_users`): one row per user id, merged from the
+# Google account (`global_users`), the member profile (`profiles`) and the memberships,
+# with the lowercased sort keys the admin listing pages on (see app/db/indexes.py).
+# Write paths refresh the rows of the users they touch next to their own writes; the hot
+# paths (room joins, logins) schedule the refresh with refresh_later() so the request
+# does not wait for it. Like the stats counters this is best effort, and rebuild()
+# recomputes every row (migration 6, or `python -m app.services.user_directory --rebuild`).
+
+_pending: Set[asyncio.Task] = set()
+
+def rows_pipeline(user_ids: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+    """Directory rows of `user_ids` (every user when None), run on `global_users`."""
+    def only(field: str) -> List[Dict[str, Any]]:
+        return [{"$match": {field: {"$in": user_ids}}}] if user_ids is not None else []
+
+    return [
+        *only("id"),
+        {"$project": {"_id": 0, "id": 1, "g_name": {"$ifNull": ["$name", "Unknown"]}, "g_email": "$email", "g_picture": "$picture", "google": {"$literal": True}}},
+        {"$unionWith": {"coll": "profiles", "pipeline": [
+            *only("_id"),
+            {"$project": {"_id": 0, "id": "$_id", "r_name": "$name", "r_picture": "$picture"}}
+        ]}},
+        {"$unionWith": {"coll": "memberships", "pipeline": [
+            *only("user_id"),
+            {"$group": {"_id": "$user_id"}},
+            {"$project": {"_id": 0, "id": "$_id"}}
+        ]}},
+        {"$group": {
+            "_id": "$id",
+            "google": {"$max": "$google"},
+            "g_name": {"$max": "$g_name"},
+            "g_email": {"$max": "$g_email"},
+            "g_picture": {"$max": "$g_picture"},
+            "r_name": {"$max": "$r_name"},
+            "r_picture": {"$max": "$r_picture"}
+        }},
+        {"$project": {
+            "id": "$_id",
+            "name": {"$cond": [
+                "$google",
+                {"$cond": [{"$and": [{"$eq": ["$g_name", "Unknown"]}, "$r_name"]}, "$r_name", "$g_name"]},
+                {"$ifNull": ["$r_name", "Guest"]}
+            ]},
+            "email": {"$ifNull": ["$g_email", ""]},
+            "picture": {"$ifNull": ["$g_picture", "$r_picture"]},
+            "type": {"$cond": ["$google", "Google", "Guest"]}
+        }},
+        {"$addFields": {
+            "_type": {"$cond": [{"$eq": ["$type", "Google"]}, 0, 1]},
+            "_name": {"$toLower": "$name"},
+            "_email": {"$toLower": "$email"}
+        }}
+    ]
+
+async def refresh(db, user_ids: Iterable[str]):
+    """Recomputes the rows of `user_ids`, dropping those of users that no longer exist."""
+    user_ids = sorted(set(user_ids))
+    if db is None or not user_ids: return  # in-memory storage engine: no admin listing
+    try:
+        rows = await db.global_users.aggregate(rows_pipeline(user_ids)).to_list(None)
+        found = {row["_id"] for row in rows}
+        ops = [ReplaceOne({"_id": row["_id"]}, row, upsert=True) for row in rows]
+        ops += [DeleteOne({"_id": user_id}) for user_id in user_ids if user_id not in found]
+        await db.admin_users.bulk_write(ops, ordered=False)
+    except Exception as e:
+        logger.warning(f"⚠️ Falha ao atualizar o diretório de usuários: {e}")
+
+def refresh_later(db, user_ids: Iterable[str]):
+    """Runs refresh() in the background, keeping a reference until it finishes."""
+    if db is None: return
+    task = asyncio.create_task(refresh(db, list(user_ids)))
+    _pending.add(task)
+    task.add_done_callback(_pending.discard)
+
+async def rebuild(db) -> Dict[str, int]:
+    """Recomputes every row in one server-side pass and removes orphaned rows."""
+    await db.global_users.aggregate([
+        *rows_pipeline(),
+        {"$merge": {"into": "admin_users", "on": "_id", "whenMatched": "replace", "whenNotMatched": "insert"}}
+    ]).to_list(None)
+    orphans = await db.admin_users.aggregate([
+        {"$lookup": {"from": "global_users", "localField": "_id", "foreignField": "id", "as": "g"}},
+        {"$lookup": {"from": "profiles", "localField": "_id", "foreignField": "_id", "as": "p"}},
+        {"$lookup": {"from": "memberships", "localField": "_id", "foreignField": "user_id", "pipeline": [{"$limit": 1}], "as": "m"}},
+        {"$match": {"g": [], "p": [], "m": []}},
+        {"$project": {"_id": 1}}
+    ]).to_list(None)
+    removed = 0
+    if orphans: removed = (await db.admin_users.delete_many({"_id": {"$in": [o["_id"] for o in orphans]}})).deleted_count
+    return {"rows": await db.admin_users.count_documents({}), "removed": removed}
+
+async def _main() -> int:
+    from app.db.database import db_instance
+
+    await db_instance.connect()
+    db = db_instance.db
+    if db is None:
+        print("MONGO_URL is not configured")
+        return 2
+    try:
+        print(await rebuild(db))
+        return 0
+    finally:
+        await db_instance.disconnect()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild the admin_users directory from the source collections.")
+    parser.add_argument("--rebuild", action="store_true", required=True, help="rebuild every row")
+    parser.parse_args()
+    sys.exit(asyncio.run(_main()))
@@ -0,0 +1,23 @@
+import sys
+import os
+import pytest
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app.db import migrations, repositories
+from app.services import authz
+
+
+@pytest.fixture(autouse=True)
+def clear_authz_cache():
+    """Each test mocks its own DB, so cached role flags must not leak between tests."""
+    authz.membership_cache.clear()
+    authz.deck_cache.clear()
+    yield
+
+@pytest.fixture(autouse=True)
+def normalized_layout():
+    """Tests run against the normalized layout unless they switch to the legacy one themselves."""
+    yield
+    repositories.legacy_layout = False
+    migrations.applied.clear()
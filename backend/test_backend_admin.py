@@ -1,7 +1,10 @@
 import sys
 import os
+import asyncio
 import pytest
 from unittest.mock import AsyncMock, MagicMock
+from fastapi import HTTPException
+from pymongo import DeleteOne, ReplaceOne
 
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
@@ -10,61 +13,179 @@ from app.db.database import db_instance
 from app.services import socket
 from app.api.routers import auth, rooms, users, tasks, actions, admin
 from app.models import domain
+from app.services import cascade, user_directory
+from app.services.jobs import runner
+from app.db.repositories import keyed, membership_key
+
+
+class FakeCursor:
+    def __init__(self, docs):
+        self.docs = docs
+    def limit(self, n):
+        return FakeCursor(self.docs[:n])
+    async def to_list(self, length=None):
+        return list(self.docs)
+
+
+class FakeCollection:
+    """In-memory collection supporting the equality/$in queries used by the deletion cascade."""
+    def __init__(self, docs):
+        self.docs = [{"_id": f"oid-{i}-{id(self)}", **d} for i, d in enumerate(docs)]
+    @staticmethod
+    def _matches(doc, query):
+        for field, cond in query.items():
+            if isinstance(cond, dict) and "$in" in cond:
+                if doc.get(field) not in cond["$in"]: return False
+            elif doc.get(field) != cond:
+                return False
+        return True
+    def find(self, query, projection=None):
+        return FakeCursor([d for d in self.docs if self._matches(d, query)])
+    async def distinct(self, field, query):
+        return list(dict.fromkeys(d.get(field) for d in self.docs if self._matches(d, query)))
+    def aggregate(self, pipeline):
+        docs = [d for d in self.docs if self._matches(d, pipeline[0]["$match"])]
+        key = pipeline[1]["$group"]["_id"][1:]
+        groups = {}
+        for d in docs: groups[d.get(key)] = groups.get(d.get(key), 0) + 1
+        return FakeCursor([{"_id": k, "n": n} for k, n in groups.items()])
+    async def delete_many(self, query):
+        before = len(self.docs)
+        self.docs = [d for d in self.docs if not self._matches(d, query)]
+        return MagicMock(deleted_count=before - len(self.docs))
+    async def delete_one(self, query):
+        for i, d in enumerate(self.docs):
+            if self._matches(d, query):
+                del self.docs[i]
+                return MagicMock(deleted_count=1)
+        return MagicMock(deleted_count=0)
+    async def count_documents(self, query):
+        return len([d for d in self.docs if self._matches(d, query)])
+
+
+def _fake_db(**collections):
+    db = MagicMock()
+    for name in ("rooms", "tasks", "votes", "memberships", "profiles", "global_users", "archived_rooms"):
+        docs = collections.get(name, [])
+        if name in ("rooms", "tasks", "votes"): docs = [keyed(name, d) for d in docs]
+        if name == "memberships": docs = [{"_id": membership_key(d["user_id"], d["room_id"]), **d} for d in docs]
+        setattr(db, name, FakeCollection(docs))
+    db.jobs.insert_one = AsyncMock()
+    db.jobs.update_one = AsyncMock()
+    db.stats.bulk_write = AsyncMock()
+    db.stats.delete_many = AsyncMock()
+    return db
+
+def _ids(collection):
+    return sorted(d.get("id") for d in collection.docs)
+
 
 
 @pytest.mark.asyncio
 async def test_get_admin_users():
     mock_db = MagicMock()
     
-    # Mock users aggregation cursor
-    mock_cursor = AsyncMock()
-    mock_cursor.to_list.return_value = [
-        {"_id": "guest-1", "name": "Guest 1", "picture": None, "rooms": ["ROOM_1"], "is_online": True},
-        {"_id": "google-1", "name": "Google 1", "picture": None, "rooms": ["ROOM_1", "ROOM_2"], "is_online": False}
-    ]
-    mock_db.users.aggregate.return_value = mock_cursor
-    
-    # Mock global_users
-    mock_global_cursor = AsyncMock()
-    mock_global_cursor.to_list.return_value = [
-        {"id": "google-1", "name": "Google 1", "email": "g1@test.com", "picture": None}
-    ]
-    mock_db.global_users.find.return_value = mock_global_cursor
-    
-    # Mock document counts
-    mock_db.rooms.count_documents = AsyncMock(side_effect=lambda q: 1 if q.get("owner_id") == "google-1" else 0)
-    mock_db.votes.count_documents = AsyncMock(side_effect=lambda q: 3 if q.get("user_id") == "guest-1" else 1)
+    # One aggregation over the directory rows for the page, plus the count
+    mock_cursor = MagicMock()
+    mock_cursor.to_list = AsyncMock(return_value=[
+        {"id": "google-1", "name": "Google 1", "email": "g1@test.com", "type": "Google", "rooms_participated": 2, "is_online": False, "rooms_owned": 1, "votes_cast": 1, "_type": 0, "_name": "google 1", "_email": "g1@test.com"},
+        {"id": "guest-1", "name": "Guest 1", "email": "", "type": "Guest", "rooms_participated": 1, "is_online": True, "rooms_owned": 0, "votes_cast": 3, "_type": 1, "_name": "guest 1", "_email": ""},
+        {"id": "guest-2", "name": "Guest 2", "email": "", "type": "Guest", "rooms_participated": 1, "is_online": False, "rooms_owned": 0, "votes_cast": 0, "_type": 1, "_name": "guest 2", "_email": ""}
+    ])
+    mock_db.admin_users.aggregate.return_value = mock_cursor
+    mock_db.admin_users.count_documents = AsyncMock(return_value=3)
+    mock_db.rooms.count_documents = AsyncMock()
+    mock_db.votes.count_documents = AsyncMock()
     
     db_instance.db = mock_db
     
-    res = await admin.get_admin_users()
-    
-    assert len(res) == 2
-    
-    # Google user should be first because of sorting key
-    assert res[0]["id"] == "google-1"
-    assert res[0]["type"] == "Google"
-    assert res[0]["email"] == "g1@test.com"
-    assert res[0]["rooms_owned"] == 1
-    assert res[0]["votes_cast"] == 1
-    assert res[0]["rooms_participated"] == 2
+    res = await admin.get_admin_users(q=None, sort="type", order="asc", limit=2, cursor=None)
+    
+    assert res["total"] == 3
+    assert [u["id"] for u in res["items"]] == ["google-1", "guest-1"]
+    assert res["items"][0]["rooms_owned"] == 1
+    assert "_name" not in res["items"][0]
+    
+    # No per-user count queries, and no pass over every user: the page is sorted and
+    # limited on the directory rows before anything is looked up
+    mock_db.admin_users.aggregate.assert_called_once()
+    mock_db.global_users.aggregate.assert_not_called()
+    mock_db.rooms.count_documents.assert_not_called()
+    mock_db.votes.count_documents.assert_not_called()
+    pipeline = mock_db.admin_users.aggregate.call_args[0][0]
+    assert pipeline[:2] == [{"$sort": {"_type": 1, "_name": 1, "id": 1}}, {"$limit": 3}]
+    assert not any("$unionWith" in stage or "$group" in stage for stage in pipeline)
+    
+    # The next page seeks past the last returned item, within the search
+    await admin.get_admin_users(q="Gu", sort="type", order="asc", limit=2, cursor=res["next_cursor"])
+    pipeline = mock_db.admin_users.aggregate.call_args[0][0]
+    search = {"$or": [{"_name": {"$regex": "^gu"}}, {"_email": {"$regex": "^gu"}}]}
+    assert pipeline[0] == {"$match": {"$and": [search, {"$or": [
+        {"_type": {"$gt": 1}},
+        {"_type": 1, "_name": {"$gt": "guest 1"}},
+        {"_type": 1, "_name": "guest 1", "id": {"$gt": "guest-1"}}
+    ]}]}}
+    mock_db.admin_users.count_documents.assert_called_with(search)
+
+@pytest.mark.asyncio
+async def test_join_refreshes_directory_in_background(monkeypatch):
+    """Verify that joining a room schedules the directory refresh instead of awaiting it."""
+    from app.db import repositories
+    repos = repositories.memory_repositories()
+    repos.db = MagicMock()
+    await repos.rooms.insert({"id": "ROOM_1", "owner_id": "owner-1"})
+    started = asyncio.Event()
+    release = asyncio.Event()
+    async def slow_refresh(db, user_ids):
+        started.set()
+        await release.wait()
+    monkeypatch.setattr(user_directory, "refresh", slow_refresh)
+    monkeypatch.setattr(rooms.counters, "bump", AsyncMock())
+
+    user, _ = await rooms.join_room_member(repos, "ROOM_1", domain.UserJoin(room_id="ROOM_1", user_id="user-1", name="Ana"))
+
+    assert user["id"] == "user-1" and len(user_directory._pending) == 1
+    await started.wait()
+    release.set()
+    await asyncio.gather(*user_directory._pending)
+    assert not user_directory._pending
+
+@pytest.mark.asyncio
+async def test_user_directory_refresh_replaces_and_drops_rows():
+    """Verify that refreshing rows recomputes existing users and removes deleted ones."""
+    mock_db = MagicMock()
+    mock_cursor = MagicMock()
+    mock_cursor.to_list = AsyncMock(return_value=[{"_id": "u1", "id": "u1", "name": "Ana", "_name": "ana"}])
+    mock_db.global_users.aggregate.return_value = mock_cursor
+    mock_db.admin_users.bulk_write = AsyncMock()
+
+    await user_directory.refresh(mock_db, ["u2", "u1", "u1"])
+
+    pipeline = mock_db.global_users.aggregate.call_args[0][0]
+    assert pipeline[0] == {"$match": {"id": {"$in": ["u1", "u2"]}}}
+    ops = mock_db.admin_users.bulk_write.call_args[0][0]
+    assert isinstance(ops[0], ReplaceOne) and ops[0]._filter == {"_id": "u1"}
+    assert isinstance(ops[1], DeleteOne) and ops[1]._filter == {"_id": "u2"}
+
+@pytest.mark.asyncio
+async def test_get_admin_users_rejects_bad_cursor():
+    db_instance.db = MagicMock()
     
-    assert res[1]["id"] == "guest-1"
-    assert res[1]["type"] == "Guest"
-    assert res[1]["rooms_owned"] == 0
-    assert res[1]["votes_cast"] == 3
-    assert res[1]["rooms_participated"] == 1
+    with pytest.raises(HTTPException) as exc:
+        await admin.get_admin_users(q=None, sort="name", order="asc", limit=10, cursor="not-a-cursor")
+    assert exc.value.status_code == 400
 
 @pytest.mark.asyncio
 async def test_check_user_relations():
     mock_db = MagicMock()
     mock_db.rooms.count_documents = AsyncMock(return_value=2)
     mock_db.votes.count_documents = AsyncMock(return_value=5)
-    mock_db.users.count_documents = AsyncMock(return_value=3)
+    mock_db.memberships.count_documents = AsyncMock(return_value=3)
     
     db_instance.db = mock_db
     
     res = await admin.check_user_relations("test-user-id")
+    mock_db.memberships.count_documents.assert_called_once_with({"user_id": "test-user-id"})
     
     assert res["owned_rooms"] == 2
     assert res["votes"] == 5
@@ -72,220 +193,295 @@ async def test_check_user_relations():
     assert res["has_relations"] is True
 
 @pytest.mark.asyncio
-async def test_delete_user_cascade():
-    mock_db = MagicMock()
-    
-    # User owns one room
-    mock_rooms_cursor = AsyncMock()
-    mock_rooms_cursor.to_list.return_value = [{"id": "ROOM_123"}]
-    mock_db.rooms.find.return_value = mock_rooms_cursor
-    
-    # Check returns relations
-    mock_db.votes.count_documents = AsyncMock(return_value=2)
-    
-    # Memberships
-    mock_memberships_cursor = AsyncMock()
-    mock_memberships_cursor.to_list.return_value = [{"room_id": "ROOM_123"}, {"room_id": "ROOM_OTHER"}]
-    mock_db.users.find.return_value = mock_memberships_cursor
-    
-    # Tasks in owned room
-    mock_tasks_cursor = AsyncMock()
-    mock_tasks_cursor.to_list.return_value = [{"id": "TASK_1"}]
-    mock_db.tasks.find.return_value = mock_tasks_cursor
-    
-    # Async Mocks for delete
-    mock_db.votes.delete_many = AsyncMock()
-    mock_db.tasks.delete_many = AsyncMock()
-    mock_db.users.delete_many = AsyncMock()
-    mock_db.rooms.delete_one = AsyncMock()
-    mock_db.global_users.delete_one = AsyncMock()
-    
+async def test_delete_user_cascade(monkeypatch):
+    mock_db = _fake_db(
+        rooms=[{"id": "ROOM_123", "owner_id": "user-1"}, {"id": "ROOM_OTHER", "owner_id": "user-2"}],
+        tasks=[{"id": "TASK_1", "room_id": "ROOM_123"}, {"id": "TASK_2", "room_id": "ROOM_OTHER"}],
+        votes=[
+            {"task_id": "TASK_1", "user_id": "user-2"},
+            {"task_id": "TASK_2", "user_id": "user-1"},
+            {"task_id": "TASK_2", "user_id": "user-2"}
+        ],
+        memberships=[
+            {"user_id": "user-1", "room_id": "ROOM_123"},
+            {"user_id": "user-2", "room_id": "ROOM_123"},
+            {"user_id": "user-1", "room_id": "ROOM_OTHER"},
+            {"user_id": "user-2", "room_id": "ROOM_OTHER"}
+        ],
+        profiles=[{"_id": "user-1", "name": "Ana"}, {"_id": "user-2", "name": "Bia"}],
+        global_users=[{"id": "user-1"}, {"id": "user-2"}]
+    )
     db_instance.db = mock_db
-    socket.sio.emit = AsyncMock()
+    mock_emit = AsyncMock()
+    monkeypatch.setattr(cascade.sio, "emit", mock_emit)
     mock_broadcast = AsyncMock()
-    socket.broadcast_room_state = actions.broadcast_room_state = rooms.broadcast_room_state = admin.broadcast_room_state = users.broadcast_room_state = mock_broadcast
+    monkeypatch.setattr(cascade, "broadcast_room_state", mock_broadcast)
     
-    # Call delete
-    res = await admin.delete_user("user-1", confirm=True)
-    
-    assert res["status"] == "success"
-    
-    # Deletes votes for tasks in owned rooms
-    mock_db.votes.delete_many.assert_any_call({"task_id": {"$in": ["TASK_1"]}})
-    
-    # Deletes tasks, users, and room
-    mock_db.tasks.delete_many.assert_any_call({"room_id": "ROOM_123"})
-    mock_db.users.delete_many.assert_any_call({"room_id": "ROOM_123"})
-    mock_db.rooms.delete_one.assert_called_with({"id": "ROOM_123"})
+    # Relations require confirmation
+    with pytest.raises(HTTPException) as exc:
+        await admin.delete_user("user-1")
+    assert exc.value.status_code == 400
     
-    # Deletes user direct votes and memberships
-    mock_db.votes.delete_many.assert_any_call({"user_id": "user-1"})
-    mock_db.users.delete_many.assert_any_call({"id": "user-1"})
-    mock_db.global_users.delete_one.assert_called_with({"id": "user-1"})
-    
-    # Emitted socket event for room deleted
-    socket.sio.emit.assert_any_call('room_deleted', {"room_id": "ROOM_123"}, room="ROOM_123")
-    
-    # Broadcast to other affected rooms
-    mock_broadcast.assert_called_with("ROOM_OTHER")
+    res = await admin.delete_user("user-1", confirm=True)
+    assert res["status"] == "accepted"
+    await runner.wait(res["job_id"])
+    
+    job = mock_db.jobs.update_one.call_args[0][1]["$set"]
+    assert job["status"] == "completed"
+    assert job["result"]["deleted"] == {"rooms": 1, "tasks": 1, "votes": 2, "memberships": 3, "profiles": 1, "users": 1, "archived_rooms": 0}
+    
+    # Owned room cascaded, other rooms keep their data minus the user's votes and membership
+    assert _ids(mock_db.rooms) == ["ROOM_OTHER"]
+    assert _ids(mock_db.tasks) == ["TASK_2"]
+    assert [v["user_id"] for v in mock_db.votes.docs] == ["user-2"]
+    assert [m["_id"] for m in mock_db.memberships.docs] == ["ROOM_OTHER:user-2"]
+    assert [p["_id"] for p in mock_db.profiles.docs] == ["user-2"]
+    assert _ids(mock_db.global_users) == ["user-2"]
+    
+    mock_emit.assert_any_call('room_deleted', {"room_id": "ROOM_123"}, room="ROOM_123")
+    mock_broadcast.assert_called_once_with("ROOM_OTHER")
+
+def _bulk_ops(mock_bulk_write):
+    return [(type(op).__name__, getattr(op, "_filter", None), getattr(op, "_doc", None)) for op in mock_bulk_write.call_args[0][0]]
+
+def _vote(task_id, user_id):
+    return {"_id": f"{task_id}:{user_id}", "task_id": task_id, "user_id": user_id, "value": "5"}
+
+def _member(room_id, user_id):
+    return {"_id": f"{room_id}:{user_id}", "user_id": user_id, "room_id": room_id, "is_admin": False}
 
 @pytest.mark.asyncio
-async def test_merge_users():
+async def test_merge_users(monkeypatch):
     mock_db = MagicMock()
     
-    mock_db.rooms.update_many = AsyncMock()
-    mock_db.votes.find = MagicMock()
-    mock_votes_cursor = AsyncMock()
-    mock_votes_cursor.to_list.return_value = [
-        {"_id": "v1", "task_id": "TASK_1", "user_id": "guest-1", "value": "5"},
-        {"_id": "v2", "task_id": "TASK_2", "user_id": "guest-1", "value": "8"}
-    ]
-    mock_db.votes.find.return_value = mock_votes_cursor
-    
-    # mock find_one for vote collision check
-    mock_db.votes.find_one = AsyncMock(side_effect=lambda q: {"_id": "target-v1"} if q.get("task_id") == "TASK_1" else None)
-    
-    mock_db.votes.delete_one = AsyncMock()
-    mock_db.votes.update_one = AsyncMock()
-    
-    # User memberships
-    mock_db.users.find = MagicMock()
-    mock_users_cursor = AsyncMock()
-    mock_users_cursor.to_list.return_value = [
-        {"room_id": "ROOM_A"},
-        {"room_id": "ROOM_B"}
-    ]
-    mock_db.users.find.return_value = mock_users_cursor
-    
-    # mock find_one for membership collision check
-    mock_db.users.find_one = AsyncMock(side_effect=lambda q: {"id": "google-1"} if q.get("room_id") == "ROOM_A" else None)
-    
-    mock_db.users.delete_one = AsyncMock()
-    mock_db.users.update_one = AsyncMock()
-    mock_db.global_users.delete_one = AsyncMock()
+    # Votes grouped by task: TASK_1 conflicts with the target, TASK_2 is voted by both sources
+    mock_db.votes.aggregate.return_value = FakeCursor([
+        {"_id": "TASK_1", "has_target": True, "docs": [_vote("TASK_1", "google-1"), _vote("TASK_1", "guest-1")]},
+        {"_id": "TASK_2", "has_target": False, "docs": [_vote("TASK_2", "guest-2"), _vote("TASK_2", "guest-1")]}
+    ])
+    # Memberships grouped by room: the target is already in ROOM_A
+    mock_db.memberships.aggregate.return_value = FakeCursor([
+        {"_id": "ROOM_A", "has_target": True, "docs": [_member("ROOM_A", "google-1"), _member("ROOM_A", "guest-1"), _member("ROOM_A", "guest-2")]},
+        {"_id": "ROOM_B", "has_target": False, "docs": [_member("ROOM_B", "guest-1")]}
+    ])
+    mock_db.rooms.update_many = AsyncMock(return_value=MagicMock(modified_count=2))
+    mock_db.votes.bulk_write = AsyncMock()
+    mock_db.memberships.bulk_write = AsyncMock()
+    mock_db.votes.find_one = AsyncMock()
+    mock_db.memberships.find_one = AsyncMock()
+    mock_db.profiles.find_one = AsyncMock(side_effect=lambda q: {"_id": q["_id"], "name": "Convidado 1"} if q["_id"] == "guest-1" else None)
+    mock_db.profiles.update_one = AsyncMock()
+    mock_db.profiles.delete_many = AsyncMock()
+    mock_db.global_users.delete_many = AsyncMock()
+    mock_db.stats.bulk_write = AsyncMock()
+    mock_db.stats.delete_many = AsyncMock()
     
     db_instance.db = mock_db
     mock_broadcast = AsyncMock()
-    socket.broadcast_room_state = actions.broadcast_room_state = rooms.broadcast_room_state = admin.broadcast_room_state = users.broadcast_room_state = mock_broadcast
+    monkeypatch.setattr(admin, "broadcast_room_state", mock_broadcast)
     
     data = {
         "target_id": "google-1",
-        "source_ids": ["guest-1"]
+        "source_ids": ["guest-1", "guest-2", "google-1"]
     }
     
     res = await admin.merge_users(data)
     
     assert res["status"] == "success"
-    assert res["merged_count"] == 1
-    
-    # Transferred rooms owned
-    mock_db.rooms.update_many.assert_called_with({"owner_id": "guest-1"}, {"$set": {"owner_id": "google-1"}})
+    assert res["merged_count"] == 2
+    assert res["votes_moved"] == 1 and res["votes_conflicting"] == 2
+    assert res["memberships_moved"] == 1 and res["memberships_conflicting"] == 2
+    
+    # No per-document lookups
+    mock_db.votes.find_one.assert_not_called()
+    mock_db.memberships.find_one.assert_not_called()
+    
+    # Transferred rooms owned by every source at once
+    mock_db.rooms.update_many.assert_called_once_with({"owner_id": {"$in": ["guest-1", "guest-2"]}}, {"$set": {"owner_id": "google-1"}})
+    
+    # Vote conflicts: the first source's vote on TASK_2 moves (rekeyed to the target),
+    # the rest is deleted in bulk
+    assert _bulk_ops(mock_db.votes.bulk_write) == [
+        ("InsertOne", None, {"_id": "TASK_2:google-1", "task_id": "TASK_2", "user_id": "google-1", "value": "5"}),
+        ("DeleteOne", {"_id": "TASK_2:guest-1"}, None),
+        ("DeleteMany", {"_id": {"$in": ["TASK_1:guest-1", "TASK_2:guest-2"]}}, None)
+    ]
     
-    # Vote collision handling: deleted v1, updated v2
-    mock_db.votes.delete_one.assert_called_with({"_id": "v1"})
-    mock_db.votes.update_one.assert_called_with({"_id": "v2"}, {"$set": {"user_id": "google-1"}})
+    # Membership conflicts: sources in ROOM_A are dropped, the one in ROOM_B moves
+    assert _bulk_ops(mock_db.memberships.bulk_write) == [
+        ("InsertOne", None, {"_id": "ROOM_B:google-1", "user_id": "google-1", "room_id": "ROOM_B", "is_admin": False}),
+        ("DeleteOne", {"_id": "ROOM_B:guest-1"}, None),
+        ("DeleteMany", {"_id": {"$in": ["ROOM_A:guest-1", "ROOM_A:guest-2"]}}, None)
+    ]
     
-    # Membership collision handling: deleted guest-1 in ROOM_A, updated guest-1 in ROOM_B
-    mock_db.users.delete_one.assert_called_with({"id": "guest-1", "room_id": "ROOM_A"})
-    mock_db.users.update_one.assert_called_with(
-        {"id": "guest-1", "room_id": "ROOM_B"},
-        {"$set": {"id": "google-1"}}
-    )
+    # The target has no profile yet and takes the first source's
+    mock_db.profiles.update_one.assert_called_once_with({"_id": "google-1"}, {"$setOnInsert": {"name": "Convidado 1"}}, upsert=True)
+    mock_db.profiles.delete_many.assert_called_once_with({"_id": {"$in": ["guest-1", "guest-2"]}})
     
-    # Deleted from global_users
-    mock_db.global_users.delete_one.assert_called_with({"id": "guest-1"})
+    mock_db.global_users.delete_many.assert_called_with({"id": {"$in": ["guest-1", "guest-2"]}})
     
-    # Broadcast to affected rooms
-    mock_broadcast.assert_any_call("ROOM_A")
-    mock_broadcast.assert_any_call("ROOM_B")
+    # One broadcast per affected room
+    assert sorted(c.args[0] for c in mock_broadcast.call_args_list) == ["ROOM_A", "ROOM_B"]
 
 @pytest.mark.asyncio
-async def test_batch_delete_users():
+async def test_merge_users_dry_run():
     mock_db = MagicMock()
+    mock_db.votes.aggregate.return_value = FakeCursor([
+        {"_id": "TASK_1", "has_target": False, "docs": [_vote("TASK_1", "guest-1")]}
+    ])
+    mock_db.memberships.aggregate.return_value = FakeCursor([])
+    mock_db.rooms.count_documents = AsyncMock(return_value=3)
+    mock_db.rooms.update_many = AsyncMock()
+    mock_db.votes.bulk_write = AsyncMock()
+    db_instance.db = mock_db
     
-    # 2 users own rooms
-    mock_rooms_cursor = AsyncMock()
-    mock_rooms_cursor.to_list.return_value = [{"id": "ROOM_1"}, {"id": "ROOM_2"}]
-    mock_db.rooms.find.return_value = mock_rooms_cursor
-    
-    # Check returns relations
-    mock_db.rooms.count_documents = AsyncMock(return_value=2)
-    mock_db.votes.count_documents = AsyncMock(return_value=4)
-    mock_db.users.count_documents = AsyncMock(return_value=3)
-    
-    # Memberships
-    mock_memberships_cursor = AsyncMock()
-    mock_memberships_cursor.to_list.return_value = [{"room_id": "ROOM_1"}, {"room_id": "ROOM_3"}]
-    mock_db.users.find.return_value = mock_memberships_cursor
-    
-    # Tasks
-    mock_tasks_cursor = AsyncMock()
-    mock_tasks_cursor.to_list.return_value = [{"id": "TASK_1"}]
-    mock_db.tasks.find.return_value = mock_tasks_cursor
-    
-    # Async delete mocks
-    mock_db.votes.delete_many = AsyncMock()
-    mock_db.tasks.delete_many = AsyncMock()
-    mock_db.users.delete_many = AsyncMock()
-    mock_db.rooms.delete_many = AsyncMock()
-    mock_db.global_users.delete_many = AsyncMock()
+    res = await admin.merge_users({"target_id": "google-1", "source_ids": ["guest-1"], "dry_run": True})
     
+    assert res["dry_run"] is True
+    assert res["rooms_transferred"] == 3
+    assert res["votes_moved"] == 1
+    mock_db.rooms.update_many.assert_not_called()
+    mock_db.votes.bulk_write.assert_not_called()
+
+@pytest.mark.asyncio
+async def test_batch_delete_users(monkeypatch):
+    mock_db = _fake_db(
+        rooms=[{"id": "ROOM_1", "owner_id": "user-1"}, {"id": "ROOM_2", "owner_id": "user-2"}, {"id": "ROOM_3", "owner_id": "user-3"}],
+        tasks=[{"id": "TASK_1", "room_id": "ROOM_1"}],
+        votes=[{"task_id": "TASK_1", "user_id": "user-3"}],
+        memberships=[{"user_id": "user-1", "room_id": "ROOM_1"}, {"user_id": "user-1", "room_id": "ROOM_3"}, {"user_id": "user-3", "room_id": "ROOM_3"}],
+        global_users=[{"id": "user-1"}, {"id": "user-2"}, {"id": "user-3"}]
+    )
     db_instance.db = mock_db
-    socket.sio.emit = AsyncMock()
+    monkeypatch.setattr(cascade.sio, "emit", AsyncMock())
     mock_broadcast = AsyncMock()
-    socket.broadcast_room_state = actions.broadcast_room_state = rooms.broadcast_room_state = admin.broadcast_room_state = users.broadcast_room_state = mock_broadcast
+    monkeypatch.setattr(cascade, "broadcast_room_state", mock_broadcast)
+    monkeypatch.setattr(cascade.settings, "DELETE_BATCH_SIZE", 1)
     
     req = domain.BatchDeleteRequest(ids=["user-1", "user-2"], confirm=True)
     res = await admin.batch_delete_users(req)
     
-    assert res["status"] == "success"
+    assert res["status"] == "accepted"
     assert res["deleted_count"] == 2
+    await runner.wait(res["job_id"])
     
-    # Deletes votes for tasks in owned rooms
-    mock_db.votes.delete_many.assert_any_call({"task_id": {"$in": ["TASK_1"]}})
-    
-    # Deletes tasks, users, and rooms
-    mock_db.tasks.delete_many.assert_any_call({"room_id": {"$in": ["ROOM_1", "ROOM_2"]}})
-    mock_db.users.delete_many.assert_any_call({"room_id": {"$in": ["ROOM_1", "ROOM_2"]}})
-    mock_db.rooms.delete_many.assert_any_call({"id": {"$in": ["ROOM_1", "ROOM_2"]}})
-    
-    # Deletes direct votes, memberships, and global records
-    mock_db.votes.delete_many.assert_any_call({"user_id": {"$in": ["user-1", "user-2"]}})
-    mock_db.users.delete_many.assert_any_call({"id": {"$in": ["user-1", "user-2"]}})
-    mock_db.global_users.delete_many.assert_any_call({"id": {"$in": ["user-1", "user-2"]}})
+    assert _ids(mock_db.rooms) == ["ROOM_3"]
+    assert mock_db.tasks.docs == []
+    assert mock_db.votes.docs == []
+    assert [(m["user_id"], m["room_id"]) for m in mock_db.memberships.docs] == [("user-3", "ROOM_3")]
+    assert _ids(mock_db.global_users) == ["user-3"]
     
     # Broadcast to remaining affected rooms
-    mock_broadcast.assert_called_with("ROOM_3")
+    mock_broadcast.assert_called_once_with("ROOM_3")
 
 @pytest.mark.asyncio
-async def test_batch_delete_rooms():
-    mock_db = MagicMock()
+async def test_delete_job_can_be_cancelled(monkeypatch):
+    mock_db = _fake_db(
+        rooms=[{"id": "ROOM_A"}, {"id": "ROOM_B"}],
+        tasks=[{"id": f"T{i}", "room_id": "ROOM_A"} for i in range(5)]
+    )
+    db_instance.db = mock_db
+    monkeypatch.setattr(cascade.sio, "emit", AsyncMock())
+    monkeypatch.setattr(cascade.settings, "DELETE_BATCH_SIZE", 2)
     
-    # Tasks in rooms
-    mock_tasks_cursor = AsyncMock()
-    mock_tasks_cursor.to_list.return_value = [{"id": "T1"}, {"id": "T2"}]
-    mock_db.tasks.find.return_value = mock_tasks_cursor
+    res = await admin.batch_delete_rooms(domain.BatchDeleteRoomsRequest(ids=["ROOM_A", "ROOM_B"]))
+    await admin.cancel_job(res["job_id"])
+    await runner.wait(res["job_id"])
     
-    mock_db.votes.delete_many = AsyncMock()
-    mock_db.tasks.delete_many = AsyncMock()
-    mock_db.users.delete_many = AsyncMock()
-    mock_db.rooms.delete_many = AsyncMock()
+    assert mock_db.jobs.update_one.call_args[0][1]["$set"]["status"] == "cancelled"
+    assert _ids(mock_db.rooms) == ["ROOM_A", "ROOM_B"]
     
+    # A finished job can no longer be cancelled
+    mock_db.jobs.find_one = AsyncMock(return_value={"id": res["job_id"], "status": "cancelled", "created_at": "2024-01-01T00:00:00+00:00"})
+    with pytest.raises(HTTPException) as exc:
+        await admin.cancel_job(res["job_id"])
+    assert exc.value.status_code == 409
+
+@pytest.mark.asyncio
+async def test_batch_delete_rooms(monkeypatch):
+    mock_db = _fake_db(
+        rooms=[{"id": "ROOM_A"}, {"id": "ROOM_B"}, {"id": "ROOM_C"}],
+        tasks=[{"id": "T1", "room_id": "ROOM_A"}, {"id": "T2", "room_id": "ROOM_B"}, {"id": "T3", "room_id": "ROOM_C"}],
+        votes=[{"task_id": "T1", "user_id": "u1"}, {"task_id": "T2", "user_id": "u1"}, {"task_id": "T3", "user_id": "u1"}],
+        memberships=[{"user_id": "u1", "room_id": "ROOM_A"}, {"user_id": "u1", "room_id": "ROOM_C"}]
+    )
     db_instance.db = mock_db
-    socket.sio.emit = AsyncMock()
+    mock_emit = AsyncMock()
+    monkeypatch.setattr(cascade.sio, "emit", mock_emit)
     
-    req = domain.BatchDeleteRoomsRequest(ids=["ROOM_A", "ROOM_B"])
+    req = domain.BatchDeleteRoomsRequest(ids=["room_a", "ROOM_B"])
     res = await admin.batch_delete_rooms(req)
     
-    assert res["status"] == "success"
+    assert res["status"] == "accepted"
     assert res["deleted_count"] == 2
+    assert (await admin.get_job(res["job_id"]))["type"] == "delete_rooms"
+    await runner.wait(res["job_id"])
     
     # Deletes votes, tasks, memberships and rooms
-    mock_db.votes.delete_many.assert_called_with({"task_id": {"$in": ["T1", "T2"]}})
-    mock_db.tasks.delete_many.assert_called_with({"room_id": {"$in": ["ROOM_A", "ROOM_B"]}})
-    mock_db.users.delete_many.assert_called_with({"room_id": {"$in": ["ROOM_A", "ROOM_B"]}})
-    mock_db.rooms.delete_many.assert_called_with({"id": {"$in": ["ROOM_A", "ROOM_B"]}})
+    assert _ids(mock_db.rooms) == ["ROOM_C"]
+    assert _ids(mock_db.tasks) == ["T3"]
+    assert [v["task_id"] for v in mock_db.votes.docs] == ["T3"]
+    assert [m["room_id"] for m in mock_db.memberships.docs] == ["ROOM_C"]
     
     # Socket emits
-    socket.sio.emit.assert_any_call('room_deleted', {"room_id": "ROOM_A"}, room="ROOM_A")
-    socket.sio.emit.assert_any_call('room_deleted', {"room_id": "ROOM_B"}, room="ROOM_B")
+    mock_emit.assert_any_call('room_deleted', {"room_id": "ROOM_A"}, room="ROOM_A")
+    mock_emit.assert_any_call('room_deleted', {"room_id": "ROOM_B"}, room="ROOM_B")
+
+@pytest.mark.asyncio
+async def test_get_admin_rooms():
+    mock_db = MagicMock()
+    
+    mock_cursor = MagicMock()
+    mock_cursor.to_list = AsyncMock(return_value=[
+        {"id": "ROOM_2", "name": "Room 2", "owner_id": "u1", "created_at": "2024-01-02", "deck_type": "FIBONACCI", "tasks_count": 3, "active_users_count": 1, "total_users_count": 2},
+        {"id": "ROOM_1", "name": "Room 1", "owner_id": "u1", "created_at": "2024-01-01", "deck_type": "FIBONACCI", "tasks_count": 0, "active_users_count": 0, "total_users_count": 1}
+    ])
+    mock_db.rooms.aggregate.return_value = mock_cursor
+    mock_db.rooms.count_documents = AsyncMock(return_value=5)
+    mock_db.tasks.count_documents = AsyncMock()
+    mock_db.memberships.count_documents = AsyncMock()
+    
+    db_instance.db = mock_db
+    
+    res = await admin.get_admin_rooms(owner_id="u1", deck_type=None, active=None, order="desc", limit=1, cursor=None, total="exact")
+    
+    assert res["total"] == 5
+    assert [r["id"] for r in res["items"]] == ["ROOM_2"]
+    assert res["items"][0]["tasks_count"] == 3
+    mock_db.rooms.count_documents.assert_called_once_with({"owner_id": "u1"})
+    
+    # Counts come from the aggregation, not per-room queries
+    mock_db.tasks.count_documents.assert_not_called()
+    mock_db.memberships.count_documents.assert_not_called()
+    
+    # Keyset pagination on created_at, with counts looked up only after the limit
+    await admin.get_admin_rooms(owner_id="u1", deck_type=None, active=None, order="desc", limit=1, cursor=res["next_cursor"], total="none")
+    pipeline = mock_db.rooms.aggregate.call_args[0][0]
+    assert pipeline[0] == {"$match": {"$and": [
+        {"owner_id": "u1"},
+        {"$or": [{"created_at": {"$lt": "2024-01-02"}}, {"created_at": "2024-01-02", "id": {"$lt": "ROOM_2"}}]}
+    ]}}
+    assert pipeline[2] == {"$limit": 2}
+    assert mock_db.rooms.count_documents.call_count == 1
+
+@pytest.mark.asyncio
+async def test_operational_admin_routes_require_allowlisted_user(monkeypatch):
+    """Verify that jobs, retention, migrations, stats, analytics and diagnostics routes
+    depend on require_admin, which only lets ADMIN_USER_IDS through."""
+    from app.core.security import require_admin
+    protected = {(m, r.path) for r in admin.router.routes
+                 if any(d.dependency is require_admin for d in getattr(r, "dependencies", [])) for m in r.methods}
+    assert protected >= {
+        ("POST", "/admin/jobs/{job_id}/cancel"), ("POST", "/admin/stats/reconcile"),
+        ("GET", "/admin/retention"), ("POST", "/admin/retention/sweep"),
+        ("GET", "/admin/migrations"), ("POST", "/admin/migrations/run"),
+        ("GET", "/admin/analytics"), ("POST", "/admin/analytics/refresh"),
+        ("GET", "/admin/cache"), ("GET", "/admin/reads")
+    }
+
+    monkeypatch.setattr(admin.settings, "ADMIN_USER_IDS", [])
+    with pytest.raises(HTTPException) as exc:
+        await require_admin("user-1")
+    assert exc.value.status_code == 403
+    monkeypatch.setattr(admin.settings, "ADMIN_USER_IDS", ["user-1"])
+    assert await require_admin("user-1") == "user-1"
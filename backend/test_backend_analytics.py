@@ -0,0 +1,98 @@
+import sys
+import os
+import zlib
+import pytest
+from bson import json_util
+from unittest.mock import AsyncMock, MagicMock
+
+# Add backend dir to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+
+from app.main import fastapi_app
+from app.db.database import db_instance
+from app.services import analytics
+from app.services.jobs import runner
+from app.api.routers import admin
+
+
+class FakeCursor:
+    def __init__(self, docs):
+        self.docs = docs
+    async def to_list(self, length=None):
+        return list(self.docs)
+
+FIB = {"deck_type": "FIBONACCI", "deck_values": ["1", "2", "3", "5", "8", "?"]}
+SHIRT = {"deck_type": "T_SHIRT", "deck_values": ["XS", "S", "M", "L", "XL", "XXL", "?"]}
+TASKS = [
+    {"_id": 1, "final_score": "5", "rounds": 2, "votes": ["3", "5", "8"], "room": FIB},
+    {"_id": 2, "final_score": "3", "votes": ["3", "3", "?"], "room": FIB},
+    {"_id": 3, "final_score": "M", "rounds": 1, "votes": ["S", "M"], "room": SHIRT},
+]
+
+def test_batch_aggregates_merge_into_report():
+    """Verify distribution, consensus, rounds and vote spread per deck, across two batches."""
+    total = {}
+    analytics.merge(total, analytics.aggregate_columns(analytics.to_columns(TASKS[:2])))
+    analytics.merge(total, analytics.aggregate_columns(analytics.to_columns(TASKS[2:])))
+    report = analytics.finalize(total)
+
+    fib = report["decks"]["FIBONACCI"]
+    assert fib["tasks"] == 2 and fib["votes"] == 6
+    assert fib["distribution"][0] == {"card": "3", "count": 3}
+    assert fib["consensus_rate"] == 0.5  # "?" is not an estimate
+    assert fib["rounds"] == {"mean": 1.5, "distribution": [{"rounds": 1, "tasks": 1}, {"rounds": 2, "tasks": 1}]}
+    # |3-5| + |5-5| + |8-5| + |3-3| + |3-3| over the 5 estimable votes
+    assert fib["vote_spread"] == {"mean_abs_deviation": 1.0, "exact_match_rate": 0.5}
+    shirt = report["decks"]["T_SHIRT"]
+    assert shirt["consensus_rate"] == 0.0
+    assert shirt["vote_spread"]["mean_abs_deviation"] == 0.5  # one ordinal step on one of two votes
+    assert report["tasks"] == 3
+
+@pytest.mark.asyncio
+async def test_report_job_streams_batches_and_stores_report(monkeypatch):
+    """Verify that the job pages tasks by _id and stores the finished report per scope."""
+    monkeypatch.setattr(analytics.settings, "ANALYTICS_BATCH_SIZE", 2)
+    mock_db = MagicMock()
+    mock_db.jobs.insert_one = AsyncMock()
+    mock_db.jobs.update_one = AsyncMock()
+    mock_db.tasks.aggregate.side_effect = [FakeCursor(TASKS[:2]), FakeCursor(TASKS[2:])]
+    mock_db.analytics_reports.replace_one = AsyncMock()
+    db_instance.db = mock_db
+
+    res = await admin.refresh_analytics()
+    await runner.wait(res["job_id"])
+
+    second_page = mock_db.tasks.aggregate.call_args_list[1][0][0]
+    assert second_page[1] == {"$match": {"_id": {"$gt": 2}}}
+    query, report = mock_db.analytics_reports.replace_one.call_args[0]
+    assert query == {"scope": "global"}
+    assert report["tasks"] == 3 and set(report["decks"]) == {"FIBONACCI", "T_SHIRT"}
+    assert mock_db.jobs.update_one.call_args[0][1]["$set"]["status"] == "completed"
+
+class FakeArchiveCursor:
+    def __init__(self, docs):
+        self.docs = docs
+    async def __aiter__(self):
+        for doc in self.docs: yield doc
+
+@pytest.mark.asyncio
+async def test_report_includes_archived_rooms():
+    """Verify that completed tasks of archived rooms are counted, decoded from the cold copy."""
+    payload = {"room": {"id": "ROOM_OLD", **SHIRT}, "tasks": [
+        {"id": "t1", "status": "COMPLETED", "final_score": "M", "votes_summary": [{"name": "Ana", "value": "M"}, {"name": "Bo", "value": "M"}]},
+        {"id": "t2", "status": "PENDING"}
+    ], "votes": [], "users": []}
+    mock_db = MagicMock()
+    mock_db.rooms.distinct = AsyncMock(return_value=[])
+    mock_db.tasks.aggregate.return_value = FakeCursor([])
+    mock_db.archived_rooms.find.return_value = FakeArchiveCursor([{"codec": "zlib", "payload": zlib.compress(json_util.dumps(payload).encode())}])
+    mock_db.analytics_reports.replace_one = AsyncMock()
+    job = MagicMock(id="job-1", report=AsyncMock(), checkpoint=AsyncMock())
+
+    result = await analytics.build_report(mock_db, job, owner_id="owner-1")
+
+    assert result["tasks"] == 1
+    assert mock_db.archived_rooms.find.call_args[0][0] == {"owner_id": "owner-1"}
+    report = mock_db.analytics_reports.replace_one.call_args[0][1]
+    assert report["decks"]["T_SHIRT"]["consensus_rate"] == 1.0
@@ -0,0 +1,121 @@
+import sys
+import os
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+
+# Add backend dir to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+
+from app.main import fastapi_app
+from app.db.database import db_instance
+from app.services import archive, cascade
+from app.api.routers import users
+
+
+class FakeCursor:
+    def __init__(self, docs):
+        self.docs = docs
+    def sort(self, *args, **kwargs):
+        return self
+    async def to_list(self, length=None):
+        return list(self.docs)
+
+ROOM = {"_id": "ROOM_OLD", "id": "ROOM_OLD", "name": "Sprint 1", "owner_id": "owner-1", "created_at": "2025-01-01T00:00:00+00:00", "deck_type": "FIBONACCI"}
+TASKS = [{"_id": "t1", "id": "t1", "room_id": "ROOM_OLD", "title": "Login", "status": "COMPLETED"}]
+VOTES = [{"_id": "t1:u1", "task_id": "t1", "user_id": "u1", "value": "5"}, {"_id": "t1:u2", "task_id": "t1", "user_id": "u2", "value": "8"}]
+MEMBERSHIPS = [{"_id": "ROOM_OLD:u1", "user_id": "u1", "room_id": "ROOM_OLD", "joined_at": "2025-01-02T00:00:00+00:00"}]
+PROFILES = [{"_id": "u1", "name": "Ana"}]
+
+def _db():
+    mock_db = MagicMock()
+    for coll in (mock_db.rooms, mock_db.tasks, mock_db.votes, mock_db.memberships, mock_db.archived_rooms):
+        coll.delete_many = AsyncMock()
+        coll.delete_one = AsyncMock()
+        coll.insert_many = AsyncMock()
+        coll.insert_one = AsyncMock()
+    mock_db.archived_rooms.replace_one = AsyncMock()
+    mock_db.profiles.bulk_write = AsyncMock()
+    mock_db.stats.bulk_write = AsyncMock()
+    return mock_db
+
+@pytest.mark.asyncio
+async def test_archive_then_rehydrate_round_trip(monkeypatch):
+    """Verify that an archived room is compressed, removed from the hot collections and restored intact."""
+    monkeypatch.setattr(archive, "CODEC", "zlib")
+    mock_db = _db()
+    mock_db.rooms.find_one = AsyncMock(return_value=dict(ROOM))
+    mock_db.tasks.find.return_value = FakeCursor(TASKS)
+    mock_db.votes.find.return_value = FakeCursor(VOTES)
+    mock_db.memberships.find.return_value = FakeCursor(MEMBERSHIPS)
+    mock_db.profiles.find.return_value = FakeCursor(PROFILES)
+
+    sizes = await archive.archive_room(mock_db, "ROOM_OLD")
+
+    stored = mock_db.archived_rooms.replace_one.call_args[0][1]
+    assert stored["codec"] == "zlib"
+    assert stored["members"] == [{"id": "u1", "joined_at": "2025-01-02T00:00:00+00:00"}]
+    assert sizes == {"tasks": 1, "votes": 2, "users": 1, "raw_size": stored["raw_size"], "stored_size": len(stored["payload"])}
+    mock_db.votes.delete_many.assert_called_once_with({"task_id": {"$in": ["t1"]}})
+    mock_db.rooms.delete_one.assert_called_once_with({"_id": "ROOM_OLD"})
+    mock_db.memberships.delete_many.assert_called_once_with({"room_id": "ROOM_OLD"})
+    mock_db.profiles.delete_many.assert_not_called()  # profiles are shared with other rooms
+
+    mock_db.rooms.find_one = AsyncMock(return_value=None)
+    mock_db.archived_rooms.find_one_and_update = AsyncMock(return_value=stored)
+
+    room = await archive.rehydrate_room(mock_db, "ROOM_OLD")
+
+    assert room["name"] == "Sprint 1" and "_id" not in room
+    assert mock_db.rooms.insert_one.call_args[0][0]["_id"] == "ROOM_OLD"
+    assert mock_db.votes.insert_many.call_args[0][0] == VOTES
+    assert mock_db.memberships.insert_many.call_args[0][0] == MEMBERSHIPS
+    profile = mock_db.profiles.bulk_write.call_args[0][0][0]
+    assert profile._filter == {"_id": "u1"} and profile._doc == {"$setOnInsert": {"name": "Ana"}}
+    mock_db.archived_rooms.delete_one.assert_called_once_with({"id": "ROOM_OLD"})
+
+@pytest.mark.asyncio
+async def test_deleted_archived_room_cannot_be_rehydrated(monkeypatch):
+    """Verify that deleting an archived room removes its cold copy, so opening it no longer restores it."""
+    mock_db = _db()
+    mock_db.rooms.find_one = AsyncMock(return_value=dict(ROOM))
+    for coll, docs in ((mock_db.tasks, TASKS), (mock_db.votes, VOTES), (mock_db.memberships, MEMBERSHIPS), (mock_db.profiles, PROFILES)):
+        coll.find.return_value = FakeCursor(docs)
+    await archive.archive_room(mock_db, "ROOM_OLD")
+
+    store = {"ROOM_OLD": mock_db.archived_rooms.replace_one.call_args[0][1]}
+    async def delete_archive(query):
+        return MagicMock(deleted_count=int(store.pop(query["id"], None) is not None))
+    async def claim_archive(query, update):
+        return store.get(query["id"])
+    mock_db.archived_rooms.delete_one = AsyncMock(side_effect=delete_archive)
+    mock_db.archived_rooms.find_one_and_update = AsyncMock(side_effect=claim_archive)
+    mock_db.rooms.find_one = AsyncMock(return_value=None)
+    mock_db.rooms.delete_one = AsyncMock(return_value=MagicMock(deleted_count=0))
+    for coll in (mock_db.tasks, mock_db.memberships):
+        coll.find = MagicMock(return_value=MagicMock(limit=MagicMock(return_value=FakeCursor([]))))
+    monkeypatch.setattr(cascade.sio, "emit", AsyncMock())
+    job = MagicMock(report=AsyncMock(), checkpoint=AsyncMock())
+
+    totals = await cascade.delete_rooms(mock_db, ["ROOM_OLD"], job)
+
+    assert totals["archived_rooms"] == 1 and store == {}
+    assert await archive.rehydrate_room(mock_db, "ROOM_OLD") is None
+    mock_db.rooms.insert_one.assert_not_called()
+
+@pytest.mark.asyncio
+async def test_recent_rooms_include_archived():
+    """Verify that archived rooms a user joined are listed with the live ones, ordered by joined_at."""
+    mock_db = MagicMock()
+    mock_db.memberships.find.return_value.to_list = AsyncMock(return_value=[{"_id": "ROOM_A:u1", "user_id": "u1", "room_id": "ROOM_A", "joined_at": "2026-01-01T00:00:00Z"}])
+    mock_db.rooms.find.return_value.to_list = AsyncMock(return_value=[{"id": "ROOM_A", "name": "Live", "owner_id": "owner-1"}])
+    mock_db.archived_rooms.find.return_value = FakeCursor([
+        {"id": "ROOM_OLD", "name": "Sprint 1", "owner_id": "owner-1", "members": [{"id": "u1", "joined_at": "2026-02-01T00:00:00Z"}]}
+    ])
+    db_instance.db = mock_db
+
+    result = await users.get_recent_rooms("u1", current_user_id="u1")
+
+    assert [r["id"] for r in result] == ["ROOM_OLD", "ROOM_A"]
+    assert result[0]["archived"] is True
+    assert mock_db.rooms.find.call_args[0][0]["_id"] == {"$in": ["ROOM_A"]}
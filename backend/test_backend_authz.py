@@ -0,0 +1,84 @@
+import sys
+import os
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+
+# Add backend dir to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+
+from app.main import fastapi_app
+from app.db.database import db_instance
+from app.services import socket, authz
+from app.api.routers import auth, rooms, users, tasks, actions, admin
+from app.models import domain
+
+
+@pytest.mark.asyncio
+async def test_membership_is_cached():
+    """Verify that role flags are read from the DB once and then served from the cache."""
+    mock_db = MagicMock()
+    mock_db.memberships.find_one = AsyncMock(return_value={"_id": "ROOM_XYZ:user-1", "user_id": "user-1", "room_id": "ROOM_XYZ", "is_admin": True})
+    db_instance.db = mock_db
+
+    first = await authz.get_membership("user-1", "room_xyz")
+    second = await authz.get_membership("user-1", "ROOM_XYZ")
+
+    assert first == second
+    assert second["is_admin"] is True
+    mock_db.memberships.find_one.assert_called_once_with({"_id": "ROOM_XYZ:user-1"})
+    stats = authz.cache_stats()["membership"]
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+    assert stats["hit_ratio"] == 0.5
+
+@pytest.mark.asyncio
+async def test_non_members_are_not_cached():
+    """Verify that a missing membership is looked up again, so a later join is seen immediately."""
+    mock_db = MagicMock()
+    mock_db.memberships.find_one = AsyncMock(side_effect=[None, {"user_id": "user-1", "room_id": "ROOM_XYZ", "is_spectator": True}])
+    db_instance.db = mock_db
+
+    assert await authz.get_membership("user-1", "ROOM_XYZ") is None
+    member = await authz.get_membership("user-1", "ROOM_XYZ")
+    assert member["is_spectator"] is True
+
+@pytest.mark.asyncio
+async def test_invalidation_drops_user_and_room_entries():
+    """Verify that kick/merge/delete invalidation helpers evict the matching entries."""
+    mock_db = MagicMock()
+    mock_db.memberships.find_one = AsyncMock(return_value={"user_id": "user-1", "room_id": "ROOM_A", "is_admin": False})
+    mock_db.rooms.find_one = AsyncMock(return_value={"deck_values": ["1", "2", "3"]})
+    db_instance.db = mock_db
+
+    await authz.get_membership("user-1", "ROOM_A")
+    await authz.get_membership("user-1", "ROOM_B")
+    await authz.get_membership("user-2", "ROOM_A")
+    assert await authz.get_room_deck("ROOM_A") == ("1", "2", "3")
+
+    authz.invalidate_user("user-1")
+    assert len(authz.membership_cache) == 1
+
+    authz.invalidate_room("ROOM_A")
+    assert len(authz.membership_cache) == 0
+    assert len(authz.deck_cache) == 0
+
+@pytest.mark.asyncio
+async def test_cast_vote_uses_cached_deck(monkeypatch):
+    """Verify that repeated votes validate against the cached deck instead of re-reading the room."""
+    mock_db = MagicMock()
+    mock_db.memberships.find_one = AsyncMock(return_value={"user_id": "user-1", "room_id": "ROOM_XYZ", "is_spectator": False})
+    mock_db.rooms.find_one = AsyncMock(return_value={"id": "ROOM_XYZ", "deck_values": ["1", "2", "3"]})
+    mock_db.votes.replace_one = AsyncMock(return_value=MagicMock(matched_count=0))
+    db_instance.db = mock_db
+    monkeypatch.setattr(actions, "check_all_voted", AsyncMock(return_value=False))
+    mock_broadcast = AsyncMock()
+    socket.broadcast_room_state = actions.broadcast_room_state = rooms.broadcast_room_state = admin.broadcast_room_state = users.broadcast_room_state = mock_broadcast
+
+    action = domain.ActionVote(room_id="ROOM_XYZ", user_id="user-1", task_id="task-1", value="2")
+    await actions.cast_vote_http(action, current_user_id="user-1")
+    await actions.cast_vote_http(action, current_user_id="user-1")
+
+    mock_db.rooms.find_one.assert_called_once()
+    mock_db.memberships.find_one.assert_called_once()
+    assert mock_db.votes.replace_one.call_count == 2
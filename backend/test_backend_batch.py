@@ -0,0 +1,83 @@
+import sys
+import os
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+from fastapi import HTTPException
+
+# Add backend dir to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+
+from app.main import fastapi_app
+from app.db.database import db_instance
+from app.services import socket
+from app.api.routers import auth, rooms, users, tasks, actions, admin
+from app.models import domain
+
+
+def _admin_db():
+    mock_db = MagicMock()
+    mock_db.memberships.find_one = AsyncMock(return_value={"user_id": "admin-1", "room_id": "ROOM_XYZ", "is_admin": True})
+    mock_db.rooms.update_one = AsyncMock()
+    mock_db.rooms.find_one = AsyncMock(return_value={"id": "ROOM_XYZ", "active_task_id": None})
+    mock_db.tasks.update_one = AsyncMock()
+    mock_db.tasks.update_many = AsyncMock()
+    mock_db.votes.delete_many = AsyncMock()
+    return mock_db
+
+@pytest.mark.asyncio
+async def test_batch_applies_in_order_with_single_broadcast():
+    """Verify that a batch checks admin rights once, applies every action and broadcasts once."""
+    mock_db = _admin_db()
+    db_instance.db = mock_db
+    mock_broadcast = AsyncMock()
+    socket.broadcast_room_state = actions.broadcast_room_state = rooms.broadcast_room_state = admin.broadcast_room_state = users.broadcast_room_state = mock_broadcast
+
+    batch = domain.ActionBatch(room_id="room_xyz", user_id="admin-1", actions=[
+        {"action": "reset", "params": {"task_id": "task-1"}},
+        {"action": "active-task", "params": {"task_id": "task-2"}},
+        {"action": "start-timer", "params": {"duration_seconds": 60}},
+    ])
+    res = await actions.batch_actions_http(batch, current_user_id="admin-1")
+
+    assert res["status"] == "success"
+    assert [r["action"] for r in res["results"]] == ["reset", "active-task", "start-timer"]
+    assert "timer_end" in res["results"][2]
+    mock_db.memberships.find_one.assert_called_once_with({"_id": "ROOM_XYZ:admin-1"})
+    mock_db.votes.delete_many.assert_any_call({"task_id": "task-1"})
+    mock_db.rooms.update_one.assert_any_call({"_id": "ROOM_XYZ"}, {"$set": {"active_task_id": "task-2", "cards_revealed": False}})
+    mock_broadcast.assert_called_once_with("ROOM_XYZ")
+
+@pytest.mark.asyncio
+async def test_batch_reports_errors_per_action():
+    """Verify that invalid or unknown actions are reported without aborting the rest of the batch."""
+    mock_db = _admin_db()
+    db_instance.db = mock_db
+    mock_broadcast = AsyncMock()
+    socket.broadcast_room_state = actions.broadcast_room_state = rooms.broadcast_room_state = admin.broadcast_room_state = users.broadcast_room_state = mock_broadcast
+
+    batch = domain.ActionBatch(room_id="ROOM_XYZ", user_id="admin-1", actions=[
+        {"action": "teleport"},
+        {"action": "cancel-task", "params": {}},
+        {"action": "stop-timer"},
+    ])
+    res = await actions.batch_actions_http(batch, current_user_id="admin-1")
+
+    assert res["status"] == "error"
+    assert res["results"][0]["status_code"] == 400
+    assert res["results"][1]["status_code"] == 422
+    assert res["results"][2]["status"] == "success"
+    mock_db.rooms.update_one.assert_called_once_with({"_id": "ROOM_XYZ"}, {"$set": {"timer_end": None}})
+    mock_broadcast.assert_called_once_with("ROOM_XYZ")
+
+@pytest.mark.asyncio
+async def test_batch_requires_admin():
+    """Verify that non-admin members cannot run a batch."""
+    mock_db = MagicMock()
+    mock_db.memberships.find_one = AsyncMock(return_value={"user_id": "user-1", "room_id": "ROOM_XYZ", "is_admin": False})
+    db_instance.db = mock_db
+
+    batch = domain.ActionBatch(room_id="ROOM_XYZ", user_id="user-1", actions=[{"action": "reveal"}])
+    with pytest.raises(HTTPException) as exc_info:
+        await actions.batch_actions_http(batch, current_user_id="user-1")
+    assert exc_info.value.status_code == 403
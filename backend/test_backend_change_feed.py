@@ -0,0 +1,95 @@
+import sys
+import os
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+from pymongo.errors import OperationFailure
+
+# Add backend dir to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+
+from app.main import fastapi_app
+from app.core.config import settings
+from app.db import repositories
+from app.services import socket, change_feed
+
+
+async def _drain(feed, broadcaster):
+    while not feed.queue.empty():
+        collection, doc = feed.queue.get_nowait()
+        room_id = await broadcaster.resolver.room_of(collection, doc)
+        if room_id: broadcaster.dirty.add(room_id)
+
+@pytest.mark.asyncio
+async def test_memory_feed_broadcasts_only_changed_local_rooms(monkeypatch):
+    """Verify that writes mark their room dirty (votes via their task) and that only rooms with local sockets and new state are pushed."""
+    repos = repositories.memory_repositories()
+    monkeypatch.setattr(settings, "STORAGE_ENGINE", "memory")
+    monkeypatch.setattr(repositories, "_memory", repos)
+    monkeypatch.setattr(socket, "socket_users", {"sid-1": {"room_id": "ROOM_A", "user_id": "u1"}})
+    monkeypatch.setattr(socket, "state_digests", {})
+    emit = AsyncMock()
+    monkeypatch.setattr(socket.sio, "emit", emit)
+    feed = change_feed.MemoryChangeFeed(repos)
+    broadcaster = change_feed.Broadcaster(feed, change_feed.RoomResolver(repos))
+
+    await repos.rooms.insert({"id": "ROOM_A", "name": "A", "active_task_id": "t1"})
+    await repos.rooms.insert({"id": "ROOM_B", "name": "B"})
+    await repos.tasks.insert({"id": "t1", "room_id": "ROOM_A", "position": 0})
+    await _drain(feed, broadcaster)
+    await repos.votes.replace({"task_id": "t1", "user_id": "u1", "value": "3"})
+    await _drain(feed, broadcaster)
+
+    assert broadcaster.dirty == {"ROOM_A", "ROOM_B"}
+    assert await broadcaster.flush() == {"ROOM_A"}
+    event, state = emit.call_args[0]
+    assert event == "state_update" and state["votes"] == [{"user_id": "u1", "has_voted": True}]
+
+    # A write this node already broadcast (or a no-op write) is not pushed again.
+    await repos.rooms.update("ROOM_A", {"name": "A"})
+    await _drain(feed, broadcaster)
+    assert await broadcaster.flush() == set()
+    assert emit.call_count == 1
+
+@pytest.mark.asyncio
+async def test_mongo_feed_resolves_deletes_and_stops_on_standalone(monkeypatch):
+    """Verify that change events map to rooms (deletes through earlier events or their keys) and that a server without change streams stops the feed."""
+    class FakeStream:
+        def __init__(self, changes): self.changes, self.resume_token = changes, None
+        async def __aenter__(self): return self
+        async def __aexit__(self, *args): return False
+        def __aiter__(self): return self
+        async def __anext__(self):
+            if not self.changes: raise OperationFailure("not a replica set", code=40573)
+            change = self.changes.pop(0)
+            self.resume_token = {"_data": change["_id"]}
+            return change
+
+    changes = [
+        {"_id": "1", "ns": {"coll": "users"}, "documentKey": {"_id": "m1"}, "fullDocument": {"_id": "m1", "id": "u1", "room_id": "room_a"}},
+        {"_id": "2", "ns": {"coll": "votes"}, "documentKey": {"_id": "v1"}, "fullDocument": {"_id": "v1", "task_id": "t1", "user_id": "u1"}},
+        {"_id": "3", "ns": {"coll": "users"}, "documentKey": {"_id": "m1"}},
+        # Normalized layout: membership and vote keys start with the room and task ids.
+        {"_id": "4", "ns": {"coll": "memberships"}, "documentKey": {"_id": "ROOM_C:u1"}},
+        {"_id": "5", "ns": {"coll": "votes"}, "documentKey": {"_id": "t1:u2"}},
+    ]
+    mock_db = MagicMock()
+    mock_db.watch = MagicMock(return_value=FakeStream(changes))
+    repos = repositories.mongo_repositories(mock_db)
+    repos.tasks.get = AsyncMock(return_value={"id": "t1", "room_id": "ROOM_B"})
+    feed = change_feed.MongoChangeFeed(mock_db)
+    resolver = change_feed.RoomResolver(repos)
+
+    rooms = []
+    with pytest.raises(change_feed.ChangeFeedUnavailable):
+        async for collection, doc in feed.changes():
+            rooms.append(await resolver.room_of(collection, doc))
+
+    assert rooms == ["ROOM_A", "ROOM_B", "ROOM_A", "ROOM_C", "ROOM_B"]
+    assert feed.resume_token == {"_data": "5"}
+    repos.tasks.get.assert_called_once()  # the task of t1 is cached
+    assert mock_db.watch.call_args[1]["full_document"] == "updateLookup"
+
+    # The broadcaster treats a missing change stream as "explicit broadcasts only".
+    mock_db.watch = MagicMock(return_value=FakeStream([]))
+    await change_feed.Broadcaster(change_feed.MongoChangeFeed(mock_db), resolver).run()
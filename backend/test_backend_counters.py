@@ -0,0 +1,115 @@
+import sys
+import os
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+
+# Add backend dir to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+
+from app.main import fastapi_app
+from app.db.database import db_instance
+from app.services import socket, counters
+from app.api.routers import rooms, users, tasks, actions, admin
+from app.models import domain
+
+
+class FakeCursor:
+    """Async-iterable cursor that also supports to_list."""
+    def __init__(self, docs):
+        self.docs = docs
+    def __aiter__(self):
+        self._iter = iter(self.docs)
+        return self
+    async def __anext__(self):
+        try:
+            return next(self._iter)
+        except StopIteration:
+            raise StopAsyncIteration
+    async def to_list(self, length=None):
+        return list(self.docs)
+
+def _ops(mock_bulk_write):
+    return {op._filter["_id"]: op._doc for op in mock_bulk_write.call_args[0][0]}
+
+@pytest.mark.asyncio
+async def test_new_vote_increments_votes_cast(monkeypatch):
+    """Verify that a first vote bumps the voter's counter and a changed vote does not."""
+    mock_db = MagicMock()
+    mock_db.memberships.find_one = AsyncMock(return_value={"user_id": "user-1", "room_id": "ROOM_XYZ", "is_spectator": False})
+    mock_db.rooms.find_one = AsyncMock(return_value={"deck_values": ["1", "2", "3"]})
+    mock_db.votes.replace_one = AsyncMock(side_effect=[MagicMock(matched_count=0), MagicMock(matched_count=1)])
+    mock_db.stats.bulk_write = AsyncMock()
+    db_instance.db = mock_db
+    monkeypatch.setattr(actions, "check_all_voted", AsyncMock(return_value=False))
+    monkeypatch.setattr(actions, "broadcast_room_state", AsyncMock())
+
+    action = domain.ActionVote(room_id="ROOM_XYZ", user_id="user-1", task_id="task-1", value="2")
+    await actions.cast_vote_http(action, current_user_id="user-1")
+    await actions.cast_vote_http(action, current_user_id="user-1")
+
+    mock_db.stats.bulk_write.assert_called_once()
+    assert _ops(mock_db.stats.bulk_write) == {
+        "user:user-1": {"$inc": {"votes_cast": 1}, "$setOnInsert": {"kind": "user", "ref_id": "user-1"}}
+    }
+
+@pytest.mark.asyncio
+async def test_removed_votes_decrement_each_voter():
+    """Verify that bulk vote deletions decrement the counters of the affected voters."""
+    mock_db = MagicMock()
+    mock_db.votes.aggregate.return_value = FakeCursor([{"_id": "u1", "n": 2}, {"_id": "u2", "n": 1}])
+    mock_db.stats.bulk_write = AsyncMock()
+
+    await counters.record_votes_removed(mock_db, {"task_id": "task-1"})
+
+    ops = _ops(mock_db.stats.bulk_write)
+    assert ops["user:u1"]["$inc"] == {"votes_cast": -2}
+    assert ops["user:u2"]["$inc"] == {"votes_cast": -1}
+
+@pytest.mark.asyncio
+async def test_removed_rooms_decrement_owners_by_room_key():
+    """Verify that removed rooms are matched on _id and decrement their owners' rooms_owned."""
+    mock_db = MagicMock()
+    mock_db.rooms.aggregate.return_value = FakeCursor([{"_id": "u1", "n": 2}])
+    mock_db.stats.bulk_write = AsyncMock()
+    mock_db.stats.delete_many = AsyncMock()
+
+    await counters.record_rooms_removed(mock_db, ["ROOM_1", "ROOM_2"])
+
+    assert mock_db.rooms.aggregate.call_args[0][0][0] == {"$match": {"_id": {"$in": ["ROOM_1", "ROOM_2"]}}}
+    assert _ops(mock_db.stats.bulk_write)["user:u1"]["$inc"] == {"rooms_owned": -2}
+
+@pytest.mark.asyncio
+async def test_counter_failures_do_not_break_writes():
+    """Verify that a failing stats write is logged instead of raised."""
+    mock_db = MagicMock()
+    mock_db.stats.bulk_write = AsyncMock(side_effect=Exception("boom"))
+
+    await counters.bump(mock_db, counters.room_key("ROOM_1"), tasks_count=1)
+
+@pytest.mark.asyncio
+async def test_reconcile_reports_and_repairs_drift():
+    """Verify that reconciliation rebuilds counters from the raw collections and reports drift."""
+    mock_db = MagicMock()
+    mock_db.rooms.aggregate.return_value = FakeCursor([{"_id": "u1", "n": 2}])
+    mock_db.votes.aggregate.return_value = FakeCursor([{"_id": "u1", "n": 5}])
+    mock_db.tasks.aggregate.return_value = FakeCursor([{"_id": "ROOM_1", "n": 3}])
+    mock_db.memberships.aggregate.return_value = FakeCursor([{"_id": "ROOM_1", "n": 1}, {"_id": None, "n": 4}])
+    mock_db.stats.find.return_value = FakeCursor([
+        {"_id": "user:u1", "rooms_owned": 2, "votes_cast": 4},
+        {"_id": "room:ROOM_1", "tasks_count": 3, "members_count": 1},
+        {"_id": "room:GONE", "tasks_count": 7, "members_count": 0}
+    ])
+    mock_db.stats.bulk_write = AsyncMock()
+
+    report = await counters.reconcile(mock_db, apply=False)
+
+    assert report["drifted"] == 2
+    assert report["drift"][0] == {"key": "user:u1", "fields": {"votes_cast": {"stored": 4, "actual": 5}}}
+    assert report["drift"][1] == {"key": "room:GONE", "stale": True}
+    mock_db.stats.bulk_write.assert_not_called()
+
+    mock_db.stats.find.return_value = FakeCursor([])
+    report = await counters.reconcile(mock_db, apply=True)
+    assert report["written"] == 2
+    mock_db.stats.bulk_write.assert_called_once()
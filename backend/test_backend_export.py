@@ -0,0 +1,116 @@
+import sys
+import os
+import csv
+import io
+import json
+import zlib
+import pytest
+from bson import json_util
+from unittest.mock import AsyncMock, MagicMock
+from fastapi import HTTPException, Request
+
+# Add backend dir to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+
+from app.main import fastapi_app
+from app.db.database import db_instance
+from app.services import export as export_service
+from app.api.routers import export
+
+
+class FakeCursor:
+    """Minimal async Motor cursor: chainable sort/batch_size and async iteration."""
+    def __init__(self, docs):
+        self.docs = docs
+    def sort(self, *args, **kwargs):
+        return self
+    def batch_size(self, size):
+        self.size = size
+        return self
+    def __aiter__(self):
+        self._iter = iter(self.docs)
+        return self
+    async def __anext__(self):
+        try:
+            return next(self._iter)
+        except StopIteration:
+            raise StopAsyncIteration
+
+def _request():
+    scope = {"type": "http", "method": "GET", "path": "/api/export", "headers": [], "app": fastapi_app, "client": ("127.0.0.1", 12345)}
+    return Request(scope)
+
+TASKS = [
+    {"id": "t1", "room_id": "ROOM_A", "title": "Login", "status": "COMPLETED", "final_score": "5",
+     "votes_summary": [{"name": "Ana", "value": "5"}, {"name": "Bo", "value": "8"}],
+     "statistics": {"mean": 6.5, "median": 6.5, "consensus": False, "agreement": 0.5}, "completed_at": "2026-01-01T00:00:00+00:00"},
+    {"id": "t2", "room_id": "ROOM_A", "title": "Logout", "status": "COMPLETED", "final_score": "3"}
+]
+
+async def _body(response):
+    return "".join([chunk async for chunk in response.body_iterator])
+
+@pytest.mark.asyncio
+async def test_room_history_streams_ndjson(monkeypatch):
+    """Verify that the room export streams one JSON document per completed task."""
+    mock_db = MagicMock()
+    mock_db.rooms.find_one = AsyncMock(return_value={"id": "ROOM_A", "name": "Room A"})
+    mock_db.tasks.find.return_value = FakeCursor(TASKS)
+    db_instance.db = mock_db
+    monkeypatch.setattr(export, "get_membership_or_rehydrate", AsyncMock(return_value={"is_admin": False}))
+
+    response = await export.export_room_history(_request(), "room_a", format="ndjson", current_user_id="user-1")
+    lines = [json.loads(l) for l in (await _body(response)).splitlines()]
+
+    assert response.media_type == "application/x-ndjson"
+    assert [l["task_id"] for l in lines] == ["t1", "t2"]
+    assert lines[0]["room_name"] == "Room A"
+    assert lines[0]["votes_summary"][1] == {"name": "Bo", "value": "8"}
+    query = mock_db.tasks.find.call_args[0][0]
+    assert query == {"room_id": {"$in": ["ROOM_A"]}, "status": "COMPLETED"}
+
+@pytest.mark.asyncio
+async def test_owner_history_streams_csv_in_room_batches(monkeypatch):
+    """Verify that the owner export walks rooms in batches and writes CSV incrementally."""
+    monkeypatch.setattr(export_service.settings, "EXPORT_BATCH_SIZE", 1)
+    mock_db = MagicMock()
+    mock_db.rooms.find.return_value = FakeCursor([{"id": "ROOM_A", "name": "Room A"}, {"id": "ROOM_B", "name": "Room B"}])
+    mock_db.tasks.find.side_effect = [FakeCursor(TASKS), FakeCursor([])]
+    db_instance.db = mock_db
+
+    response = await export.export_owner_history(_request(), "owner-1", format="csv", current_user_id="owner-1")
+    rows = list(csv.DictReader(io.StringIO(await _body(response))))
+
+    assert len(rows) == 2
+    assert rows[0]["votes"] == "Ana=5; Bo=8"
+    assert rows[0]["mean"] == "6.5"
+    assert mock_db.tasks.find.call_count == 2
+    assert mock_db.tasks.find.call_args_list[1][0][0]["room_id"] == {"$in": ["ROOM_B"]}
+
+@pytest.mark.asyncio
+async def test_owner_history_includes_archived_rooms():
+    """Verify that the owner export reads archived rooms from their compressed copy without rehydrating them."""
+    payload = {"room": {"id": "ROOM_OLD", "name": "Old"}, "tasks": [
+        {"id": "t9", "room_id": "ROOM_OLD", "title": "Legacy", "status": "COMPLETED", "final_score": "8", "position": 1},
+        {"id": "t8", "room_id": "ROOM_OLD", "title": "Draft", "status": "PENDING", "position": 0}
+    ], "votes": [], "users": []}
+    mock_db = MagicMock()
+    mock_db.rooms.find.return_value = FakeCursor([{"id": "ROOM_A", "name": "Room A"}])
+    mock_db.tasks.find.return_value = FakeCursor(TASKS[:1])
+    mock_db.archived_rooms.find.return_value = FakeCursor([{"codec": "zlib", "payload": zlib.compress(json_util.dumps(payload).encode())}])
+    db_instance.db = mock_db
+
+    response = await export.export_owner_history(_request(), "owner-1", format="ndjson", current_user_id="owner-1")
+    lines = [json.loads(l) for l in (await _body(response)).splitlines()]
+
+    assert [(l["task_id"], l["room_name"]) for l in lines] == [("t1", "Room A"), ("t9", "Old")]
+    assert mock_db.archived_rooms.find.call_args[0][0] == {"owner_id": "owner-1"}
+    mock_db.rooms.insert_one.assert_not_called()
+
+@pytest.mark.asyncio
+async def test_owner_history_requires_same_user():
+    """Verify that users can only export their own rooms."""
+    with pytest.raises(HTTPException) as exc_info:
+        await export.export_owner_history(_request(), "owner-1", current_user_id="someone-else")
+    assert exc_info.value.status_code == 403
@@ -0,0 +1,130 @@
+import sys
+import os
+import json
+import pytest
+from contextlib import AsyncExitStack
+from unittest.mock import AsyncMock, MagicMock
+from fastapi import Request
+from pymongo.errors import OperationFailure
+
+# Add backend dir to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+
+from app.main import fastapi_app
+from app.db.database import db_instance
+from app.core.security import create_access_token
+from app.services import socket, idempotency
+from app.api.routers import auth, rooms, users, tasks, actions, admin
+from app.models import domain
+
+
+def _route_handler(path):
+    route = next(r for r in actions.router.routes if r.path == path)
+    return route.get_route_handler()
+
+def _request(path, payload, key=None, user_id="admin-1"):
+    body = json.dumps(payload).encode()
+    headers = [
+        (b"content-type", b"application/json"),
+        (b"authorization", f"Bearer {create_access_token({'sub': user_id})}".encode())
+    ]
+    if key: headers.append((b"idempotency-key", key.encode()))
+
+    async def receive():
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    scope = {
+        "type": "http",
+        "method": "POST",
+        "path": path,
+        "headers": headers,
+        "query_string": b"",
+        "app": fastapi_app,
+        "client": ("127.0.0.1", 12345)
+    }
+    stack = AsyncExitStack()
+    for name in ("fastapi_middleware_astack", "fastapi_inner_astack", "fastapi_function_astack"):
+        scope[name] = stack
+    return Request(scope, receive)
+
+@pytest.fixture(autouse=True)
+def fresh_store(monkeypatch):
+    monkeypatch.setattr(idempotency, "store", idempotency.MemoryIdempotencyStore(60, 100))
+
+def _admin_db():
+    mock_db = MagicMock()
+    mock_db.memberships.find_one = AsyncMock(return_value={"user_id": "admin-1", "room_id": "ROOM_XYZ", "is_admin": True})
+    mock_db.rooms.update_one = AsyncMock()
+    mock_db.votes.delete_many = AsyncMock()
+    mock_db.tasks.update_one = AsyncMock()
+    return mock_db
+
+@pytest.mark.asyncio
+async def test_retry_with_same_key_is_replayed():
+    """Verify that a retried request returns the stored response without DB work or a broadcast."""
+    mock_db = _admin_db()
+    db_instance.db = mock_db
+    mock_broadcast = AsyncMock()
+    socket.broadcast_room_state = actions.broadcast_room_state = rooms.broadcast_room_state = admin.broadcast_room_state = users.broadcast_room_state = mock_broadcast
+    handler = _route_handler("/reset")
+    payload = {"room_id": "ROOM_XYZ", "user_id": "admin-1", "task_id": "task-1"}
+
+    first = await handler(_request("/api/reset", payload, key="retry-1"))
+    second = await handler(_request("/api/reset", payload, key="retry-1"))
+
+    assert first.status_code == second.status_code == 200
+    assert second.body == first.body
+    assert second.headers["Idempotent-Replayed"] == "true"
+    mock_db.votes.delete_many.assert_called_once_with({"task_id": "task-1"})
+    mock_db.tasks.update_one.assert_called_once_with({"_id": "task-1"}, {"$set": {"statistics": None}})
+    mock_broadcast.assert_called_once_with("ROOM_XYZ")
+
+@pytest.mark.asyncio
+async def test_key_reused_with_different_payload_is_rejected():
+    """Verify that reusing a key for a different request body returns 422."""
+    db_instance.db = _admin_db()
+    mock_broadcast = AsyncMock()
+    socket.broadcast_room_state = actions.broadcast_room_state = rooms.broadcast_room_state = admin.broadcast_room_state = users.broadcast_room_state = mock_broadcast
+    handler = _route_handler("/reset")
+
+    await handler(_request("/api/reset", {"room_id": "ROOM_XYZ", "user_id": "admin-1", "task_id": "task-1"}, key="k"))
+    res = await handler(_request("/api/reset", {"room_id": "ROOM_XYZ", "user_id": "admin-1", "task_id": "task-2"}, key="k"))
+
+    assert res.status_code == 422
+
+@pytest.mark.asyncio
+async def test_requests_without_key_are_not_deduplicated():
+    """Verify that requests without the header run every time."""
+    db_instance.db = _admin_db()
+    mock_broadcast = AsyncMock()
+    socket.broadcast_room_state = actions.broadcast_room_state = rooms.broadcast_room_state = admin.broadcast_room_state = users.broadcast_room_state = mock_broadcast
+    handler = _route_handler("/stop-timer")
+    payload = {"room_id": "ROOM_XYZ", "user_id": "admin-1"}
+
+    await handler(_request("/api/stop-timer", payload))
+    await handler(_request("/api/stop-timer", payload))
+
+    assert mock_broadcast.call_count == 2
+
+@pytest.mark.asyncio
+async def test_ttl_index_is_updated_in_place_when_expiry_changes(monkeypatch):
+    """Verify that a changed TTL updates the existing index at startup and that the store never creates indexes per request."""
+    monkeypatch.setattr(idempotency.settings, "IDEMPOTENCY_BACKEND", "mongo")
+    monkeypatch.setattr(idempotency.settings, "IDEMPOTENCY_TTL_SECONDS", 120)
+    mock_db = MagicMock()
+    mock_db.idempotency_keys.create_index = AsyncMock(side_effect=OperationFailure("conflict", code=85))
+    mock_db.command = AsyncMock()
+
+    await idempotency.ensure_ttl_index(mock_db)
+
+    mock_db.command.assert_called_once_with("collMod", "idempotency_keys", index={"name": "created_at_1", "expireAfterSeconds": 120})
+
+    mock_db.idempotency_keys.create_index.reset_mock()
+    mock_db.idempotency_keys.find_one = AsyncMock(return_value=None)
+    mock_db.idempotency_keys.replace_one = AsyncMock()
+    db_instance.db = mock_db
+    store = idempotency.MongoIdempotencyStore(120)
+    await store.set("k", {"status_code": 200})
+    assert await store.get("k") is None
+    mock_db.idempotency_keys.create_index.assert_not_called()
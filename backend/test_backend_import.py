@@ -0,0 +1,74 @@
+import sys
+import os
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+from pymongo import InsertOne, UpdateOne
+
+# Add backend dir to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+
+from app.main import fastapi_app
+from app.db.database import db_instance
+from app.services import task_import
+from app.models import domain
+
+
+async def _chunks(data: bytes, size: int = 7):
+    for i in range(0, len(data), size):
+        yield data[i:i + size]
+
+async def _collect(parser, data: bytes):
+    return [item async for item in parser(_chunks(data))]
+
+@pytest.mark.asyncio
+async def test_parsers_handle_chunk_boundaries():
+    """Verify NDJSON, CSV and JSON arrays are parsed incrementally across arbitrary chunk splits."""
+    ndjson = b'{"title": "A", "external_id": "H-1"}\n\n{"title": "B"}\n'
+    assert [r for _, r in await _collect(task_import.parse_ndjson, ndjson)] == [
+        {"title": "A", "external_id": "H-1"}, {"title": "B"}
+    ]
+
+    csv_data = 'title,description,external_id\n"Login, SSO","line one\nline two",H-7\nPayments,,\n'.encode()
+    rows = [r for _, r in await _collect(task_import.parse_csv, csv_data)]
+    assert rows[0] == {"title": "Login, SSO", "description": "line one\nline two", "external_id": "H-7"}
+    assert rows[1]["title"] == "Payments"
+
+    array = b'[ {"title": "A \\u00e9"}, {"title": "B", "id": 42} ]'
+    assert [r for _, r in await _collect(task_import.parse_json_array, array)] == [
+        {"title": "A é"}, {"title": "B", "id": 42}
+    ]
+
+@pytest.mark.asyncio
+async def test_csv_without_title_column_is_rejected():
+    """Verify that a CSV without a title column fails fast."""
+    with pytest.raises(task_import.ImportFormatError):
+        await _collect(task_import.parse_csv, b"name,description\nA,B\n")
+
+@pytest.mark.asyncio
+async def test_import_upserts_by_external_id_and_assigns_positions(monkeypatch):
+    """Verify that known external IDs are updated, new rows get consecutive positions and invalid rows are reported."""
+    monkeypatch.setattr(task_import.settings, "IMPORT_CHUNK_SIZE", 2)
+    mock_db = MagicMock()
+    mock_db.tasks.find_one = AsyncMock(return_value={"position": 4})
+    mock_db.tasks.find.return_value.to_list = AsyncMock(return_value=[{"external_id": "H-1"}])
+    mock_db.tasks.bulk_write = AsyncMock(return_value=MagicMock(inserted_count=1, upserted_count=1, matched_count=1))
+    progress = AsyncMock()
+
+    data = b'{"title": "Known", "external_id": "H-1"}\n{"title": "New", "external_id": "H-2"}\n{"description": "no title"}\n{"title": "Plain"}\n'
+    summary = await task_import.import_tasks(mock_db, "ROOM_XYZ", _chunks(data), "ndjson", on_progress=progress)
+
+    assert summary["processed"] == 4
+    assert summary["errors"] == [{"row": 3, "detail": "Missing title"}]
+    assert progress.call_count == 2
+
+    first_ops = mock_db.tasks.bulk_write.call_args_list[0][0][0]
+    known, new = first_ops
+    assert isinstance(known, UpdateOne) and "$setOnInsert" not in known._doc
+    assert known._filter == {"room_id": "ROOM_XYZ", "external_id": "H-1"}
+    assert new._doc["$setOnInsert"]["position"] == 5
+    assert new._doc["$setOnInsert"]["_id"] == new._doc["$setOnInsert"]["id"]
+    plain = mock_db.tasks.bulk_write.call_args_list[1][0][0][0]
+    assert isinstance(plain, InsertOne)
+    assert plain._doc["position"] == 6
+    assert plain._doc["_id"] == plain._doc["id"]
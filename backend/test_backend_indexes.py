@@ -0,0 +1,60 @@
+import sys
+import os
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+from pymongo.errors import OperationFailure
+
+# Add backend dir to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+
+from app.main import fastapi_app
+from app.db import indexes
+
+
+@pytest.mark.asyncio
+async def test_ensure_indexes_declares_unique_keys_and_survives_failures():
+    """Verify that the hot-path indexes are created with their unique constraints and one failure does not stop the rest."""
+    mock_db = MagicMock()
+    calls = []
+    def create_index(collection, keys, **options):
+        calls.append((collection, keys, options))
+        if collection == "archived_rooms" and options.get("unique"): raise OperationFailure("E11000 duplicate key")
+        return "_".join(k for k, _ in keys)
+    mock_db.__getitem__.side_effect = lambda name: MagicMock(create_index=AsyncMock(side_effect=lambda keys, **o: create_index(name, keys, **o)))
+    mock_db.memberships.create_index = AsyncMock()
+    mock_db.tasks.create_index = AsyncMock()
+
+    report = await indexes.ensure_indexes(mock_db)
+
+    unique = {(c, tuple(k for k, _ in keys)) for c, keys, o in calls if o.get("unique")}
+    assert {("global_users", ("id",)), ("archived_rooms", ("id",)), ("jobs", ("id",))} <= unique
+    # Rooms, tasks, votes and memberships are unique by _id, so nothing else is declared for them.
+    assert not {c for c, _ in unique} & {"rooms", "tasks", "votes", "memberships"}
+    assert ("tasks", [("room_id", 1), ("position", 1)], {}) in calls
+    assert ("rooms", [("owner_id", 1), ("created_at", -1)], {}) in calls
+    assert [f["collection"] for f in report["failed"]] == ["archived_rooms"]
+    assert len(report["created"]) == len(indexes.INDEXES) - 1
+    mock_db.tasks.create_index.assert_called_once()  # text index
+
+@pytest.mark.asyncio
+async def test_check_flags_collection_scans():
+    """Verify that explain() output with a COLLSCAN fails the check unless the shape allows scans."""
+    ixscan = {"queryPlanner": {"winningPlan": {"stage": "FETCH", "inputStage": {"stage": "IXSCAN", "indexName": "id_1"}}}}
+    collscan_agg = {"stages": [{"$cursor": {"queryPlanner": {"winningPlan": {"queryPlan": {"stage": "COLLSCAN"}}}}}]}
+
+    async def command(name, cmd, verbosity):
+        if cmd.get("find") == "votes" and cmd["filter"] == {"user_id": "u"}: return collscan_agg
+        if cmd.get("find") == "stats": return collscan_agg
+        return ixscan
+    mock_db = MagicMock()
+    mock_db.command = AsyncMock(side_effect=command)
+
+    results = {r["name"]: r for r in await indexes.check_query_plans(mock_db)}
+
+    assert results["votes of user"]["ok"] is False and results["votes of user"]["collscan"] is True
+    assert results["stats reconciliation"]["ok"] is True  # whole-collection read by design
+    assert results["membership"]["ok"] is True
+    assert sum(not r["ok"] for r in results.values()) == 1
+    name, cmd = mock_db.command.call_args_list[0][0]
+    assert name == "explain" and mock_db.command.call_args_list[0][1] == {"verbosity": "queryPlanner"}
@@ -0,0 +1,79 @@
+import sys
+import os
+import pytest
+import socketio
+from unittest.mock import AsyncMock
+from jose import jwt
+
+# Add backend dir to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+
+from app.main import fastapi_app
+from app.core.config import settings
+from app.services import socket, live_metrics
+
+
+@pytest.fixture(autouse=True)
+def clean_metrics():
+    live_metrics.reset()
+    socket.admin_sids.clear()
+    yield
+    live_metrics.reset()
+
+def _environ(user_id):
+    token = jwt.encode({"sub": user_id}, settings.JWT_SECRET, algorithm=settings.ALGORITHM)
+    return {"HTTP_COOKIE": f"access_token={token}"}
+
+def test_snapshot_ranks_hottest_rooms():
+    """Verify that the snapshot counts votes in the window and ranks rooms by activity."""
+    for _ in range(3): live_metrics.record_vote("room_b")
+    live_metrics.record_vote("ROOM_A")
+    live_metrics.record_broadcast("ROOM_A")
+    socket_users = {
+        "s1": {"room_id": "ROOM_A", "user_id": "u1"},
+        "s2": {"room_id": "ROOM_A", "user_id": "u2"},
+        "s3": {"room_id": "ROOM_C", "user_id": "u1"},
+    }
+
+    snap = live_metrics.snapshot(socket_users, connected_sockets=4, top_n=2)
+
+    assert snap["votes_per_minute"] == 4
+    assert snap["active_rooms"] == 2
+    assert snap["online_users"] == 2
+    assert snap["connected_sockets"] == 4
+    assert [r["room_id"] for r in snap["hottest_rooms"]] == ["ROOM_B", "ROOM_A"]
+    assert snap["hottest_rooms"][1] == {"room_id": "ROOM_A", "votes_per_minute": 1, "updates_per_minute": 1, "online_users": 2}
+
+@pytest.mark.asyncio
+async def test_admin_namespace_requires_allowlisted_user(monkeypatch):
+    """Verify that the /admin namespace refuses non-admins and sends admins a snapshot on connect."""
+    monkeypatch.setattr(settings, "ADMIN_USER_IDS", ["admin-1"])
+    emit = AsyncMock()
+    monkeypatch.setattr(socket.sio, "emit", emit)
+
+    with pytest.raises(socketio.exceptions.ConnectionRefusedError):
+        await socket.admin_connect("sid-1", _environ("user-1"))
+    with pytest.raises(socketio.exceptions.ConnectionRefusedError):
+        await socket.admin_connect("sid-1", {})
+    assert socket.admin_sids == set()
+
+    await socket.admin_connect("sid-2", _environ("admin-1"))
+
+    assert socket.admin_sids == {"sid-2"}
+    event, payload = emit.call_args[0]
+    assert event == "metrics" and "hottest_rooms" in payload
+    assert emit.call_args[1] == {"to": "sid-2", "namespace": "/admin"}
+
+@pytest.mark.asyncio
+async def test_admin_namespace_refuses_everyone_without_allowlist(monkeypatch):
+    """Verify that with no ADMIN_USER_IDS configured even authenticated users are refused."""
+    monkeypatch.setattr(settings, "ADMIN_USER_IDS", [])
+    emit = AsyncMock()
+    monkeypatch.setattr(socket.sio, "emit", emit)
+
+    with pytest.raises(socketio.exceptions.ConnectionRefusedError):
+        await socket.admin_connect("sid-3", _environ("user-1"))
+
+    assert "sid-3" not in socket.admin_sids
+    emit.assert_not_called()
@@ -0,0 +1,192 @@
+import sys
+import os
+import pytest
+import uuid
+import zlib
+from unittest.mock import AsyncMock, MagicMock
+from bson import Binary, json_util
+from pymongo.errors import DuplicateKeyError
+
+# Add backend dir to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+
+from app.main import fastapi_app
+from app.core.config import settings
+from app.db import migrations, repositories
+from app.db.database import db_instance
+from app.services import archive
+
+
+class FakeCursor:
+    def __init__(self, docs):
+        self.docs = docs
+
+    def sort(self, *args):
+        return self
+
+    def limit(self, n):
+        self.docs = self.docs[:n]
+        return self
+
+    async def to_list(self, length=None):
+        return self.docs
+
+class FakeRooms:
+    """Just enough of a collection for `backfill`: `$exists` filters, `_id` ranges and `$set`."""
+    def __init__(self, docs):
+        self.docs = docs
+        self.update_many_calls = 0
+
+    def _matches(self, doc, query):
+        for field, cond in query.items():
+            if field == "_id":
+                if "$gt" in cond and not doc["_id"] > cond["$gt"]: return False
+                if "$in" in cond and doc["_id"] not in cond["$in"]: return False
+            elif (field in doc) != cond["$exists"]:
+                return False
+        return True
+
+    def find(self, query, projection=None):
+        return FakeCursor([{"_id": d["_id"]} for d in sorted(self.docs, key=lambda d: d["_id"]) if self._matches(d, query)])
+
+    async def update_many(self, query, update):
+        self.update_many_calls += 1
+        matched = [d for d in self.docs if self._matches(d, query)]
+        for d in matched: d.update(update["$set"])
+        return MagicMock(matched_count=len(matched), modified_count=len(matched))
+
+@pytest.mark.asyncio
+async def test_backfill_runs_in_batches_once_and_records_progress(monkeypatch):
+    """Verify that pending migrations backfill rooms in _id batches, report progress and are skipped once applied."""
+    monkeypatch.setattr(settings, "MIGRATION_BATCH_SIZE", 2)
+    monkeypatch.setattr(migrations, "MIGRATIONS", migrations.MIGRATIONS[:3])
+    rooms = FakeRooms([{"_id": i, "id": f"ROOM_{i}"} for i in range(5)] + [{"_id": 5, "id": "ROOM_5", "deck_type": "T_SHIRT", "deck_values": ["S"], "timer_end": None}])
+    mock_db = MagicMock()
+    mock_db.__getitem__.side_effect = lambda name: rooms
+    mock_db.schema_migrations.find_one_and_update = AsyncMock()
+    mock_db.schema_migrations.update_one = AsyncMock()
+    job = MagicMock(report=AsyncMock(), checkpoint=AsyncMock())
+
+    result = await migrations.migrate(mock_db, job)
+
+    assert result == {"applied": [1, 2, 3], "already_applied": []}
+    assert all(d["deck_type"] and d["deck_values"] and "timer_end" in d for d in rooms.docs)
+    assert rooms.docs[5]["deck_type"] == "T_SHIRT" and rooms.docs[5]["deck_values"] == ["S"]
+    assert rooms.update_many_calls == 9  # 5 rooms to migrate, 2 per batch, 3 migrations
+    query, update = mock_db.schema_migrations.update_one.call_args[0]
+    assert query == {"_id": 3, "owner": migrations.OWNER}
+    assert update["$set"]["status"] == "applied"
+    assert update["$set"]["progress"] == {"rooms": {"matched": 5, "modified": 5, "batches": 3}}
+    job.checkpoint.assert_called()
+
+    # Applied migrations fail the claim filter; the upsert then hits the existing record.
+    mock_db.schema_migrations.find_one_and_update = AsyncMock(side_effect=DuplicateKeyError("dup"))
+    mock_db.schema_migrations.find_one = AsyncMock(return_value={"_id": 1, "status": "applied"})
+    rooms.update_many_calls = 0
+
+    assert await migrations.migrate(mock_db) == {"applied": [], "already_applied": [1, 2, 3]}
+    assert rooms.update_many_calls == 0
+
+@pytest.mark.asyncio
+async def test_archived_rooms_are_upgraded_on_rehydrate():
+    """Verify that a room archived before the deck fields existed is written back in the current schema."""
+    payload = {"room": {"id": "ROOM_OLD", "name": "Old"}, "tasks": [], "votes": [], "users": []}
+    mock_db = MagicMock()
+    mock_db.rooms.find_one = AsyncMock(return_value=None)
+    mock_db.archived_rooms.find_one_and_update = AsyncMock(return_value={
+        "_id": "ROOM_OLD", "codec": "zlib", "payload": Binary(zlib.compress(json_util.dumps(payload).encode()))
+    })
+    mock_db.archived_rooms.delete_one = AsyncMock()
+    mock_db.rooms.insert_one = AsyncMock()
+    mock_db.stats.bulk_write = AsyncMock()
+    db_instance.db = mock_db
+
+    room = await archive.rehydrate_room(mock_db, "ROOM_OLD")
+
+    stored = mock_db.rooms.insert_one.call_args[0][0]
+    assert stored["deck_type"] == "FIBONACCI" and stored["deck_values"][-1] == "?" and stored["timer_end"] is None
+    assert room["deck_values"] == stored["deck_values"]
+
+@pytest.mark.asyncio
+async def test_imported_tasks_are_rekeyed_by_id():
+    """Verify that migration 7 moves tasks left under an ObjectId _id to their id."""
+    migration = next(m for m in migrations.MIGRATIONS if m.version == 7)
+    ctx = MagicMock(rekey=AsyncMock())
+
+    await migration.run(ctx)
+
+    collection, key = ctx.rekey.call_args[0]
+    assert collection == "tasks" and key({"_id": "oid", "id": "t1"}) == "t1"
+
+@pytest.mark.asyncio
+@pytest.mark.skipif(not os.environ.get("TEST_MONGO_URL"), reason="TEST_MONGO_URL not set")
+async def test_import_into_normalized_db_keys_tasks_by_id(monkeypatch):
+    """Verify against a real server that tasks imported into an already normalized database are
+    keyed by their id, and that migration 7 rekeys the ones an earlier import stored under an ObjectId."""
+    from motor.motor_asyncio import AsyncIOMotorClient
+    from app.services import task_import
+    client = AsyncIOMotorClient(os.environ["TEST_MONGO_URL"])
+    name = f"test_migrations_{uuid.uuid4().hex[:8]}"
+    db = client[name]
+    try:
+        await migrations.migrate(db)
+        # A deployment that imported tasks before migration 7 existed.
+        await db.schema_migrations.delete_one({"_id": 7})
+        await db.tasks.insert_one({"id": "old-import", "room_id": "R1", "external_id": "H-0", "title": "Old", "position": 0})
+
+        async def chunks():
+            yield b'{"title": "New", "external_id": "H-1"}\n{"title": "Plain"}\n'
+        await task_import.import_tasks(db, "R1", chunks(), "ndjson")
+        imported = await db.tasks.find({"room_id": "R1", "id": {"$ne": "old-import"}}).to_list(None)
+        assert len(imported) == 2 and all(t["_id"] == t["id"] for t in imported)
+
+        assert (await migrations.migrate(db))["applied"] == [7]
+        assert (await db.tasks.find_one({"_id": "old-import"}))["title"] == "Old"
+        assert await db.tasks.count_documents({"_id": {"$type": "objectId"}}) == 0
+    finally:
+        await client.drop_database(name)
+        client.close()
+
+@pytest.mark.asyncio
+@pytest.mark.skipif(not os.environ.get("TEST_MONGO_URL"), reason="TEST_MONGO_URL not set")
+async def test_layout_migration_keeps_legacy_reads_working(monkeypatch):
+    """Verify that the repositories read both layouts while migration 4 is pending, and that
+    it keys rooms and votes by _id and splits members into memberships and profiles."""
+    from motor.motor_asyncio import AsyncIOMotorClient
+    monkeypatch.setattr(settings, "MIGRATION_BATCH_SIZE", 1)
+    monkeypatch.setattr(settings, "MIGRATION_STATUS_REFRESH_SECONDS", 0)
+    client = AsyncIOMotorClient(os.environ["TEST_MONGO_URL"])
+    name = f"test_migrations_{uuid.uuid4().hex[:8]}"
+    db = client[name]
+    try:
+        await db.rooms.create_index("id", unique=True)
+        await db.rooms.insert_one({"id": "R1", "name": "Sprint", "owner_id": "u1"})
+        await db.votes.insert_one({"task_id": "t1", "user_id": "u1", "value": "5"})
+        await db.users.insert_many([{"id": "u1", "room_id": "R1", "name": "Ana", "is_admin": True}, {"id": "u2", "room_id": "R1", "name": "Bia"}])
+        await migrations.load_applied(db)
+        assert repositories.legacy_layout is True
+
+        # Before the migration: legacy documents are read, and written ones move to the new layout.
+        repos = repositories.mongo_repositories(db)
+        assert (await repos.rooms.get("R1"))["name"] == "Sprint"
+        await repos.memberships.update("u2", "R1", {"is_online": False})
+        assert await db.memberships.find_one({"_id": "R1:u2"}) is not None
+        assert sorted(m["name"] for m in await repos.memberships.list_room("R1")) == ["Ana", "Bia"]
+        assert await repos.memberships.count_room("R1") == 2
+
+        assert (await migrations.migrate(db))["applied"] == [1, 2, 3, 4, 5, 6, 7]
+
+        assert repositories.legacy_layout is False
+        assert (await db.rooms.find_one({"_id": "R1"}))["deck_type"] == "FIBONACCI"
+        assert await db.votes.find_one({"_id": "t1:u1"}) is not None
+        assert "users" not in await db.list_collection_names()
+        assert "id_1" not in await db.rooms.index_information()
+        assert await repos.memberships.get("u1", "R1") == {"id": "u1", "room_id": "R1", "is_admin": True}
+        assert sorted((m["id"], m["name"]) for m in await repos.memberships.list_room("R1")) == [("u1", "Ana"), ("u2", "Bia")]
+        assert sorted((r["_id"], r["name"], r["type"]) for r in await db.admin_users.find({}).to_list(None)) == [("u1", "Ana", "Guest"), ("u2", "Bia", "Guest")]
+        progress = (await migrations.status(db))[3]["progress"]
+        assert progress["users"]["moved"] == 1 and progress["before"]["users"]["count"] == 1
+    finally:
+        await client.drop_database(name)
+        client.close()
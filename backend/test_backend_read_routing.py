@@ -0,0 +1,120 @@
+import sys
+import os
+import asyncio
+import uuid
+import pytest
+from unittest.mock import MagicMock
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo.read_preferences import ReadPreference, SecondaryPreferred
+
+# Add backend dir to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+
+from app.core.config import settings
+from app.db import database
+from app.db.database import QueryMetrics, TaggedHandle, db_instance, get_db, query_class, read_preference
+
+
+def command_event(name, host="db1", port=27017, micros=2000):
+    return MagicMock(command_name=name, connection_id=(host, port), duration_micros=micros)
+
+def test_tolerant_classes_read_from_secondaries_with_staleness_bound(monkeypatch):
+    """Verify that listed classes get the configured preference with max staleness, and everything else the primary."""
+    monkeypatch.setattr(settings, "TOLERANT_READ_CLASSES", ["admin", "export"])
+    monkeypatch.setattr(settings, "TOLERANT_READ_PREFERENCE", "secondaryPreferred")
+    monkeypatch.setattr(settings, "READ_MAX_STALENESS_SECONDS", 120)
+
+    assert read_preference("admin") == SecondaryPreferred(max_staleness=120)
+    assert read_preference("realtime") == ReadPreference.PRIMARY
+    assert read_preference("analytics") == ReadPreference.PRIMARY
+
+    monkeypatch.setattr(settings, "TOLERANT_READ_PREFERENCE", "primary")
+    assert read_preference("admin") == ReadPreference.PRIMARY
+
+def test_get_db_without_client_returns_injected_db():
+    """Verify that an injected db (no client) is returned untouched for every class."""
+    mock_db = MagicMock()
+    db_instance.db = mock_db
+
+    assert get_db() is mock_db and get_db("export") is mock_db
+    assert query_class.get() == "realtime"
+
+@pytest.mark.asyncio
+async def test_tagged_handle_scopes_the_class_to_its_own_operations(monkeypatch):
+    """Verify that only operations made through a tolerant handle are tagged, including
+    the collections and cursors it returns, and that the calling task keeps its class."""
+    monkeypatch.setattr(settings, "TOLERANT_READ_CLASSES", ["admin"])
+    client = AsyncIOMotorClient("mongodb://localhost:1", connect=False)
+    monkeypatch.setattr(db_instance, "client", client)
+    monkeypatch.setattr(db_instance, "db", client[settings.DB_NAME])
+    monkeypatch.setattr(db_instance, "readers", {})
+
+    admin = get_db("admin")
+    assert admin.read_preference == SecondaryPreferred(max_staleness=settings.READ_MAX_STALENESS_SECONDS)
+    assert isinstance(admin.rooms, TaggedHandle) and isinstance(admin["rooms"].find({}).sort("_id").limit(5), TaggedHandle)
+    assert get_db() is db_instance.db and query_class.get() == "realtime"
+
+    seen = []
+    class Target:
+        def scheduled(self):  # Motor futures copy the context when called
+            seen.append(query_class.get())
+            return "future"
+        async def native(self):
+            await asyncio.sleep(0)
+            seen.append(query_class.get())
+            return "done"
+    handle = TaggedHandle(Target(), "admin")
+
+    assert handle.scheduled() == "future"
+    assert await handle.native() == "done"
+    seen.append(query_class.get())
+    assert seen == ["admin", "admin", "realtime"]
+
+def test_query_metrics_count_reads_per_class_and_server():
+    """Verify that read commands are counted per query class and server, labelled with the server role."""
+    metrics = QueryMetrics()
+    metrics.succeeded(command_event("find", micros=1000))
+    metrics.succeeded(command_event("insert"))
+    token = query_class.set("admin")
+    try:
+        metrics.succeeded(command_event("aggregate", host="db2", micros=3000))
+        metrics.failed(command_event("getMore", host="db2", micros=1000))
+    finally:
+        query_class.reset(token)
+    client = MagicMock(primary=("db1", 27017), secondaries={("db2", 27017)})
+
+    assert metrics.snapshot(client) == {
+        "realtime": {"db1:27017": {"role": "primary", "commands": 1, "errors": 0, "avg_ms": 1.0}},
+        "admin": {"db2:27017": {"role": "secondary", "commands": 2, "errors": 1, "avg_ms": 2.0}}
+    }
+    metrics.clear()
+    assert metrics.snapshot() == {}
+
+@pytest.mark.asyncio
+@pytest.mark.skipif(not os.environ.get("TEST_MONGO_URL"), reason="TEST_MONGO_URL not set")
+async def test_tolerant_reads_on_single_host_replica_set(monkeypatch):
+    """Verify against a replica set (a single-host one is enough) that tolerant handles carry the
+    staleness bound, fall back to the primary without secondaries, and are counted per class."""
+    monkeypatch.setattr(settings, "MONGO_URL", os.environ["TEST_MONGO_URL"])
+    monkeypatch.setattr(settings, "DB_NAME", f"test_reads_{uuid.uuid4().hex[:8]}")
+    monkeypatch.setattr(settings, "TOLERANT_READ_CLASSES", ["room_lists"])
+    database.query_metrics.clear()
+    await db_instance.connect()
+    try:
+        await get_db().rooms.insert_one({"_id": "R1", "name": "Sprint"})
+
+        handle = get_db("room_lists")
+        assert handle.read_preference == SecondaryPreferred(max_staleness=settings.READ_MAX_STALENESS_SECONDS)
+        assert [r["_id"] async for r in handle.rooms.find({})] == ["R1"]
+        assert await handle.rooms.count_documents({}) == 1
+        # Realtime reads in the same task are not counted under the tolerant class.
+        await get_db().rooms.find_one({"_id": "R1"})
+
+        snapshot = database.query_metrics.snapshot(db_instance.client)
+        assert [(s["role"], s["commands"]) for s in snapshot["room_lists"].values()] == [("primary", 2)]
+        assert sum(s["commands"] for s in snapshot["realtime"].values()) >= 1
+    finally:
+        await db_instance.client.drop_database(settings.DB_NAME)
+        await db_instance.disconnect()
+        db_instance.client = None
@@ -33,10 +33,9 @@ async def test_get_recent_rooms_db_not_connected():
 async def test_get_recent_rooms_no_memberships():
     """Verify that get_recent_rooms returns empty list if user has no room memberships."""
     mock_db = MagicMock()
-    mock_users = MagicMock()
     # No memberships
-    mock_users.find.return_value.to_list = AsyncMock(return_value=[])
-    mock_db.users = mock_users
+    mock_db.memberships.find.return_value.to_list = AsyncMock(return_value=[])
+    mock_db.archived_rooms.find.return_value.to_list = AsyncMock(return_value=[])
     db_instance.db = mock_db
     
     rooms = await users.get_recent_rooms("user-1", current_user_id="user-1")
@@ -49,13 +48,12 @@ async def test_get_recent_rooms_success():
     
     # Mock memberships (joined room A then room B)
     memberships = [
-        {"id": "user-1", "room_id": "ROOM_A", "joined_at": "2026-07-15T01:00:00Z"},
-        {"id": "user-1", "room_id": "ROOM_B", "joined_at": "2026-07-15T02:00:00Z"},
-        {"id": "user-1", "room_id": "ROOM_C", "joined_at": "2026-07-15T00:30:00Z"}
+        {"_id": "ROOM_A:user-1", "user_id": "user-1", "room_id": "ROOM_A", "joined_at": "2026-07-15T01:00:00Z"},
+        {"_id": "ROOM_B:user-1", "user_id": "user-1", "room_id": "ROOM_B", "joined_at": "2026-07-15T02:00:00Z"},
+        {"_id": "ROOM_C:user-1", "user_id": "user-1", "room_id": "ROOM_C", "joined_at": "2026-07-15T00:30:00Z"}
     ]
-    mock_users = MagicMock()
-    mock_users.find.return_value.to_list = AsyncMock(return_value=memberships)
-    mock_db.users = mock_users
+    mock_db.memberships.find.return_value.to_list = AsyncMock(return_value=memberships)
+    mock_db.archived_rooms.find.return_value.to_list = AsyncMock(return_value=[])
     
     # Mock rooms:
     # ROOM_A: owned by user-2 (not owned by user-1)
@@ -76,7 +74,7 @@ async def test_get_recent_rooms_success():
     # Assert find called with correct filter excluding owner_id="user-1"
     mock_db.rooms.find.assert_called_once()
     find_args = mock_db.rooms.find.call_args[0][0]
-    assert find_args["id"]["$in"] == ["ROOM_A", "ROOM_B", "ROOM_C"]
+    assert find_args["_id"]["$in"] == ["ROOM_A", "ROOM_B", "ROOM_C"]
     assert find_args["owner_id"] == {"$ne": "user-1"}
     
     # Assert result is sorted by joined_at descending: ROOM_B (02:00) then ROOM_A (01:00)
@@ -91,9 +89,9 @@ async def test_join_room_sets_joined_at():
     
     # Mock room exists
     mock_db.rooms.find_one = AsyncMock(return_value={"id": "ROOM_XYZ", "owner_id": "user-other"})
-    mock_db.users.count_documents = AsyncMock(return_value=1)
-    mock_db.users.update_one = AsyncMock()
-    mock_db.users.find_one = AsyncMock(return_value={"id": "user-1", "room_id": "ROOM_XYZ", "name": "Test User"})
+    mock_db.memberships.count_documents = AsyncMock(return_value=1)
+    mock_db.memberships.update_one = AsyncMock()
+    mock_db.profiles.update_one = AsyncMock()
     
     db_instance.db = mock_db
     
@@ -119,8 +117,11 @@ async def test_join_room_sets_joined_at():
     await rooms.join_room_http(mock_request, "ROOM_XYZ", user_join)
     
     # Assert update_one was called and set joined_at
-    mock_db.users.update_one.assert_called_once()
-    set_dict = mock_db.users.update_one.call_args[0][1]["$set"]
-    assert "joined_at" in set_dict
-    assert set_dict["id"] == "user-1"
-    assert set_dict["room_id"] == "ROOM_XYZ"
+    mock_db.memberships.update_one.assert_called_once()
+    query, update = mock_db.memberships.update_one.call_args[0]
+    assert query == {"_id": "ROOM_XYZ:user-1"}
+    assert "joined_at" in update["$set"]
+    assert update["$set"]["user_id"] == "user-1"
+    assert update["$set"]["room_id"] == "ROOM_XYZ"
+    assert "name" not in update["$set"]
+    mock_db.profiles.update_one.assert_called_once_with({"_id": "user-1"}, {"$set": {"name": "Test User", "picture": None}}, upsert=True)
@@ -0,0 +1,119 @@
+import sys
+import os
+import uuid
+import pytest
+import pytest_asyncio
+
+# Add backend dir to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+
+from app.db import repositories
+
+# Conformance suite: every storage engine must pass the same tests. The MongoDB engine
+# runs against a real server when TEST_MONGO_URL is set (each run uses a throwaway DB).
+
+ENGINES = ["memory", pytest.param("mongo", marks=pytest.mark.skipif(not os.environ.get("TEST_MONGO_URL"), reason="TEST_MONGO_URL not set"))]
+
+@pytest_asyncio.fixture(params=ENGINES)
+async def repos(request):
+    if request.param == "memory":
+        yield repositories.memory_repositories()
+        return
+    from motor.motor_asyncio import AsyncIOMotorClient
+    client = AsyncIOMotorClient(os.environ["TEST_MONGO_URL"])
+    name = f"test_repositories_{uuid.uuid4().hex[:8]}"
+    try:
+        yield repositories.mongo_repositories(client[name])
+    finally:
+        await client.drop_database(name)
+        client.close()
+
+@pytest.mark.asyncio
+async def test_rooms_by_id_owner_and_projection(repos):
+    """Verify that rooms are found by id, listed by owner newest first, projected and revealed once."""
+    await repos.rooms.insert({"id": "R1", "name": "Old", "owner_id": "u1", "created_at": "2026-01-01", "deck_values": ["1"]})
+    await repos.rooms.insert({"id": "R2", "name": "New", "owner_id": "u1", "created_at": "2026-02-01"})
+    await repos.rooms.insert({"id": "R3", "name": "Other", "owner_id": "u2", "created_at": "2026-03-01"})
+    await repos.rooms.update("R1", {"cards_revealed": True})
+
+    assert (await repos.rooms.get("R1"))["cards_revealed"] is True
+    assert await repos.rooms.reveal("R2") is True
+    assert await repos.rooms.reveal("R2") is False and await repos.rooms.reveal("NOPE") is False
+    assert await repos.rooms.get("R1", ["deck_values"]) == {"deck_values": ["1"]}
+    assert await repos.rooms.get("NOPE") is None
+    assert [r["id"] for r in await repos.rooms.list_by_owner("u1")] == ["R2", "R1"]
+    assert [r["id"] for r in await repos.rooms.list_by_ids(["R1", "R3"], exclude_owner="u1")] == ["R3"]
+    assert await repos.rooms.delete("R3") == 1
+    assert await repos.rooms.list_by_owner("u2") == []
+
+@pytest.mark.asyncio
+async def test_memberships_upsert_filters_and_counts(repos):
+    """Verify membership upserts, online/voter filters, per-room counts and that profiles are shared across rooms."""
+    assert await repos.memberships.upsert("u1", "R1", {"name": "Ana", "is_spectator": False, "is_online": True, "offline_since": "x"}) is True
+    assert await repos.memberships.upsert("u1", "R1", {"name": "Ana B"}, unset=["offline_since"]) is False
+    await repos.memberships.upsert("u2", "R1", {"name": "Bia", "is_spectator": True, "is_online": True})
+    await repos.memberships.upsert("u3", "R1", {"name": "Caio", "is_spectator": False})
+    await repos.memberships.upsert("u1", "R2", {"name": "Ana"})
+    await repos.memberships.update("u3", "R1", {"is_online": False})
+
+    # Memberships hold the role flags; names live once per user in the profile.
+    member = await repos.memberships.get("u1", "R1")
+    assert member["is_spectator"] is False and "offline_since" not in member and "name" not in member
+    assert {m["id"]: m["name"] for m in await repos.memberships.list_room("R1")} == {"u1": "Ana", "u2": "Bia", "u3": "Caio"}
+    assert {m["id"] for m in await repos.memberships.list_room("R1", online_only=True)} == {"u1", "u2"}
+    assert [m["id"] for m in await repos.memberships.list_room("R1", online_only=True, voters_only=True)] == ["u1"]
+    assert {m["room_id"] for m in await repos.memberships.list_user("u1")} == {"R1", "R2"}
+    assert await repos.memberships.list_by_ids("R1", ["u2", "u9"]) == [{"id": "u2", "name": "Bia"}]
+    assert await repos.memberships.count_room("R1") == 3
+    assert await repos.memberships.count_room("R1", exclude_user="u1") == 2
+    assert await repos.memberships.delete("u2", "R1") == 1
+    assert await repos.memberships.delete("u2", "R1") == 0
+
+@pytest.mark.asyncio
+async def test_tasks_ordering_and_updates(repos):
+    """Verify task ordering by position, scoped updates and status transitions."""
+    assert await repos.tasks.last_position("R1") is None
+    for position, task_id in [(1, "t2"), (0, "t1"), (2, "t3")]:
+        await repos.tasks.insert({"id": task_id, "room_id": "R1", "position": position, "status": "pending"})
+    await repos.tasks.insert({"id": "t9", "room_id": "R2", "position": 7, "status": "active"})
+
+    assert [t["id"] for t in await repos.tasks.list_room("R1")] == ["t1", "t2", "t3"]
+    assert await repos.tasks.last_position("R1") == 2
+    await repos.tasks.update("t3", {"position": 0}, room_id="R2")
+    assert (await repos.tasks.get("t3"))["position"] == 2
+    await repos.tasks.update("t1", {"statistics": {"mean": 3}}, inc={"rounds": 1})
+    await repos.tasks.update("t1", {}, inc={"rounds": 1})
+    assert (await repos.tasks.get("t1"))["rounds"] == 2
+    await repos.tasks.replace_status("R2", "active", "pending")
+    assert (await repos.tasks.get("t9"))["status"] == "pending"
+    assert await repos.tasks.delete("t9") == 1
+    assert await repos.tasks.get("t9") is None
+
+@pytest.mark.asyncio
+async def test_votes_replace_and_delete(repos):
+    """Verify that a user has one vote per task and that votes are removed by task and user."""
+    assert await repos.votes.replace({"task_id": "t1", "user_id": "u1", "value": "3"}) is False
+    assert await repos.votes.replace({"task_id": "t1", "user_id": "u1", "value": "5"}) is True
+    await repos.votes.replace({"task_id": "t1", "user_id": "u2", "value": "8"})
+    await repos.votes.replace({"task_id": "t2", "user_id": "u1", "value": "1", "room_id": "R1"})
+
+    votes = {v["user_id"]: v["value"] for v in await repos.votes.list_task("t1")}
+    assert votes == {"u1": "5", "u2": "8"}
+    assert await repos.votes.delete("t1", "u2") == 1
+    assert await repos.votes.delete_user_in_room("u1", "R1") == 1
+    assert await repos.votes.delete_task("t1") == 1
+    assert await repos.votes.list_task("t1") == [] and await repos.votes.list_task("t2") == []
+
+@pytest.mark.asyncio
+async def test_global_users_and_returned_docs_are_copies(repos):
+    """Verify global user upserts and that mutating a returned document never changes storage."""
+    await repos.global_users.upsert("g1", {"name": "Ana", "email": "a@x"})
+    await repos.global_users.upsert("g1", {"name": "Ana B"})
+    user = await repos.global_users.get("g1")
+    assert user == {"id": "g1", "name": "Ana B", "email": "a@x"}
+
+    user["name"] = "changed"
+    assert (await repos.global_users.get("g1"))["name"] == "Ana B"
+    assert await repos.global_users.delete("g1") == 1
+    assert await repos.global_users.get("g1") is None
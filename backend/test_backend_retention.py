@@ -0,0 +1,124 @@
+import sys
+import os
+import asyncio
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+from fastapi import HTTPException
+
+# Add backend dir to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+
+from app.main import fastapi_app
+from app.db.database import db_instance
+from app.services import retention, cascade
+from app.services.jobs import runner
+from app.api.routers import admin
+
+
+class FakeCursor:
+    def __init__(self, docs):
+        self.docs = docs
+    async def to_list(self, length=None):
+        return list(self.docs)
+
+@pytest.fixture(autouse=True)
+def small_batches(monkeypatch):
+    monkeypatch.setattr(retention.settings, "SWEEP_BATCH_SIZE", 2)
+    monkeypatch.setattr(retention.settings, "SWEEP_BATCH_DELAY_SECONDS", 0)
+
+def _db():
+    mock_db = MagicMock()
+    mock_db.jobs.insert_one = AsyncMock()
+    mock_db.jobs.update_one = AsyncMock()
+    mock_db.stats.bulk_write = AsyncMock()
+    mock_db.stats.delete_many = AsyncMock()
+    mock_db.memberships.count_documents = AsyncMock(return_value=0)
+    mock_db.memberships.update_many = AsyncMock(return_value=MagicMock(modified_count=0))
+    mock_db.memberships.create_index = AsyncMock()
+    mock_db.rooms.aggregate.return_value = FakeCursor([])
+    mock_db.tasks.aggregate.return_value = FakeCursor([])
+    mock_db.votes.aggregate.return_value = FakeCursor([])
+    mock_db.archived_rooms.count_documents = AsyncMock(return_value=0)
+    mock_db.archived_rooms.delete_many = AsyncMock(return_value=MagicMock(deleted_count=0))
+    return mock_db
+
+@pytest.mark.asyncio
+async def test_dry_run_reports_without_deleting():
+    """Verify that a dry run counts what each policy would remove and writes nothing."""
+    mock_db = _db()
+    mock_db.memberships.count_documents = AsyncMock(side_effect=[4, 6])
+    mock_db.rooms.aggregate.return_value = FakeCursor([{"_id": 1, "id": "OLD_ROOM"}])
+    mock_db.tasks.aggregate.return_value = FakeCursor([{"_id": 1, "id": "T1"}])
+    mock_db.votes.count_documents = AsyncMock(return_value=3)
+    mock_db.votes.delete_many = AsyncMock()
+    mock_db.rooms.delete_one = AsyncMock()
+    db_instance.db = mock_db
+
+    res = await admin.run_retention_sweep(dry_run=True)
+    await runner.wait(res["job_id"])
+
+    report = (await admin.get_retention())["last_run"]
+    assert report["dry_run"] is True
+    assert report["policies"]["offline_memberships"]["matched"] == 4
+    assert report["policies"]["offline_memberships"]["backfilled"] == 6
+    assert report["policies"]["idle_rooms"]["matched"] == 1
+    assert report["policies"]["archive_rooms"]["matched"] == 1
+    assert report["policies"]["closed_task_votes"]["matched"] == 3
+    assert all(m["deleted"] == 0 for m in report["policies"].values())
+    mock_db.votes.delete_many.assert_not_called()
+    mock_db.rooms.delete_one.assert_not_called()
+    mock_db.memberships.update_many.assert_not_called()
+
+@pytest.mark.asyncio
+async def test_orphan_votes_are_deleted_in_chunks(monkeypatch):
+    """Verify that orphan votes are paged by _id and deleted one chunk at a time."""
+    mock_db = _db()
+    mock_db.votes.aggregate.side_effect = [
+        FakeCursor([{"_id": 1}, {"_id": 2}]),
+        FakeCursor([{"_id": 3}]),
+    ]
+    mock_db.votes.delete_many = AsyncMock(side_effect=[MagicMock(deleted_count=2), MagicMock(deleted_count=1)])
+    monkeypatch.setattr(retention.counters, "record_votes_removed", AsyncMock())
+    monkeypatch.setattr(retention.settings, "RETENTION_IDLE_ROOM_DAYS", 0)
+    monkeypatch.setattr(retention.settings, "RETENTION_CLOSED_TASK_VOTES_DAYS", 0)
+    monkeypatch.setattr(retention.settings, "RETENTION_ENABLED", True)
+    db_instance.db = mock_db
+
+    job = await retention.submit_sweep(mock_db, dry_run=False)
+    await runner.wait(job["id"])
+
+    metrics = retention.last_run["policies"]["orphan_votes"]
+    assert metrics["deleted"] == 3
+    assert metrics["batches"] == 2
+    assert mock_db.votes.delete_many.call_args_list[1].args[0] == {"_id": {"$in": [3]}}
+    # The second page starts after the last _id of the first one
+    second_pipeline = mock_db.votes.aggregate.call_args_list[1].args[0]
+    assert {"$match": {"_id": {"$gt": 2}}} in second_pipeline
+    mock_db.memberships.create_index.assert_called_once()
+
+@pytest.mark.asyncio
+async def test_retention_is_dry_run_until_enabled(monkeypatch):
+    """Verify that, by default, deleting sweeps are refused, the periodic sweep only simulates
+    and the TTL index is not created."""
+    monkeypatch.setattr(retention.settings, "RETENTION_ENABLED", False)
+    mock_db = _db()
+    db_instance.db = mock_db
+
+    with pytest.raises(HTTPException) as exc:
+        await admin.run_retention_sweep(dry_run=False)
+    assert exc.value.status_code == 409
+
+    submitted = []
+    async def submit(db, dry_run=False):
+        submitted.append(dry_run)
+        raise asyncio.CancelledError
+    monkeypatch.setattr(retention, "submit_sweep", submit)
+    monkeypatch.setattr(retention.asyncio, "sleep", AsyncMock())
+    with pytest.raises(asyncio.CancelledError):
+        await retention.sweep_periodically(lambda: mock_db, 1)
+    assert submitted == [True]
+
+    await retention.ensure_ttl_indexes(mock_db)
+    mock_db.memberships.create_index.assert_not_called()
+    assert retention.policies()["enabled"] is False
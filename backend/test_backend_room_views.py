@@ -0,0 +1,89 @@
+import sys
+import os
+import pytest
+from datetime import datetime, timezone
+from unittest.mock import AsyncMock, MagicMock
+from pymongo.errors import DuplicateKeyError
+
+# Add backend dir to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+
+from app.main import fastapi_app
+from app.db.database import db_instance
+from app.services import socket, room_views
+
+
+class FakeCursor:
+    def __init__(self, docs):
+        self.docs = docs
+
+    def sort(self, *args):
+        return self
+
+    def limit(self, n):
+        return self
+
+    async def to_list(self, length=None):
+        return self.docs
+
+def _state(revealed=False):
+    return {
+        "room": {"id": "ROOM_XYZ", "cards_revealed": revealed},
+        "users": [{"id": "u1", "has_voted": True}, {"id": "u2", "has_voted": True}],
+        "tasks": [{"id": "t1"}],
+        "votes": [{"task_id": "t1", "user_id": "u1", "value": "3"}, {"task_id": "t1", "user_id": "u2", "value": "8"}],
+        "active_task": {"id": "t1"},
+        "version": "node:4"
+    }
+
+@pytest.mark.asyncio
+async def test_state_is_served_from_the_projection_with_own_vote():
+    """Verify that the projection masks votes, that GET-style reads are one find_one and that each voter sees only their own card."""
+    view = room_views.to_document(_state(), datetime.now(timezone.utc))
+    assert view["state"]["votes"] == [{"user_id": "u1", "has_voted": True}, {"user_id": "u2", "has_voted": True}]
+    assert "version" not in view["state"]
+    assert room_views.to_document(_state(revealed=True), datetime.now(timezone.utc))["hidden_votes"] == {}
+
+    mock_db = MagicMock()
+    mock_db.room_views.find_one = AsyncMock(return_value={"_id": "ROOM_XYZ", "version": 7, **view})
+    mock_db.rooms.find_one = AsyncMock()
+    db_instance.db = mock_db
+
+    state = await socket.read_room_state("room_xyz", requesting_user_id="u2")
+
+    mock_db.room_views.find_one.assert_called_once_with({"_id": "ROOM_XYZ"})
+    mock_db.rooms.find_one.assert_not_called()
+    assert state["votes"] == [{"user_id": "u1", "has_voted": True}, {"user_id": "u2", "has_voted": True, "value": "8"}]
+    assert state["version"] == socket.get_room_version("ROOM_XYZ")
+
+@pytest.mark.asyncio
+async def test_save_is_conditional_and_rebuild_removes_orphans():
+    """Verify that stale or identical views are not overwritten and that a rebuild reprojects rooms and drops orphan views."""
+    started = datetime.now(timezone.utc)
+    mock_db = MagicMock()
+    mock_db.room_views.update_one = AsyncMock(side_effect=[None, DuplicateKeyError("dup")])
+
+    assert await room_views.save(mock_db, "ROOM_XYZ", _state(), started) is True
+    query, update = mock_db.room_views.update_one.call_args[0]
+    assert query == {"_id": "ROOM_XYZ", "digest": {"$ne": update["$set"]["digest"]}, "built_at": {"$lt": started}}
+    assert update["$inc"] == {"version": 1}
+    assert await room_views.save(mock_db, "ROOM_XYZ", _state(), started) is False
+
+    mock_db = MagicMock()
+    mock_db.rooms.find = MagicMock(return_value=FakeCursor([{"_id": 1, "id": "ROOM_A"}, {"_id": 2, "id": "ROOM_GONE"}]))
+    mock_db.room_views.find = MagicMock(return_value=FakeCursor([{"_id": "ROOM_A"}, {"_id": "ROOM_OLD"}]))
+    mock_db.rooms.distinct = AsyncMock(return_value=["ROOM_A"])
+    mock_db.room_views.update_one = AsyncMock()
+    mock_db.room_views.delete_one = AsyncMock()
+    mock_db.room_views.delete_many = AsyncMock(return_value=MagicMock(deleted_count=1))
+
+    async def build(room_id):
+        return _state() if room_id == "ROOM_A" else {}
+
+    totals = await room_views.rebuild(mock_db, build)
+
+    assert totals == {"rebuilt": 1, "orphans_removed": 1}
+    assert mock_db.room_views.update_one.call_args[0][0] == {"_id": "ROOM_A"}
+    mock_db.room_views.delete_one.assert_called_once_with({"_id": "ROOM_GONE"})
+    mock_db.room_views.delete_many.assert_called_once_with({"_id": {"$in": ["ROOM_OLD"]}})
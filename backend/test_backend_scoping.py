@@ -28,7 +28,7 @@ async def test_join_room_scoping():
     mock_db = MagicMock()
     mock_users = MagicMock()
     mock_users.update_one = AsyncMock()
-    mock_db.users = mock_users
+    mock_db.memberships = mock_users
     
     db_instance.db = mock_db
     
@@ -43,9 +43,9 @@ async def test_join_room_scoping():
     await socket.join_room(sid, data)
     
     # Assert update_one was called with the correct room scope
-    mock_db.users.update_one.assert_called_with(
-        {"id": "user-google-1", "room_id": "ROOM_123"},
-        {"$set": {"is_online": True}}
+    mock_db.memberships.update_one.assert_called_with(
+        {"_id": "ROOM_123:user-google-1"},
+        {"$set": {"is_online": True}, "$unset": {"offline_since": ""}}
     )
 
 @pytest.mark.asyncio
@@ -55,7 +55,7 @@ async def test_disconnect_scoping():
     mock_db = MagicMock()
     mock_users = MagicMock()
     mock_users.update_one = AsyncMock()
-    mock_db.users = mock_users
+    mock_db.memberships = mock_users
     
     mock_db.rooms = MagicMock()
     mock_db.rooms.find_one = AsyncMock(return_value=None)
@@ -68,10 +68,10 @@ async def test_disconnect_scoping():
     await socket.disconnect(sid)
     
     # Assert update_one was called with the correct room scope
-    mock_db.users.update_one.assert_called_with(
-        {"id": "user-google-1", "room_id": "ROOM_123"},
-        {"$set": {"is_online": False}}
-    )
+    query, update = mock_db.memberships.update_one.call_args[0]
+    assert query == {"_id": "ROOM_123:user-google-1"}
+    assert update["$set"]["is_online"] is False
+    assert update["$set"]["offline_since"] is not None
 
 @pytest.mark.asyncio
 async def test_cast_vote_scoping():
@@ -82,17 +82,16 @@ async def test_cast_vote_scoping():
     mock_find = MagicMock()
     mock_find.to_list = AsyncMock(return_value=[])
     mock_users.find.return_value = mock_find
-    mock_users.find_one = AsyncMock(return_value={"id": "user-google-1", "is_spectator": False})
+    mock_users.find_one = AsyncMock(return_value={"user_id": "user-google-1", "room_id": "ROOM_123", "is_spectator": False})
     mock_users.update_one = AsyncMock()
-    mock_db.users = mock_users
+    mock_db.memberships = mock_users
     
     mock_db.rooms = MagicMock()
-    mock_db.rooms.find_one = AsyncMock(return_value={"id": "ROOM_123"})
+    mock_db.rooms.find_one = AsyncMock(return_value={"id": "ROOM_123", "deck_values": ["3", "5", "8"]})
     mock_db.rooms.update_one = AsyncMock()
     
     mock_db.votes = MagicMock()
-    mock_db.votes.delete_one = AsyncMock()
-    mock_db.votes.insert_one = AsyncMock()
+    mock_db.votes.replace_one = AsyncMock(return_value=MagicMock(matched_count=0))
     mock_db.votes.find = MagicMock()
     mock_db.votes.find.return_value.to_list = AsyncMock(return_value=[])
     
@@ -109,6 +108,6 @@ async def test_cast_vote_scoping():
     await actions.cast_vote_http(action, current_user_id="user-google-1")
     
     # Assert find_one was called with the correct room scope
-    mock_db.users.find_one.assert_called_with(
-        {"id": "user-google-1", "room_id": "ROOM_123"}
+    mock_db.memberships.find_one.assert_called_with(
+        {"_id": "ROOM_123:user-google-1"}
     )
@@ -0,0 +1,126 @@
+import sys
+import os
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+from pymongo.errors import OperationFailure
+from starlette.requests import Request
+
+# Add backend dir to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+
+from app.main import fastapi_app
+from app.db.database import db_instance
+from app.db.pagination import encode_cursor
+from app.services import search
+from app.api.routers import search as search_router
+
+
+class FakeCursor:
+    def __init__(self, docs):
+        self.docs = docs
+    async def to_list(self, length=None):
+        return list(self.docs)
+
+TASKS = [
+    {"id": "t1", "room_id": "ROOM_A", "title": "Login com Google", "description": ""},
+    {"id": "t2", "room_id": "ROOM_A", "title": "Relatórios", "description": "exportar relatório de login"},
+    {"id": "t3", "room_id": "ROOM_B", "title": "Tela de login", "description": ""},
+    {"id": "t4", "room_id": "ROOM_X", "title": "Login admin", "description": ""},
+]
+
+@pytest.fixture(autouse=True)
+def fresh_index(monkeypatch):
+    monkeypatch.setattr(search, "index", search.InvertedIndex())
+    monkeypatch.setattr(search, "_text_search_failed_at", None)
+
+def _request():
+    scope = {"type": "http", "method": "GET", "path": "/api/search/tasks", "headers": [], "app": fastapi_app, "client": ("127.0.0.1", 12345)}
+    return Request(scope)
+
+def _db(room_ids):
+    mock_db = MagicMock()
+    mock_db.memberships.distinct = AsyncMock(return_value=room_ids)
+    mock_db.rooms.distinct = AsyncMock(return_value=[])
+    return mock_db
+
+@pytest.mark.asyncio
+async def test_memory_fallback_ranks_and_pages():
+    """Verify that a rejected $text query falls back to the inverted index, scoped to the user's rooms."""
+    mock_db = _db(["ROOM_A", "ROOM_B"])
+    mock_db.tasks.find.return_value = FakeCursor([t for t in TASKS if t["room_id"] != "ROOM_X"])
+
+    def aggregate(pipeline):
+        if "$text" in pipeline[0]["$match"]: raise OperationFailure("text index required for $text query")
+        ids = pipeline[0]["$match"]["_id"]["$in"]
+        return FakeCursor([{**t, "status": "COMPLETED", "final_score": "5", "room_name": t["room_id"]} for t in TASKS if t["id"] in ids])
+    mock_db.tasks.aggregate.side_effect = aggregate
+    db_instance.db = mock_db
+
+    first = await search_router.search_tasks(_request(), q="LOGIN", limit=2, cursor=None, current_user_id="user-1")
+
+    # Title matches (t1, t3) outrank the description match (t2); ROOM_X is not the user's.
+    assert [h["id"] for h in first["items"]] == ["t3", "t1"]
+    assert first["items"][0]["final_score"] == "5" and "_score" not in first["items"][0]
+    second = await search_router.search_tasks(_request(), q="relatorio", limit=2, cursor=None, current_user_id="user-1")
+    assert [h["id"] for h in second["items"]] == ["t2"]  # accents are folded
+    rest = await search_router.search_tasks(_request(), q="login", limit=2, cursor=first["next_cursor"], current_user_id="user-1")
+    assert [h["id"] for h in rest["items"]] == ["t2"] and rest["next_cursor"] is None
+    assert mock_db.tasks.find.call_count == 1  # rooms stay indexed between searches
+
+@pytest.mark.asyncio
+async def test_mongo_text_search_pipeline():
+    """Verify that the text query is scoped to the user's rooms and resumes after the cursor."""
+    mock_db = _db(["ROOM_B", "ROOM_A"])
+    mock_db.tasks.aggregate.return_value = FakeCursor([
+        {"id": "t3", "title": "Tela de login", "room_id": "ROOM_B", "_score": 1.5},
+    ])
+    db_instance.db = mock_db
+    cursor = encode_cursor([2.0, "t9"])
+
+    res = await search_router.search_tasks(_request(), q="login", limit=5, cursor=cursor, current_user_id="user-1")
+
+    pipeline = mock_db.tasks.aggregate.call_args[0][0]
+    assert pipeline[0] == {"$match": {"$text": {"$search": "login"}, "room_id": {"$in": ["ROOM_A", "ROOM_B"]}}}
+    assert pipeline[2] == {"$match": {"$or": [{"_score": {"$lt": 2.0}}, {"_score": 2.0, "id": {"$lt": "t9"}}]}}
+    assert res["items"] == [{"id": "t3", "title": "Tela de login", "room_id": "ROOM_B", "score": 1.5}]
+
+@pytest.mark.asyncio
+async def test_search_scope_leaves_out_archived_rooms():
+    """Verify that search is scoped to live rooms; archived ones become searchable once rehydrated."""
+    mock_db = _db(["ROOM_A"])
+    mock_db.rooms.distinct = AsyncMock(return_value=["ROOM_B"])
+
+    assert await search.user_room_ids(mock_db, "user-1") == ["ROOM_A", "ROOM_B"]
+    assert not mock_db.archived_rooms.method_calls
+
+@pytest.mark.asyncio
+async def test_text_search_is_retried_after_cooldown(monkeypatch):
+    """Verify that a rejected $text query only falls back for SEARCH_TEXT_RETRY_SECONDS and is logged once."""
+    monkeypatch.setattr(search.settings, "SEARCH_TEXT_RETRY_SECONDS", 60)
+    clock = [1000.0]
+    monkeypatch.setattr(search.time, "monotonic", lambda: clock[0])
+    mock_db = _db(["ROOM_A"])
+    mock_db.tasks.find.return_value = FakeCursor([t for t in TASKS if t["room_id"] == "ROOM_A"])
+    text_calls = []
+    def aggregate(pipeline):
+        if "$text" in pipeline[0]["$match"]:
+            text_calls.append(clock[0])
+            if len(text_calls) < 3: raise OperationFailure("text index required for $text query")
+            return FakeCursor([])
+        return FakeCursor([])
+    mock_db.tasks.aggregate.side_effect = aggregate
+    warnings = []
+    monkeypatch.setattr(search.logger, "warning", warnings.append)
+
+    await search.search_tasks(mock_db, "user-1", "login", 10, None)
+    clock[0] += 30
+    await search.search_tasks(mock_db, "user-1", "login", 10, None)  # cooling down: memory only
+    clock[0] += 31
+    await search.search_tasks(mock_db, "user-1", "login", 10, None)  # retried, fails again
+    clock[0] += 61
+    await search.search_tasks(mock_db, "user-1", "login", 10, None)  # retried, succeeds
+
+    assert text_calls == [1000.0, 1061.0, 1122.0]
+    assert len(warnings) == 1
+    assert search._text_search_failed_at is None
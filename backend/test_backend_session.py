@@ -0,0 +1,97 @@
+import sys
+import os
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+from fastapi import Request, Response
+
+# Add backend dir to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+
+from app.main import fastapi_app
+from app.db.database import db_instance
+from app.core.security import create_access_token
+from app.services import socket
+from app.api.routers import auth, rooms, users, tasks, actions, admin, session
+from app.models import domain
+
+
+def _request(headers=None):
+    scope = {
+        "type": "http",
+        "method": "POST",
+        "path": "/api/session/bootstrap",
+        "headers": headers or [],
+        "app": fastapi_app,
+        "client": ("127.0.0.1", 12345)
+    }
+    return Request(scope)
+
+@pytest.mark.asyncio
+async def test_bootstrap_guest_joins_and_returns_state(monkeypatch):
+    """Verify that bootstrap issues a guest token, joins the room and returns the masked state with its version."""
+    mock_db = MagicMock()
+    mock_db.rooms.find_one = AsyncMock(return_value={"id": "ROOM_XYZ", "owner_id": "someone-else"})
+    mock_db.memberships.count_documents = AsyncMock(return_value=1)
+    mock_db.memberships.update_one = AsyncMock()
+    mock_db.profiles.update_one = AsyncMock()
+    db_instance.db = mock_db
+
+    mock_broadcast = AsyncMock()
+    monkeypatch.setattr(session, "broadcast_room_state", mock_broadcast)
+    mock_state = AsyncMock(return_value={"room": {"id": "ROOM_XYZ"}, "votes": [], "version": "node:3"})
+    monkeypatch.setattr(session, "read_room_state", mock_state)
+
+    input = domain.SessionBootstrap(room_id="room_xyz", name="Guest")
+    res = await session.bootstrap_session(_request(), input, Response())
+
+    user_id = res["user"]["id"]
+    assert user_id.startswith("guest-")
+    assert res["user"]["is_guest"] is True
+    assert res["access_token"]
+    assert res["membership"]["room_id"] == "ROOM_XYZ"
+    assert res["membership"]["is_admin"] is False
+    assert res["state_version"] == "node:3"
+    mock_broadcast.assert_called_once_with("ROOM_XYZ")
+    mock_state.assert_called_once_with("ROOM_XYZ", requesting_user_id=user_id)
+
+@pytest.mark.asyncio
+async def test_bootstrap_reuses_existing_session(monkeypatch):
+    """Verify that a caller with a valid token keeps its user id instead of becoming a new guest."""
+    mock_db = MagicMock()
+    mock_db.rooms.find_one = AsyncMock(return_value={"id": "ROOM_XYZ", "owner_id": "google-1"})
+    mock_db.memberships.update_one = AsyncMock()
+    mock_db.profiles.update_one = AsyncMock()
+    db_instance.db = mock_db
+    monkeypatch.setattr(session, "broadcast_room_state", AsyncMock())
+    monkeypatch.setattr(session, "read_room_state", AsyncMock(return_value={"version": "node:1"}))
+
+    token = create_access_token({"sub": "google-1"})
+    request = _request([(b"authorization", f"Bearer {token}".encode())])
+    res = await session.bootstrap_session(request, domain.SessionBootstrap(room_id="ROOM_XYZ", name="Owner"), Response())
+
+    assert res["user"]["id"] == "google-1"
+    assert res["user"]["is_guest"] is False
+    assert res["membership"]["is_admin"] is True
+
+@pytest.mark.asyncio
+async def test_socket_join_skips_rebuild_when_version_matches(monkeypatch):
+    """Verify that a socket join carrying the current state version skips the DB write and broadcast."""
+    mock_db = MagicMock()
+    mock_db.memberships.update_one = AsyncMock()
+    db_instance.db = mock_db
+    monkeypatch.setattr(socket.sio, "get_session", AsyncMock(return_value={"user_id": "user-1"}))
+    monkeypatch.setattr(socket.sio, "enter_room", AsyncMock())
+    mock_broadcast = AsyncMock()
+    monkeypatch.setattr(socket, "broadcast_room_state", mock_broadcast)
+
+    version = socket.bump_room_version("ROOM_V")
+    await socket.join_room("sid-1", {"room_id": "room_v", "state_version": version})
+    mock_db.memberships.update_one.assert_not_called()
+    mock_broadcast.assert_not_called()
+
+    await socket.join_room("sid-2", {"room_id": "ROOM_V", "state_version": "stale"})
+    mock_db.memberships.update_one.assert_called_once_with({"_id": "ROOM_V:user-1"}, {"$set": {"is_online": True}, "$unset": {"offline_since": ""}})
+    mock_broadcast.assert_called_once_with("ROOM_V")
+    socket.socket_users.pop("sid-1", None)
+    socket.socket_users.pop("sid-2", None)
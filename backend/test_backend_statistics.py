@@ -0,0 +1,111 @@
+import sys
+import os
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+
+# Add backend dir to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+
+from app.main import fastapi_app
+from app.db import repositories
+from app.db.database import db_instance
+from app.services import socket, statistics
+from app.api.routers import auth, rooms, users, tasks, actions, admin
+from app.models import domain
+
+
+def test_fibonacci_statistics_ignore_question_mark():
+    """Verify numeric decks use card values and count '?' as an abstention."""
+    stats = statistics.compute_vote_statistics(["3", "5", "5", "?", "8"], domain.get_deck_values("FIBONACCI"))
+
+    assert stats["scale"] == "numeric"
+    assert stats["count"] == 4
+    assert stats["abstentions"] == 1
+    assert stats["mean"] == 5.25
+    assert stats["median"] == 5.0
+    assert stats["mode"] == ["5"]
+    assert stats["spread"] == 5.0
+    assert stats["nearest_card"] == "5"
+    assert stats["consensus"] is False
+    assert stats["distribution"] == [{"card": "3", "count": 1}, {"card": "5", "count": 2}, {"card": "8", "count": 1}]
+
+def test_t_shirt_statistics_use_ordinal_scale():
+    """Verify T-shirt sizes map to their position in the deck."""
+    stats = statistics.compute_vote_statistics(["S", "XL", "XL", "XL"], domain.get_deck_values("T_SHIRT"))
+
+    assert stats["scale"] == "ordinal"
+    assert stats["min"] == "S"
+    assert stats["max"] == "XL"
+    assert stats["spread"] == 3.0
+    assert stats["nearest_card"] == "L"
+    assert stats["agreement"] == 0.75
+
+def test_consensus_and_empty_votes():
+    """Verify unanimous votes flag consensus and an empty round yields empty statistics."""
+    deck = domain.get_deck_values("CUSTOM", "1, 2, 4, 8, coffee")
+    assert statistics.compute_vote_statistics(["4", "4"], deck)["consensus"] is True
+
+    empty = statistics.compute_vote_statistics(["?"], domain.get_deck_values("SEQUENTIAL"))
+    assert empty["count"] == 0
+    assert empty["mean"] is None
+
+@pytest.mark.asyncio
+async def test_reveal_persists_statistics_once_per_round():
+    """Verify that only the hidden -> revealed flip computes statistics, stores them on the
+    task and counts a round; a repeated reveal changes nothing."""
+    repos = repositories.memory_repositories()
+    await repos.rooms.insert({"id": "ROOM_XYZ", "deck_values": ["1", "2", "3", "?"], "active_task_id": "task-1", "cards_revealed": False})
+    await repos.tasks.insert({"id": "task-1", "room_id": "ROOM_XYZ", "rounds": 0})
+    for user_id, value in (("a", "1"), ("b", "3")):
+        await repos.votes.replace({"task_id": "task-1", "user_id": user_id, "value": value})
+
+    assert await socket.reveal_cards(repos, "ROOM_XYZ") is True
+    await repos.votes.replace({"task_id": "task-1", "user_id": "c", "value": "3"})
+    assert await socket.reveal_cards(repos, "ROOM_XYZ") is False
+
+    task = await repos.tasks.get("task-1")
+    assert task["rounds"] == 1
+    assert task["statistics"]["mean"] == 2.0 and task["statistics"]["count"] == 2
+
+
+@pytest.mark.asyncio
+async def test_complete_recomputes_statistics_after_votes_change():
+    """Verify that a vote changed after the reveal is reflected in the statistics stored on completion."""
+    repos = repositories.memory_repositories()
+    await repos.rooms.insert({"id": "ROOM_XYZ", "deck_values": ["1", "2", "3", "?"], "active_task_id": "task-1", "cards_revealed": False})
+    await repos.tasks.insert({"id": "task-1", "room_id": "ROOM_XYZ", "rounds": 0})
+    for user_id, value in (("a", "1"), ("b", "3")):
+        await repos.votes.replace({"task_id": "task-1", "user_id": user_id, "value": value})
+    await socket.reveal_cards(repos, "ROOM_XYZ")
+    assert (await repos.tasks.get("task-1"))["statistics"]["consensus"] is False
+
+    await repos.votes.replace({"task_id": "task-1", "user_id": "a", "value": "3"})
+    await actions._apply_complete(repos, domain.ActionComplete(room_id="ROOM_XYZ", user_id="a", task_id="task-1", final_score="3"))
+
+    task = await repos.tasks.get("task-1")
+    assert task["statistics"]["mean"] == 3.0 and task["statistics"]["consensus"] is True
+    assert task["rounds"] == 1
+
+@pytest.mark.asyncio
+async def test_reveal_broadcast_ships_stored_statistics(monkeypatch):
+    """Verify that the reveal payload carries the task's stored statistics without writing to the task."""
+    mock_db = MagicMock()
+    mock_db.tasks.update_one = AsyncMock()
+    db_instance.db = mock_db
+    monkeypatch.setattr(socket.room_views, "enabled", lambda db: False)
+    stats = {"mean": 2.0}
+    monkeypatch.setattr(socket, "get_room_state", AsyncMock(return_value={
+        "room": {"id": "ROOM_XYZ", "deck_values": ["1", "2", "3", "?"]},
+        "active_task": {"id": "task-1", "statistics": stats},
+        "votes": [{"user_id": "a", "value": "1"}, {"user_id": "b", "value": "3"}]
+    }))
+    mock_emit = AsyncMock()
+    monkeypatch.setattr(socket.sio, "emit", mock_emit)
+
+    await socket.broadcast_reveal("ROOM_XYZ")
+
+    mock_db.tasks.update_one.assert_not_called()
+    event, payload = mock_emit.call_args[0]
+    assert event == "reveal_votes"
+    assert payload["statistics"] == stats
@@ -0,0 +1,126 @@
+import sys
+import os
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+from fastapi import HTTPException, Request
+from pymongo.errors import BulkWriteError
+
+# Add backend dir to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+
+from app.main import fastapi_app
+from app.db.database import db_instance
+from app.api.routers import templates
+from app.models import domain
+
+
+def _request():
+    scope = {"type": "http", "method": "POST", "path": "/api/templates", "headers": [], "app": fastapi_app, "client": ("127.0.0.1", 12345)}
+    return Request(scope)
+
+def _template_doc(owner_id="owner-1", tasks=2):
+    return domain.RoomTemplate(
+        id="tpl-1",
+        name="Sprint",
+        owner_id=owner_id,
+        deck_type="T_SHIRT",
+        deck_values=domain.get_deck_values("T_SHIRT"),
+        tasks=[domain.TemplateTask(title=f"Task {i}") for i in range(tasks)]
+    ).model_dump()
+
+@pytest.mark.asyncio
+async def test_create_template_resolves_deck():
+    """Verify that a template stores the resolved deck values for its deck type."""
+    mock_db = MagicMock()
+    mock_db.room_templates.insert_one = AsyncMock()
+    db_instance.db = mock_db
+
+    input = domain.RoomTemplateCreate(name="Custom", deck_type="CUSTOM", custom_deck="S, M, L", tasks=[{"title": "Login"}])
+    template = await templates.create_template(_request(), input, current_user_id="owner-1")
+
+    assert template.owner_id == "owner-1"
+    assert template.deck_values == ["S", "M", "L"]
+    mock_db.room_templates.insert_one.assert_called_once()
+
+@pytest.mark.asyncio
+async def test_provision_uses_bulk_inserts():
+    """Verify that N rooms and their tasks are written with one insert_many per collection."""
+    mock_db = MagicMock()
+    mock_db.room_templates.find_one = AsyncMock(return_value=_template_doc())
+    mock_db.rooms.insert_many = AsyncMock()
+    mock_db.tasks.insert_many = AsyncMock()
+    mock_db.rooms.insert_one = AsyncMock()
+    mock_db.tasks.insert_one = AsyncMock()
+    db_instance.db = mock_db
+
+    res = await templates.provision_rooms(_request(), "tpl-1", domain.RoomProvision(count=3), current_user_id="owner-1")
+
+    assert len(res["room_ids"]) == 3
+    assert [r["name"] for r in res["rooms"]] == ["Sprint 1", "Sprint 2", "Sprint 3"]
+    mock_db.rooms.insert_many.assert_called_once()
+    mock_db.tasks.insert_many.assert_called_once()
+    mock_db.rooms.insert_one.assert_not_called()
+
+    rooms = mock_db.rooms.insert_many.call_args[0][0]
+    assert all(r["deck_type"] == "T_SHIRT" and r["owner_id"] == "owner-1" for r in rooms)
+    tasks = mock_db.tasks.insert_many.call_args[0][0]
+    assert len(tasks) == 6
+    assert {t["room_id"] for t in tasks} == set(res["room_ids"])
+    assert sorted(t["position"] for t in tasks if t["room_id"] == res["room_ids"][0]) == [0, 1]
+
+@pytest.mark.asyncio
+async def test_provision_regenerates_colliding_room_ids(monkeypatch):
+    """Verify that rooms whose id is taken get a new id before their tasks and counters are written."""
+    mock_db = MagicMock()
+    mock_db.room_templates.find_one = AsyncMock(return_value=_template_doc())
+    attempts = []
+    async def insert_rooms(docs, ordered=True):
+        attempts.append([d["_id"] for d in docs])
+        if len(attempts) == 1:
+            raise BulkWriteError({"writeErrors": [{"index": 1, "code": 11000, "errmsg": "duplicate key"}]})
+    mock_db.rooms.insert_many = AsyncMock(side_effect=insert_rooms)
+    mock_db.tasks.insert_many = AsyncMock()
+    bump_many = AsyncMock()
+    monkeypatch.setattr(templates.counters, "bump_many", bump_many)
+    db_instance.db = mock_db
+
+    res = await templates.provision_rooms(_request(), "tpl-1", domain.RoomProvision(count=3), current_user_id="owner-1")
+
+    first, retry = attempts
+    assert len(retry) == 1 and retry[0] != first[1]
+    assert res["room_ids"] == [first[0], retry[0], first[2]]
+    assert {t["room_id"] for t in mock_db.tasks.insert_many.call_args[0][0]} == set(res["room_ids"])
+    deltas = bump_many.call_args[0][1]
+    assert first[1] not in [k.split(":", 1)[1] for k in deltas]
+
+@pytest.mark.asyncio
+async def test_provision_removes_inserted_rooms_on_failure(monkeypatch):
+    """Verify that a non-duplicate write error removes the rooms already inserted and writes no tasks."""
+    mock_db = MagicMock()
+    mock_db.room_templates.find_one = AsyncMock(return_value=_template_doc())
+    mock_db.rooms.insert_many = AsyncMock(side_effect=BulkWriteError({"writeErrors": [{"index": 0, "code": 121, "errmsg": "validation"}]}))
+    mock_db.rooms.delete_many = AsyncMock()
+    mock_db.tasks.insert_many = AsyncMock()
+    db_instance.db = mock_db
+
+    with pytest.raises(BulkWriteError):
+        await templates.provision_rooms(_request(), "tpl-1", domain.RoomProvision(count=2), current_user_id="owner-1")
+
+    rooms = mock_db.rooms.insert_many.call_args[0][0]
+    mock_db.rooms.delete_many.assert_called_once_with({"_id": {"$in": [rooms[1]["_id"]]}})
+    mock_db.tasks.insert_many.assert_not_called()
+
+@pytest.mark.asyncio
+async def test_provision_requires_template_owner():
+    """Verify that only the template owner can provision rooms from it."""
+    mock_db = MagicMock()
+    mock_db.room_templates.find_one = AsyncMock(return_value=_template_doc(owner_id="someone-else"))
+    mock_db.rooms.insert_many = AsyncMock()
+    db_instance.db = mock_db
+
+    with pytest.raises(HTTPException) as exc:
+        await templates.provision_rooms(_request(), "tpl-1", domain.RoomProvision(names=["A"]), current_user_id="owner-1")
+
+    assert exc.value.status_code == 403
+    mock_db.rooms.insert_many.assert_not_called()
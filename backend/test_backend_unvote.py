@@ -19,9 +19,9 @@ from app.models import domain
 async def test_unvote_success():
     """Verify that unvote route successfully deletes vote and broadcasts state."""
     mock_db = MagicMock()
-    mock_users = MagicMock()
-    mock_users.find_one = AsyncMock(return_value={"id": "user-1", "is_spectator": False})
-    mock_db.users = mock_users
+    mock_memberships = MagicMock()
+    mock_memberships.find_one = AsyncMock(return_value={"user_id": "user-1", "room_id": "ROOM_XYZ", "is_spectator": False})
+    mock_db.memberships = mock_memberships
     
     mock_votes = MagicMock()
     mock_votes.delete_one = AsyncMock()
@@ -39,7 +39,7 @@ async def test_unvote_success():
     
     response = await actions.retract_vote_http(action, current_user_id="user-1")
     assert response == {"status": "success"}
-    mock_votes.delete_one.assert_called_once_with({"task_id": "task-1", "user_id": "user-1"})
+    mock_votes.delete_one.assert_called_once_with({"_id": "task-1:user-1"})
     mock_broadcast.assert_called_once_with("ROOM_XYZ")
 
 @pytest.mark.asyncio
@@ -65,14 +65,13 @@ async def test_get_room_state_exposes_own_vote():
     mock_rooms.find_one = AsyncMock(return_value={"id": "ROOM_XYZ", "cards_revealed": False, "active_task_id": "task-1"})
     mock_db.rooms = mock_rooms
     
-    # Mock users
-    users = [
-        {"id": "user-1", "name": "User 1", "is_spectator": False},
-        {"id": "user-2", "name": "User 2", "is_spectator": False}
+    # Mock memberships and profiles
+    memberships = [
+        {"_id": "ROOM_XYZ:user-1", "user_id": "user-1", "room_id": "ROOM_XYZ", "is_spectator": False},
+        {"_id": "ROOM_XYZ:user-2", "user_id": "user-2", "room_id": "ROOM_XYZ", "is_spectator": False}
     ]
-    mock_users = MagicMock()
-    mock_users.find.return_value.to_list = AsyncMock(return_value=users)
-    mock_db.users = mock_users
+    mock_db.memberships.find.return_value.to_list = AsyncMock(return_value=memberships)
+    mock_db.profiles.find.return_value.to_list = AsyncMock(return_value=[{"_id": "user-1", "name": "User 1"}, {"_id": "user-2", "name": "User 2"}])
     
     # Mock active task
     mock_db.tasks.find_one = AsyncMock(return_value={"id": "task-1"})
@@ -56,4 +56,17 @@ export const disconnectSocket = () => {
 export const getSocket = () => {
   if (!socket) return connectSocket();
   return socket;
-};
\ No newline at end of file
+};
+
+// Namespace /admin: métricas ao vivo enviadas pelo servidor a cada segundo
+export const connectAdminSocket = () => {
+  const apiUrl = import.meta.env.VITE_API_URL || '';
+  return io(`${apiUrl}/admin`, {
+    path: '/api/socket.io/',
+    transports: ['polling', 'websocket'],
+    withCredentials: true,
+    auth: {
+      token: localStorage.getItem('access_token')
+    }
+  });
+};
@@ -1,6 +1,7 @@
 import { useState, useEffect } from "react";
 import { useNavigate } from "react-router-dom";
 import api from "../services/api";
+import { connectAdminSocket } from "../lib/socket";
 import { Toaster, toast } from "sonner";
 import {
   Users,
@@ -12,7 +13,8 @@ import {
   RefreshCw,
   X,
   ExternalLink,
-  Info
+  Info,
+  Activity
 } from "lucide-react";
 
 export default function AdminPanel() {
@@ -23,9 +25,12 @@ export default function AdminPanel() {
   const [loading, setLoading] = useState(false);
   const [refreshing, setRefreshing] = useState(false);
   
-  // Dados
+  // Dados (uma página por vez; next_cursor carrega a seguinte)
   const [users, setUsers] = useState([]);
   const [rooms, setRooms] = useState([]);
+  const [usersPage, setUsersPage] = useState({ next_cursor: null, total: null });
+  const [roomsPage, setRoomsPage] = useState({ next_cursor: null, total: null });
+  const [loadingMore, setLoadingMore] = useState(false);
   
   // Filtros / Busca
   const [searchUser, setSearchUser] = useState("");
@@ -59,18 +64,62 @@ export default function AdminPanel() {
   const [showBulkRoomModal, setShowBulkRoomModal] = useState(false);
   const [isDeletingBulkRooms, setIsDeletingBulkRooms] = useState(false);
 
+  // Métricas ao vivo (namespace /admin do socket.io)
+  const [liveMetrics, setLiveMetrics] = useState(null);
+
+  // Listagens administrativas são paginadas por cursor; busca uma página por vez
+  const PAGE_SIZE = 100;
+  const fetchPage = async (url, cursor = null) => {
+    const res = await api.get(url, { params: { limit: PAGE_SIZE, ...(cursor ? { cursor } : {}) } });
+    return res.data;
+  };
+
+  const loadMore = async (kind) => {
+    const [url, page, setItems, setPage] = kind === "users"
+      ? ["/api/admin/users", usersPage, setUsers, setUsersPage]
+      : ["/api/admin/rooms", roomsPage, setRooms, setRoomsPage];
+    if (!page.next_cursor) return;
+    setLoadingMore(true);
+    try {
+      const data = await fetchPage(url, page.next_cursor);
+      setItems(prev => [...prev, ...data.items]);
+      setPage({ next_cursor: data.next_cursor, total: data.total ?? page.total });
+    } catch (error) {
+      console.error("Erro ao carregar mais itens:", error);
+      toast.error("Falha ao carregar mais itens.");
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
+  // Exclusões rodam como jobs em segundo plano; aguarda a conclusão consultando o progresso
+  const waitForJob = async (data) => {
+    if (!data?.job_id) return;
+    while (true) {
+      const res = await api.get(`/api/admin/jobs/${data.job_id}`);
+      const { status, error } = res.data;
+      if (status === "completed") return;
+      if (["failed", "cancelled", "interrupted"].includes(status)) {
+        throw new Error(error || `Job ${status}`);
+      }
+      await new Promise(resolve => setTimeout(resolve, 1000));
+    }
+  };
+
   // Carregar Dados
   const fetchData = async (isRefresh = false) => {
     if (isRefresh) setRefreshing(true);
     else setLoading(true);
     
     try {
-      const [usersRes, roomsRes] = await Promise.all([
-        api.get("/api/admin/users"),
-        api.get("/api/admin/rooms")
+      const [usersData, roomsData] = await Promise.all([
+        fetchPage("/api/admin/users"),
+        fetchPage("/api/admin/rooms")
       ]);
-      setUsers(usersRes.data);
-      setRooms(roomsRes.data);
+      setUsers(usersData.items);
+      setUsersPage({ next_cursor: usersData.next_cursor, total: usersData.total ?? null });
+      setRooms(roomsData.items);
+      setRoomsPage({ next_cursor: roomsData.next_cursor, total: roomsData.total ?? null });
     } catch (error) {
       console.error("Erro ao buscar dados administrativos:", error);
       toast.error("Falha ao carregar os dados administrativos. Verifique o servidor.");
@@ -84,6 +133,13 @@ export default function AdminPanel() {
     fetchData();
   }, []);
 
+  useEffect(() => {
+    const adminSocket = connectAdminSocket();
+    adminSocket.on("metrics", setLiveMetrics);
+    adminSocket.on("connect_error", (err) => console.error("❌ Métricas ao vivo indisponíveis:", err.message));
+    return () => adminSocket.disconnect();
+  }, []);
+
   // --- FILTROS ---
   const filteredUsers = users.filter(user => 
     user.name.toLowerCase().includes(searchUser.toLowerCase()) || 
@@ -143,7 +199,8 @@ export default function AdminPanel() {
     if (!deleteTargetUser) return;
     setIsDeletingUser(true);
     try {
-      await api.delete(`/api/admin/users/${deleteTargetUser.id}?confirm=true`);
+      const res = await api.delete(`/api/admin/users/${deleteTargetUser.id}?confirm=true`);
+      await waitForJob(res.data);
       toast.success(`Usuário ${deleteTargetUser.name} excluído com sucesso!`);
       
       // Limpa das seleções
@@ -184,10 +241,11 @@ export default function AdminPanel() {
   const handleConfirmBulkDeleteUsers = async () => {
     setIsDeletingBulkUsers(true);
     try {
-      await api.post("/api/admin/users/batch-delete", {
+      const res = await api.post("/api/admin/users/batch-delete", {
         ids: selectedUserIds,
         confirm: true
       });
+      await waitForJob(res.data);
       
       toast.success(`${selectedUserIds.length} usuários excluídos com sucesso!`);
       
@@ -278,7 +336,8 @@ export default function AdminPanel() {
     if (!deleteTargetRoom) return;
     setIsDeletingRoom(true);
     try {
-      await api.delete(`/api/admin/rooms/${deleteTargetRoom.id}`);
+      const res = await api.delete(`/api/admin/rooms/${deleteTargetRoom.id}`);
+      await waitForJob(res.data);
       toast.success(`Sala ${deleteTargetRoom.name} (${deleteTargetRoom.id}) excluída com sucesso!`);
       setSelectedRoomIds(prev => prev.filter(id => id !== deleteTargetRoom.id));
       setDeleteTargetRoom(null);
@@ -295,9 +354,10 @@ export default function AdminPanel() {
   const handleConfirmBulkDeleteRooms = async () => {
     setIsDeletingBulkRooms(true);
     try {
-      await api.post("/api/admin/rooms/batch-delete", {
+      const res = await api.post("/api/admin/rooms/batch-delete", {
         ids: selectedRoomIds
       });
+      await waitForJob(res.data);
       toast.success(`${selectedRoomIds.length} salas excluídas com sucesso!`);
       setSelectedRoomIds([]);
       setShowBulkRoomModal(false);
@@ -357,6 +417,31 @@ export default function AdminPanel() {
 
       {/* Main Content */}
       <main className="flex-1 max-w-7xl mx-auto px-4 sm:px-6 lg:px-8 py-8 w-full pb-28">
+        {/* Métricas ao vivo */}
+        {liveMetrics && (
+          <div className="mb-8 p-4 bg-card/50 border border-border rounded-xl">
+            <div className="flex items-center gap-2 mb-3 text-sm font-semibold text-muted-foreground">
+              <Activity className="w-4 h-4 text-emerald-400" />
+              Ao vivo
+            </div>
+            <div className="grid grid-cols-2 sm:grid-cols-4 gap-4 text-sm">
+              <div><p className="text-muted-foreground text-xs">Salas ativas</p><p className="text-lg font-bold">{liveMetrics.active_rooms}</p></div>
+              <div><p className="text-muted-foreground text-xs">Sockets conectados</p><p className="text-lg font-bold">{liveMetrics.connected_sockets}</p></div>
+              <div><p className="text-muted-foreground text-xs">Usuários online</p><p className="text-lg font-bold">{liveMetrics.online_users}</p></div>
+              <div><p className="text-muted-foreground text-xs">Votos/minuto</p><p className="text-lg font-bold">{liveMetrics.votes_per_minute}</p></div>
+            </div>
+            {liveMetrics.hottest_rooms.length > 0 && (
+              <div className="mt-3 flex flex-wrap gap-2 text-xs font-mono">
+                {liveMetrics.hottest_rooms.map(room => (
+                  <span key={room.room_id} className="px-2 py-1 bg-accent rounded-md">
+                    {room.room_id} · {room.votes_per_minute} votos · {room.online_users} online
+                  </span>
+                ))}
+              </div>
+            )}
+          </div>
+        )}
+
         {/* Tabs Selectors */}
         <div className="flex border-b border-border mb-8 gap-6">
           <button
@@ -368,7 +453,7 @@ export default function AdminPanel() {
             }`}
           >
             <Users className="w-4 h-4" />
-            Usuários ({users.length})
+            Usuários ({usersPage.total != null && usersPage.total > users.length ? `${users.length} de ${usersPage.total}` : users.length})
           </button>
           
           <button
@@ -380,7 +465,7 @@ export default function AdminPanel() {
             }`}
           >
             <Home className="w-4 h-4" />
-            Salas ({rooms.length})
+            Salas ({roomsPage.total != null && roomsPage.total > rooms.length ? `${rooms.length} de ${roomsPage.total}` : rooms.length})
           </button>
         </div>
 
@@ -526,6 +611,17 @@ export default function AdminPanel() {
                       </tbody>
                     </table>
                   </div>
+                  {usersPage.next_cursor && (
+                    <div className="flex justify-center p-4 border-t border-border/60">
+                      <button
+                        onClick={() => loadMore("users")}
+                        disabled={loadingMore}
+                        className="px-4 py-2 bg-accent hover:bg-accent text-foreground hover:text-primary-foreground rounded-lg transition text-sm font-medium disabled:opacity-50"
+                      >
+                        {loadingMore ? "Carregando..." : "Carregar mais"}
+                      </button>
+                    </div>
+                  )}
                 </div>
 
                 {/* Painel de Mesclagem */}
@@ -740,6 +836,17 @@ export default function AdminPanel() {
                     </tbody>
                   </table>
                 </div>
+                {roomsPage.next_cursor && (
+                  <div className="flex justify-center p-4 border-t border-border/60">
+                    <button
+                      onClick={() => loadMore("rooms")}
+                      disabled={loadingMore}
+                      className="px-4 py-2 bg-accent hover:bg-accent text-foreground hover:text-primary-foreground rounded-lg transition text-sm font-medium disabled:opacity-50"
+                    >
+                      {loadingMore ? "Carregando..." : "Carregar mais"}
+                    </button>
+                  </div>
+                )}
               </div>
             )}
           </>